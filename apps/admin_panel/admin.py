@@ -6,7 +6,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import AdminActionLog, PlatformSettings
+from .models import AdminActionLog, PlatformSettings, PlatformSnapshot
 from .domain_models import CustomDomain, DomainVerificationLog
 
 
@@ -262,3 +262,21 @@ class DomainVerificationLogAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         # Keep audit trail intact
         return False
+
+
+@admin.register(PlatformSnapshot)
+class PlatformSnapshotAdmin(admin.ModelAdmin):
+    """
+    Read-only history of platform KPI snapshots.
+    """
+    list_display = [
+        'captured_at', 'total_trainers', 'active_trainers', 'total_clients',
+        'total_bookings', 'mrr', 'churn_rate'
+    ]
+    date_hierarchy = 'captured_at'
+    ordering = ['-captured_at']
+    readonly_fields = [field.name for field in PlatformSnapshot._meta.fields]
+    
+    def has_add_permission(self, request):
+        # Snapshots are taken by the scheduled task
+        return False
@@ -3,6 +3,7 @@ Analytics utilities for Epic 0.4: Analytics Dashboard
 Provides data aggregation functions for charts and visualizations.
 """
 from django.db.models import Count, Sum, Q, Avg
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
 from django.utils import timezone
 from datetime import timedelta, datetime
 from collections import defaultdict
@@ -13,50 +14,119 @@ from apps.clients.models import Client
 from apps.bookings.models import Booking
 
 
+# Supported group_by values and the database function truncating to them
+PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+# Measure kinds: (aggregate factory, value for periods without rows)
+MEASURES = {
+    'count': (lambda field: Count(field), 0),
+    'sum': (lambda field: Sum(field), 0.0),
+    'distinct': (lambda field: Count(field, distinct=True), 0),
+}
+
+
+def period_start(value, group_by):
+    """Start date of the day, week (Monday) or month containing a date or datetime."""
+    if isinstance(value, datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    if group_by == 'week':
+        return value - timedelta(days=value.weekday())
+    if group_by == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def period_label(period, group_by):
+    """Chart label of a period: '2024-01' for months, else the start date."""
+    return period.strftime('%Y-%m') if group_by == 'month' else period.isoformat()
+
+
+def next_period(period, group_by):
+    if group_by == 'week':
+        return period + timedelta(days=7)
+    if group_by == 'month':
+        return (period + timedelta(days=32)).replace(day=1)
+    return period + timedelta(days=1)
+
+
+def aggregate_time_series(queryset, date_field, start, end, group_by='day', **measures):
+    """
+    Aggregate a queryset into a gap-free time series, grouped in the database.
+    
+    Rows between start and end are grouped by their truncated date_field
+    and aggregated with one GROUP BY query; periods without rows are filled
+    with zeros so charts get a continuous axis.
+    
+    Args:
+        queryset: Rows to aggregate
+        date_field: Date/datetime field placing each row in time
+        start: Window start (datetime)
+        end: Window end (datetime)
+        group_by: 'day', 'week' or 'month'
+        **measures: name=(kind, field) with kind 'count', 'sum' or 'distinct'
+            (e.g. revenue=('sum', 'amount'), active_users=('distinct', 'trainer'))
+    
+    Returns:
+        List of dicts with the period label and each measure
+        Format: [{'date': '2024-01-01', 'revenue': 1500.0}, ...]
+    """
+    rows = queryset.filter(**{
+        f'{date_field}__gte': start,
+        f'{date_field}__lte': end,
+    }).annotate(
+        period=PERIODS[group_by](date_field)
+    ).values('period').annotate(**{
+        name: MEASURES[kind][0](field) for name, (kind, field) in measures.items()
+    }).order_by('period')
+    
+    totals = {period_start(row['period'], group_by): row for row in rows}
+    
+    series = []
+    period = period_start(start, group_by)
+    last = period_start(end, group_by)
+    while period <= last:
+        row = totals.get(period, {})
+        point = {'date': period_label(period, group_by)}
+        for name, (kind, _) in measures.items():
+            empty = MEASURES[kind][1]
+            point[name] = type(empty)(row.get(name) or empty)
+        series.append(point)
+        period = next_period(period, group_by)
+    
+    return series
+
+
 def get_revenue_trends(days=30, group_by='day'):
     """
     Get revenue trends over time.
     
     Args:
         days: Number of days to look back (default: 30)
-        group_by: 'day' or 'month' for grouping
+        group_by: 'day', 'week' or 'month' for grouping
     
     Returns:
         List of dicts with date and revenue amount
         Format: [{'date': '2024-01-01', 'revenue': 1500.00}, ...]
     """
     try:
-        from apps.payments.models import Payment, Subscription
+        from apps.payments.models import Payment
         
         end_date = timezone.now()
         start_date = end_date - timedelta(days=days)
         
-        # Get all completed payments in the date range
-        payments = Payment.objects.filter(
-            status='completed',
-            created_at__gte=start_date,
-            created_at__lte=end_date
-        ).order_by('created_at')
-        
-        # Group by day or month
-        revenue_by_period = defaultdict(Decimal)
-        
-        for payment in payments:
-            if group_by == 'day':
-                key = payment.created_at.date().isoformat()
-            else:  # month
-                key = payment.created_at.strftime('%Y-%m')
-            
-            revenue_by_period[key] += payment.amount
-        
-        # Convert to list sorted by date
-        result = [
-            {'date': date, 'revenue': float(amount)}
-            for date, amount in sorted(revenue_by_period.items())
-        ]
-        
-        return result
-        
+        return aggregate_time_series(
+            Payment.objects.filter(status='completed'),
+            'created_at',
+            start_date,
+            end_date,
+            group_by,
+            revenue=('sum', 'amount')
+        )
+    
     except Exception as e:
         # If payments app not available, return empty list
         return []
@@ -68,7 +138,7 @@ def get_signup_trends(days=30, group_by='day'):
     
     Args:
         days: Number of days to look back (default: 30)
-        group_by: 'day' or 'month' for grouping
+        group_by: 'day', 'week' or 'month' for grouping
     
     Returns:
         List of dicts with date and signup count
@@ -77,30 +147,14 @@ def get_signup_trends(days=30, group_by='day'):
     end_date = timezone.now()
     start_date = end_date - timedelta(days=days)
     
-    # Get all trainers created in the date range
-    trainers = Trainer.objects.filter(
-        created_at__gte=start_date,
-        created_at__lte=end_date
-    ).order_by('created_at')
-    
-    # Group by day or month
-    signups_by_period = defaultdict(int)
-    
-    for trainer in trainers:
-        if group_by == 'day':
-            key = trainer.created_at.date().isoformat()
-        else:  # month
-            key = trainer.created_at.strftime('%Y-%m')
-        
-        signups_by_period[key] += 1
-    
-    # Convert to list sorted by date
-    result = [
-        {'date': date, 'signups': count}
-        for date, count in sorted(signups_by_period.items())
-    ]
-    
-    return result
+    return aggregate_time_series(
+        Trainer.objects.all(),
+        'created_at',
+        start_date,
+        end_date,
+        group_by,
+        signups=('count', 'id')
+    )
 
 
 def get_active_users_over_time(days=30, group_by='day'):
@@ -110,7 +164,7 @@ def get_active_users_over_time(days=30, group_by='day'):
     
     Args:
         days: Number of days to look back (default: 30)
-        group_by: 'day' or 'month' for grouping
+        group_by: 'day', 'week' or 'month' for grouping
     
     Returns:
         List of dicts with date and active user count
@@ -119,30 +173,14 @@ def get_active_users_over_time(days=30, group_by='day'):
     end_date = timezone.now()
     start_date = end_date - timedelta(days=days)
     
-    # Get bookings grouped by date
-    bookings = Booking.objects.filter(
-        start_time__gte=start_date,
-        start_time__lte=end_date
-    ).order_by('start_time')
-    
-    # Group by day or month and count unique trainers
-    active_users_by_period = defaultdict(set)
-    
-    for booking in bookings:
-        if group_by == 'day':
-            key = booking.start_time.date().isoformat()
-        else:  # month
-            key = booking.start_time.strftime('%Y-%m')
-        
-        active_users_by_period[key].add(booking.trainer_id)
-    
-    # Convert to list sorted by date
-    result = [
-        {'date': date, 'active_users': len(trainer_ids)}
-        for date, trainer_ids in sorted(active_users_by_period.items())
-    ]
-    
-    return result
+    return aggregate_time_series(
+        Booking.objects.all(),
+        'start_time',
+        start_date,
+        end_date,
+        group_by,
+        active_users=('distinct', 'trainer')
+    )
 
 
 def get_geographic_distribution():
@@ -201,7 +239,7 @@ def get_revenue_by_plan():
         ]
         
         return result
-        
+    
     except Exception:
         return []
 
@@ -212,7 +250,7 @@ def get_booking_trends(days=30, group_by='day'):
     
     Args:
         days: Number of days to look back (default: 30)
-        group_by: 'day' or 'month' for grouping
+        group_by: 'day', 'week' or 'month' for grouping
     
     Returns:
         List of dicts with date and booking count
@@ -221,30 +259,14 @@ def get_booking_trends(days=30, group_by='day'):
     end_date = timezone.now()
     start_date = end_date - timedelta(days=days)
     
-    # Get all bookings in the date range
-    bookings = Booking.objects.filter(
-        start_time__gte=start_date,
-        start_time__lte=end_date
-    ).order_by('start_time')
-    
-    # Group by day or month
-    bookings_by_period = defaultdict(int)
-    
-    for booking in bookings:
-        if group_by == 'day':
-            key = booking.start_time.date().isoformat()
-        else:  # month
-            key = booking.start_time.strftime('%Y-%m')
-        
-        bookings_by_period[key] += 1
-    
-    # Convert to list sorted by date
-    result = [
-        {'date': date, 'bookings': count}
-        for date, count in sorted(bookings_by_period.items())
-    ]
-    
-    return result
+    return aggregate_time_series(
+        Booking.objects.all(),
+        'start_time',
+        start_date,
+        end_date,
+        group_by,
+        bookings=('count', 'id')
+    )
 
 
 def get_client_growth_trends(days=30, group_by='day'):
@@ -253,7 +275,7 @@ def get_client_growth_trends(days=30, group_by='day'):
     
     Args:
         days: Number of days to look back (default: 30)
-        group_by: 'day' or 'month' for grouping
+        group_by: 'day', 'week' or 'month' for grouping
     
     Returns:
         List of dicts with date and new client count
@@ -262,87 +284,40 @@ def get_client_growth_trends(days=30, group_by='day'):
     end_date = timezone.now()
     start_date = end_date - timedelta(days=days)
     
-    # Get all clients created in the date range
-    clients = Client.objects.filter(
-        created_at__gte=start_date,
-        created_at__lte=end_date,
-        is_active=True
-    ).order_by('created_at')
-    
-    # Group by day or month
-    clients_by_period = defaultdict(int)
-    
-    for client in clients:
-        if group_by == 'day':
-            key = client.created_at.date().isoformat()
-        else:  # month
-            key = client.created_at.strftime('%Y-%m')
-        
-        clients_by_period[key] += 1
-    
-    # Convert to list sorted by date
-    result = [
-        {'date': date, 'new_clients': count}
-        for date, count in sorted(clients_by_period.items())
-    ]
-    
-    return result
+    return aggregate_time_series(
+        Client.objects.filter(is_active=True),
+        'created_at',
+        start_date,
+        end_date,
+        group_by,
+        new_clients=('count', 'id')
+    )
 
 
-def get_top_performing_trainers(limit=10):
+def get_top_performing_trainers(limit=10, metric='revenue'):
     """
-    Get top performing trainers by revenue or bookings.
+    Get top performing trainers from the incrementally kept leaderboard.
     
     Args:
         limit: Number of trainers to return (default: 10)
+        metric: 'revenue', 'bookings' or 'completed_sessions' (default: 'revenue')
     
     Returns:
         List of dicts with trainer info and metrics
     """
-    try:
-        from apps.payments.models import Payment, Subscription
-        
-        # Get trainers with their revenue
-        # Note: Using select_related and prefetch_related for optimization
-        trainers = Trainer.objects.select_related('user').prefetch_related(
-            'subscription__payments'
-        ).annotate(
-            total_revenue=Sum(
-                'subscription__payments__amount',
-                filter=Q(subscription__payments__status='completed')
-            ),
-            total_bookings=Count('bookings')
-        ).order_by('-total_revenue')[:limit]
-        
-        result = []
-        for trainer in trainers:
-            result.append({
-                'trainer_id': trainer.id,
-                'business_name': trainer.business_name,
-                'email': trainer.user.email,
-                'total_revenue': float(trainer.total_revenue or 0),
-                'total_bookings': trainer.total_bookings or 0,
-                'location': trainer.location or 'N/A'
-            })
-        
-        return result
-        
-    except Exception:
-        # Fallback to bookings only
-        trainers = Trainer.objects.annotate(
-            total_bookings=Count('bookings')
-        ).order_by('-total_bookings')[:limit]
-        
-        result = []
-        for trainer in trainers:
-            result.append({
-                'trainer_id': trainer.id,
-                'business_name': trainer.business_name,
-                'email': trainer.user.email,
-                'total_revenue': 0.0,
-                'total_bookings': trainer.total_bookings or 0,
-                'location': trainer.location or 'N/A'
-            })
-        
-        return result
-
+    from apps.analytics.leaderboard import top
+    
+    result = []
+    for score in top(metric=metric, limit=limit):
+        trainer = score.trainer
+        result.append({
+            'trainer_id': trainer.id,
+            'business_name': trainer.business_name,
+            'email': trainer.user.email,
+            'total_revenue': float(score.revenue),
+            'total_bookings': score.bookings,
+            'completed_sessions': score.completed_sessions,
+            'location': trainer.location or 'N/A'
+        })
+    
+    return result
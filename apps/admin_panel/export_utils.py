@@ -1,154 +1,163 @@
 """
 Export utilities for admin panel.
 Generate CSV and Excel exports of trainer data.
+Trainer exports stream (see apps.core.exports): subscription, domain and
+count columns are annotated onto the trainer query instead of being
+looked up per trainer.
 """
 import csv
 import io
 from datetime import datetime
+from django.db.models import Case, CharField, F, Value, When
 from django.http import HttpResponse
 
+from apps.core.exports import format_datetime, iterate, related_count, streaming_csv_response, yes_no
 
-def export_trainers_csv(trainers):
+
+TRAINER_EXPORT_HEADER = [
+    'ID',
+    'Business Name',
+    'Email',
+    'User Active',
+    'Is Verified',
+    'Location',
+    'Timezone',
+    'Rating',
+    'Total Sessions',
+    'Total Clients',
+    'Total Bookings',
+    'Subscription Plan',
+    'Subscription Status',
+    'Custom Domain',
+    'Created At',
+    'Updated At'
+]
+
+
+def annotate_trainer_export(trainers):
     """
-    Export trainers to CSV format.
+    Add the related columns of a trainer export to a Trainer queryset.
     
     Args:
         trainers: QuerySet of Trainer objects
-        
+    
     Returns:
-        HttpResponse with CSV file
+        QuerySet with user joined and export_* annotations
     """
-    response = HttpResponse(content_type='text/csv')
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    response['Content-Disposition'] = f'attachment; filename="trainers_export_{timestamp}.csv"'
-    
-    writer = csv.writer(response)
-    
-    # Header row
-    writer.writerow([
-        'ID',
-        'Business Name',
-        'Email',
-        'User Active',
-        'Is Verified',
-        'Location',
-        'Timezone',
-        'Rating',
-        'Total Sessions',
-        'Total Clients',
-        'Total Bookings',
-        'Subscription Plan',
-        'Subscription Status',
-        'Custom Domain',
-        'Created At',
-        'Updated At'
-    ])
-    
-    # Data rows
-    for trainer in trainers:
-        # Get subscription info
-        try:
-            from apps.payments.models import Subscription
-            subscription = Subscription.objects.filter(trainer=trainer).first()
-            sub_plan = subscription.plan if subscription else 'free'
-            sub_status = subscription.status if subscription else 'free'
-        except:
-            sub_plan = 'free'
-            sub_status = 'free'
-        
-        # Get custom domain
-        try:
-            from apps.payments.models import CustomDomain
-            domain = CustomDomain.objects.filter(trainer=trainer, status='active').first()
-            custom_domain = domain.domain if domain else ''
-        except:
-            custom_domain = ''
-        
-        # Get counts
-        total_clients = trainer.clients.filter(is_active=True).count()
-        total_bookings = trainer.bookings.count()
-        
-        writer.writerow([
+    from apps.bookings.models import Booking
+    from apps.clients.models import Client
+    
+    return trainers.select_related('user').annotate(
+        export_clients=related_count(Client.objects.filter(is_active=True), 'trainer'),
+        export_bookings=related_count(Booking.objects.all(), 'trainer'),
+        export_plan=F('subscription__plan'),
+        export_status=F('subscription__status'),
+        export_domain=Case(
+            When(custom_domain__status='active', then=F('custom_domain__domain')),
+            default=Value(''),
+            output_field=CharField()
+        )
+    )
+
+
+def trainer_export_rows(trainers):
+    """Yield one CSV row per trainer of an annotate_trainer_export() queryset."""
+    for trainer in iterate(trainers):
+        yield [
             trainer.id,
             trainer.business_name,
             trainer.user.email,
-            'Yes' if trainer.user.is_active else 'No',
-            'Yes' if trainer.is_verified else 'No',
+            yes_no(trainer.user.is_active),
+            yes_no(trainer.is_verified),
             trainer.location,
             trainer.timezone,
             trainer.rating,
             trainer.total_sessions,
-            total_clients,
-            total_bookings,
-            sub_plan,
-            sub_status,
-            custom_domain,
-            trainer.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            trainer.updated_at.strftime('%Y-%m-%d %H:%M:%S')
-        ])
-    
-    return response
+            trainer.export_clients,
+            trainer.export_bookings,
+            trainer.export_plan or 'free',
+            trainer.export_status or 'free',
+            trainer.export_domain,
+            format_datetime(trainer.created_at),
+            format_datetime(trainer.updated_at)
+        ]
 
 
-def export_trainer_detail_csv(trainer):
+def export_trainers_csv(trainers):
     """
-    Export detailed trainer information including clients and bookings.
+    Export trainers to CSV format.
     
     Args:
-        trainer: Trainer object
-        
+        trainers: QuerySet of Trainer objects
+    
     Returns:
-        HttpResponse with CSV file
+        StreamingHttpResponse with CSV file
     """
-    response = HttpResponse(content_type='text/csv')
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"trainer_{trainer.id}_{trainer.business_name.replace(' ', '_')}_{timestamp}.csv"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    writer = csv.writer(response)
-    
+    return streaming_csv_response(
+        f'trainers_export_{timestamp}.csv',
+        TRAINER_EXPORT_HEADER,
+        trainer_export_rows(annotate_trainer_export(trainers))
+    )
+
+
+def trainer_detail_rows(trainer):
+    """Yield the sections of a trainer detail export as CSV rows."""
     # Trainer info section
-    writer.writerow(['TRAINER INFORMATION'])
-    writer.writerow(['Field', 'Value'])
-    writer.writerow(['ID', trainer.id])
-    writer.writerow(['Business Name', trainer.business_name])
-    writer.writerow(['Email', trainer.user.email])
-    writer.writerow(['Location', trainer.location])
-    writer.writerow(['Timezone', trainer.timezone])
-    writer.writerow(['Rating', trainer.rating])
-    writer.writerow(['Total Sessions', trainer.total_sessions])
-    writer.writerow(['Is Verified', 'Yes' if trainer.is_verified else 'No'])
-    writer.writerow(['Account Active', 'Yes' if trainer.user.is_active else 'No'])
-    writer.writerow([])
+    yield ['TRAINER INFORMATION']
+    yield ['Field', 'Value']
+    yield ['ID', trainer.id]
+    yield ['Business Name', trainer.business_name]
+    yield ['Email', trainer.user.email]
+    yield ['Location', trainer.location]
+    yield ['Timezone', trainer.timezone]
+    yield ['Rating', trainer.rating]
+    yield ['Total Sessions', trainer.total_sessions]
+    yield ['Is Verified', yes_no(trainer.is_verified)]
+    yield ['Account Active', yes_no(trainer.user.is_active)]
+    yield []
     
     # Clients section
-    writer.writerow(['CLIENTS'])
-    writer.writerow(['ID', 'Name', 'Email', 'Phone', 'Fitness Level', 'Created'])
+    yield ['CLIENTS']
+    yield ['ID', 'Name', 'Email', 'Phone', 'Fitness Level', 'Created']
     for client in trainer.clients.filter(is_active=True)[:100]:
-        writer.writerow([
+        yield [
             client.id,
             client.get_full_name(),
             client.email,
             client.phone,
             client.fitness_level,
             client.created_at.strftime('%Y-%m-%d')
-        ])
-    writer.writerow([])
+        ]
+    yield []
     
     # Bookings section
-    writer.writerow(['RECENT BOOKINGS'])
-    writer.writerow(['ID', 'Client', 'Start Time', 'End Time', 'Status', 'Duration (min)'])
-    for booking in trainer.bookings.order_by('-start_time')[:100]:
-        writer.writerow([
+    yield ['RECENT BOOKINGS']
+    yield ['ID', 'Client', 'Start Time', 'End Time', 'Status', 'Duration (min)']
+    for booking in trainer.bookings.select_related('client').order_by('-start_time')[:100]:
+        yield [
             booking.id,
             booking.client.get_full_name(),
             booking.start_time.strftime('%Y-%m-%d %H:%M'),
             booking.end_time.strftime('%Y-%m-%d %H:%M'),
             booking.status,
             booking.duration_minutes
-        ])
+        ]
+
+
+def export_trainer_detail_csv(trainer):
+    """
+    Export detailed trainer information including clients and bookings.
     
-    return response
+    Args:
+        trainer: Trainer object
+    
+    Returns:
+        StreamingHttpResponse with CSV file
+    """
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"trainer_{trainer.id}_{trainer.business_name.replace(' ', '_')}_{timestamp}.csv"
+    return streaming_csv_response(filename, None, trainer_detail_rows(trainer))
 
 
 def export_platform_stats_csv(stats_data):
@@ -157,7 +166,7 @@ def export_platform_stats_csv(stats_data):
     
     Args:
         stats_data: Dictionary of platform statistics
-        
+    
     Returns:
         HttpResponse with CSV file
     """
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:02
+
+from django.db import migrations
+
+from apps.core.partitioning import PartitionByMonth
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0002_customdomain_domainverificationlog_and_more'),
+    ]
+
+    operations = [
+        PartitionByMonth('adminactionlog', 'created_at'),
+        PartitionByMonth('domainverificationlog', 'created_at'),
+    ]
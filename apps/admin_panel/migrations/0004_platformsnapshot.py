@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin_panel', '0003_partition_by_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('captured_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('total_trainers', models.IntegerField(default=0)),
+                ('active_trainers', models.IntegerField(default=0)),
+                ('total_clients', models.IntegerField(default=0)),
+                ('total_bookings', models.IntegerField(default=0)),
+                ('new_signups_this_month', models.IntegerField(default=0)),
+                ('total_revenue_this_month', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('mrr', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('churn_rate', models.FloatField(default=0)),
+                ('subscription_breakdown', models.JSONField(blank=True, default=dict)),
+                ('analytics', models.JSONField(blank=True, default=dict)),
+            ],
+            options={
+                'ordering': ['-captured_at'],
+                'get_latest_by': 'captured_at',
+            },
+        ),
+    ]
@@ -80,3 +80,30 @@ class PlatformSettings(models.Model):
     
     def __str__(self):
         return self.key
+
+
+class PlatformSnapshot(models.Model):
+    """
+    Point-in-time snapshot of platform KPIs.
+    Taken on a schedule (and on demand) so admin dashboards read the latest
+    row instead of scanning every tenant's data; the rows form a KPI history.
+    """
+    captured_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    total_trainers = models.IntegerField(default=0)
+    active_trainers = models.IntegerField(default=0)
+    total_clients = models.IntegerField(default=0)
+    total_bookings = models.IntegerField(default=0)
+    new_signups_this_month = models.IntegerField(default=0)
+    total_revenue_this_month = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    mrr = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    churn_rate = models.FloatField(default=0)
+    subscription_breakdown = models.JSONField(default=dict, blank=True)
+    # Default analytics dashboard payload (see snapshots.ANALYTICS_DAYS)
+    analytics = models.JSONField(default=dict, blank=True)
+    
+    class Meta:
+        ordering = ['-captured_at']
+        get_latest_by = 'captured_at'
+    
+    def __str__(self):
+        return f"Platform snapshot {self.captured_at:%Y-%m-%d %H:%M}"
@@ -161,6 +161,7 @@ class PlatformStatsSerializer(serializers.Serializer):
     mrr = serializers.DecimalField(max_digits=10, decimal_places=2)
     churn_rate = serializers.FloatField()
     subscription_breakdown = serializers.DictField()
+    captured_at = serializers.DateTimeField(required=False)
 
 
 class TrainerAccountActionSerializer(serializers.Serializer):
@@ -236,6 +237,7 @@ class TopPerformingTrainerSerializer(serializers.Serializer):
     email = serializers.EmailField()
     total_revenue = serializers.FloatField()
     total_bookings = serializers.IntegerField()
+    completed_sessions = serializers.IntegerField(required=False)
     location = serializers.CharField()
 
 
@@ -0,0 +1,184 @@
+"""
+Platform KPI snapshots.
+Platform-wide totals, subscription breakdown, MRR and churn are computed
+with a handful of aggregate queries and stored as PlatformSnapshot rows on
+a schedule. Admin endpoints serve the latest snapshot and can refresh it
+on demand; a stale snapshot is still served while a new one is taken in
+the background. Snapshots past PLATFORM_SNAPSHOT_RETENTION_DAYS are pruned
+by the snapshot task.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, Count, DecimalField, Q, Sum, Value, When
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.clients.models import Client
+from apps.trainers.models import Trainer
+from .models import PlatformSnapshot
+
+
+# Monthly price of each subscription plan
+PLAN_PRICES = {
+    'free': 0,
+    'pro': 29,
+    'business': 79,
+}
+
+# Window and grouping of the analytics payload stored with each snapshot
+ANALYTICS_DAYS = 30
+ANALYTICS_GROUP_BY = 'day'
+
+# Snapshots older than this are refreshed in the background when served
+MAX_SNAPSHOT_AGE = timedelta(hours=1)
+
+# Held while a background refresh is queued, so requests queue one between them
+REFRESH_LOCK_KEY = 'admin_panel:snapshot-refresh'
+REFRESH_LOCK_TIMEOUT = 15 * 60
+
+
+def compute_kpis():
+    """
+    Compute platform KPIs.
+    
+    Returns:
+        dict: Fields of PlatformSnapshot except analytics
+    """
+    now = timezone.now()
+    this_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    
+    trainers = Trainer.objects.aggregate(
+        total_trainers=Count('id'),
+        active_trainers=Count('id', filter=Q(user__is_active=True)),
+        new_signups_this_month=Count('id', filter=Q(created_at__gte=this_month_start))
+    )
+    kpis = {
+        **trainers,
+        'total_clients': Client.objects.filter(is_active=True).count(),
+        'total_bookings': Booking.objects.count(),
+        'total_revenue_this_month': Decimal('0'),
+        'mrr': Decimal('0'),
+        'churn_rate': 0,
+        'subscription_breakdown': {},
+    }
+    
+    try:
+        from apps.payments.models import Payment, Subscription
+    except ImportError:
+        return kpis
+    
+    kpis['total_revenue_this_month'] = Payment.objects.filter(
+        created_at__gte=this_month_start,
+        status='completed'
+    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    
+    kpis['subscription_breakdown'] = {
+        item['plan']: item['count']
+        for item in Subscription.objects.filter(status='active').values('plan').annotate(
+            count=Count('id')
+        ).order_by()
+    }
+    
+    subscriptions = Subscription.objects.aggregate(
+        mrr=Sum(
+            Case(
+                *[When(plan=plan, then=Value(price)) for plan, price in PLAN_PRICES.items()],
+                default=Value(0),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+            filter=Q(status='active')
+        ),
+        churned_this_month=Count('id', filter=Q(status='cancelled', updated_at__gte=this_month_start)),
+        active_last_month=Count('id', filter=Q(created_at__lt=this_month_start))
+    )
+    kpis['mrr'] = subscriptions['mrr'] or Decimal('0')
+    if subscriptions['active_last_month']:
+        kpis['churn_rate'] = round(
+            subscriptions['churned_this_month'] / subscriptions['active_last_month'] * 100, 2
+        )
+    
+    return kpis
+
+
+def compute_analytics(days=ANALYTICS_DAYS, group_by=ANALYTICS_GROUP_BY):
+    """Analytics dashboard payload (trends, distributions, top trainers)."""
+    from .analytics_utils import (
+        get_revenue_trends,
+        get_signup_trends,
+        get_active_users_over_time,
+        get_geographic_distribution,
+        get_revenue_by_plan,
+        get_booking_trends,
+        get_client_growth_trends,
+        get_top_performing_trainers
+    )
+    
+    return {
+        'revenue_trends': get_revenue_trends(days=days, group_by=group_by),
+        'signup_trends': get_signup_trends(days=days, group_by=group_by),
+        'active_users_trends': get_active_users_over_time(days=days, group_by=group_by),
+        'geographic_distribution': get_geographic_distribution(),
+        'booking_trends': get_booking_trends(days=days, group_by=group_by),
+        'client_growth_trends': get_client_growth_trends(days=days, group_by=group_by),
+        'revenue_by_plan': get_revenue_by_plan(),
+        'top_performing_trainers': get_top_performing_trainers(limit=10),
+    }
+
+
+def take_snapshot():
+    """Compute and store a new platform snapshot."""
+    return PlatformSnapshot.objects.create(analytics=compute_analytics(), **compute_kpis())
+
+
+def latest_snapshot(refresh=False):
+    """
+    The most recent platform snapshot.
+    
+    Args:
+        refresh: Take a new snapshot instead of serving the stored one
+    
+    Returns:
+        PlatformSnapshot: taken now if refresh is set or no snapshot exists
+            yet; a latest snapshot older than MAX_SNAPSHOT_AGE is returned
+            as is and take_platform_snapshot is queued
+    """
+    snapshot = None if refresh else PlatformSnapshot.objects.order_by('-captured_at').first()
+    if snapshot is None:
+        return take_snapshot()
+    
+    if snapshot.captured_at < timezone.now() - MAX_SNAPSHOT_AGE and cache.add(
+        REFRESH_LOCK_KEY, True, REFRESH_LOCK_TIMEOUT
+    ):
+        from .tasks import take_platform_snapshot
+        take_platform_snapshot.delay()
+    return snapshot
+
+
+def prune_snapshots():
+    """
+    Delete snapshots older than PLATFORM_SNAPSHOT_RETENTION_DAYS.
+    
+    Returns:
+        int: Number of snapshots deleted
+    """
+    cutoff = timezone.now() - timedelta(days=settings.PLATFORM_SNAPSHOT_RETENTION_DAYS)
+    deleted, _ = PlatformSnapshot.objects.filter(captured_at__lt=cutoff).delete()
+    return deleted
+
+
+def snapshot_stats(snapshot):
+    """Platform stats payload (PlatformStatsSerializer fields) of a snapshot."""
+    return {
+        'total_trainers': snapshot.total_trainers,
+        'active_trainers': snapshot.active_trainers,
+        'total_clients': snapshot.total_clients,
+        'total_bookings': snapshot.total_bookings,
+        'new_signups_this_month': snapshot.new_signups_this_month,
+        'total_revenue_this_month': snapshot.total_revenue_this_month,
+        'mrr': snapshot.mrr,
+        'churn_rate': snapshot.churn_rate,
+        'subscription_breakdown': snapshot.subscription_breakdown,
+        'captured_at': snapshot.captured_at,
+    }
@@ -3,6 +3,7 @@ Celery Tasks for Domain Management
 Automatic DNS verification and SSL renewal.
 """
 from celery import shared_task
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
 from .domain_models import CustomDomain, DomainVerificationLog
@@ -188,3 +189,24 @@ def renew_expiring_ssl_certificates():
     
     return results
 
+
+@shared_task
+def take_platform_snapshot():
+    """
+    Store a platform KPI snapshot for the admin dashboard and prune
+    snapshots past retention.
+    Runs every 15 minutes.
+    """
+    from .snapshots import REFRESH_LOCK_KEY, prune_snapshots, take_snapshot
+    
+    try:
+        snapshot = take_snapshot()
+        cache.delete(REFRESH_LOCK_KEY)
+        return {
+            'snapshot_id': snapshot.id,
+            'captured_at': snapshot.captured_at.isoformat(),
+            'pruned': prune_snapshots(),
+        }
+    except Exception as e:
+        print(f"Error taking platform snapshot: {str(e)}")
+        return {'error': str(e)}
@@ -1,6 +1,7 @@
 """
 Admin Panel Utility Functions
 """
+from django.db.models import Q
 
 
 def log_admin_action(admin_user, action, target_trainer=None, details=None, request=None):
@@ -41,3 +42,35 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR')
     return ip
 
+
+
+def filter_trainers(queryset, params):
+    """
+    Apply the admin trainer list filters.
+    
+    Args:
+        queryset: QuerySet of Trainer objects
+        params: Mapping with optional search, is_active ('true'/'false')
+            and plan values (e.g. request.query_params)
+    
+    Returns:
+        Filtered QuerySet
+    """
+    search = params.get('search', '')
+    if search:
+        queryset = queryset.filter(
+            Q(business_name__icontains=search) |
+            Q(user__email__icontains=search) |
+            Q(user__first_name__icontains=search) |
+            Q(user__last_name__icontains=search)
+        )
+    
+    is_active = params.get('is_active')
+    if is_active is not None:
+        queryset = queryset.filter(user__is_active=is_active.lower() == 'true')
+    
+    plan = params.get('plan')
+    if plan:
+        queryset = queryset.filter(subscription__plan=plan)
+    
+    return queryset
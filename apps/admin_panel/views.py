@@ -7,14 +7,11 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Q, Sum
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, timedelta
 
 from apps.trainers.models import Trainer
-from apps.clients.models import Client
-from apps.bookings.models import Booking
-from .models import AdminActionLog, PlatformSettings
+from .models import AdminActionLog, PlatformSettings, PlatformSnapshot
 from .serializers import (
     TrainerAdminSerializer,
     TrainerDetailAdminSerializer,
@@ -32,7 +29,7 @@ from .serializers import (
     AnalyticsDashboardSerializer
 )
 from .permissions import IsSuperUser
-from .utils import log_admin_action, get_client_ip
+from .utils import log_admin_action, get_client_ip, filter_trainers
 from .export_utils import (
     export_trainers_csv,
     export_trainer_detail_csv,
@@ -44,12 +41,21 @@ from .bulk_actions import (
     bulk_verify_trainers,
     bulk_delete_trainers
 )
+from apps.analytics import activity
+from apps.analytics.leaderboard import METRICS as LEADERBOARD_METRICS
+from .snapshots import (
+    ANALYTICS_DAYS,
+    ANALYTICS_GROUP_BY,
+    compute_analytics,
+    latest_snapshot,
+    snapshot_stats
+)
 from .analytics_utils import (
+    PERIODS,
     get_revenue_trends,
     get_signup_trends,
     get_active_users_over_time,
     get_geographic_distribution,
-    get_revenue_by_plan,
     get_booking_trends,
     get_client_growth_trends,
     get_top_performing_trainers
@@ -68,75 +74,36 @@ class AdminDashboardViewSet(viewsets.ViewSet):
     def stats(self, request):
         """
         Get platform-wide statistics.
+        
+        Served from the latest KPI snapshot.
+        
+        Query Parameters:
+        - refresh: 'true' to take a new snapshot first
         """
-        now = timezone.now()
-        this_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
-        
-        # Basic counts
-        total_trainers = Trainer.objects.count()
-        active_trainers = Trainer.objects.filter(user__is_active=True).count()
-        total_clients = Client.objects.filter(is_active=True).count()
-        total_bookings = Booking.objects.count()
-        
-        # New signups this month
-        new_signups = Trainer.objects.filter(
-            created_at__gte=this_month_start
-        ).count()
-        
-        # Subscription breakdown
-        try:
-            from apps.payments.models import Subscription
-            subscription_breakdown = Subscription.objects.filter(
-                status='active'
-            ).values('plan').annotate(count=Count('id'))
-            subscription_breakdown = {
-                item['plan']: item['count'] 
-                for item in subscription_breakdown
-            }
-        except:
-            subscription_breakdown = {}
-        
-        # Revenue calculations (placeholder - will be populated by Paddle webhooks)
-        try:
-            from apps.payments.models import Payment
-            this_month_revenue = Payment.objects.filter(
-                created_at__gte=this_month_start,
-                status='completed'
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            # Simple MRR calculation
-            active_subs = Subscription.objects.filter(status='active')
-            mrr = sum([self._get_plan_price(sub.plan) for sub in active_subs])
-            
-            # Churn calculation
-            churned_this_month = Subscription.objects.filter(
-                status='cancelled',
-                updated_at__gte=this_month_start
-            ).count()
-            active_last_month = Subscription.objects.filter(
-                created_at__lt=this_month_start
-            ).count()
-            churn_rate = (churned_this_month / active_last_month * 100) if active_last_month > 0 else 0
-            
-        except:
-            this_month_revenue = 0
-            mrr = 0
-            churn_rate = 0
-        
-        data = {
-            'total_trainers': total_trainers,
-            'active_trainers': active_trainers,
-            'total_clients': total_clients,
-            'total_bookings': total_bookings,
-            'new_signups_this_month': new_signups,
-            'total_revenue_this_month': this_month_revenue,
-            'mrr': mrr,
-            'churn_rate': round(churn_rate, 2),
-            'subscription_breakdown': subscription_breakdown
-        }
+        refresh = request.query_params.get('refresh', '').lower() == 'true'
+        snapshot = latest_snapshot(refresh=refresh)
+        serializer = PlatformStatsSerializer(snapshot_stats(snapshot))
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], url_path='stats-history')
+    def stats_history(self, request):
+        """
+        Get the KPI snapshot time series.
+        
+        GET /api/admin/dashboard/stats-history/
         
-        serializer = PlatformStatsSerializer(data)
+        Query Parameters:
+        - days: Number of days to look back (default: 30)
+        """
+        days = int(request.query_params.get('days', 30))
+        snapshots = PlatformSnapshot.objects.filter(
+            captured_at__gte=timezone.now() - timedelta(days=days)
+        ).order_by('captured_at')
+        
+        serializer = PlatformStatsSerializer(
+            [snapshot_stats(snapshot) for snapshot in snapshots],
+            many=True
+        )
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
@@ -146,59 +113,8 @@ class AdminDashboardViewSet(viewsets.ViewSet):
         
         GET /api/admin/dashboard/export-stats/
         """
-        # Get the same stats as the stats endpoint
-        now = timezone.now()
-        this_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        total_trainers = Trainer.objects.count()
-        active_trainers = Trainer.objects.filter(user__is_active=True).count()
-        total_clients = Client.objects.filter(is_active=True).count()
-        total_bookings = Booking.objects.count()
-        new_signups = Trainer.objects.filter(created_at__gte=this_month_start).count()
-        
-        try:
-            from apps.payments.models import Subscription, Payment
-            this_month_revenue = Payment.objects.filter(
-                created_at__gte=this_month_start,
-                status='completed'
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            active_subs = Subscription.objects.filter(status='active')
-            mrr = sum([self._get_plan_price(sub.plan) for sub in active_subs])
-            
-            churned_this_month = Subscription.objects.filter(
-                status='cancelled',
-                updated_at__gte=this_month_start
-            ).count()
-            active_last_month = Subscription.objects.filter(
-                created_at__lt=this_month_start
-            ).count()
-            churn_rate = (churned_this_month / active_last_month * 100) if active_last_month > 0 else 0
-            
-            subscription_breakdown = Subscription.objects.filter(
-                status='active'
-            ).values('plan').annotate(count=Count('id'))
-            subscription_breakdown = {
-                item['plan']: item['count'] 
-                for item in subscription_breakdown
-            }
-        except:
-            this_month_revenue = 0
-            mrr = 0
-            churn_rate = 0
-            subscription_breakdown = {}
-        
-        stats_data = {
-            'total_trainers': total_trainers,
-            'active_trainers': active_trainers,
-            'total_clients': total_clients,
-            'total_bookings': total_bookings,
-            'new_signups_this_month': new_signups,
-            'total_revenue_this_month': this_month_revenue,
-            'mrr': mrr,
-            'churn_rate': round(churn_rate, 2),
-            'subscription_breakdown': subscription_breakdown
-        }
+        refresh = request.query_params.get('refresh', '').lower() == 'true'
+        snapshot = latest_snapshot(refresh=refresh)
         
         # Log the export action
         log_admin_action(
@@ -208,16 +124,7 @@ class AdminDashboardViewSet(viewsets.ViewSet):
             request=request
         )
         
-        return export_platform_stats_csv(stats_data)
-    
-    def _get_plan_price(self, plan):
-        """Get monthly price for a plan."""
-        prices = {
-            'free': 0,
-            'pro': 29,
-            'business': 79
-        }
-        return prices.get(plan, 0)
+        return export_platform_stats_csv(snapshot_stats(snapshot))
     
     @action(detail=False, methods=['get'])
     def analytics(self, request):
@@ -228,36 +135,23 @@ class AdminDashboardViewSet(viewsets.ViewSet):
         
         Query Parameters:
         - days: Number of days to look back (default: 30)
-        - group_by: 'day' or 'month' (default: 'day')
+        - group_by: 'day', 'week' or 'month' (default: 'day')
+        - refresh: 'true' to take a new snapshot first (default view only)
         
         Returns comprehensive analytics data for charts and visualizations.
         """
-        days = int(request.query_params.get('days', 30))
-        group_by = request.query_params.get('group_by', 'day')
+        days = int(request.query_params.get('days', ANALYTICS_DAYS))
+        group_by = request.query_params.get('group_by', ANALYTICS_GROUP_BY)
         
-        if group_by not in ['day', 'month']:
+        if group_by not in PERIODS:
             group_by = 'day'
         
-        # Get all analytics data
-        revenue_trends = get_revenue_trends(days=days, group_by=group_by)
-        signup_trends = get_signup_trends(days=days, group_by=group_by)
-        active_users_trends = get_active_users_over_time(days=days, group_by=group_by)
-        geographic_distribution = get_geographic_distribution()
-        booking_trends = get_booking_trends(days=days, group_by=group_by)
-        client_growth_trends = get_client_growth_trends(days=days, group_by=group_by)
-        revenue_by_plan = get_revenue_by_plan()
-        top_performing_trainers = get_top_performing_trainers(limit=10)
-        
-        data = {
-            'revenue_trends': revenue_trends,
-            'signup_trends': signup_trends,
-            'active_users_trends': active_users_trends,
-            'geographic_distribution': geographic_distribution,
-            'booking_trends': booking_trends,
-            'client_growth_trends': client_growth_trends,
-            'revenue_by_plan': revenue_by_plan,
-            'top_performing_trainers': top_performing_trainers
-        }
+        # The default view is stored with each KPI snapshot
+        if days == ANALYTICS_DAYS and group_by == ANALYTICS_GROUP_BY:
+            refresh = request.query_params.get('refresh', '').lower() == 'true'
+            data = latest_snapshot(refresh=refresh).analytics
+        else:
+            data = compute_analytics(days=days, group_by=group_by)
         
         serializer = AnalyticsDashboardSerializer(data)
         return Response(serializer.data)
@@ -271,12 +165,12 @@ class AdminDashboardViewSet(viewsets.ViewSet):
         
         Query Parameters:
         - days: Number of days to look back (default: 30)
-        - group_by: 'day' or 'month' (default: 'day')
+        - group_by: 'day', 'week' or 'month' (default: 'day')
         """
         days = int(request.query_params.get('days', 30))
         group_by = request.query_params.get('group_by', 'day')
         
-        if group_by not in ['day', 'month']:
+        if group_by not in PERIODS:
             group_by = 'day'
         
         trends = get_revenue_trends(days=days, group_by=group_by)
@@ -292,12 +186,12 @@ class AdminDashboardViewSet(viewsets.ViewSet):
         
         Query Parameters:
         - days: Number of days to look back (default: 30)
-        - group_by: 'day' or 'month' (default: 'day')
+        - group_by: 'day', 'week' or 'month' (default: 'day')
         """
         days = int(request.query_params.get('days', 30))
         group_by = request.query_params.get('group_by', 'day')
         
-        if group_by not in ['day', 'month']:
+        if group_by not in PERIODS:
             group_by = 'day'
         
         trends = get_signup_trends(days=days, group_by=group_by)
@@ -313,18 +207,60 @@ class AdminDashboardViewSet(viewsets.ViewSet):
         
         Query Parameters:
         - days: Number of days to look back (default: 30)
-        - group_by: 'day' or 'month' (default: 'day')
+        - group_by: 'day', 'week' or 'month' (default: 'day')
         """
         days = int(request.query_params.get('days', 30))
         group_by = request.query_params.get('group_by', 'day')
         
-        if group_by not in ['day', 'month']:
+        if group_by not in PERIODS:
             group_by = 'day'
         
         trends = get_active_users_over_time(days=days, group_by=group_by)
         serializer = ActiveUsersTrendSerializer(trends, many=True)
         return Response(serializer.data)
     
+    @action(detail=False, methods=['get'], url_path='active-users')
+    def active_users(self, request):
+        """
+        Get approximate daily, weekly and monthly active trainers and clients.
+        
+        GET /api/admin/dashboard/active-users/
+        
+        Query Parameters:
+        - start, end: Optional date range (YYYY-MM-DD); adds distinct actives
+          over the whole range (at most activity.MAX_RANGE_DAYS days)
+        """
+        data = {metric: activity.active_counts(metric) for metric in activity.METRICS}
+        
+        start = request.query_params.get('start')
+        end = request.query_params.get('end')
+        if start and end:
+            try:
+                start = date.fromisoformat(start)
+                end = date.fromisoformat(end)
+            except ValueError:
+                return Response(
+                    {'error': 'start and end must be dates (YYYY-MM-DD)'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if end < start:
+                return Response(
+                    {'error': 'end must not be before start'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if (end - start).days + 1 > activity.MAX_RANGE_DAYS:
+                return Response(
+                    {'error': f'Date range cannot exceed {activity.MAX_RANGE_DAYS} days'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            data['range'] = {
+                'start': start,
+                'end': end,
+                **{metric: activity.count(metric, start, end) for metric in activity.METRICS},
+            }
+        
+        return Response(data)
+    
     @action(detail=False, methods=['get'])
     def geographic_distribution(self, request):
         """
@@ -345,12 +281,12 @@ class AdminDashboardViewSet(viewsets.ViewSet):
         
         Query Parameters:
         - days: Number of days to look back (default: 30)
-        - group_by: 'day' or 'month' (default: 'day')
+        - group_by: 'day', 'week' or 'month' (default: 'day')
         """
         days = int(request.query_params.get('days', 30))
         group_by = request.query_params.get('group_by', 'day')
         
-        if group_by not in ['day', 'month']:
+        if group_by not in PERIODS:
             group_by = 'day'
         
         trends = get_booking_trends(days=days, group_by=group_by)
@@ -366,12 +302,12 @@ class AdminDashboardViewSet(viewsets.ViewSet):
         
         Query Parameters:
         - days: Number of days to look back (default: 30)
-        - group_by: 'day' or 'month' (default: 'day')
+        - group_by: 'day', 'week' or 'month' (default: 'day')
         """
         days = int(request.query_params.get('days', 30))
         group_by = request.query_params.get('group_by', 'day')
         
-        if group_by not in ['day', 'month']:
+        if group_by not in PERIODS:
             group_by = 'day'
         
         trends = get_client_growth_trends(days=days, group_by=group_by)
@@ -387,9 +323,15 @@ class AdminDashboardViewSet(viewsets.ViewSet):
         
         Query Parameters:
         - limit: Number of trainers to return (default: 10)
+        - metric: 'revenue', 'bookings' or 'completed_sessions' (default: 'revenue')
         """
         limit = int(request.query_params.get('limit', 10))
-        trainers = get_top_performing_trainers(limit=limit)
+        metric = request.query_params.get('metric', 'revenue')
+        
+        if metric not in LEADERBOARD_METRICS:
+            metric = 'revenue'
+        
+        trainers = get_top_performing_trainers(limit=limit, metric=metric)
         serializer = TopPerformingTrainerSerializer(trainers, many=True)
         return Response(serializer.data)
 
@@ -411,34 +353,7 @@ class TrainerAdminViewSet(viewsets.ReadOnlyModelViewSet):
         """
         List all trainers with filters.
         """
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # Filter by search query
-        search = request.query_params.get('search', '')
-        if search:
-            queryset = queryset.filter(
-                Q(business_name__icontains=search) |
-                Q(user__email__icontains=search) |
-                Q(user__first_name__icontains=search) |
-                Q(user__last_name__icontains=search)
-            )
-        
-        # Filter by status
-        is_active = request.query_params.get('is_active')
-        if is_active is not None:
-            queryset = queryset.filter(user__is_active=is_active.lower() == 'true')
-        
-        # Filter by subscription plan
-        plan = request.query_params.get('plan')
-        if plan:
-            try:
-                from apps.payments.models import Subscription
-                trainer_ids = Subscription.objects.filter(
-                    plan=plan
-                ).values_list('trainer_id', flat=True)
-                queryset = queryset.filter(id__in=trainer_ids)
-            except:
-                pass
+        queryset = filter_trainers(self.filter_queryset(self.get_queryset()), request.query_params)
         
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -591,32 +506,7 @@ class TrainerAdminViewSet(viewsets.ReadOnlyModelViewSet):
         
         GET /api/admin/trainers/export/
         """
-        queryset = self.filter_queryset(self.get_queryset())
-        
-        # Apply same filters as list view
-        search = request.query_params.get('search', '')
-        if search:
-            queryset = queryset.filter(
-                Q(business_name__icontains=search) |
-                Q(user__email__icontains=search) |
-                Q(user__first_name__icontains=search) |
-                Q(user__last_name__icontains=search)
-            )
-        
-        is_active = request.query_params.get('is_active')
-        if is_active is not None:
-            queryset = queryset.filter(user__is_active=is_active.lower() == 'true')
-        
-        plan = request.query_params.get('plan')
-        if plan:
-            try:
-                from apps.payments.models import Subscription
-                trainer_ids = Subscription.objects.filter(
-                    plan=plan
-                ).values_list('trainer_id', flat=True)
-                queryset = queryset.filter(id__in=trainer_ids)
-            except:
-                pass
+        queryset = filter_trainers(self.filter_queryset(self.get_queryset()), request.query_params)
         
         # Log the export action
         log_admin_action(
@@ -0,0 +1,165 @@
+"""
+Approximate active-user metrics.
+Active trainers and clients are recorded per day into HyperLogLog
+sketches: Redis HyperLogLogs (PFADD/PFCOUNT) when Redis is reachable,
+otherwise pure-Python sketches stored in ActivitySketch. Sketches of any
+range of days merge into one distinct count, so daily, weekly and monthly
+actives take constant memory and a handful of reads to answer, with a
+standard error around 1-2%.
+"""
+import hashlib
+import math
+from datetime import timedelta
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ActivitySketch
+
+
+METRICS = ['trainers', 'clients']
+
+# Prefix of the Redis HyperLogLog keys, one per metric and day
+SKETCH_KEY_PREFIX = 'trainerhubb:activity:'
+
+# Redis sketches are kept for this long
+SKETCH_TTL = 400 * 24 * 3600
+
+# Longest range count() is asked for by the admin API (a year fits in SKETCH_TTL)
+MAX_RANGE_DAYS = 366
+
+# Database sketches use 2**12 one-byte registers (~1.6% standard error)
+DEFAULT_PRECISION = 12
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter.
+    
+    Members are hashed to 64 bits; the first `precision` bits pick a
+    register, which keeps the highest rank (position of the first set bit)
+    seen among the remaining bits. Merging two sketches keeps the maximum
+    of each register.
+    """
+    
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers else bytearray(self.size)
+    
+    def add(self, member):
+        """
+        Add a member.
+        
+        Returns:
+            bool: True if the sketch changed
+        """
+        digest = hashlib.blake2b(str(member).encode(), digest_size=8).digest()
+        value = int.from_bytes(digest, 'big')
+        bits = 64 - self.precision
+        index = value >> bits
+        rank = bits - (value & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+    
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+    
+    def count(self):
+        """Estimated number of distinct members."""
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size ** 2 / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Small range correction (linear counting)
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+
+def _redis():
+    from apps.notifications.outbound import get_redis
+    return get_redis()
+
+
+def _key(metric, day):
+    return f'{SKETCH_KEY_PREFIX}{metric}:{day.isoformat()}'
+
+
+def record(metric, member, day=None):
+    """
+    Record a member (trainer or client ID) as active on a day.
+    
+    Args:
+        metric: One of METRICS
+        member: ID of the active trainer or client
+        day: Day of the activity (default: today)
+    """
+    record_many(metric, [member], day)
+
+
+def record_many(metric, members, day=None):
+    """Record several members as active on a day (default: today)."""
+    day = day or timezone.localdate()
+    members = list(members)
+    if not members:
+        return
+    
+    client = _redis()
+    if client is not None:
+        try:
+            pipeline = client.pipeline()
+            pipeline.pfadd(_key(metric, day), *members)
+            pipeline.expire(_key(metric, day), SKETCH_TTL)
+            pipeline.execute()
+            return
+        except Exception as e:
+            print(f"Error recording activity in Redis: {str(e)}")
+    
+    with transaction.atomic():
+        sketch, _ = ActivitySketch.objects.select_for_update().get_or_create(
+            metric=metric,
+            day=day,
+            defaults={'registers': bytes(1 << DEFAULT_PRECISION)}
+        )
+        hll = HyperLogLog(registers=sketch.registers)
+        changed = [hll.add(member) for member in members]
+        if any(changed):
+            sketch.registers = bytes(hll.registers)
+            sketch.save(update_fields=['registers', 'updated_at'])
+
+
+def record_on_commit(metric, member):
+    """Record activity once the current transaction commits."""
+    if member:
+        transaction.on_commit(lambda: record(metric, member))
+
+
+def count(metric, start, end):
+    """Estimated distinct members active between two days (inclusive)."""
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    client = _redis()
+    if client is not None:
+        try:
+            return client.pfcount(*[_key(metric, day) for day in days])
+        except Exception as e:
+            print(f"Error counting activity in Redis: {str(e)}")
+    
+    merged = HyperLogLog()
+    for registers in ActivitySketch.objects.filter(
+        metric=metric,
+        day__gte=start,
+        day__lte=end
+    ).values_list('registers', flat=True).iterator():
+        merged.merge(HyperLogLog(registers=bytes(registers)))
+    return merged.count()
+
+
+def active_counts(metric, day=None):
+    """Daily, weekly and monthly actives (rolling windows ending on day)."""
+    day = day or timezone.localdate()
+    return {
+        'dau': count(metric, day, day),
+        'wau': count(metric, day - timedelta(days=6), day),
+        'mau': count(metric, day - timedelta(days=29), day),
+    }
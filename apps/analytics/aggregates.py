@@ -0,0 +1,109 @@
+"""
+Conditional aggregation.
+Stats widgets describe the counts, sums and averages they need, each with
+an optional Q filter; conditional_aggregate() computes all of them in one
+aggregate() query (COUNT/SUM ... FILTER (WHERE ...)) instead of a query
+per figure, and grouped_aggregate() computes them per group (e.g. per
+trainer) in one GROUP BY query.
+"""
+from django.db.models import Avg, Count, Q, Sum
+
+
+# Measure kinds: (aggregate class, value when no row matches)
+AGGREGATES = {
+    'count': (Count, 0),
+    'sum': (Sum, 0),
+    'avg': (Avg, 0),
+}
+
+
+def choice_measures(field, choices, kind='count', measure_field='id'):
+    """
+    One measure per choice value of a field.
+    
+    Args:
+        field: Model field holding the choice
+        choices: Django choices, e.g. Booking.STATUS_CHOICES
+    
+    Returns:
+        dict: choice value -> (kind, measure_field, Q(field=value))
+    """
+    return {value: (kind, measure_field, Q(**{field: value})) for value, _ in choices}
+
+
+def _flatten(measures, path=()):
+    for name, measure in measures.items():
+        if isinstance(measure, dict):
+            yield from _flatten(measure, path + (name,))
+        else:
+            yield path + (name,), measure
+
+
+def conditional_aggregate(queryset, measures):
+    """
+    Compute filtered counts, sums and averages in a single query.
+    
+    Args:
+        queryset: Rows to aggregate over
+        measures: name -> (kind, field) or (kind, field, Q filter), with kind
+            one of AGGREGATES; a nested dict of measures gives a nested result
+    
+    Returns:
+        dict: name -> value (0 instead of None when no row matches), shaped
+            like measures
+    
+    Example:
+        conditional_aggregate(Booking.objects.filter(trainer=trainer), {
+            'total': ('count', 'id'),
+            'by_status': choice_measures('status', Booking.STATUS_CHOICES),
+        })
+    """
+    flat = list(_flatten(measures))
+    totals = queryset.aggregate(**_aggregates(flat))
+    return _nest(flat, totals)
+
+
+def grouped_aggregate(queryset, key, measures):
+    """
+    Compute conditional_aggregate() measures per group in a single query.
+    
+    Args:
+        queryset: Rows to aggregate over
+        key: Field to group by (e.g. 'trainer_id')
+        measures: As for conditional_aggregate()
+    
+    Returns:
+        dict: key value -> result shaped like measures; groups without
+            rows are missing (see empty_result())
+    """
+    flat = list(_flatten(measures))
+    rows = queryset.values(key).annotate(**_aggregates(flat)).order_by()
+    return {row[key]: _nest(flat, row) for row in rows}
+
+
+def empty_result(measures):
+    """Result of measures over no rows (every value 0)."""
+    flat = list(_flatten(measures))
+    return _nest(flat, {})
+
+
+def _aggregates(flat):
+    # Positional aliases, so names need not be valid SQL aliases ('no-show')
+    return {
+        f'measure_{index}': AGGREGATES[measure[0]][0](
+            measure[1],
+            filter=measure[2] if len(measure) > 2 else None
+        )
+        for index, (_, measure) in enumerate(flat)
+    }
+
+
+def _nest(flat, totals):
+    result = {}
+    for index, (path, measure) in enumerate(flat):
+        target = result
+        for name in path[:-1]:
+            target = target.setdefault(name, {})
+        value = totals.get(f'measure_{index}')
+        target[path[-1]] = AGGREGATES[measure[0]][1] if value is None else value
+    return result
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AnalyticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.analytics'
+    
+    def ready(self):
+        """Import signals when app is ready"""
+        import apps.analytics.signals
@@ -0,0 +1,279 @@
+"""
+Weekly utilization heatmap.
+A trainer's bookings and availability slots over the last year are folded
+onto one week of minutes (Monday 00:00 to Sunday 24:00, in the trainer's
+timezone) and summed into weekday x time-of-day cells: booked versus
+available minutes, bookings started, and no-show and cancellation rates.
+The database extracts local weekday/hour/minute, the folding runs as
+vectorized NumPy operations (with a pure-Python fallback), and results
+are cached per trainer per day.
+"""
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.core.cache import cache
+from django.db.models import DurationField, ExpressionWrapper, F
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, ExtractMinute
+from django.utils import timezone
+
+from apps.availability.models import AvailabilitySlot
+from apps.bookings.models import Booking
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the deployment
+    np = None
+
+
+CACHE_KEY = 'analytics:utilization-heatmap:{trainer_id}:{cell_minutes}:{day}'
+CACHE_TIMEOUT = 24 * 3600
+
+# Days of history covered, ending at the start of today
+DEFAULT_DAYS = 365
+
+# Supported cell sizes in minutes (24 or 96 cells per day)
+CELL_MINUTES = [60, 15]
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Cancelled bookings do not occupy their slot
+UNBOOKED_STATUSES = ['cancelled']
+
+
+def _trainer_tz(trainer):
+    try:
+        return ZoneInfo(trainer.timezone or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def load_bookings(trainer, start, end):
+    """
+    Bookings starting in [start, end) as columns.
+    
+    Returns:
+        dict: starts (minute of the week, local time), durations (minutes)
+            and statuses, as parallel lists
+    """
+    tz = _trainer_tz(trainer)
+    rows = Booking.objects.filter(
+        trainer=trainer,
+        start_time__gte=start,
+        start_time__lt=end
+    ).annotate(
+        weekday=ExtractIsoWeekDay('start_time', tzinfo=tz),
+        hour=ExtractHour('start_time', tzinfo=tz),
+        minute=ExtractMinute('start_time', tzinfo=tz),
+        duration=ExpressionWrapper(F('end_time') - F('start_time'), output_field=DurationField())
+    ).values_list('weekday', 'hour', 'minute', 'duration', 'status').order_by()
+    
+    columns = {'starts': [], 'durations': [], 'statuses': []}
+    for weekday, hour, minute, duration, status in rows.iterator(chunk_size=5000):
+        columns['starts'].append((weekday - 1) * MINUTES_PER_DAY + hour * 60 + minute)
+        # Bookings longer than a week would wrap onto themselves
+        columns['durations'].append(
+            min(max(int(duration.total_seconds() // 60), 0), MINUTES_PER_WEEK)
+        )
+        columns['statuses'].append(status)
+    return columns
+
+
+def load_availability(trainer):
+    """Active availability slots as (start, end) minutes of the week."""
+    return [
+        (
+            day * MINUTES_PER_DAY + start.hour * 60 + start.minute,
+            day * MINUTES_PER_DAY + end.hour * 60 + end.minute,
+        )
+        for day, start, end in AvailabilitySlot.objects.filter(
+            trainer=trainer,
+            is_active=True
+        ).values_list('day_of_week', 'start_time', 'end_time')
+    ]
+
+
+def weekday_counts(start_day, days):
+    """How many times each weekday (Monday first) occurs in the window."""
+    counts = [days // 7] * 7
+    for offset in range(days % 7):
+        counts[(start_day.weekday() + offset) % 7] += 1
+    return counts
+
+
+def _percent(part, whole):
+    return round(part / whole * 100, 2) if whole else 0
+
+
+def _compute_numpy(bookings, slots, occurrences, cell_minutes):
+    cells = MINUTES_PER_DAY // cell_minutes
+    starts = np.asarray(bookings['starts'], dtype=np.int64)
+    durations = np.asarray(bookings['durations'], dtype=np.int64)
+    statuses = np.asarray(bookings['statuses'], dtype=object)
+    booked = ~np.isin(statuses, UNBOOKED_STATUSES)
+    
+    # Booked minutes: +1/-1 at interval edges over two weeks, cumulative sum,
+    # then fold the second week (bookings running past Sunday) onto the first
+    edges = np.zeros(2 * MINUTES_PER_WEEK + 1, dtype=np.int64)
+    np.add.at(edges, starts[booked], 1)
+    np.add.at(edges, starts[booked] + durations[booked], -1)
+    occupancy = np.cumsum(edges[:-1])
+    occupancy = occupancy[:MINUTES_PER_WEEK] + occupancy[MINUTES_PER_WEEK:]
+    
+    slot_edges = np.zeros(MINUTES_PER_WEEK + 1, dtype=np.int64)
+    if slots:
+        bounds = np.asarray(slots, dtype=np.int64)
+        np.add.at(slot_edges, bounds[:, 0], 1)
+        np.add.at(slot_edges, bounds[:, 1], -1)
+    available = np.cumsum(slot_edges[:-1]) > 0
+    
+    def per_cell(minutes):
+        return minutes.reshape(7, cells, cell_minutes).sum(axis=2)
+    
+    available_minutes = per_cell(available.astype(np.int64)) * np.asarray(occurrences)[:, None]
+    booked_minutes = per_cell(occupancy)
+    booked_available = per_cell(occupancy * available)
+    
+    cell = starts // cell_minutes
+    
+    def started(mask=None):
+        weights = None if mask is None else mask.astype(np.int64)
+        return np.bincount(cell, weights=weights, minlength=7 * cells).reshape(7, cells).astype(np.int64)
+    
+    totals = started()
+    cancelled = started(statuses == 'cancelled')
+    no_shows = started(statuses == 'no-show')
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        utilization = np.round(booked_available / available_minutes * 100, 2)
+        cancellation_rate = np.where(totals > 0, np.round(cancelled / totals * 100, 2), 0)
+        no_show_rate = np.where(totals > 0, np.round(no_shows / totals * 100, 2), 0)
+    
+    return {
+        'utilization': [
+            [value if minutes else None for value, minutes in zip(row, minutes_row)]
+            for row, minutes_row in zip(utilization.tolist(), available_minutes.tolist())
+        ],
+        'booked_minutes': booked_minutes.tolist(),
+        'available_minutes': available_minutes.tolist(),
+        'bookings': totals.tolist(),
+        'no_show_rate': no_show_rate.tolist(),
+        'cancellation_rate': cancellation_rate.tolist(),
+    }
+
+
+def _compute_python(bookings, slots, occurrences, cell_minutes):
+    cells = MINUTES_PER_DAY // cell_minutes
+    
+    edges = [0] * (2 * MINUTES_PER_WEEK + 1)
+    for start, duration, status in zip(bookings['starts'], bookings['durations'], bookings['statuses']):
+        if status not in UNBOOKED_STATUSES:
+            edges[start] += 1
+            edges[start + duration] -= 1
+    slot_edges = [0] * (MINUTES_PER_WEEK + 1)
+    for start, end in slots:
+        slot_edges[start] += 1
+        slot_edges[end] -= 1
+    
+    booked_minutes = [[0] * cells for _ in range(7)]
+    booked_available = [[0] * cells for _ in range(7)]
+    available_minutes = [[0] * cells for _ in range(7)]
+    occupancy = 0
+    folded = [0] * MINUTES_PER_WEEK
+    for minute in range(2 * MINUTES_PER_WEEK):
+        occupancy += edges[minute]
+        folded[minute % MINUTES_PER_WEEK] += occupancy
+    depth = 0
+    for minute in range(MINUTES_PER_WEEK):
+        depth += slot_edges[minute]
+        day, cell = divmod(minute // cell_minutes, cells)
+        booked_minutes[day][cell] += folded[minute]
+        if depth > 0:
+            booked_available[day][cell] += folded[minute]
+            available_minutes[day][cell] += occurrences[day]
+    
+    totals = [[0] * cells for _ in range(7)]
+    cancelled = [[0] * cells for _ in range(7)]
+    no_shows = [[0] * cells for _ in range(7)]
+    for start, status in zip(bookings['starts'], bookings['statuses']):
+        day, cell = divmod(start // cell_minutes, cells)
+        totals[day][cell] += 1
+        cancelled[day][cell] += status == 'cancelled'
+        no_shows[day][cell] += status == 'no-show'
+    
+    return {
+        'utilization': [
+            [
+                _percent(booked_available[day][cell], available_minutes[day][cell])
+                if available_minutes[day][cell] else None
+                for cell in range(cells)
+            ]
+            for day in range(7)
+        ],
+        'booked_minutes': booked_minutes,
+        'available_minutes': available_minutes,
+        'bookings': totals,
+        'no_show_rate': [
+            [_percent(no_shows[day][cell], totals[day][cell]) for cell in range(cells)]
+            for day in range(7)
+        ],
+        'cancellation_rate': [
+            [_percent(cancelled[day][cell], totals[day][cell]) for cell in range(cells)]
+            for day in range(7)
+        ],
+    }
+
+
+def compute_heatmap(trainer, cell_minutes=60, days=DEFAULT_DAYS, today=None):
+    """
+    Compute a trainer's weekday x time-of-day utilization matrices.
+    
+    Args:
+        trainer: Trainer instance
+        cell_minutes: Cell size, one of CELL_MINUTES
+        days: Days of history, ending at the start of today
+        today: Day the window ends on (default: today in the trainer's timezone)
+    
+    Returns:
+        dict: Window bounds plus 7 x (1440 / cell_minutes) matrices, Monday
+            first: utilization (% of available minutes booked, None where
+            the trainer is never available), booked_minutes,
+            available_minutes, bookings, no_show_rate and cancellation_rate
+    """
+    if cell_minutes not in CELL_MINUTES:
+        raise ValueError(f'Unsupported cell size: {cell_minutes}')
+    
+    tz = _trainer_tz(trainer)
+    today = today or timezone.localdate(timezone=tz)
+    start_day = today - timedelta(days=days)
+    start = datetime.combine(start_day, time.min, tzinfo=tz)
+    end = datetime.combine(today, time.min, tzinfo=tz)
+    
+    compute = _compute_numpy if np is not None else _compute_python
+    matrices = compute(
+        load_bookings(trainer, start, end),
+        load_availability(trainer),
+        weekday_counts(start_day, days),
+        cell_minutes
+    )
+    
+    return {
+        'start_date': start_day.isoformat(),
+        'end_date': (today - timedelta(days=1)).isoformat(),
+        'timezone': str(tz),
+        'cell_minutes': cell_minutes,
+        'days_of_week': DAYS_OF_WEEK,
+        **matrices,
+    }
+
+
+def get_heatmap(trainer, cell_minutes=60):
+    """A trainer's heatmap for today's window, from the cache when available."""
+    today = timezone.localdate(timezone=_trainer_tz(trainer))
+    key = CACHE_KEY.format(trainer_id=trainer.id, cell_minutes=cell_minutes, day=today.isoformat())
+    heatmap = cache.get(key)
+    if heatmap is None:
+        heatmap = compute_heatmap(trainer, cell_minutes=cell_minutes, today=today)
+        cache.set(key, heatmap, CACHE_TIMEOUT)
+    return heatmap
@@ -0,0 +1,147 @@
+"""
+Trainer leaderboards.
+Each trainer's revenue, bookings and completed sessions are kept in
+TrainerScore. Booking and payment writes apply deltas to the scores
+(see signals.py), reconcile() recomputes them from the source tables,
+and top() reads the first N rows of an index on the score column.
+"""
+from collections import Counter, defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from apps.bookings.models import Booking
+from apps.payments.models import Payment
+from apps.trainers.models import Trainer
+from .models import TrainerScore
+
+
+METRICS = ['revenue', 'bookings', 'completed_sessions']
+
+
+def booking_contribution(trainer_id, status):
+    """Scores a booking adds to its trainer: (trainer_id, {metric: value})."""
+    return trainer_id, {'bookings': 1, 'completed_sessions': int(status == 'completed')}
+
+
+def payment_contribution(trainer_id, status, amount):
+    """Scores a payment adds to its trainer; only completed payments count."""
+    return trainer_id, {'revenue': amount if status == 'completed' else Decimal('0')}
+
+
+def record(previous, current):
+    """
+    Apply the change between a row's previous and current contribution.
+    
+    Args:
+        previous: Contribution before the write (None for inserts)
+        current: Contribution after the write (None for deletes)
+    """
+    deltas = defaultdict(Counter)
+    for contribution, sign in ((previous, -1), (current, 1)):
+        if contribution is None or contribution[0] is None:
+            continue
+        trainer_id, scores = contribution
+        for metric, value in scores.items():
+            deltas[trainer_id][metric] += sign * value
+    apply(deltas)
+
+
+def apply(deltas):
+    """
+    Add score deltas ({trainer_id: {metric: delta}}), creating rows as needed.
+    
+    Trainers are updated in sorted order so concurrent writers lock score
+    rows in the same order.
+    """
+    for trainer_id, changes in sorted(deltas.items()):
+        changes = {metric: delta for metric, delta in changes.items() if delta}
+        if not changes:
+            continue
+        
+        scores = TrainerScore.objects.filter(trainer_id=trainer_id)
+        if scores.update(**{metric: F(metric) + delta for metric, delta in changes.items()}):
+            continue
+        
+        try:
+            with transaction.atomic():
+                TrainerScore.objects.create(trainer_id=trainer_id, **changes)
+        except IntegrityError:
+            # Created concurrently since the update above
+            scores.update(**{metric: F(metric) + delta for metric, delta in changes.items()})
+
+
+def compute_scores():
+    """
+    Scores of every trainer from the source tables.
+    
+    Bookings and payments are aggregated in separate grouped queries, so
+    neither inflates the other through a join.
+    
+    Returns:
+        dict: trainer_id -> {metric: value}
+    """
+    scores = {
+        trainer_id: {'revenue': Decimal('0'), 'bookings': 0, 'completed_sessions': 0}
+        for trainer_id in Trainer.objects.values_list('id', flat=True)
+    }
+    
+    bookings = Booking.objects.values('trainer_id').annotate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(status='completed'))
+    ).order_by()
+    for row in bookings:
+        if row['trainer_id'] in scores:
+            scores[row['trainer_id']]['bookings'] = row['total']
+            scores[row['trainer_id']]['completed_sessions'] = row['completed']
+    
+    revenue = Payment.objects.filter(
+        status='completed',
+        subscription__isnull=False
+    ).values('subscription__trainer_id').annotate(total=Sum('amount')).order_by()
+    for row in revenue:
+        if row['subscription__trainer_id'] in scores:
+            scores[row['subscription__trainer_id']]['revenue'] = row['total'] or Decimal('0')
+    
+    return scores
+
+
+def reconcile():
+    """
+    Overwrite all scores with values recomputed from the source tables.
+    
+    Repairs drift from writes that bypass signals (bulk_create,
+    queryset.update()).
+    
+    Returns:
+        int: Number of trainers reconciled
+    """
+    scores = compute_scores()
+    with transaction.atomic():
+        TrainerScore.objects.bulk_create(
+            [
+                TrainerScore(trainer_id=trainer_id, **values)
+                for trainer_id, values in scores.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['trainer'],
+            update_fields=METRICS,
+            batch_size=1000
+        )
+    return len(scores)
+
+
+def top(metric='revenue', limit=10):
+    """
+    Highest scoring trainers by a metric.
+    
+    Returns:
+        QuerySet: TrainerScore rows with their trainer and user loaded
+    """
+    if metric not in METRICS:
+        raise ValueError(f'Unknown leaderboard metric: {metric}')
+    if not TrainerScore.objects.exists():
+        reconcile()
+    return TrainerScore.objects.select_related('trainer__user').order_by(
+        f'-{metric}', 'trainer_id'
+    )[:limit]
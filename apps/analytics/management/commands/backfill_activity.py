@@ -0,0 +1,41 @@
+"""
+Management command to seed active-user sketches from booking history
+"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from apps.analytics.activity import record_many
+from apps.bookings.models import Booking
+
+
+class Command(BaseCommand):
+    help = 'Record trainers and clients with bookings created in the last N days as active'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Days of booking history to replay (default: 30)'
+        )
+    
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        start = today - timedelta(days=options['days'] - 1)
+        
+        bookings = Booking.objects.annotate(day=TruncDate('created_at')).filter(
+            day__gte=start,
+            day__lte=today
+        )
+        
+        day = start
+        while day <= today:
+            on_day = bookings.filter(day=day)
+            trainers = on_day.values_list('trainer_id', flat=True).distinct().order_by()
+            clients = on_day.values_list('client_id', flat=True).distinct().order_by()
+            record_many('trainers', trainers.iterator(), day)
+            record_many('clients', clients.iterator(), day)
+            day += timedelta(days=1)
+        
+        self.stdout.write(self.style.SUCCESS(f'Recorded activity from {start} to {today}'))
@@ -0,0 +1,51 @@
+"""
+Management command to build DashboardMetrics history from the raw tables
+"""
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.analytics.rollup import backfill
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily dashboard metrics for a date range (default: the last 365 days)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day (YYYY-MM-DD)')
+        parser.add_argument('--end', help='Last day (YYYY-MM-DD, default: today)')
+        parser.add_argument(
+            '--trainer',
+            type=int,
+            action='append',
+            dest='trainer_ids',
+            help='Trainer ID to rebuild (repeatable)'
+        )
+        parser.add_argument(
+            '--chunk-days',
+            type=int,
+            default=31,
+            help='Days rebuilt per transaction'
+        )
+    
+    def handle(self, *args, **options):
+        try:
+            end = self._parse(options['end']) if options['end'] else timezone.localdate()
+            start = self._parse(options['start']) if options['start'] else end - timedelta(days=364)
+        except ValueError:
+            raise CommandError('Dates must be in YYYY-MM-DD format')
+        if start > end:
+            raise CommandError('--start must not be after --end')
+        
+        total = 0
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(end, chunk_start + timedelta(days=options['chunk_days'] - 1))
+            rows = backfill(chunk_start, chunk_end, options['trainer_ids'])
+            total += rows
+            self.stdout.write(f'{chunk_start} to {chunk_end}: {rows} rows')
+            chunk_start = chunk_end + timedelta(days=1)
+        
+        self.stdout.write(self.style.SUCCESS(f'Wrote {total} dashboard metric rows'))
+    
+    def _parse(self, value):
+        return datetime.strptime(value, '%Y-%m-%d').date()
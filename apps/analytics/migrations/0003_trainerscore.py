@@ -0,0 +1,58 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_scores(apps, schema_editor):
+    """Score existing trainers (same aggregation as leaderboard.compute_scores)."""
+    Trainer = apps.get_model('trainers', 'Trainer')
+    Booking = apps.get_model('bookings', 'Booking')
+    Payment = apps.get_model('payments', 'Payment')
+    TrainerScore = apps.get_model('analytics', 'TrainerScore')
+    
+    scores = {trainer_id: {} for trainer_id in Trainer.objects.values_list('id', flat=True)}
+    for row in Booking.objects.values('trainer_id').annotate(
+        bookings=Count('id'),
+        completed_sessions=Count('id', filter=Q(status='completed'))
+    ).order_by():
+        scores[row.pop('trainer_id')].update(row)
+    for row in Payment.objects.filter(
+        status='completed',
+        subscription__isnull=False
+    ).values('subscription__trainer_id').annotate(revenue=Sum('amount')).order_by():
+        scores[row.pop('subscription__trainer_id')].update(row)
+    
+    TrainerScore.objects.bulk_create(
+        (TrainerScore(trainer_id=trainer_id, **values) for trainer_id, values in scores.items()),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_metricsrollupstate'),
+        ('bookings', '0002_booking_service_and_more'),
+        ('payments', '0004_partition_by_month'),
+        ('trainers', '0003_paymentlinks'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='TrainerScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('bookings', models.IntegerField(default=0)),
+                ('completed_sessions', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('trainer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='score', to='trainers.trainer')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-revenue', 'trainer'], name='analytics_t_revenue_de0be1_idx'), models.Index(fields=['-bookings', 'trainer'], name='analytics_t_booking_dd981c_idx'), models.Index(fields=['-completed_sessions', 'trainer'], name='analytics_t_complet_0a6265_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_trainerscore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivitySketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=30)),
+                ('day', models.DateField()),
+                ('registers', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('metric', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_activitysketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricsDirtyDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trainer_id', models.BigIntegerField()),
+                ('date', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'unique_together': {('trainer_id', 'date')},
+            },
+        ),
+    ]
@@ -47,3 +47,79 @@ class DashboardMetrics(models.Model):
             return 0
         return round(self.revenue / self.completed_bookings, 2)
 
+
+
+class MetricsRollupState(models.Model):
+    """
+    High-water mark of an incremental rollup.
+    Source rows changed after high_water_mark have not been rolled up yet.
+    """
+    
+    name = models.CharField(max_length=50, unique=True)
+    high_water_mark = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.high_water_mark}"
+
+
+class MetricsDirtyDay(models.Model):
+    """
+    A (trainer, day) whose DashboardMetrics row the next rollup recomputes.
+    Recorded when a booking or payment moves off a day or a source row is
+    deleted, which the rollup's high-water mark cannot see.
+    """
+    
+    # Not a foreign key: rows are recorded while a trainer's bookings are
+    # being cascade-deleted, and the rollup skips trainers that are gone
+    trainer_id = models.BigIntegerField()
+    date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['trainer_id', 'date']
+    
+    def __str__(self):
+        return f"Trainer {self.trainer_id} - {self.date}"
+
+
+class TrainerScore(models.Model):
+    """
+    Running leaderboard scores of a trainer.
+    Kept up to date from booking and payment writes and periodically
+    reconciled against the source tables (see apps.analytics.leaderboard).
+    """
+    
+    trainer = models.OneToOneField(Trainer, on_delete=models.CASCADE, related_name='score')
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    bookings = models.IntegerField(default=0)
+    completed_sessions = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['-revenue', 'trainer']),
+            models.Index(fields=['-bookings', 'trainer']),
+            models.Index(fields=['-completed_sessions', 'trainer']),
+        ]
+    
+    def __str__(self):
+        return f"{self.trainer.business_name} scores"
+
+
+class ActivitySketch(models.Model):
+    """
+    HyperLogLog sketch of the members active on a day for one metric.
+    Database fallback for the Redis HyperLogLogs (see apps.analytics.activity).
+    """
+    
+    metric = models.CharField(max_length=30)
+    day = models.DateField()
+    registers = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['metric', 'day']
+    
+    def __str__(self):
+        return f"{self.metric} {self.day}"
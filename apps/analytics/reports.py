@@ -0,0 +1,166 @@
+"""
+Weekly trainer reports.
+Every trainer's figures for the previous week (Monday to Sunday) are
+computed together: one grouped query per table, keyed by trainer_id, so a
+run costs the same handful of queries however many trainers there are.
+Reports are rendered from the grouped results into email notifications
+sharing one substitution template and handed to the outbound queue,
+which sends them up to 1000 recipients per SendGrid request.
+"""
+from datetime import datetime, time, timedelta
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.clients.models import Client
+from apps.packages.models import ClientPackage
+from apps.payments.models import ClientPayment
+from apps.trainers.models import Trainer
+from .aggregates import empty_result, grouped_aggregate
+
+
+def week_bounds(today=None):
+    """
+    Start and end (exclusive) of the week before the one containing today.
+    
+    Returns:
+        tuple: Aware datetimes for the previous Monday 00:00 and this Monday 00:00
+    """
+    today = today or timezone.localdate()
+    this_monday = today - timedelta(days=today.weekday())
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(this_monday - timedelta(days=7), time.min), tz),
+        timezone.make_aware(datetime.combine(this_monday, time.min), tz),
+    )
+
+
+def report_sections(start, end):
+    """
+    Grouped queries behind a report.
+    
+    Returns:
+        list: (queryset, trainer key, measures) per table
+    """
+    week = Q(created_at__gte=start, created_at__lt=end)
+    next_week = end + timedelta(days=7)
+    return [
+        (
+            Booking.objects.filter(start_time__gte=start, start_time__lt=next_week),
+            'trainer_id',
+            {
+                'bookings': ('count', 'id', Q(start_time__lt=end)),
+                'completed': ('count', 'id', Q(start_time__lt=end, status='completed')),
+                'cancelled': ('count', 'id', Q(start_time__lt=end, status='cancelled')),
+                'no_shows': ('count', 'id', Q(start_time__lt=end, status='no-show')),
+                'upcoming': ('count', 'id', Q(
+                    start_time__gte=end,
+                    status__in=['pending', 'confirmed']
+                )),
+            },
+        ),
+        (
+            Client.objects.all(),
+            'trainer_id',
+            {
+                'new_clients': ('count', 'id', week),
+                'active_clients': ('count', 'id', Q(is_active=True)),
+            },
+        ),
+        (
+            ClientPayment.objects.filter(payment_date__gte=start.date(), payment_date__lt=end.date()),
+            'client__trainer_id',
+            {
+                'revenue': ('sum', 'amount'),
+                'payments': ('count', 'id'),
+            },
+        ),
+        (
+            ClientPackage.objects.all(),
+            'client__trainer_id',
+            {
+                'packages_sold': ('count', 'id', Q(purchased_at__gte=start, purchased_at__lt=end)),
+                'active_packages': ('count', 'id', Q(sessions_remaining__gt=0)),
+                'sessions_remaining': ('sum', 'sessions_remaining', Q(sessions_remaining__gt=0)),
+            },
+        ),
+    ]
+
+
+def compute_weekly_metrics(trainer_ids, start, end):
+    """
+    Report figures of many trainers for a week (one query per table).
+    
+    Returns:
+        dict: trainer_id -> flat dict of figures, zeros where a trainer has
+            no rows
+    """
+    metrics = {trainer_id: {} for trainer_id in trainer_ids}
+    for queryset, key, measures in report_sections(start, end):
+        grouped = grouped_aggregate(queryset, key, measures)
+        empty = empty_result(measures)
+        for trainer_id, figures in metrics.items():
+            figures.update(grouped.get(trainer_id, empty))
+    return metrics
+
+
+def build_reports(start, end):
+    """
+    Build unsaved weekly report notifications, one per active trainer.
+    
+    Returns:
+        list: Unsaved pending Notification instances
+    """
+    from apps.notifications.models import Notification
+    
+    trainers = list(
+        Trainer.objects.filter(user__is_active=True).exclude(user__email='').values_list(
+            'id', 'business_name', 'user__email'
+        ).order_by('id')
+    )
+    metrics = compute_weekly_metrics([trainer_id for trainer_id, _, _ in trainers], start, end)
+    
+    week_start = start.date().isoformat()
+    week_end = (end - timedelta(days=1)).date().isoformat()
+    
+    reports = []
+    for trainer_id, business_name, email in trainers:
+        figures = metrics[trainer_id]
+        figures['revenue'] = f"{figures['revenue']:.2f}"
+        reports.append(Notification(
+            trainer_id=trainer_id,
+            notification_type='email',
+            recipient=email,
+            subject=f'Your weekly report: {week_start} to {week_end}',
+            message=(
+                f"{figures['bookings']} bookings, {figures['new_clients']} new clients, "
+                f"${figures['revenue']} revenue"
+            ),
+            payload={
+                'template': 'weekly_report',
+                'variables': {
+                    'trainer_name': business_name,
+                    'week_start': week_start,
+                    'week_end': week_end,
+                    **figures,
+                },
+            },
+        ))
+    return reports
+
+
+def send_weekly_reports(today=None):
+    """
+    Queue the previous week's report for every active trainer.
+    
+    Returns:
+        int: Number of reports queued
+    """
+    from apps.notifications.outbound import enqueue
+    
+    start, end = week_bounds(today)
+    with transaction.atomic():
+        # A scheduled run is not worth refusing over a busy queue
+        queued = enqueue(build_reports(start, end), check_capacity=False)
+    return len(queued)
@@ -0,0 +1,218 @@
+"""
+Daily DashboardMetrics rollup.
+Aggregates bookings, client payments and new clients into one row per
+trainer per day, so dashboards read small pre-aggregated rows instead of
+scanning the raw tables. The nightly run only recomputes the (trainer, day)
+pairs whose source rows changed since the last run's high-water mark, plus
+the days signals marked dirty when a booking or payment moved off a day or
+a source row was deleted (see signals.py).
+"""
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.clients.models import Client
+from apps.payments.models import ClientPayment
+from apps.trainers.models import Trainer
+from .models import DashboardMetrics, MetricsDirtyDay, MetricsRollupState
+
+
+ROLLUP_NAME = 'dashboard_metrics'
+
+# Rows committed shortly before a run can carry an updated_at older than
+# the run's start; each run re-reads this much before the high-water mark
+HIGH_WATER_OVERLAP = timedelta(minutes=10)
+
+# (trainer, day) pairs aggregated per batch of queries
+BATCH_SIZE = 1000
+
+METRIC_FIELDS = [
+    'bookings_count',
+    'completed_bookings',
+    'cancelled_bookings',
+    'revenue',
+    'new_clients',
+    'active_clients',
+]
+
+
+def day_of(moment):
+    """Day a datetime counts towards, matching TruncDate in the current timezone."""
+    return timezone.localdate(moment)
+
+
+def mark_dirty(trainer_id, day):
+    """Have the next run recompute a trainer's day."""
+    if trainer_id is not None and day is not None:
+        MetricsDirtyDay.objects.bulk_create(
+            [MetricsDirtyDay(trainer_id=trainer_id, date=day)],
+            ignore_conflicts=True
+        )
+
+
+def _sources(trainer_ids=None):
+    """Source querysets, each annotated with the day its rows count towards."""
+    bookings = Booking.objects.annotate(day=TruncDate('start_time'))
+    clients = Client.objects.annotate(day=TruncDate('created_at'))
+    payments = ClientPayment.objects.annotate(day=F('payment_date'))
+    if trainer_ids is not None:
+        bookings = bookings.filter(trainer_id__in=trainer_ids)
+        clients = clients.filter(trainer_id__in=trainer_ids)
+        payments = payments.filter(client__trainer_id__in=trainer_ids)
+    return bookings, clients, payments
+
+
+def changed_days(since=None, start=None, end=None, trainer_ids=None):
+    """
+    (trainer_id, day) pairs with source rows matching the filters.
+    
+    Args:
+        since: Only rows changed at or after this time (default: all)
+        start: First day (default: unbounded)
+        end: Last day (default: unbounded)
+        trainer_ids: Trainers to include (default: all)
+    
+    Returns:
+        set: (trainer_id, date) tuples
+    """
+    bookings, clients, payments = _sources(trainer_ids)
+    if since is not None:
+        bookings = bookings.filter(updated_at__gte=since)
+        clients = clients.filter(created_at__gte=since)
+        payments = payments.filter(updated_at__gte=since)
+    
+    pairs = set()
+    for queryset, trainer_field in (
+        (bookings, 'trainer_id'),
+        (clients, 'trainer_id'),
+        (payments, 'client__trainer_id'),
+    ):
+        if start is not None:
+            queryset = queryset.filter(day__gte=start)
+        if end is not None:
+            queryset = queryset.filter(day__lte=end)
+        pairs.update(queryset.values_list(trainer_field, 'day').distinct().order_by())
+    return pairs
+
+
+def compute(pairs):
+    """
+    Metrics of (trainer_id, day) pairs, one grouped query per source.
+    
+    Returns:
+        dict: (trainer_id, date) -> {metric field: value}, zeros included
+    """
+    trainer_ids = {trainer_id for trainer_id, _ in pairs}
+    days = {day for _, day in pairs}
+    bookings, clients, payments = _sources(trainer_ids)
+    
+    metrics = {pair: dict.fromkeys(METRIC_FIELDS, 0) for pair in pairs}
+    
+    def merge(rows, trainer_field):
+        for row in rows:
+            pair = (row.pop(trainer_field), row.pop('day'))
+            if pair in metrics:
+                metrics[pair].update(row)
+    
+    merge(
+        bookings.filter(day__in=days).values('trainer_id', 'day').annotate(
+            bookings_count=Count('id'),
+            completed_bookings=Count('id', filter=Q(status='completed')),
+            cancelled_bookings=Count('id', filter=Q(status='cancelled')),
+            active_clients=Count('client', distinct=True, filter=~Q(status='cancelled'))
+        ).order_by(),
+        'trainer_id'
+    )
+    merge(
+        clients.filter(day__in=days).values('trainer_id', 'day').annotate(
+            new_clients=Count('id')
+        ).order_by(),
+        'trainer_id'
+    )
+    merge(
+        payments.filter(day__in=days).values('client__trainer_id', 'day').annotate(
+            revenue=Sum('amount')
+        ).order_by(),
+        'client__trainer_id'
+    )
+    return metrics
+
+
+def write(pairs):
+    """
+    Recompute and upsert the DashboardMetrics rows of (trainer_id, day) pairs.
+    
+    Returns:
+        int: Number of rows written
+    """
+    pairs = sorted(pairs)
+    written = 0
+    for offset in range(0, len(pairs), BATCH_SIZE):
+        metrics = compute(pairs[offset:offset + BATCH_SIZE])
+        DashboardMetrics.objects.bulk_create(
+            [
+                DashboardMetrics(trainer_id=trainer_id, date=day, **values)
+                for (trainer_id, day), values in metrics.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['trainer', 'date'],
+            update_fields=METRIC_FIELDS
+        )
+        written += len(metrics)
+    return written
+
+
+def run():
+    """
+    Incremental rollup: recompute the days whose source rows changed.
+    
+    Changes are found by updated_at (created_at for clients) since the
+    stored high-water mark; the first run rolls up everything. Days left
+    by moved or deleted rows come from MetricsDirtyDay and are consumed.
+    Bulk writes that bypass signals (queryset.update/delete) still need a
+    backfill.
+    
+    Returns:
+        dict: Number of days rolled up and the new high-water mark
+    """
+    started = timezone.now()
+    state, _ = MetricsRollupState.objects.get_or_create(name=ROLLUP_NAME)
+    since = state.high_water_mark - HIGH_WATER_OVERLAP if state.high_water_mark else None
+    
+    dirty = list(MetricsDirtyDay.objects.values_list('id', 'trainer_id', 'date'))
+    trainer_ids = set(
+        Trainer.objects.filter(pk__in={trainer_id for _, trainer_id, _ in dirty}).values_list('id', flat=True)
+    )
+    pairs = changed_days(since=since)
+    pairs.update((trainer_id, day) for _, trainer_id, day in dirty if trainer_id in trainer_ids)
+    
+    days = write(pairs)
+    MetricsDirtyDay.objects.filter(id__in=[dirty_id for dirty_id, _, _ in dirty]).delete()
+    
+    state.high_water_mark = started
+    state.save(update_fields=['high_water_mark', 'updated_at'])
+    return {'days': days, 'high_water_mark': started.isoformat()}
+
+
+def backfill(start, end, trainer_ids=None):
+    """
+    Rebuild the DashboardMetrics rows of a date range from scratch.
+    
+    Args:
+        start: First day
+        end: Last day
+        trainer_ids: Trainers to rebuild (default: all)
+    
+    Returns:
+        int: Number of rows written
+    """
+    existing = DashboardMetrics.objects.filter(date__gte=start, date__lte=end)
+    if trainer_ids is not None:
+        existing = existing.filter(trainer_id__in=trainer_ids)
+    
+    with transaction.atomic():
+        existing.delete()
+        return write(changed_days(start=start, end=end, trainer_ids=trainer_ids))
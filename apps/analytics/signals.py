@@ -0,0 +1,136 @@
+"""
+Django signals invalidating cached dashboard summaries, keeping
+leaderboard scores in step with bookings and payments, marking the
+DashboardMetrics days left by moved or deleted rows and recording trainer
+and client activity
+"""
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from apps.bookings.models import Booking
+from apps.bookings.signals import stored_values as stored_booking
+from apps.clients.models import Client
+from apps.packages.models import ClientPackage
+from apps.payments.models import ClientPayment, Payment
+from apps.payments.signals import stored_values as stored_payment
+from apps.trainers.models import Trainer
+from . import activity, leaderboard, rollup
+from .summary import invalidate
+
+
+@receiver([post_save, post_delete], sender=Booking)
+@receiver([post_save, post_delete], sender=Client)
+def trainer_data_changed(sender, instance, **kwargs):
+    invalidate(instance.trainer_id)
+
+
+@receiver([post_save, post_delete], sender=ClientPackage)
+def client_package_changed(sender, instance, **kwargs):
+    invalidate(Client.objects.filter(pk=instance.client_id).values_list('trainer_id', flat=True).first())
+
+
+@receiver([post_save, post_delete], sender=Payment)
+def payment_changed(sender, instance, **kwargs):
+    invalidate(instance.trainer_id)
+    if instance.subscription_id:
+        invalidate(instance.subscription.trainer_id)
+
+
+@receiver(post_save, sender=Booking)
+def booking_scored(sender, instance, **kwargs):
+    stored = stored_booking(instance)
+    leaderboard.record(
+        leaderboard.booking_contribution(stored['trainer_id'], stored['status']) if stored else None,
+        leaderboard.booking_contribution(instance.trainer_id, instance.status)
+    )
+
+
+@receiver(post_delete, sender=Booking)
+def booking_unscored(sender, instance, **kwargs):
+    leaderboard.record(leaderboard.booking_contribution(instance.trainer_id, instance.status), None)
+
+
+@receiver(post_save, sender=Booking)
+def booking_moved(sender, instance, **kwargs):
+    """A booking moved to another day or trainer leaves its old day to recompute."""
+    stored = stored_booking(instance)
+    if stored is None:
+        return
+    previous = (stored['trainer_id'], rollup.day_of(stored['start_time']))
+    if previous != (instance.trainer_id, rollup.day_of(instance.start_time)):
+        rollup.mark_dirty(*previous)
+
+
+@receiver(post_delete, sender=Booking)
+def booking_removed(sender, instance, **kwargs):
+    rollup.mark_dirty(instance.trainer_id, rollup.day_of(instance.start_time))
+
+
+@receiver(post_save, sender=ClientPayment)
+def client_payment_moved(sender, instance, **kwargs):
+    """A payment moved to another day or client leaves its old day to recompute."""
+    stored = stored_payment(instance)
+    if stored is None:
+        return
+    if (stored['client_id'], stored['payment_date']) != (instance.client_id, instance.payment_date):
+        rollup.mark_dirty(stored['client__trainer_id'], stored['payment_date'])
+
+
+@receiver(post_delete, sender=ClientPayment)
+def client_payment_removed(sender, instance, **kwargs):
+    rollup.mark_dirty(
+        Client.objects.filter(pk=instance.client_id).values_list('trainer_id', flat=True).first(),
+        instance.payment_date
+    )
+
+
+@receiver(post_delete, sender=Client)
+def client_removed(sender, instance, **kwargs):
+    rollup.mark_dirty(instance.trainer_id, rollup.day_of(instance.created_at))
+
+
+def _payment_trainer_id(payment):
+    return payment.subscription.trainer_id if payment.subscription_id else None
+
+
+@receiver(pre_save, sender=Payment)
+def payment_pre_save(sender, instance, **kwargs):
+    """Remember the stored payment's leaderboard contribution."""
+    stored = Payment.objects.filter(pk=instance.pk).values(
+        'subscription__trainer_id', 'status', 'amount'
+    ).first() if instance.pk else None
+    instance._score_contribution = leaderboard.payment_contribution(
+        stored['subscription__trainer_id'], stored['status'], stored['amount']
+    ) if stored else None
+
+
+@receiver(post_save, sender=Payment)
+def payment_scored(sender, instance, **kwargs):
+    leaderboard.record(
+        getattr(instance, '_score_contribution', None),
+        leaderboard.payment_contribution(_payment_trainer_id(instance), instance.status, instance.amount)
+    )
+
+
+@receiver(post_delete, sender=Payment)
+def payment_unscored(sender, instance, **kwargs):
+    leaderboard.record(
+        leaderboard.payment_contribution(_payment_trainer_id(instance), instance.status, instance.amount),
+        None
+    )
+
+
+@receiver(post_save, sender=Booking)
+def booking_activity(sender, instance, created, **kwargs):
+    """A new booking makes its trainer and client active today."""
+    if created:
+        activity.record_on_commit('trainers', instance.trainer_id)
+        activity.record_on_commit('clients', instance.client_id)
+
+
+@receiver(user_logged_in)
+def login_activity(sender, request, user, **kwargs):
+    activity.record_on_commit(
+        'trainers',
+        Trainer.objects.filter(user=user).values_list('id', flat=True).first()
+    )
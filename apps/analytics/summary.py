@@ -0,0 +1,100 @@
+"""
+Trainer dashboard summary.
+All dashboard figures are computed with one conditional-aggregation query
+per table and cached per trainer; signals on bookings, clients, packages
+and payments drop the cached copy when a trainer's data changes.
+"""
+from datetime import datetime, time, timedelta
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from apps.bookings.models import Booking
+from apps.clients.models import Client
+from apps.packages.models import ClientPackage
+from apps.payments.models import Payment
+
+
+CACHE_KEY = 'analytics:dashboard-summary:{trainer_id}'
+
+# Upper bound on staleness for changes no signal sees (queryset.update(),
+# bookings moving from upcoming to past as time goes by)
+CACHE_TIMEOUT = 300
+
+
+def cache_key(trainer_id):
+    return CACHE_KEY.format(trainer_id=trainer_id)
+
+
+def month_starts(now):
+    """Aware datetimes starting the current and the previous month."""
+    this_month = timezone.localdate(now).replace(day=1)
+    last_month = (this_month - timedelta(days=1)).replace(day=1)
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(this_month, time.min), tz),
+        timezone.make_aware(datetime.combine(last_month, time.min), tz),
+    )
+
+
+def compute_summary(trainer):
+    """
+    Compute the dashboard figures of a trainer (four aggregate queries).
+    
+    Returns:
+        dict: Booking, client, package and revenue figures
+    """
+    now = timezone.now()
+    this_month, last_month = month_starts(now)
+    previous_month = Q(created_at__gte=last_month, created_at__lt=this_month)
+    
+    bookings = Booking.objects.filter(trainer=trainer).aggregate(
+        total_bookings=Count('id'),
+        completed_bookings=Count('id', filter=Q(status='completed')),
+        upcoming_bookings=Count('id', filter=Q(
+            status__in=['pending', 'confirmed'],
+            start_time__gte=now
+        )),
+        last_month_bookings=Count('id', filter=previous_month)
+    )
+    clients = Client.objects.filter(trainer=trainer).aggregate(
+        total_clients=Count('id'),
+        active_clients=Count('id', filter=Q(is_active=True)),
+        new_clients=Count('id', filter=Q(created_at__gte=this_month)),
+        last_month_clients=Count('id', filter=previous_month)
+    )
+    packages = ClientPackage.objects.filter(client__trainer=trainer).aggregate(
+        active_packages=Count('id', filter=Q(sessions_remaining__gt=0))
+    )
+    revenue = Payment.objects.filter(
+        subscription__trainer=trainer,
+        status='completed'
+    ).aggregate(
+        total_revenue=Sum('amount'),
+        monthly_revenue=Sum('amount', filter=Q(created_at__gte=this_month))
+    )
+    
+    return {
+        **bookings,
+        **clients,
+        **packages,
+        'total_revenue': float(revenue['total_revenue'] or 0),
+        'monthly_revenue': float(revenue['monthly_revenue'] or 0),
+    }
+
+
+def get_summary(trainer):
+    """Dashboard figures of a trainer, from the cache when available."""
+    key = cache_key(trainer.id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = compute_summary(trainer)
+        cache.set(key, summary, CACHE_TIMEOUT)
+    return summary
+
+
+def invalidate(trainer_id):
+    """Drop a trainer's cached summary once the current transaction commits."""
+    if trainer_id:
+        transaction.on_commit(lambda: cache.delete(cache_key(trainer_id)))
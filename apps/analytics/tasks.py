@@ -0,0 +1,45 @@
+"""
+Celery tasks for analytics rollups and reports
+"""
+from celery import shared_task
+
+from . import leaderboard, reports, rollup
+
+
+@shared_task
+def rollup_dashboard_metrics():
+    """
+    Roll changed bookings, payments and clients up into DashboardMetrics.
+    Runs nightly via Celery beat.
+    """
+    try:
+        return rollup.run()
+    except Exception as e:
+        print(f"Error rolling up dashboard metrics: {str(e)}")
+        return {'error': str(e)}
+
+
+@shared_task
+def reconcile_leaderboard():
+    """
+    Recompute leaderboard scores from bookings and payments.
+    Runs hourly via Celery beat.
+    """
+    try:
+        return {'trainers': leaderboard.reconcile()}
+    except Exception as e:
+        print(f"Error reconciling leaderboard: {str(e)}")
+        return {'error': str(e)}
+
+
+@shared_task
+def send_weekly_reports():
+    """
+    Queue last week's report email for every active trainer.
+    Runs every Monday via Celery beat.
+    """
+    try:
+        return {'queued': reports.send_weekly_reports()}
+    except Exception as e:
+        print(f"Error sending weekly reports: {str(e)}")
+        return {'error': str(e)}
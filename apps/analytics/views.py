@@ -4,12 +4,15 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Sum, Count, Avg, Q
+from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import timedelta, datetime
 
 from .models import DashboardMetrics
 from .serializers import DashboardMetricsSerializer
+from .aggregates import choice_measures, conditional_aggregate
+from .heatmap import CELL_MINUTES, get_heatmap
+from .summary import get_summary
 from apps.bookings.models import Booking
 from apps.clients.models import Client
 from apps.payments.models import Payment
@@ -48,48 +51,22 @@ class AnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        now = timezone.now()
-        today = now.date()
-        this_month = today.replace(day=1)
-        
-        # Bookings
-        bookings = Booking.objects.filter(trainer=trainer)
-        total_bookings = bookings.count()
-        completed_bookings = bookings.filter(status='completed').count()
-        upcoming_bookings = bookings.filter(
-            status__in=['pending', 'confirmed'],
-            start_time__gte=now
-        ).count()
-        
-        # Clients
-        total_clients = Client.objects.filter(trainer=trainer).count()
-        new_clients_count = Client.objects.filter(
-            trainer=trainer,
-            created_at__gte=this_month
-        ).count()
-        active_clients = Client.objects.filter(trainer=trainer, is_active=True).count()
-        
-        # Revenue
-        payments = Payment.objects.filter(subscription__trainer=trainer, status='completed')
-        total_revenue = payments.aggregate(Sum('amount'))['amount__sum'] or 0
-        monthly_revenue = payments.filter(
-            created_at__gte=this_month
-        ).aggregate(Sum('amount'))['amount__sum'] or 0
+        summary = get_summary(trainer)
         
         # Calculate average booking value
         average_booking_value = 0
-        if total_bookings > 0:
-            average_booking_value = float(total_revenue) / total_bookings
+        if summary['total_bookings'] > 0:
+            average_booking_value = summary['total_revenue'] / summary['total_bookings']
         
         return Response({
-            'total_bookings': total_bookings,
-            'completed_bookings': completed_bookings,
-            'upcoming_bookings': upcoming_bookings,
-            'total_clients': total_clients,
-            'active_clients': active_clients,
-            'new_clients': new_clients_count,
-            'total_revenue': float(total_revenue),
-            'monthly_revenue': float(monthly_revenue),
+            'total_bookings': summary['total_bookings'],
+            'completed_bookings': summary['completed_bookings'],
+            'upcoming_bookings': summary['upcoming_bookings'],
+            'total_clients': summary['total_clients'],
+            'active_clients': summary['active_clients'],
+            'new_clients': summary['new_clients'],
+            'total_revenue': summary['total_revenue'],
+            'monthly_revenue': summary['monthly_revenue'],
             'average_booking_value': average_booking_value,
         })
     
@@ -155,23 +132,19 @@ class AnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        bookings = Booking.objects.filter(trainer=trainer)
-        total = bookings.count()
-        
-        # Status breakdown
-        status_breakdown = {}
-        for status_choice in Booking.STATUS_CHOICES:
-            count = bookings.filter(status=status_choice[0]).count()
-            status_breakdown[status_choice[0]] = count
+        totals = conditional_aggregate(Booking.objects.filter(trainer=trainer), {
+            'total': ('count', 'id'),
+            'by_status': choice_measures('status', Booking.STATUS_CHOICES),
+        })
+        total = totals['total']
+        status_breakdown = totals['by_status']
         
         # Calculate rates
         completion_rate = 0
         cancellation_rate = 0
         if total > 0:
-            completed = bookings.filter(status='completed').count()
-            cancelled = bookings.filter(status='cancelled').count()
-            completion_rate = round((completed / total) * 100, 2)
-            cancellation_rate = round((cancelled / total) * 100, 2)
+            completion_rate = round((status_breakdown['completed'] / total) * 100, 2)
+            cancellation_rate = round((status_breakdown['cancelled'] / total) * 100, 2)
         
         return Response({
             'total': total,
@@ -195,23 +168,14 @@ class AnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        clients = Client.objects.filter(trainer=trainer)
-        total_clients = clients.count()
-        active_clients = clients.filter(is_active=True).count()
-        inactive_clients = clients.filter(is_active=False).count()
-        
-        # Fitness level breakdown
-        fitness_level_breakdown = {}
-        for level_choice in Client.FITNESS_LEVEL_CHOICES:
-            count = clients.filter(fitness_level=level_choice[0]).count()
-            fitness_level_breakdown[level_choice[0]] = count
-        
-        return Response({
-            'total_clients': total_clients,
-            'active_clients': active_clients,
-            'inactive_clients': inactive_clients,
-            'by_fitness_level': fitness_level_breakdown,
+        totals = conditional_aggregate(Client.objects.filter(trainer=trainer), {
+            'total_clients': ('count', 'id'),
+            'active_clients': ('count', 'id', Q(is_active=True)),
+            'inactive_clients': ('count', 'id', Q(is_active=False)),
+            'by_fitness_level': choice_measures('fitness_level', Client.FITNESS_LEVEL_CHOICES),
         })
+        
+        return Response(totals)
     
     @action(detail=False, methods=['get'], url_path='metrics-summary')
     def metrics_summary(self, request):
@@ -249,14 +213,20 @@ class AnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
         )
         
         # Aggregate metrics
-        total_bookings = metrics.aggregate(Sum('bookings_count'))['bookings_count__sum'] or 0
-        total_completed = metrics.aggregate(Sum('completed_bookings'))['completed_bookings__sum'] or 0
-        total_cancelled = metrics.aggregate(Sum('cancelled_bookings'))['cancelled_bookings__sum'] or 0
-        total_revenue = metrics.aggregate(Sum('revenue'))['revenue__sum'] or 0
-        total_new_clients = metrics.aggregate(Sum('new_clients'))['new_clients__sum'] or 0
-        
-        # Calculate averages
-        avg_rating = metrics.aggregate(Avg('average_session_rating'))['average_session_rating__avg'] or 0
+        totals = conditional_aggregate(metrics, {
+            'bookings': ('sum', 'bookings_count'),
+            'completed': ('sum', 'completed_bookings'),
+            'cancelled': ('sum', 'cancelled_bookings'),
+            'revenue': ('sum', 'revenue'),
+            'new_clients': ('sum', 'new_clients'),
+            'rating': ('avg', 'average_session_rating'),
+        })
+        total_bookings = totals['bookings']
+        total_completed = totals['completed']
+        total_cancelled = totals['cancelled']
+        total_revenue = totals['revenue']
+        total_new_clients = totals['new_clients']
+        avg_rating = totals['rating']
         
         return Response({
             'start_date': start_date.isoformat(),
@@ -270,4 +240,28 @@ class AnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
             'completion_rate': round((total_completed / total_bookings * 100), 2) if total_bookings > 0 else 0,
             'cancellation_rate': round((total_cancelled / total_bookings * 100), 2) if total_bookings > 0 else 0,
         })
-
+    
+    @action(detail=False, methods=['get'], url_path='utilization-heatmap')
+    def utilization_heatmap(self, request):
+        """
+        Get weekday x time-of-day utilization over the last year.
+        
+        GET /api/analytics/utilization-heatmap/?interval=60
+        Query params: interval (cell size in minutes: 60 or 15)
+        """
+        try:
+            trainer = request.user.trainer_profile
+        except Trainer.DoesNotExist:
+            return Response(
+                {'error': 'Trainer profile not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        interval = request.query_params.get('interval', '60')
+        if not interval.isdigit() or int(interval) not in CELL_MINUTES:
+            return Response(
+                {'error': f'interval must be one of {CELL_MINUTES}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(get_heatmap(trainer, cell_minutes=int(interval)))
@@ -0,0 +1,29 @@
+"""
+Django signals reading a booking's stored row once per save, shared by the
+post_save handlers of other apps (leaderboard scores, reminder schedules)
+"""
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+from .models import Booking
+
+
+# Stored values the post_save handlers compare against
+STORED_FIELDS = ('trainer_id', 'status', 'start_time')
+
+
+@receiver(pre_save, sender=Booking)
+def booking_pre_save(sender, instance, **kwargs):
+    """Remember the stored booking's values before it is overwritten."""
+    instance._stored_values = Booking.objects.filter(pk=instance.pk).values(
+        *STORED_FIELDS
+    ).first() if instance.pk else None
+
+
+def stored_values(instance):
+    """
+    Values a booking had in the database before the current save.
+    
+    Returns:
+        dict or None: STORED_FIELDS of the stored row, None for new bookings
+    """
+    return getattr(instance, '_stored_values', None)
@@ -5,9 +5,11 @@ from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 from .models import Booking
 from .serializers import BookingSerializer, BookingCreateSerializer, BookingDetailSerializer
+from apps.core.exports import format_datetime, iterate, streaming_csv_response
 from apps.trainers.models import Trainer
 from apps.packages.models import Service
 
@@ -149,3 +151,47 @@ class BookingViewSet(viewsets.ModelViewSet):
         )
         serializer = self.get_serializer(bookings, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Export bookings to CSV.
+        
+        GET /api/bookings/export/
+        Accepts the list filters (status, client, search, ordering) and:
+            - start_date: Start date (YYYY-MM-DD)
+            - end_date: End date (YYYY-MM-DD)
+        """
+        bookings = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        
+        start_date = parse_date(request.query_params.get('start_date') or '')
+        end_date = parse_date(request.query_params.get('end_date') or '')
+        if start_date:
+            bookings = bookings.filter(start_time__date__gte=start_date)
+        if end_date:
+            bookings = bookings.filter(start_time__date__lte=end_date)
+        
+        def rows():
+            for booking in iterate(bookings):
+                yield [
+                    booking.id,
+                    booking.client.get_full_name(),
+                    booking.client.email,
+                    booking.service.name if booking.service else '',
+                    format_datetime(booking.start_time, '%Y-%m-%d %H:%M'),
+                    format_datetime(booking.end_time, '%Y-%m-%d %H:%M'),
+                    booking.duration_minutes,
+                    booking.status,
+                    booking.notes,
+                    booking.cancellation_reason,
+                    format_datetime(booking.created_at),
+                ]
+        
+        return streaming_csv_response(
+            'bookings_export.csv',
+            [
+                'ID', 'Client', 'Email', 'Service', 'Start Time', 'End Time',
+                'Duration (min)', 'Status', 'Notes', 'Cancellation Reason', 'Created At'
+            ],
+            rows()
+        )
@@ -25,7 +25,7 @@ class Client(models.Model):
     notes = models.TextField(blank=True)
     is_active = models.BooleanField(default=True)
     
-    # Payment tracking fields
+    # Payment tracking fields, written only by apps.payments.balances
     total_paid = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     last_payment_date = models.DateField(null=True, blank=True)
     payment_status = models.CharField(max_length=20, default='unpaid', choices=[
@@ -48,6 +48,18 @@ class Client(models.Model):
             models.Index(fields=['created_at']),
         ]
     
+    # Kept by atomic UPDATEs as payments are written; save() of an existing
+    # client leaves them out so an edit cannot undo a concurrent payment
+    BALANCE_FIELDS = ('total_paid', 'last_payment_date', 'payment_status')
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.BALANCE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.trainer.business_name})"
     
@@ -124,17 +124,9 @@ class ClientViewSet(viewsets.ModelViewSet):
         elif request.method == 'POST':
             serializer = ClientPaymentSerializer(data=request.data)
             if serializer.is_valid():
+                # The client's total_paid, last_payment_date and payment_status
+                # are updated atomically with the payment (payments.balances)
                 serializer.save(client=client, recorded_by=request.user)
                 
-                # Update client payment status
-                from django.db.models import Sum
-                total_paid = ClientPayment.objects.filter(client=client).aggregate(Sum('amount'))['amount__sum'] or 0
-                latest_payment = ClientPayment.objects.filter(client=client).order_by('-payment_date').first()
-                
-                client.total_paid = total_paid
-                client.last_payment_date = latest_payment.payment_date if latest_payment else None
-                client.payment_status = 'paid' if total_paid > 0 else 'unpaid'
-                client.save()
-                
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
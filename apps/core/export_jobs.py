@@ -0,0 +1,264 @@
+"""
+Background export jobs.
+Exports that can outlast a request run as ExportJobs: a Celery task reads
+the rows with the streaming export helpers (see exports.py), writes them
+gzip-compressed as CSV or JSON Lines to a temporary file, recording
+progress every chunk, and saves the artifact to the export storage.
+Artifacts are downloaded through signed links that expire after
+EXPORT_LINK_MAX_AGE and are deleted after EXPORT_ARTIFACT_TTL. A user
+requesting an export with the same kind, format, trainer and parameters
+within EXPORT_REUSE_WINDOW gets their existing job instead of starting
+another (jobs are only visible to the user who requested them).
+"""
+import csv
+import gzip
+import hashlib
+import io
+import json
+import tempfile
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .exports import CHUNK_SIZE, Echo
+from .models import ExportJob
+
+
+SIGNING_SALT = 'apps.core.export_jobs'
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def _trainers_source(job):
+    from apps.admin_panel.export_utils import (
+        TRAINER_EXPORT_HEADER, annotate_trainer_export, trainer_export_rows
+    )
+    from apps.admin_panel.utils import filter_trainers
+    from apps.trainers.models import Trainer
+    
+    trainers = filter_trainers(Trainer.objects.order_by('id'), job.params)
+    return TRAINER_EXPORT_HEADER, trainers, trainer_export_rows(annotate_trainer_export(trainers))
+
+
+def _payments_source(job):
+    from apps.payments.utils import (
+        PAYMENT_EXPORT_HEADER, get_payment_export_queryset, payment_export_rows
+    )
+    
+    payments = get_payment_export_queryset(job.trainer, **job.params)
+    return PAYMENT_EXPORT_HEADER, payments, payment_export_rows(payments)
+
+
+def _notifications_source(job):
+    from apps.notifications.utils import (
+        NOTIFICATION_EXPORT_HEADER, get_notification_export_queryset, notification_export_rows
+    )
+    
+    notifications = get_notification_export_queryset(job.trainer, **job.params)
+    return NOTIFICATION_EXPORT_HEADER, notifications, notification_export_rows(notifications)
+
+
+# Export kind -> (source, accepted params, platform-wide (admins only)).
+# A source returns (header, queryset to count, rows generator).
+EXPORT_SOURCES = {
+    'trainers': (_trainers_source, ['search', 'is_active', 'plan'], True),
+    'payments': (_payments_source, ['start_date', 'end_date'], False),
+    'notifications': (
+        _notifications_source,
+        ['status', 'notification_type', 'start_date', 'end_date'],
+        False
+    ),
+}
+
+
+def clean_params(kind, params):
+    """Keep the parameters a kind accepts, as non-empty strings."""
+    accepted = EXPORT_SOURCES[kind][1]
+    return {
+        name: str(params[name])
+        for name in accepted
+        if params.get(name) not in (None, '')
+    }
+
+
+def params_hash(kind, format, trainer_id, params):
+    """Identity of an export's output, for reusing artifacts."""
+    identity = json.dumps([kind, format, trainer_id, params], sort_keys=True)
+    return hashlib.sha256(identity.encode()).hexdigest()
+
+
+def request_export(user, kind, format='csv', params=None, trainer=None):
+    """
+    Start an export job, or return the user's recent identical one.
+    
+    Args:
+        user: User requesting the export
+        kind: One of EXPORT_SOURCES
+        format: 'csv' or 'jsonl'
+        params: Filters for the kind (unknown names are ignored)
+        trainer: Trainer whose data is exported (None for platform-wide kinds)
+    
+    Returns:
+        tuple: (ExportJob, created)
+    
+    Raises:
+        ValueError: Unknown kind or format, or trainer missing/present
+            where the kind requires otherwise
+    """
+    if kind not in EXPORT_SOURCES:
+        raise ValueError(f'Unknown export kind: {kind}')
+    if format not in CONTENT_TYPES:
+        raise ValueError(f'Unknown export format: {format}')
+    platform_wide = EXPORT_SOURCES[kind][2]
+    if platform_wide and trainer is not None:
+        raise ValueError(f'{kind} exports cover all trainers')
+    if not platform_wide and trainer is None:
+        raise ValueError(f'{kind} exports need a trainer')
+    
+    params = clean_params(kind, params or {})
+    digest = params_hash(kind, format, trainer.id if trainer else None, params)
+    
+    reusable = ExportJob.objects.filter(
+        requested_by=user,
+        params_hash=digest,
+        status__in=['pending', 'running', 'completed'],
+        created_at__gte=timezone.now() - timedelta(seconds=settings.EXPORT_REUSE_WINDOW)
+    ).order_by('-created_at').first()
+    if reusable is not None:
+        return reusable, False
+    
+    job = ExportJob.objects.create(
+        requested_by=user,
+        trainer=trainer,
+        kind=kind,
+        format=format,
+        params=params,
+        params_hash=digest
+    )
+    
+    from .tasks import run_export_job
+    transaction.on_commit(lambda: run_export_job.delay(job.id))
+    return job, True
+
+
+def _lines(format, header, rows):
+    if format == 'csv':
+        writer = csv.writer(Echo())
+        yield None, writer.writerow(header)
+        for row in rows:
+            yield row, writer.writerow(row)
+    else:
+        for row in rows:
+            yield row, json.dumps(dict(zip(header, row)), default=str, ensure_ascii=False) + '\n'
+
+
+def write_artifact(job, header, rows, fileobj, chunk_size=CHUNK_SIZE):
+    """
+    Write rows gzip-compressed to fileobj, recording progress on the job.
+    
+    Returns:
+        int: Rows written
+    """
+    written = 0
+    with gzip.GzipFile(fileobj=fileobj, mode='wb') as compressed:
+        text = io.TextIOWrapper(compressed, encoding='utf-8', newline='')
+        for row, line in _lines(job.format, header, rows):
+            text.write(line)
+            if row is None:
+                continue
+            written += 1
+            if written % chunk_size == 0:
+                ExportJob.objects.filter(pk=job.pk).update(rows_written=written)
+        text.flush()
+        text.detach()
+    return written
+
+
+def run_export(job):
+    """
+    Produce a job's artifact.
+    
+    Args:
+        job: Pending ExportJob
+    
+    Returns:
+        ExportJob: The job, completed or failed
+    """
+    job.status = 'running'
+    job.started_at = timezone.now()
+    job.save(update_fields=['status', 'started_at'])
+    
+    try:
+        source = EXPORT_SOURCES[job.kind][0]
+        header, queryset, rows = source(job)
+        job.rows_total = queryset.count()
+        job.save(update_fields=['rows_total'])
+        
+        with tempfile.TemporaryFile() as artifact:
+            job.rows_written = write_artifact(job, header, rows, artifact)
+            job.size = artifact.tell()
+            artifact.seek(0)
+            job.file.save(f'{job.kind}-{job.pk}.{job.format}.gz', File(artifact), save=False)
+        
+        job.status = 'completed'
+        job.expires_at = timezone.now() + timedelta(seconds=settings.EXPORT_ARTIFACT_TTL)
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+    
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def download_token(job):
+    """Signed token for downloading a job's artifact (see load_download_token)."""
+    return signing.dumps(job.pk, salt=SIGNING_SALT)
+
+
+def load_download_token(token):
+    """
+    Job a download token was issued for.
+    
+    Returns:
+        ExportJob or None: None when the token is invalid or older than
+            EXPORT_LINK_MAX_AGE, or the artifact is gone
+    """
+    try:
+        job_id = signing.loads(token, salt=SIGNING_SALT, max_age=settings.EXPORT_LINK_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return ExportJob.objects.filter(
+        pk=job_id,
+        status='completed',
+        expires_at__gt=timezone.now()
+    ).first()
+
+
+def download_filename(job):
+    return f'{job.kind}_export_{job.created_at:%Y%m%d_%H%M%S}.{job.format}.gz'
+
+
+def purge_expired(now=None):
+    """
+    Delete artifacts past their expiry.
+    
+    Returns:
+        int: Number of artifacts deleted
+    """
+    now = now or timezone.now()
+    purged = 0
+    for job in ExportJob.objects.filter(status='completed', expires_at__lte=now).iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.file = ''
+        job.status = 'expired'
+        job.save(update_fields=['status', 'file'])
+        purged += 1
+    return purged
@@ -0,0 +1,100 @@
+"""
+Background export endpoints.
+Request exports, poll their progress and download finished artifacts.
+"""
+from django.http import FileResponse, Http404
+from django.views.decorators.http import require_http_methods
+from rest_framework import viewsets, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from apps.trainers.models import Trainer
+from .export_jobs import download_filename, load_download_token, request_export
+from .models import ExportJob
+from .serializers import ExportJobSerializer, ExportRequestSerializer
+
+
+class ExportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Background exports of the current user.
+    
+    GET  /api/exports/       - List exports
+    POST /api/exports/       - Request an export
+    GET  /api/exports/{id}/  - Status, progress and download link
+    """
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        return ExportJob.objects.filter(requested_by=self.request.user)
+    
+    def create(self, request):
+        """
+        Request an export.
+        
+        Body:
+            - kind: trainers (admins only), payments or notifications
+            - format: csv (default) or jsonl
+            - params: Filters, as for the matching list endpoint
+            - trainer_id: Admins only, trainer whose data is exported
+        
+        Returns 202 for a new job, or 200 with a recent job that had the same
+        parameters (its artifact is reused).
+        """
+        serializer = ExportRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        user = request.user
+        trainer = None
+        if data['kind'] == 'trainers':
+            if not user.is_superuser:
+                return Response(
+                    {'error': 'Only admins can export all trainers'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+        elif 'trainer_id' in data and user.is_superuser:
+            trainer = Trainer.objects.filter(pk=data['trainer_id']).first()
+            if trainer is None:
+                return Response(
+                    {'error': 'Trainer not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        elif hasattr(user, 'trainer_profile'):
+            trainer = user.trainer_profile
+        else:
+            return Response(
+                {'error': 'User is not a trainer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        job, created = request_export(
+            user,
+            data['kind'],
+            format=data['format'],
+            params=data['params'],
+            trainer=trainer
+        )
+        return Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_202_ACCEPTED if created else status.HTTP_200_OK
+        )
+
+
+@require_http_methods(["GET"])
+def export_download(request, token):
+    """
+    Download an export artifact through a signed, expiring link.
+    
+    GET /api/exports/download/{token}/
+    """
+    job = load_download_token(token)
+    if job is None:
+        raise Http404('Export link is invalid or has expired')
+    
+    return FileResponse(
+        job.file.open('rb'),
+        as_attachment=True,
+        filename=download_filename(job),
+        content_type='application/gzip'
+    )
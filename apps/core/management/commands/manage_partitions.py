@@ -0,0 +1,58 @@
+"""
+Management command to create upcoming log table partitions and apply retention
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.core.partitioning import add_months, month_start, registered_tables
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions for log tables and drop or archive expired ones'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=settings.LOG_PARTITION_MONTHS_AHEAD,
+            help='Months of partitions to create beyond the current one'
+        )
+        parser.add_argument(
+            '--no-retention',
+            action='store_true',
+            help='Only create partitions'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be created and removed'
+        )
+    
+    def handle(self, *args, **options):
+        current = month_start(timezone.now())
+        
+        for table in registered_tables():
+            partitioned = table.is_partitioned()
+            self.stdout.write(f"{table.label} ({'partitioned' if partitioned else 'not partitioned'})")
+            
+            if options['dry_run']:
+                if partitioned:
+                    existing = table.partitions()
+                    missing = [
+                        add_months(current, offset)
+                        for offset in range(options['months_ahead'] + 1)
+                        if add_months(current, offset) not in existing
+                    ]
+                    for month in missing:
+                        self.stdout.write(f'  would create {month:%Y-%m}')
+                    if not options['no_retention']:
+                        for month in table.expired_months():
+                            self.stdout.write(f"  would {table.retention['action']} {month:%Y-%m}")
+                continue
+            
+            if partitioned:
+                for month in table.ensure_partitions(options['months_ahead']):
+                    self.stdout.write(self.style.SUCCESS(f'  created {month:%Y-%m}'))
+            if not options['no_retention']:
+                for removed in table.apply_retention():
+                    self.stdout.write(self.style.SUCCESS(f'  {removed}'))
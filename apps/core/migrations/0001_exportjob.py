@@ -0,0 +1,45 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:39
+
+import apps.core.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('trainers', '0003_paymentlinks'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('trainers', 'Trainers'), ('payments', 'Payment History'), ('notifications', 'Notification Log')], max_length=20)),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('jsonl', 'JSON Lines')], default='csv', max_length=10)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('params_hash', models.CharField(help_text='Hash of kind, format, trainer and params, for reusing identical exports', max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed'), ('expired', 'Expired')], default='pending', max_length=20)),
+                ('rows_total', models.PositiveIntegerField(blank=True, null=True)),
+                ('rows_written', models.PositiveIntegerField(default=0)),
+                ('file', models.FileField(blank=True, storage=apps.core.models.export_storage, upload_to='exports/')),
+                ('size', models.PositiveBigIntegerField(default=0, help_text='Compressed artifact size in bytes')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+                ('trainer', models.ForeignKey(blank=True, help_text='Trainer whose data is exported (empty for platform-wide exports)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='trainers.trainer')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['params_hash', 'created_at'], name='core_export_params__3c2ef3_idx'), models.Index(fields=['requested_by', 'created_at'], name='core_export_request_47fc21_idx'), models.Index(fields=['status', 'expires_at'], name='core_export_status_ec2891_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+"""
+Core models
+"""
+from django.conf import settings
+from django.core.files.storage import storages
+from django.db import models
+
+
+def export_storage():
+    """Storage export artifacts are written to (settings.EXPORT_STORAGE_ALIAS)."""
+    return storages[settings.EXPORT_STORAGE_ALIAS]
+
+
+class ExportJob(models.Model):
+    """
+    A background export and its compressed artifact.
+    See apps.core.export_jobs.
+    """
+    
+    KIND_CHOICES = [
+        ('trainers', 'Trainers'),
+        ('payments', 'Payment History'),
+        ('notifications', 'Notification Log'),
+    ]
+    
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('jsonl', 'JSON Lines'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('expired', 'Expired'),
+    ]
+    
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='export_jobs'
+    )
+    trainer = models.ForeignKey(
+        'trainers.Trainer',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='export_jobs',
+        help_text="Trainer whose data is exported (empty for platform-wide exports)"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv')
+    params = models.JSONField(default=dict, blank=True)
+    params_hash = models.CharField(
+        max_length=64,
+        help_text="Hash of kind, format, trainer and params, for reusing identical exports"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_total = models.PositiveIntegerField(null=True, blank=True)
+    rows_written = models.PositiveIntegerField(default=0)
+    file = models.FileField(upload_to='exports/', storage=export_storage, blank=True)
+    size = models.PositiveBigIntegerField(default=0, help_text="Compressed artifact size in bytes")
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['params_hash', 'created_at']),
+            models.Index(fields=['requested_by', 'created_at']),
+            models.Index(fields=['status', 'expires_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} export #{self.pk} ({self.status})"
+    
+    @property
+    def progress(self):
+        """Percentage of rows written (None until the row count is known)."""
+        if self.status == 'completed':
+            return 100
+        if not self.rows_total:
+            return None if self.rows_total is None else 0
+        return min(round(self.rows_written / self.rows_total * 100, 1), 100)
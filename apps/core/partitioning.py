@@ -0,0 +1,393 @@
+"""
+Monthly partitioning and retention for append-only log tables.
+
+On PostgreSQL the tables in PARTITIONED_TABLES are range-partitioned by
+month on their timestamp column (one child table per month plus a default
+partition), so retention detaches and drops or archives whole months
+instead of running DELETE scans, and each month's indexes stay small.
+On other databases (SQLite in development) the tables stay plain tables
+and retention falls back to batched deletes.
+"""
+from datetime import date, datetime, time, timezone as dt_timezone
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, migrations, transaction
+from django.utils import timezone
+
+
+# Model label -> partition column
+PARTITIONED_TABLES = {
+    'notifications.Notification': 'created_at',
+    'workflows.WorkflowExecutionLog': 'executed_at',
+    'payments.WebhookEvent': 'created_at',
+    'admin_panel.AdminActionLog': 'created_at',
+    'admin_panel.DomainVerificationLog': 'created_at',
+}
+
+# Schema archived partitions are moved to
+ARCHIVE_SCHEMA = 'log_archive'
+
+# Rows removed per statement by the non-PostgreSQL retention fallback
+DELETE_BATCH_SIZE = 5000
+
+
+def supports_partitioning(conn=None):
+    """Declarative partitioning is only used on PostgreSQL."""
+    return (conn or connection).vendor == 'postgresql'
+
+
+def month_start(value):
+    """First day of the month containing a date or datetime."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """Shift a month (first-of-month date) by count months."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_bound(month):
+    """UTC timestamp literal of a month's start, for partition bounds."""
+    return datetime.combine(month, time.min, tzinfo=dt_timezone.utc).isoformat()
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def default_partition_name(table):
+    return f'{table}_pdefault'
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+class PartitionedTable:
+    """A registered log table and its retention policy."""
+    
+    def __init__(self, label, column):
+        self.label = label
+        self.column = column
+    
+    @property
+    def model(self):
+        return apps.get_model(self.label)
+    
+    @property
+    def table(self):
+        return self.model._meta.db_table
+    
+    @property
+    def retention(self):
+        """{'months': int, 'action': 'drop' | 'archive'} or None to keep forever."""
+        return settings.LOG_RETENTION.get(self.label)
+    
+    def is_partitioned(self):
+        if not supports_partitioning():
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT 1 FROM pg_partitioned_table pt
+                JOIN pg_class c ON c.oid = pt.partrelid
+                WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+                """,
+                [self.table]
+            )
+            return cursor.fetchone() is not None
+    
+    def partitions(self):
+        """Months with a partition, oldest first (default partition excluded)."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT child.relname FROM pg_inherits i
+                JOIN pg_class parent ON parent.oid = i.inhparent
+                JOIN pg_class child ON child.oid = i.inhrelid
+                WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)
+                """,
+                [self.table]
+            )
+            names = [row[0] for row in cursor.fetchall()]
+        
+        prefix = f'{self.table}_p'
+        months = []
+        for name in names:
+            suffix = name[len(prefix):]
+            if name.startswith(prefix) and suffix.isdigit() and len(suffix) == 6:
+                months.append(date(int(suffix[:4]), int(suffix[4:]), 1))
+        return sorted(months)
+    
+    def create_partition(self, month):
+        """
+        Create the partition for a month, if it does not exist yet.
+        
+        The partition is built as a standalone table, any of its rows that
+        landed in the default partition are moved over, and it is then
+        attached, so this also works once the month has started.
+        
+        Returns:
+            bool: True if a partition was created
+        """
+        if month in self.partitions():
+            return False
+        
+        name = partition_name(self.table, month)
+        default = default_partition_name(self.table)
+        start, end = month_bound(month), month_bound(add_months(month, 1))
+        column = _quote(self.column)
+        
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {_quote(self.table)} IN SHARE ROW EXCLUSIVE MODE')
+            cursor.execute(
+                f'CREATE TABLE {_quote(name)} (LIKE {_quote(self.table)} '
+                f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+            )
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {_quote(default)} '
+                f'WHERE {column} >= %s AND {column} < %s RETURNING *) '
+                f'INSERT INTO {_quote(name)} SELECT * FROM moved',
+                [start, end]
+            )
+            cursor.execute(
+                f'ALTER TABLE {_quote(self.table)} ATTACH PARTITION {_quote(name)} '
+                f"FOR VALUES FROM ('{start}') TO ('{end}')"
+            )
+        return True
+    
+    def ensure_partitions(self, months_ahead):
+        """
+        Create partitions for this month and the next months_ahead months.
+        
+        Returns:
+            list: Months whose partition was created
+        """
+        current = month_start(timezone.now())
+        return [
+            month
+            for month in (add_months(current, offset) for offset in range(months_ahead + 1))
+            if self.create_partition(month)
+        ]
+    
+    def expired_months(self, now=None):
+        """Partitioned months entirely older than the retention period."""
+        if not self.retention:
+            return []
+        cutoff = add_months(month_start(now or timezone.now()), -self.retention['months'])
+        return [month for month in self.partitions() if add_months(month, 1) <= cutoff]
+    
+    def apply_retention(self, now=None):
+        """
+        Remove data older than the retention period.
+        
+        On partitioned tables whole months are detached and then dropped,
+        or moved to the ARCHIVE_SCHEMA schema when the policy's action is
+        'archive'. Elsewhere rows are deleted in batches ('archive' needs
+        PostgreSQL and is skipped).
+        
+        Returns:
+            list: Descriptions of what was removed
+        """
+        if not self.retention:
+            return []
+        
+        if not self.is_partitioned():
+            return self._delete_expired_rows(now)
+        
+        removed = []
+        for month in self.expired_months(now):
+            name = partition_name(self.table, month)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'ALTER TABLE {_quote(self.table)} DETACH PARTITION {_quote(name)}')
+                if self.retention['action'] == 'archive':
+                    cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {_quote(ARCHIVE_SCHEMA)}')
+                    cursor.execute(f'ALTER TABLE {_quote(name)} SET SCHEMA {_quote(ARCHIVE_SCHEMA)}')
+                    removed.append(f'archived {name} to {ARCHIVE_SCHEMA}')
+                else:
+                    cursor.execute(f'DROP TABLE {_quote(name)}')
+                    removed.append(f'dropped {name}')
+        return removed
+    
+    def _delete_expired_rows(self, now=None):
+        if self.retention['action'] == 'archive':
+            return []
+        
+        cutoff = datetime.combine(
+            add_months(month_start(now or timezone.now()), -self.retention['months']),
+            time.min,
+            tzinfo=dt_timezone.utc
+        )
+        expired = self.model.objects.filter(**{f'{self.column}__lt': cutoff})
+        
+        deleted = 0
+        while True:
+            ids = list(expired.order_by('pk').values_list('pk', flat=True)[:DELETE_BATCH_SIZE])
+            if not ids:
+                break
+            self.model.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+        return [f'deleted {deleted} rows from {self.table}'] if deleted else []
+
+
+def registered_tables():
+    """PartitionedTable for every registered log table."""
+    return [PartitionedTable(label, column) for label, column in PARTITIONED_TABLES.items()]
+
+
+def _table_definitions(cursor, table):
+    """Index definitions and outgoing foreign keys of a table."""
+    cursor.execute(
+        "SELECT pg_get_indexdef(indexrelid), indisunique, indisprimary FROM pg_index "
+        "WHERE indrelid = %s::regclass",
+        [table]
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table]
+    )
+    return indexes, cursor.fetchall()
+
+
+def partition_table(schema_editor, table, column, months_ahead=3):
+    """
+    Convert a plain table into a table range-partitioned by month.
+    
+    Used by the PartitionByMonth migration operation. The table is rebuilt:
+    renamed aside, recreated as a partitioned table with the same columns,
+    defaults and check constraints, given partitions covering its data and
+    the coming months, filled, and finally given back its indexes and
+    foreign keys. PostgreSQL requires the partition column in every
+    unique index, so the primary key becomes (id, column) and unique
+    indexes are extended with the column - which makes them unique per
+    timestamp only, so these models must not rely on unique fields (see
+    WebhookEventKey for WebhookEvent.event_id). Incoming foreign keys are
+    dropped; models referencing these tables must use db_constraint=False.
+    """
+    quote = schema_editor.quote_name
+    old = f'{table}_unpartitioned'
+    sequence = f'{table}_id_pseq'
+    
+    with schema_editor.connection.cursor() as cursor:
+        indexes, foreign_keys = _table_definitions(cursor, table)
+        cursor.execute(
+            f'SELECT min({quote(column)}), max({quote(column)}), max(id) FROM {quote(table)}'
+        )
+        first, last, max_id = cursor.fetchone()
+    
+    statements = [
+        f'ALTER TABLE {quote(table)} RENAME TO {quote(old)}',
+        (
+            f'CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS '
+            f'INCLUDING CONSTRAINTS) PARTITION BY RANGE ({quote(column)})'
+        ),
+        f'CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.id',
+        f"ALTER TABLE {quote(table)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')",
+        f"SELECT setval('{sequence}', {(max_id or 0) + 1}, false)",
+        f'CREATE TABLE {quote(default_partition_name(table))} PARTITION OF {quote(table)} DEFAULT',
+    ]
+    
+    current = month_start(timezone.now())
+    month = month_start(first) if first else current
+    final = add_months(max(month_start(last) if last else current, current), months_ahead)
+    while month <= final:
+        statements.append(
+            f'CREATE TABLE {quote(partition_name(table, month))} PARTITION OF {quote(table)} '
+            f"FOR VALUES FROM ('{month_bound(month)}') TO ('{month_bound(add_months(month, 1))}')"
+        )
+        month = add_months(month, 1)
+    
+    # Constraints and indexes are added once the old table, which still
+    # holds their names, is gone
+    statements += [
+        f'INSERT INTO {quote(table)} SELECT * FROM {quote(old)}',
+        f'DROP TABLE {quote(old)} CASCADE',
+        f'ALTER TABLE {quote(table)} ADD PRIMARY KEY (id, {quote(column)})',
+    ]
+    
+    # Definitions were read before the rename, so they name the new table
+    for indexdef, unique, primary in indexes:
+        if primary:
+            continue
+        if unique:
+            indexdef = f'{indexdef[:-1]}, {quote(column)})'
+        statements.append(indexdef)
+    for name, definition in foreign_keys:
+        statements.append(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}')
+    
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+def unpartition_table(schema_editor, table, column):
+    """Reverse of partition_table: rebuild the table as a plain table."""
+    quote = schema_editor.quote_name
+    old = f'{table}_partitioned'
+    
+    with schema_editor.connection.cursor() as cursor:
+        indexes, foreign_keys = _table_definitions(cursor, table)
+    
+    statements = [
+        f'ALTER TABLE {quote(table)} RENAME TO {quote(old)}',
+        f'CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+        f'ALTER SEQUENCE {quote(table + "_id_pseq")} OWNED BY {quote(table)}.id',
+        f'INSERT INTO {quote(table)} SELECT * FROM {quote(old)}',
+        f'DROP TABLE {quote(old)} CASCADE',
+        f'ALTER TABLE {quote(table)} ADD PRIMARY KEY (id)',
+    ]
+    for indexdef, unique, primary in indexes:
+        if primary:
+            continue
+        indexdef = indexdef.replace(' ON ONLY ', ' ON ')
+        if unique:
+            indexdef = indexdef.replace(f', {quote(column)})', ')')
+        statements.append(indexdef)
+    for name, definition in foreign_keys:
+        statements.append(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}')
+    
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+class PartitionByMonth(migrations.operations.base.Operation):
+    """
+    Migration operation partitioning a model's table by month.
+    
+    No-op on databases without declarative partitioning, so the same
+    migrations run on SQLite. The model state is unchanged: Django keeps
+    treating id as the primary key.
+    """
+    
+    reduces_to_sql = False
+    reversible = True
+    
+    def __init__(self, model_name, column):
+        self.model_name = model_name
+        self.column = column
+    
+    def state_forwards(self, app_label, state):
+        pass
+    
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if supports_partitioning(schema_editor.connection):
+            model = to_state.apps.get_model(app_label, self.model_name)
+            partition_table(
+                schema_editor,
+                model._meta.db_table,
+                self.column,
+                months_ahead=settings.LOG_PARTITION_MONTHS_AHEAD
+            )
+    
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if supports_partitioning(schema_editor.connection):
+            model = from_state.apps.get_model(app_label, self.model_name)
+            unpartition_table(schema_editor, model._meta.db_table, self.column)
+    
+    def describe(self):
+        return f'Partition {self.model_name} by month on {self.column}'
+    
+    def deconstruct(self):
+        return (self.__class__.__qualname__, [self.model_name, self.column], {})
@@ -0,0 +1,36 @@
+from django.urls import reverse
+from rest_framework import serializers
+
+from .export_jobs import EXPORT_SOURCES, CONTENT_TYPES, download_token
+from .models import ExportJob
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    """Serializer for background export jobs."""
+    progress = serializers.FloatField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ExportJob
+        fields = [
+            'id', 'kind', 'format', 'params', 'trainer', 'status', 'progress',
+            'rows_total', 'rows_written', 'size', 'error', 'download_url',
+            'created_at', 'started_at', 'finished_at', 'expires_at'
+        ]
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        """Signed link to the artifact, valid for EXPORT_LINK_MAX_AGE seconds."""
+        if obj.status != 'completed':
+            return None
+        path = reverse('export-download', args=[download_token(obj)])
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request else path
+
+
+class ExportRequestSerializer(serializers.Serializer):
+    """Serializer for requesting an export."""
+    kind = serializers.ChoiceField(choices=list(EXPORT_SOURCES))
+    format = serializers.ChoiceField(choices=list(CONTENT_TYPES), default='csv')
+    params = serializers.DictField(required=False, default=dict)
+    trainer_id = serializers.IntegerField(required=False, help_text="Admins only: trainer to export")
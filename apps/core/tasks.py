@@ -0,0 +1,61 @@
+"""
+Celery tasks for core maintenance
+"""
+from celery import shared_task
+from django.conf import settings
+
+from .partitioning import registered_tables
+from . import export_jobs
+
+
+@shared_task
+def manage_log_partitions():
+    """
+    Create upcoming monthly partitions and apply retention to log tables.
+    Runs daily via Celery beat.
+    """
+    results = {}
+    for table in registered_tables():
+        try:
+            created = []
+            if table.is_partitioned():
+                created = table.ensure_partitions(settings.LOG_PARTITION_MONTHS_AHEAD)
+            removed = table.apply_retention()
+            results[table.label] = {
+                'created': [f'{month:%Y-%m}' for month in created],
+                'removed': removed,
+            }
+        except Exception as e:
+            print(f"Error managing partitions for {table.label}: {str(e)}")
+            results[table.label] = {'error': str(e)}
+    return results
+
+
+@shared_task
+def run_export_job(job_id):
+    """
+    Write the artifact of a background export.
+    Queued when the job is requested.
+    """
+    from .models import ExportJob
+    
+    job = ExportJob.objects.filter(pk=job_id, status='pending').first()
+    if job is None:
+        return None
+    job = export_jobs.run_export(job)
+    if job.status == 'failed':
+        print(f"Error running export job {job.id}: {job.error}")
+    return {'status': job.status, 'rows': job.rows_written}
+
+
+@shared_task
+def purge_expired_exports():
+    """
+    Delete export artifacts past their expiry.
+    Runs hourly via Celery beat.
+    """
+    try:
+        return export_jobs.purge_expired()
+    except Exception as e:
+        print(f"Error purging expired exports: {str(e)}")
+        return 0
@@ -0,0 +1,11 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .export_views import ExportJobViewSet, export_download
+
+router = DefaultRouter()
+router.register(r'exports', ExportJobViewSet, basename='export')
+
+urlpatterns = [
+    path('exports/download/<str:token>/', export_download, name='export-download'),
+    path('', include(router.urls)),
+]
@@ -18,7 +18,9 @@ from apps.packages.models import SessionPackage, ClientPackage
 from apps.payments.models import Payment, Subscription
 from apps.notifications.models import Notification
 from apps.trainers.models import Trainer
-from django.db.models import Sum, Count, Avg, Q
+from apps.analytics.aggregates import choice_measures, conditional_aggregate
+from apps.analytics.summary import get_summary
+from django.db.models import Avg, Q
 from datetime import timedelta
 
 
@@ -127,35 +129,14 @@ def dashboard(request):
 def dashboard_stats(request):
     """Dashboard stats partial for HTMX."""
     trainer = get_or_create_trainer_profile(request.user)
-    now = timezone.now()
-    today = now.date()
-    this_month = today.replace(day=1)
-    last_month = (this_month - timedelta(days=1)).replace(day=1)
+    summary = get_summary(trainer)
     
-    # Get stats
-    bookings = Booking.objects.filter(trainer=trainer)
-    clients = Client.objects.filter(trainer=trainer)
-    payments = Payment.objects.filter(subscription__trainer=trainer, status='completed')
-    
-    # Calculate current month stats
-    total_bookings = bookings.count()
-    upcoming_bookings = bookings.filter(
-        status__in=['pending', 'confirmed'],
-        start_time__gte=now
-    ).count()
-    total_clients = clients.count()
-    total_revenue = payments.aggregate(Sum('amount'))['amount__sum'] or 0
-    
-    # Calculate last month for comparison
-    last_month_bookings = bookings.filter(
-        created_at__gte=last_month,
-        created_at__lt=this_month
-    ).count()
-    
-    last_month_clients = clients.filter(
-        created_at__gte=last_month,
-        created_at__lt=this_month
-    ).count()
+    total_bookings = summary['total_bookings']
+    upcoming_bookings = summary['upcoming_bookings']
+    total_clients = summary['total_clients']
+    total_revenue = summary['total_revenue']
+    last_month_bookings = summary['last_month_bookings']
+    last_month_clients = summary['last_month_clients']
     
     # Calculate percentage changes
     booking_change = 0
@@ -261,32 +242,43 @@ def analytics_revenue_chart(request):
         now = timezone.now()
         this_month = now.date().replace(day=1)
         
-        # Get payment data
+        # Last 6 months, newest first
+        months = []
+        for i in range(6):
+            month_start = (this_month - timedelta(days=30*i)).replace(day=1)
+            if i > 0:
+                month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+            else:
+                month_end = now.date()
+            months.append((month_start, month_end))
+        
+        # Get payment data (all figures in one query)
         payments = Payment.objects.filter(subscription__trainer=trainer, status='completed')
-        total_revenue = payments.aggregate(Sum('amount'))['amount__sum'] or 0
-        monthly_revenue = payments.filter(created_at__gte=this_month).aggregate(Sum('amount'))['amount__sum'] or 0
+        totals = conditional_aggregate(payments, {
+            'total': ('sum', 'amount'),
+            'monthly': ('sum', 'amount', Q(created_at__gte=this_month)),
+            'months': {
+                index: ('sum', 'amount', Q(
+                    created_at__date__gte=month_start,
+                    created_at__date__lte=month_end
+                ))
+                for index, (month_start, month_end) in enumerate(months)
+            },
+        })
+        total_revenue = totals['total']
+        monthly_revenue = totals['monthly']
         
         # Calculate average booking value
-        bookings = Booking.objects.filter(trainer=trainer, status='completed')
+        completed_bookings = Booking.objects.filter(trainer=trainer, status='completed').count()
         average_booking_value = 0
-        if bookings.exists():
-            average_booking_value = float(total_revenue) / bookings.count()
+        if completed_bookings:
+            average_booking_value = float(total_revenue) / completed_bookings
         
-        # Get last 6 months of revenue data
         monthly_data = []
         max_revenue = 0
         
-        for i in range(6):
-            month_start = (this_month - timedelta(days=30*i)).replace(day=1)
-            if i > 0:
-                month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            else:
-                month_end = now.date()
-            
-            month_revenue = payments.filter(
-                created_at__date__gte=month_start,
-                created_at__date__lte=month_end
-            ).aggregate(Sum('amount'))['amount__sum'] or 0
+        for index, (month_start, _) in enumerate(months):
+            month_revenue = totals['months'][index]
             
             if month_revenue > max_revenue:
                 max_revenue = float(month_revenue)
@@ -1032,32 +1024,30 @@ def analytics_summary(request):
     except Trainer.DoesNotExist:
         return render(request, 'partials/analytics/summary.html', {'stats': []})
     
-    bookings = Booking.objects.filter(trainer=trainer)
-    clients = Client.objects.filter(trainer=trainer)
-    payments = Payment.objects.filter(subscription__trainer=trainer, status='completed')
+    summary = get_summary(trainer)
     
     stats = [
         {
             'label': 'Total Revenue',
-            'value': f"${payments.aggregate(Sum('amount'))['amount__sum'] or 0:,.2f}",
+            'value': f"${summary['total_revenue']:,.2f}",
             'color': 'pink',
             'icon': 'M12 8c-1.657 0-3 .895-3 2s1.343 2 3 2 3 .895 3 2-1.343 2-3 2m0-8c1.11 0 2.08.402 2.599 1M12 8V7m0 1v8m0 0v1m0-1c-1.11 0-2.08-.402-2.599-1M21 12a9 9 0 11-18 0 9 9 0 0118 0z',
         },
         {
             'label': 'Total Bookings',
-            'value': bookings.count(),
+            'value': summary['total_bookings'],
             'color': 'indigo',
             'icon': 'M8 7V3m8 4V3m-9 8h10M5 21h14a2 2 0 002-2V7a2 2 0 00-2-2H5a2 2 0 00-2 2v12a2 2 0 002 2z',
         },
         {
             'label': 'Total Clients',
-            'value': clients.count(),
+            'value': summary['total_clients'],
             'color': 'purple',
             'icon': 'M12 4.354a4 4 0 110 5.292M15 21H3v-1a6 6 0 0112 0v1zm0 0h6v-1a6 6 0 00-9-5.197M13 7a4 4 0 11-8 0 4 4 0 018 0z',
         },
         {
             'label': 'Active Packages',
-            'value': ClientPackage.objects.filter(client__trainer=trainer, sessions_remaining__gt=0).count(),
+            'value': summary['active_packages'],
             'color': 'green',
             'icon': 'M20 7l-8-4-8 4m16 0l-8 4m8-4v10l-8 4m0-10L4 7m8 4v10M4 7v10l8 4',
         },
@@ -1079,21 +1069,27 @@ def analytics_bookings_chart(request):
             'status_breakdown': []
         })
     
-    bookings = Booking.objects.filter(trainer=trainer)
-    total_bookings = bookings.count()
-    completed_bookings = bookings.filter(status='completed').count()
-    upcoming_bookings = bookings.filter(status__in=['pending', 'confirmed'], start_time__gte=timezone.now()).count()
+    totals = conditional_aggregate(Booking.objects.filter(trainer=trainer), {
+        'total': ('count', 'id'),
+        'upcoming': ('count', 'id', Q(status__in=['pending', 'confirmed'], start_time__gte=timezone.now())),
+        'by_status': choice_measures('status', Booking.STATUS_CHOICES),
+    })
+    total_bookings = totals['total']
+    completed_bookings = totals['by_status']['completed']
+    upcoming_bookings = totals['upcoming']
     
-    # Status breakdown
-    status_counts = bookings.values('status').annotate(count=Count('id')).order_by('-count')
-    total = sum(s['count'] for s in status_counts)
+    # Status breakdown (statuses in use, most frequent first)
+    status_counts = sorted(
+        ((status, count) for status, count in totals['by_status'].items() if count),
+        key=lambda item: -item[1]
+    )
     
     status_breakdown = []
-    for status_data in status_counts:
-        percentage = (status_data['count'] / total * 100) if total > 0 else 0
+    for status, count in status_counts:
+        percentage = (count / total_bookings * 100) if total_bookings > 0 else 0
         status_breakdown.append({
-            'status': status_data['status'],
-            'count': status_data['count'],
+            'status': status,
+            'count': count,
             'percentage': round(percentage, 1)
         })
     
@@ -1123,17 +1119,22 @@ def analytics_clients_metrics(request):
     this_month = now.date().replace(day=1)
     last_month = (this_month - timedelta(days=1)).replace(day=1)
     
-    clients = Client.objects.filter(trainer=trainer)
-    total_clients = clients.count()
-    active_clients = clients.filter(is_active=True).count()
-    new_clients = clients.filter(created_at__gte=this_month).count()
-    last_month_clients = clients.filter(created_at__gte=last_month, created_at__lt=this_month).count()
+    totals = conditional_aggregate(Client.objects.filter(trainer=trainer), {
+        'total': ('count', 'id'),
+        'active': ('count', 'id', Q(is_active=True)),
+        'new': ('count', 'id', Q(created_at__gte=this_month)),
+        'last_month': ('count', 'id', Q(created_at__gte=last_month, created_at__lt=this_month)),
+    })
+    total_clients = totals['total']
+    active_clients = totals['active']
+    new_clients = totals['new']
+    last_month_clients = totals['last_month']
     
     # Average sessions per client
-    completed_bookings = Booking.objects.filter(trainer=trainer, status='completed')
     avg_sessions_per_client = 0
     if total_clients > 0:
-        avg_sessions_per_client = completed_bookings.count() / total_clients
+        completed_bookings = Booking.objects.filter(trainer=trainer, status='completed').count()
+        avg_sessions_per_client = completed_bookings / total_clients
     
     return render(request, 'partials/analytics/clients_metrics.html', {
         'total_clients': total_clients,
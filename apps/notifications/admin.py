@@ -1,5 +1,22 @@
 from django.contrib import admin
-from .models import Notification
+from . import counters
+from .models import DigestEntry, Notification, NotificationCounter, ReminderLedger, ScheduledReminder
+
+
+# Changelist filters that NotificationCounter can answer, mapped to its fields
+COUNTER_FILTERS = {
+    'notification_type__exact': 'notification_type',
+    'status__exact': 'status',
+    'trainer__id__exact': 'trainer_id',
+    'created_at__year': 'day__year',
+    'created_at__month': 'day__month',
+    'created_at__day': 'day__day',
+    'created_at__gte': 'day__gte',
+    'created_at__lt': 'day__lt',
+}
+
+# Changelist parameters that do not filter rows
+COUNTER_IGNORED_PARAMS = {'p', 'o', 'e', '_changelist_filters'}
 
 
 @admin.register(Notification)
@@ -8,16 +25,22 @@ class NotificationAdmin(admin.ModelAdmin):
     list_display = ('get_trainer_name', 'notification_type', 'recipient', 'subject_preview', 'status', 'created_at', 'sent_at')
     list_filter = ('notification_type', 'status', 'created_at', 'trainer')
     search_fields = ('trainer__business_name', 'recipient', 'subject', 'message')
-    readonly_fields = ('created_at', 'sent_at', 'failed_reason')
+    readonly_fields = ('created_at', 'sent_at', 'failed_reason', 'payload', 'attempts', 'next_retry_at')
     ordering = ('-created_at',)
     date_hierarchy = 'created_at'
+    # Page counts come from NotificationCounter; skip the unfiltered COUNT(*)
+    show_full_result_count = False
     
     fieldsets = (
         ('Notification Details', {
             'fields': ('trainer', 'notification_type', 'recipient', 'subject', 'message')
         }),
         ('Status', {
-            'fields': ('status', 'sent_at', 'failed_reason')
+            'fields': ('status', 'sent_at', 'failed_reason', 'attempts', 'next_retry_at')
+        }),
+        ('Replay Payload', {
+            'fields': ('payload',),
+            'classes': ('collapse',)
         }),
         ('Timestamp', {
             'fields': ('created_at',),
@@ -30,6 +53,28 @@ class NotificationAdmin(admin.ModelAdmin):
         queryset = super().get_queryset(request)
         return queryset.select_related('trainer', 'trainer__user')
     
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        """Count from NotificationCounter when the filters allow it."""
+        filters = self._counter_filters(request)
+        if filters is not None:
+            queryset = queryset.with_count(counters.count(**filters))
+        return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+    
+    @staticmethod
+    def _counter_filters(request):
+        """Counter filters equivalent to the changelist's, or None if there are none."""
+        filters = {}
+        for param, value in request.GET.items():
+            if param in COUNTER_IGNORED_PARAMS:
+                continue
+            if param not in COUNTER_FILTERS:
+                return None
+            if param in ('created_at__gte', 'created_at__lt'):
+                # Date filter bounds are midnights; the date part is the day
+                value = value[:10]
+            filters[COUNTER_FILTERS[param]] = value
+        return filters
+    
     def get_trainer_name(self, obj):
         return obj.trainer.business_name
     get_trainer_name.short_description = 'Trainer'
@@ -39,3 +84,43 @@ class NotificationAdmin(admin.ModelAdmin):
         return obj.subject[:50] + '...' if len(obj.subject) > 50 else obj.subject
     subject_preview.short_description = 'Subject'
 
+
+@admin.register(NotificationCounter)
+class NotificationCounterAdmin(admin.ModelAdmin):
+    """Admin interface for NotificationCounter model."""
+    list_display = ('trainer', 'day', 'notification_type', 'status', 'count')
+    list_filter = ('notification_type', 'status', 'day')
+    search_fields = ('trainer__business_name',)
+    raw_id_fields = ('trainer',)
+    readonly_fields = ('trainer', 'day', 'notification_type', 'status', 'count')
+    ordering = ('-day',)
+
+
+@admin.register(ReminderLedger)
+class ReminderLedgerAdmin(admin.ModelAdmin):
+    """Admin interface for ReminderLedger model."""
+    list_display = ('booking', 'kind', 'claimed_at')
+    list_filter = ('kind', 'claimed_at')
+    readonly_fields = ('booking', 'kind', 'claim_token', 'claimed_at')
+    raw_id_fields = ('booking',)
+    ordering = ('-claimed_at',)
+
+
+@admin.register(ScheduledReminder)
+class ScheduledReminderAdmin(admin.ModelAdmin):
+    """Admin interface for ScheduledReminder model."""
+    list_display = ('booking', 'kind', 'due_at', 'updated_at')
+    list_filter = ('kind',)
+    raw_id_fields = ('booking',)
+    ordering = ('due_at',)
+
+
+@admin.register(DigestEntry)
+class DigestEntryAdmin(admin.ModelAdmin):
+    """Admin interface for DigestEntry model."""
+    list_display = ('recipient', 'event_type', 'notification_type', 'flush_at', 'flushed_at', 'notification')
+    list_filter = ('event_type', 'notification_type', 'flushed_at')
+    search_fields = ('recipient', 'trainer__business_name')
+    raw_id_fields = ('trainer', 'booking', 'notification')
+    readonly_fields = ('created_at',)
+    ordering = ('-created_at',)
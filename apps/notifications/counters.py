@@ -0,0 +1,185 @@
+"""
+Incrementally maintained notification counters.
+Notification writes feed per-trainer (day, type, status) deltas into
+NotificationCounter, so statistics never have to scan the notifications
+table. rebuild() recomputes counters from scratch in one aggregation pass.
+"""
+from collections import Counter
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import UNKNOWN_STATUS, Notification, NotificationCounter
+
+
+STATUSES = [status for status, _ in Notification.STATUS_CHOICES]
+TYPES = [notification_type for notification_type, _ in Notification.TYPE_CHOICES]
+
+
+def track(notifications):
+    """
+    Count inserts and status changes of notifications that were just written.
+    
+    Each notification remembers the status it was last counted under, so
+    a notification is only ever counted once per status it passes through.
+    """
+    deltas = Counter()
+    for notification in notifications:
+        previous = getattr(notification, '_counted_status', None)
+        if previous is UNKNOWN_STATUS or previous == notification.status:
+            continue
+        
+        key = (
+            notification.trainer_id,
+            timezone.localdate(notification.created_at),
+            notification.notification_type,
+        )
+        if previous is not None:
+            deltas[key + (previous,)] -= 1
+        deltas[key + (notification.status,)] += 1
+        notification._counted_status = notification.status
+    
+    apply(deltas)
+
+
+def track_update(queryset, status):
+    """
+    Prepare counting a queryset.update(status=...).
+    
+    The rows about to move are grouped before the update runs; the returned
+    callable applies the deltas once it has.
+    """
+    moving = queryset.exclude(status=status).annotate(
+        day=TruncDate('created_at')
+    ).values('trainer_id', 'day', 'notification_type', 'status').annotate(
+        moved=Count('id')
+    ).order_by()
+    
+    deltas = Counter()
+    for row in moving:
+        key = (row['trainer_id'], row['day'], row['notification_type'])
+        deltas[key + (row['status'],)] -= row['moved']
+        deltas[key + (status,)] += row['moved']
+    
+    return lambda: apply(deltas)
+
+
+def apply(deltas):
+    """
+    Add deltas to the counter rows, creating rows as needed.
+    
+    Keys are applied in sorted order so concurrent writers lock counter
+    rows in the same order and cannot deadlock.
+    """
+    for (trainer_id, day, notification_type, status), delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        
+        counter = NotificationCounter.objects.filter(
+            trainer_id=trainer_id,
+            day=day,
+            notification_type=notification_type,
+            status=status
+        )
+        if counter.update(count=F('count') + delta):
+            continue
+        
+        try:
+            with transaction.atomic():
+                NotificationCounter.objects.create(
+                    trainer_id=trainer_id,
+                    day=day,
+                    notification_type=notification_type,
+                    status=status,
+                    count=delta
+                )
+        except IntegrityError:
+            # Created concurrently since the update above
+            counter.update(count=F('count') + delta)
+
+
+def rebuild(trainer_ids=None):
+    """
+    Recompute counters from the notifications table.
+    
+    One pass over the notifications, grouped by trainer, day and type with
+    a conditional count per status. Used to backfill and to repair drift
+    (e.g. after rows were deleted directly).
+    
+    Args:
+        trainer_ids: Trainers to rebuild (default: all)
+    
+    Returns:
+        int: Number of counter rows written
+    """
+    notifications = Notification.objects.all()
+    counters = NotificationCounter.objects.all()
+    if trainer_ids is not None:
+        notifications = notifications.filter(trainer_id__in=trainer_ids)
+        counters = counters.filter(trainer_id__in=trainer_ids)
+    
+    rows = notifications.annotate(
+        day=TruncDate('created_at')
+    ).values('trainer_id', 'day', 'notification_type').annotate(**{
+        status: Count('id', filter=Q(status=status)) for status in STATUSES
+    }).order_by()
+    
+    with transaction.atomic():
+        counters.delete()
+        created = NotificationCounter.objects.bulk_create(
+            (
+                NotificationCounter(
+                    trainer_id=row['trainer_id'],
+                    day=row['day'],
+                    notification_type=row['notification_type'],
+                    status=status,
+                    count=row[status]
+                )
+                for row in rows.iterator(chunk_size=2000)
+                for status in STATUSES
+                if row[status]
+            ),
+            batch_size=1000
+        )
+    
+    return len(created)
+
+
+def week_start():
+    """First day of the 7-day window (today and the six days before)."""
+    return timezone.localdate() - timedelta(days=6)
+
+
+def summary(trainer):
+    """
+    Notification totals for a trainer, read from the counters.
+    
+    Falls back to rebuilding the trainer's counters if they have none yet
+    but the trainer has notifications.
+    
+    Returns:
+        dict: total, per status, per type and sent in the last 7 days
+    """
+    counters = NotificationCounter.objects.filter(trainer=trainer)
+    if not counters.exists() and Notification.objects.filter(trainer=trainer).exists():
+        rebuild([trainer.id])
+    
+    totals = counters.aggregate(
+        total=Sum('count'),
+        recent_sent=Sum('count', filter=Q(status='sent', day__gte=week_start())),
+        **{status: Sum('count', filter=Q(status=status)) for status in STATUSES},
+        **{
+            notification_type: Sum('count', filter=Q(notification_type=notification_type))
+            for notification_type in TYPES
+        }
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
+
+def count(**filters):
+    """Sum of the counter rows matching `filters` (NotificationCounter fields)."""
+    return NotificationCounter.objects.filter(**filters).aggregate(
+        total=Sum('count')
+    )['total'] or 0
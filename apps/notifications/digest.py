@@ -0,0 +1,184 @@
+"""
+Notification digests.
+Optional coalescing stage in front of the outbound queue: messages to the
+same recipient from the same trainer are held for NOTIFICATION_DIGEST_WINDOW
+seconds and then delivered as one digest, so a client booking several
+sessions at once gets one email and one SMS instead of one per booking.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DigestEntry, Notification
+from .outbound import enqueue, ensure_capacity
+from .retry import provider_configured
+
+
+# Maximum number of held entries flushed per run
+FLUSH_LIMIT = 5000
+
+
+def submit(notifications, event_type, booking=None, check_capacity=True):
+    """
+    Send notifications, through the digest stage when it is enabled.
+    
+    With NOTIFICATION_DIGEST_WINDOW set to 0 this is outbound.enqueue.
+    
+    Args:
+        notifications: Unsaved Notification instances
+        event_type: Event the messages are about (see DigestEntry.EVENT_CHOICES)
+        booking: Booking the event refers to (optional)
+        check_capacity: Raise OutboundBackpressure if a backlog is full
+    """
+    if not settings.NOTIFICATION_DIGEST_WINDOW:
+        enqueue(notifications, check_capacity=check_capacity)
+        return
+    
+    notifications = [
+        notification for notification in notifications
+        if provider_configured(notification.notification_type)
+    ]
+    if check_capacity:
+        ensure_capacity(notification.notification_type for notification in notifications)
+    
+    hold(notifications, event_type, booking=booking)
+
+
+def hold(notifications, event_type, booking=None):
+    """
+    Hold notifications as digest entries.
+    
+    An entry joins the open window of its (trainer, channel, recipient)
+    group, or opens a new one ending NOTIFICATION_DIGEST_WINDOW seconds from
+    now. Windows are never extended, so a steady stream of events cannot
+    postpone delivery indefinitely.
+    
+    Returns:
+        list: The created DigestEntry instances
+    """
+    from .tasks import flush_due_digests
+    
+    window = settings.NOTIFICATION_DIGEST_WINDOW
+    now = timezone.now()
+    opened = False
+    
+    entries = []
+    for notification in notifications:
+        flush_at = DigestEntry.objects.filter(
+            trainer_id=notification.trainer_id,
+            notification_type=notification.notification_type,
+            recipient=notification.recipient,
+            flushed_at__isnull=True
+        ).order_by('flush_at').values_list('flush_at', flat=True).first()
+        
+        if flush_at is None:
+            flush_at = now + timedelta(seconds=window)
+            opened = True
+        
+        entries.append(DigestEntry(
+            trainer_id=notification.trainer_id,
+            booking=booking,
+            event_type=event_type,
+            notification_type=notification.notification_type,
+            recipient=notification.recipient,
+            subject=notification.subject,
+            message=notification.message,
+            payload=notification.payload,
+            flush_at=flush_at
+        ))
+    
+    DigestEntry.objects.bulk_create(entries)
+    
+    if opened:
+        # The per-minute sweep would catch it too; this keeps delivery close
+        # to the end of the window
+        transaction.on_commit(lambda: flush_due_digests.apply_async(countdown=window))
+    
+    return entries
+
+
+def flush_due():
+    """
+    Deliver every digest whose window has closed.
+    
+    Due entries are locked (skipping rows a concurrent flush holds), merged
+    into one Notification per group and queued for delivery, and linked to
+    the Notification they were delivered in.
+    
+    Returns:
+        int: Number of notifications queued
+    """
+    now = timezone.now()
+    
+    with transaction.atomic():
+        entries = list(
+            DigestEntry.objects.select_for_update(skip_locked=True).filter(
+                flushed_at__isnull=True,
+                flush_at__lte=now
+            ).select_related('trainer').order_by('id')[:FLUSH_LIMIT]
+        )
+        
+        groups = {}
+        for entry in entries:
+            key = (entry.trainer_id, entry.notification_type, entry.recipient)
+            groups.setdefault(key, []).append(entry)
+        
+        digests = [(build_digest(group), group) for group in groups.values()]
+        # Capacity was checked when the entries were submitted
+        queued = enqueue([notification for notification, _ in digests], check_capacity=False)
+        
+        for notification, group in digests:
+            for entry in group:
+                entry.flushed_at = now
+                entry.notification = notification if notification.pk else None
+        DigestEntry.objects.bulk_update(entries, ['flushed_at', 'notification'])
+    
+    return len(queued)
+
+
+def build_digest(entries):
+    """
+    Merge a group of held entries into one unsaved Notification.
+    
+    A group of one is delivered as the original message.
+    """
+    first = entries[0]
+    if len(entries) == 1:
+        return Notification(
+            trainer=first.trainer,
+            notification_type=first.notification_type,
+            recipient=first.recipient,
+            subject=first.subject,
+            message=first.message,
+            payload=first.payload,
+        )
+    
+    trainer_name = first.trainer.business_name
+    
+    if first.notification_type == 'sms':
+        lines = '\n'.join(f'- {entry.message}' for entry in entries)
+        return Notification(
+            trainer=first.trainer,
+            notification_type='sms',
+            recipient=first.recipient,
+            message=f'{len(entries)} updates from {trainer_name}:\n{lines}',
+        )
+    
+    return Notification(
+        trainer=first.trainer,
+        notification_type=first.notification_type,
+        recipient=first.recipient,
+        subject=f'{len(entries)} updates from {trainer_name}',
+        message='\n'.join(entry.message for entry in entries),
+        payload={
+            'template': 'digest',
+            'variables': {
+                'trainer_name': trainer_name,
+                'items': [
+                    {'subject': entry.subject, 'message': entry.message}
+                    for entry in entries
+                ],
+            },
+        },
+    )
@@ -2,23 +2,64 @@
 Email service for sending emails via SendGrid.
 Handles booking confirmations, reminders, and payment receipts.
 """
+import json
+import re
 from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from sendgrid.helpers.mail import Mail, Personalization, Substitution, To
 from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.html import escape, linebreaks
 from .models import Notification
+from .utils import trainer_localtime
+
+
+# SendGrid v3 accepts at most 1000 personalizations per mail/send request
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+
+# Error fields look like "personalizations.3.to.0.email"
+PERSONALIZATION_ERROR_FIELD = re.compile(r'^personalizations\.(\d+)\.')
+
+
+class BatchEmail:
+    """
+    One recipient's message in a batched send.
+    
+    The html_template holds SendGrid substitution tags (-key-) that are
+    filled per recipient from substitutions. Emails sharing the same
+    template are sent together as personalizations of one request, and the
+    outcome is written back onto the notification.
+    """
+    
+    def __init__(self, notification, html_template, substitutions=None):
+        self.notification = notification
+        self.html_template = html_template
+        self.substitutions = substitutions or {}
 
 
 class EmailService:
     """Service for sending emails via SendGrid."""
     
+    # Notification payload template name -> render method
+    TEMPLATE_RENDERERS = {
+        'booking_confirmation': '_render_booking_confirmation_template',
+        'booking_reminder': '_render_booking_reminder_template',
+        'payment_receipt': '_render_payment_receipt_template',
+        'digest': '_render_digest_template',
+        'weekly_report': '_render_weekly_report_template',
+    }
+    
+    # Templates rendered with their real values rather than substitution
+    # tags; every email from them is unique, so there is nothing to batch
+    UNBATCHED_TEMPLATES = {'digest'}
+    
     def __init__(self):
         self.api_key = settings.SENDGRID_API_KEY
+        self.api_host = getattr(settings, 'SENDGRID_API_HOST', 'https://api.sendgrid.com')
         self.from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@trainerhub.com')
         
         if self.api_key:
-            self.client = SendGridAPIClient(self.api_key)
+            self.client = SendGridAPIClient(self.api_key, host=self.api_host)
         else:
             self.client = None
     
@@ -41,16 +82,11 @@ class EmailService:
             trainer = booking.trainer
         
         subject = f'Booking Confirmed with {booking.trainer.business_name}'
+        context = self._booking_confirmation_variables(booking)
+        payload = {'template': 'booking_confirmation', 'variables': context}
         
         # Simple HTML email template
-        html_content = self._render_booking_confirmation_template({
-            'client_name': booking.client.get_full_name(),
-            'trainer_name': booking.trainer.business_name,
-            'date': booking.start_time.date(),
-            'time': booking.start_time.strftime('%I:%M %p'),
-            'duration': booking.duration_minutes,
-            'location': getattr(booking.trainer, 'location', ''),
-        })
+        html_content = self._render_booking_confirmation_template(context)
         
         message = Mail(
             from_email=self.from_email,
@@ -69,6 +105,7 @@ class EmailService:
                 recipient=client_email,
                 subject=subject,
                 message=f'Booking confirmed for {booking.start_time}',
+                payload=payload,
                 status='sent',
                 sent_at=timezone.now()
             )
@@ -82,6 +119,7 @@ class EmailService:
                 recipient=client_email,
                 subject=subject,
                 message=f'Booking confirmed for {booking.start_time}',
+                payload=payload,
                 status='failed',
                 failed_reason=str(e)
             )
@@ -107,15 +145,11 @@ class EmailService:
             trainer = booking.trainer
         
         subject = f'Reminder: Your session in {hours_before} hours'
+        summary = f'Reminder: Booking in {hours_before} hours'
+        context = self._booking_reminder_variables(booking, hours_before)
+        payload = {'template': 'booking_reminder', 'variables': context}
         
-        html_content = self._render_booking_reminder_template({
-            'client_name': booking.client.get_full_name(),
-            'trainer_name': booking.trainer.business_name,
-            'date': booking.start_time.date(),
-            'time': booking.start_time.strftime('%I:%M %p'),
-            'hours_before': hours_before,
-            'location': getattr(booking.trainer, 'location', ''),
-        })
+        html_content = self._render_booking_reminder_template(context)
         
         message = Mail(
             from_email=self.from_email,
@@ -132,7 +166,8 @@ class EmailService:
                 notification_type='email',
                 recipient=client_email,
                 subject=subject,
-                message=f'Reminder: Booking in {hours_before} hours',
+                message=summary,
+                payload=payload,
                 status='sent',
                 sent_at=timezone.now()
             )
@@ -144,12 +179,194 @@ class EmailService:
                 notification_type='email',
                 recipient=client_email,
                 subject=subject,
-                message=f'Reminder: Booking in {hours_before} hours',
+                message=summary,
+                payload=payload,
                 status='failed',
                 failed_reason=str(e)
             )
             return False, str(e)
     
+    def build_booking_reminders(self, bookings, hours_before=24):
+        """
+        Build unsaved reminder email notifications for the outbound queue.
+        
+        Args:
+            bookings: Iterable of Booking instances (client and trainer loaded)
+            hours_before: Hours before booking (default 24)
+        
+        Returns:
+            list: Unsaved pending Notification instances, one per booking
+        """
+        return [
+            Notification(
+                trainer=booking.trainer,
+                notification_type='email',
+                recipient=booking.client.email,
+                subject=f'Reminder: Your session in {hours_before} hours',
+                message=f'Reminder: Booking in {hours_before} hours',
+                payload={
+                    'template': 'booking_reminder',
+                    'variables': self._booking_reminder_variables(booking, hours_before),
+                },
+            )
+            for booking in bookings
+        ]
+    
+    def build_booking_confirmation(self, client_email, booking):
+        """Build an unsaved booking confirmation email notification."""
+        variables = self._booking_confirmation_variables(booking)
+        return Notification(
+            trainer=booking.trainer,
+            notification_type='email',
+            recipient=client_email,
+            subject=f'Booking Confirmed with {booking.trainer.business_name}',
+            message=f"Booking confirmed for {variables['date']} at {variables['time']}",
+            payload={'template': 'booking_confirmation', 'variables': variables},
+        )
+    
+    def build_payment_receipt(self, trainer_email, payment, trainer):
+        """Build an unsaved payment receipt email notification."""
+        return Notification(
+            trainer=trainer,
+            notification_type='email',
+            recipient=trainer_email,
+            subject=f'Payment Receipt - ${payment.amount}',
+            message=f'Payment receipt for ${payment.amount}',
+            payload={
+                'template': 'payment_receipt',
+                'variables': self._payment_receipt_variables(payment, trainer),
+            },
+        )
+    
+    def batch_email(self, notification):
+        """
+        Build a BatchEmail that replays a notification from its payload.
+        
+        Non-empty variables become -key- substitution tags, so notifications
+        rendered from the same template (and the same set of empty optional
+        fields) share one html_template and can go out in one request.
+        
+        Args:
+            notification: Notification with a payload
+                ({'template': name, 'variables': {...}})
+        
+        Returns:
+            BatchEmail
+        """
+        template = notification.payload.get('template')
+        variables = notification.payload.get('variables', {})
+        
+        if template == 'custom':
+            html_content = variables.get('html_content') or f"<p>{notification.message}</p>"
+            return BatchEmail(notification, html_content)
+        
+        renderer = getattr(self, self.TEMPLATE_RENDERERS[template])
+        if template in self.UNBATCHED_TEMPLATES:
+            return BatchEmail(notification, renderer(variables))
+        
+        placeholders = {
+            key: f'-{key}-' if value not in ('', None) else value
+            for key, value in variables.items()
+        }
+        substitutions = {
+            key: value
+            for key, value in variables.items()
+            if value not in ('', None)
+        }
+        return BatchEmail(notification, renderer(placeholders), substitutions)
+    
+    @staticmethod
+    def batch_requests(emails):
+        """
+        Split emails into mail/send requests.
+        
+        Yields:
+            tuple: (html_template, emails) with at most
+                SENDGRID_MAX_PERSONALIZATIONS emails sharing the template
+        """
+        groups = {}
+        for email in emails:
+            groups.setdefault(email.html_template, []).append(email)
+        
+        for html_template, group in groups.items():
+            for offset in range(0, len(group), SENDGRID_MAX_PERSONALIZATIONS):
+                yield html_template, group[offset:offset + SENDGRID_MAX_PERSONALIZATIONS]
+    
+    def send_request(self, html_template, emails, retry_accepted=True):
+        """
+        Send one multi-personalization request and record the outcome.
+        
+        SendGrid accepts or rejects a request as a whole. When it rejects
+        specific personalizations (HTTP 400 with personalizations.N error
+        fields), only those recipients are marked failed and the rest are
+        resent once. A 429 leaves every notification pending so the
+        outbound queue can try the request again later.
+        """
+        message = Mail(from_email=self.from_email, html_content=html_template)
+        for index, email in enumerate(emails):
+            personalization = Personalization()
+            personalization.add_to(To(email.notification.recipient))
+            personalization.subject = email.notification.subject
+            for key, value in email.substitutions.items():
+                personalization.add_substitution(Substitution(f'-{key}-', str(value)))
+            # add_personalization prepends by default; keep request order so
+            # error indexes map back to emails
+            message.add_personalization(personalization, index=index)
+        
+        try:
+            self.client.send(message)
+        except Exception as e:
+            if getattr(e, 'status_code', None) == 429:
+                for email in emails:
+                    email.notification.status = 'pending'
+                    email.notification.failed_reason = 'Rate limited by SendGrid'
+                return
+            
+            rejected = self._rejected_personalizations(e)
+            if rejected and retry_accepted:
+                accepted = []
+                for index, email in enumerate(emails):
+                    if index in rejected:
+                        self._mark_failed(email.notification, rejected[index])
+                    else:
+                        accepted.append(email)
+                if accepted:
+                    self.send_request(html_template, accepted, retry_accepted=False)
+            else:
+                for email in emails:
+                    self._mark_failed(email.notification, str(e))
+            return
+        
+        sent_at = timezone.now()
+        for email in emails:
+            email.notification.status = 'sent'
+            email.notification.sent_at = sent_at
+            email.notification.failed_reason = ''
+    
+    @staticmethod
+    def _rejected_personalizations(error):
+        """Map personalization index -> error message from a SendGrid 400."""
+        if getattr(error, 'status_code', None) != 400:
+            return {}
+        
+        try:
+            errors = json.loads(error.body).get('errors', [])
+        except (TypeError, ValueError, AttributeError):
+            return {}
+        
+        rejected = {}
+        for item in errors:
+            match = PERSONALIZATION_ERROR_FIELD.match(item.get('field') or '')
+            if match:
+                rejected[int(match.group(1))] = item.get('message', 'Rejected by SendGrid')
+        return rejected
+    
+    @staticmethod
+    def _mark_failed(notification, reason):
+        notification.status = 'failed'
+        notification.sent_at = None
+        notification.failed_reason = reason
+    
     def send_payment_receipt(self, trainer_email, payment, trainer=None):
         """
         Send payment receipt email.
@@ -169,14 +386,10 @@ class EmailService:
             trainer = payment.subscription.trainer
         
         subject = f'Payment Receipt - ${payment.amount}'
+        context = self._payment_receipt_variables(payment, trainer)
+        payload = {'template': 'payment_receipt', 'variables': context}
         
-        html_content = self._render_payment_receipt_template({
-            'trainer_name': trainer.business_name,
-            'amount': payment.amount,
-            'currency': payment.currency,
-            'transaction_id': payment.paddle_transaction_id,
-            'date': payment.created_at.date(),
-        })
+        html_content = self._render_payment_receipt_template(context)
         
         message = Mail(
             from_email=self.from_email,
@@ -194,6 +407,7 @@ class EmailService:
                 recipient=trainer_email,
                 subject=subject,
                 message=f'Payment receipt for ${payment.amount}',
+                payload=payload,
                 status='sent',
                 sent_at=timezone.now()
             )
@@ -206,6 +420,7 @@ class EmailService:
                 recipient=trainer_email,
                 subject=subject,
                 message=f'Payment receipt for ${payment.amount}',
+                payload=payload,
                 status='failed',
                 failed_reason=str(e)
             )
@@ -228,6 +443,12 @@ class EmailService:
         if not self.client:
             return False, "SendGrid API key not configured"
         
+        # Only custom HTML needs storing; the default is rebuilt from message
+        payload = {
+            'template': 'custom',
+            'variables': {'html_content': html_content} if html_content else {},
+        }
+        
         if not html_content:
             html_content = f"<p>{message_text}</p>"
         
@@ -247,6 +468,7 @@ class EmailService:
                 recipient=recipient,
                 subject=subject,
                 message=message_text,
+                payload=payload,
                 status='sent',
                 sent_at=timezone.now()
             )
@@ -259,11 +481,46 @@ class EmailService:
                 recipient=recipient,
                 subject=subject,
                 message=message_text,
+                payload=payload,
                 status='failed',
                 failed_reason=str(e)
             )
             return False, str(e)
     
+    def _booking_confirmation_variables(self, booking):
+        """Template variables for a booking confirmation (JSON-serializable)."""
+        start_time = trainer_localtime(booking.start_time, booking.trainer)
+        return {
+            'client_name': booking.client.get_full_name(),
+            'trainer_name': booking.trainer.business_name,
+            'date': str(start_time.date()),
+            'time': start_time.strftime('%I:%M %p'),
+            'duration': booking.duration_minutes,
+            'location': getattr(booking.trainer, 'location', ''),
+        }
+    
+    def _payment_receipt_variables(self, payment, trainer):
+        """Template variables for a payment receipt (JSON-serializable)."""
+        return {
+            'trainer_name': trainer.business_name,
+            'amount': str(payment.amount),
+            'currency': payment.currency,
+            'transaction_id': payment.paddle_transaction_id,
+            'date': str(payment.created_at.date()),
+        }
+    
+    def _booking_reminder_variables(self, booking, hours_before):
+        """Template variables for a booking reminder (JSON-serializable)."""
+        start_time = trainer_localtime(booking.start_time, booking.trainer)
+        return {
+            'client_name': booking.client.get_full_name(),
+            'trainer_name': booking.trainer.business_name,
+            'date': str(start_time.date()),
+            'time': start_time.strftime('%I:%M %p'),
+            'hours_before': hours_before,
+            'location': getattr(booking.trainer, 'location', ''),
+        }
+    
     @staticmethod
     def _render_booking_confirmation_template(context):
         """Render booking confirmation email template."""
@@ -309,6 +566,52 @@ class EmailService:
         </html>
         """
     
+    @staticmethod
+    def _render_digest_template(context):
+        """Render a digest of several messages as one email."""
+        items = ''.join(
+            f"<li style=\"margin-bottom: 15px;\"><strong>{escape(item['subject'])}</strong>"
+            f"{linebreaks(item['message'], autoescape=True)}</li>"
+            for item in context['items']
+        )
+        return f"""
+        <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h2 style="color: #4CAF50;">Updates from {escape(context['trainer_name'])}</h2>
+                <p>Here is a summary of your recent updates:</p>
+                <ul style="background-color: #f5f5f5; padding: 15px 15px 15px 35px; border-radius: 5px; margin: 20px 0;">
+                    {items}
+                </ul>
+                <p>Best regards,<br>{escape(context['trainer_name'])}</p>
+            </div>
+        </body>
+        </html>
+        """
+    
+    @staticmethod
+    def _render_weekly_report_template(context):
+        """Render a trainer's weekly report email template."""
+        return f"""
+        <html>
+        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                <h2 style="color: #4CAF50;">Your Week at a Glance</h2>
+                <p>Hi {context['trainer_name']},</p>
+                <p>Here is how your business did from {context['week_start']} to {context['week_end']}.</p>
+                <div style="background-color: #f5f5f5; padding: 15px; border-radius: 5px; margin: 20px 0;">
+                    <p><strong>Bookings:</strong> {context['bookings']} ({context['completed']} completed, {context['cancelled']} cancelled, {context['no_shows']} no-shows)</p>
+                    <p><strong>Revenue:</strong> ${context['revenue']} from {context['payments']} payments</p>
+                    <p><strong>New clients:</strong> {context['new_clients']} ({context['active_clients']} active in total)</p>
+                    <p><strong>Packages:</strong> {context['packages_sold']} sold, {context['active_packages']} active with {context['sessions_remaining']} sessions remaining</p>
+                    <p><strong>Coming up:</strong> {context['upcoming']} bookings next week</p>
+                </div>
+                <p>Best regards,<br>TrainerHub</p>
+            </div>
+        </body>
+        </html>
+        """
+    
     @staticmethod
     def _render_payment_receipt_template(context):
         """Render payment receipt email template."""
@@ -0,0 +1,27 @@
+"""
+Management command to rebuild notification counters from the notifications table
+"""
+from django.core.management.base import BaseCommand
+from apps.notifications.counters import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute notification counters (all trainers, or those given with --trainer)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trainer',
+            type=int,
+            action='append',
+            dest='trainer_ids',
+            help='Trainer ID to rebuild (repeatable)'
+        )
+    
+    def handle(self, *args, **options):
+        trainer_ids = options['trainer_ids']
+        scope = f"trainers {', '.join(map(str, trainer_ids))}" if trainer_ids else 'all trainers'
+        self.stdout.write(f'Rebuilding notification counters for {scope}...')
+        
+        rows = rebuild(trainer_ids)
+        
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} counter rows'))
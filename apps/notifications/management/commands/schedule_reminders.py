@@ -0,0 +1,26 @@
+"""
+Management command to backfill reminder schedules for upcoming bookings
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.bookings.models import Booking
+from apps.notifications.scheduling import REMINDABLE_STATUSES, schedule_reminders
+
+
+class Command(BaseCommand):
+    help = 'Schedule reminders for all upcoming bookings (run once after deploying reminder scheduling)'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Scheduling reminders for upcoming bookings...')
+        
+        bookings = Booking.objects.filter(
+            start_time__gt=timezone.now(),
+            status__in=REMINDABLE_STATUSES
+        ).order_by('id').only('id', 'start_time', 'status')
+        
+        count = 0
+        for booking in bookings.iterator(chunk_size=1000):
+            schedule_reminders(booking)
+            count += 1
+        
+        self.stdout.write(self.style.SUCCESS(f'Scheduled reminders for {count} bookings'))
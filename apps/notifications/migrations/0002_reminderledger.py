@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_booking_service_and_more'),
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('24h', '24 hours before'), ('1h', '1 hour before')], max_length=10)),
+                ('claim_token', models.UUIDField()),
+                ('claimed_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminder_ledger', to='bookings.booking')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['claim_token'], name='notificatio_claim_t_f89e2c_idx')],
+                'unique_together': {('booking', 'kind')},
+            },
+        ),
+    ]
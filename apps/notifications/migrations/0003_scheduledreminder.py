@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_booking_service_and_more'),
+        ('notifications', '0002_reminderledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('24h', '24 hours before'), ('1h', '1 hour before')], max_length=10)),
+                ('due_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scheduled_reminders', to='bookings.booking')),
+            ],
+            options={
+                'ordering': ['due_at'],
+                'indexes': [models.Index(fields=['due_at'], name='notificatio_due_at_c74d30_idx')],
+                'unique_together': {('booking', 'kind')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_booking_service_and_more'),
+        ('notifications', '0004_notification_retry'),
+        ('trainers', '0003_paymentlinks'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='DigestEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('booking_confirmation', 'Booking Confirmation'), ('workflow', 'Workflow Action')], max_length=30)),
+                ('notification_type', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS'), ('push', 'Push')], max_length=20)),
+                ('recipient', models.CharField(max_length=255)),
+                ('subject', models.CharField(blank=True, max_length=255)),
+                ('message', models.TextField()),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('flush_at', models.DateTimeField()),
+                ('flushed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='digest_entries', to='bookings.booking')),
+                ('notification', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='digest_entries', to='notifications.notification')),
+                ('trainer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='digest_entries', to='trainers.trainer')),
+            ],
+            options={
+                'verbose_name_plural': 'Digest entries',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['flushed_at', 'flush_at'], name='notificatio_flushed_e74a93_idx'), models.Index(fields=['recipient', 'flushed_at'], name='notificatio_recipie_1e0da2_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.0.1 on 2026-10-19 06:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def backfill_counters(apps, schema_editor):
+    """Count existing notifications (same aggregation as counters.rebuild)."""
+    Notification = apps.get_model('notifications', 'Notification')
+    NotificationCounter = apps.get_model('notifications', 'NotificationCounter')
+    statuses = ['pending', 'sent', 'failed']
+    
+    rows = Notification.objects.annotate(
+        day=TruncDate('created_at')
+    ).values('trainer_id', 'day', 'notification_type').annotate(**{
+        status: Count('id', filter=Q(status=status)) for status in statuses
+    }).order_by()
+    
+    NotificationCounter.objects.bulk_create(
+        (
+            NotificationCounter(
+                trainer_id=row['trainer_id'],
+                day=row['day'],
+                notification_type=row['notification_type'],
+                status=status,
+                count=row[status]
+            )
+            for row in rows.iterator(chunk_size=2000)
+            for status in statuses
+            if row[status]
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_digestentry'),
+        ('trainers', '0003_paymentlinks'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('notification_type', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS'), ('push', 'Push')], max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('trainer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_counters', to='trainers.trainer')),
+            ],
+            options={
+                'ordering': ['-day'],
+                'unique_together': {('trainer', 'day', 'notification_type', 'status')},
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
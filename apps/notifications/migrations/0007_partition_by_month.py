@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from apps.core.partitioning import PartitionByMonth
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_notificationcounter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='digestentry',
+            name='notification',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='digest_entries', to='notifications.notification'),
+        ),
+        PartitionByMonth('notification', 'created_at'),
+    ]
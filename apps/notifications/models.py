@@ -1,7 +1,70 @@
-from django.db import models
+from django.db import models, transaction
 from apps.trainers.models import Trainer
 
 
+# Marks a loaded notification whose status was deferred, so its counted
+# status is not known
+UNKNOWN_STATUS = object()
+
+
+class NotificationQuerySet(models.QuerySet):
+    """
+    Notification queries that keep NotificationCounter in step.
+    
+    Inserts and status changes made through bulk_create, bulk_update and
+    update(status='...') are counted in the same transaction as the write.
+    """
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        from .counters import track
+        
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            track(objs)
+        return objs
+    
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        from .counters import track
+        
+        with transaction.atomic(using=self.db):
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+            if 'status' in fields:
+                track(objs)
+        return rows
+    
+    def update(self, **kwargs):
+        from .counters import track_update
+        
+        # Expressions (e.g. the Case that bulk_update, which counts its own
+        # changes, passes in) are not counted
+        if not isinstance(kwargs.get('status'), str):
+            return super().update(**kwargs)
+        
+        with transaction.atomic(using=self.db):
+            moved = track_update(self, kwargs['status'])
+            rows = super().update(**kwargs)
+            moved()
+        return rows
+    
+    def with_count(self, count):
+        """
+        Copy of this queryset whose count() returns `count` without a query.
+        
+        Lets paginators use a count read from NotificationCounter. Only this
+        copy is affected; further filtering gives a queryset that counts
+        normally.
+        """
+        clone = self._chain()
+        clone._known_count = count
+        return clone
+    
+    def count(self):
+        known = getattr(self, '_known_count', None)
+        if known is not None:
+            return known
+        return super().count()
+
+
 class Notification(models.Model):
     """Log of all sent notifications."""
     
@@ -25,19 +88,49 @@ class Notification(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     sent_at = models.DateTimeField(null=True, blank=True)
     failed_reason = models.TextField(blank=True)
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Replay data: {'template': name, 'variables': {...}}"
+    )
+    attempts = models.PositiveIntegerField(default=1)
+    next_retry_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = NotificationQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['trainer', 'status']),
             models.Index(fields=['created_at']),
             models.Index(fields=['notification_type', 'status']),
+            models.Index(fields=['status', 'next_retry_at']),
         ]
     
     def __str__(self):
         return f"{self.notification_type} to {self.recipient} ({self.status})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._counted_status = instance.__dict__.get('status', UNKNOWN_STATUS)
+        return instance
+    
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._counted_status = self.__dict__.get('status', UNKNOWN_STATUS)
+    
+    def save(self, *args, **kwargs):
+        """Save, counting the insert or status change in NotificationCounter."""
+        from .counters import track
+        
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or 'status' in update_fields:
+                track([self])
+    
     def mark_sent(self):
         """Mark notification as sent."""
         from django.utils import timezone
@@ -51,3 +144,169 @@ class Notification(models.Model):
         self.failed_reason = reason
         self.save()
 
+
+
+class NotificationCounter(models.Model):
+    """
+    Number of a trainer's notifications per day, type and status.
+    
+    Maintained incrementally as notifications are created and change
+    status (see NotificationQuerySet), so statistics read a few counter
+    rows instead of scanning the notification history. Days are creation
+    days. counters.rebuild() recomputes them from the notifications.
+    """
+    
+    trainer = models.ForeignKey(Trainer, on_delete=models.CASCADE, related_name='notification_counters')
+    day = models.DateField()
+    notification_type = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES)
+    status = models.CharField(max_length=20, choices=Notification.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['trainer', 'day', 'notification_type', 'status']
+        ordering = ['-day']
+    
+    def __str__(self):
+        return f"{self.day} {self.notification_type}/{self.status}: {self.count}"
+
+
+class ReminderLedger(models.Model):
+    """
+    Ledger of booking reminders claimed for sending.
+    
+    One row per (booking, kind), enforced by the database. Overlapping
+    reminder runs claim bookings by inserting rows; whichever run inserts
+    first owns the send, so a reminder is never sent twice.
+    """
+    
+    KIND_CHOICES = [
+        ('24h', '24 hours before'),
+        ('1h', '1 hour before'),
+    ]
+    
+    booking = models.ForeignKey('bookings.Booking', on_delete=models.CASCADE, related_name='reminder_ledger')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    claim_token = models.UUIDField()
+    claimed_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['booking', 'kind']
+        indexes = [
+            models.Index(fields=['claim_token']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} reminder for booking {self.booking_id}"
+    
+    @staticmethod
+    def kind_for(hours_before):
+        """Ledger kind for a reminder sent hours_before the booking."""
+        return f'{hours_before}h'
+    
+    @classmethod
+    def claim(cls, booking_ids, kind):
+        """
+        Atomically claim reminders for a set of bookings.
+        
+        Rows are inserted in one statement with conflicts ignored, then read
+        back by this call's claim token, so concurrent runs each get a
+        disjoint set.
+        
+        Args:
+            booking_ids: IDs of bookings about to be reminded
+            kind: Reminder kind (see KIND_CHOICES)
+        
+        Returns:
+            set: IDs of the bookings this call now owns
+        """
+        import uuid
+        
+        token = uuid.uuid4()
+        cls.objects.bulk_create(
+            [cls(booking_id=booking_id, kind=kind, claim_token=token) for booking_id in booking_ids],
+            ignore_conflicts=True
+        )
+        return set(
+            cls.objects.filter(claim_token=token).values_list('booking_id', flat=True)
+        )
+
+
+class ScheduledReminder(models.Model):
+    """
+    Reminder waiting to be sent, indexed by due time.
+    
+    Entries are written when a booking is created, confirmed or
+    rescheduled, moved when its start time changes and removed when it is
+    cancelled. The reminder ticker pops entries whose due_at has passed,
+    so reminder cost scales with due reminders rather than total bookings.
+    """
+    
+    booking = models.ForeignKey('bookings.Booking', on_delete=models.CASCADE, related_name='scheduled_reminders')
+    kind = models.CharField(max_length=10, choices=ReminderLedger.KIND_CHOICES)
+    due_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['due_at']
+        unique_together = ['booking', 'kind']
+        indexes = [
+            models.Index(fields=['due_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} reminder for booking {self.booking_id} due {self.due_at}"
+
+
+class DigestEntry(models.Model):
+    """
+    Message held back for coalescing into a digest.
+    
+    Messages to the same recipient from the same trainer are held until
+    the first one's flush_at, then merged into a single Notification.
+    Entries stay linked to the Notification that delivered them, as the
+    record of the events a digest was made of.
+    """
+    
+    EVENT_CHOICES = [
+        ('booking_confirmation', 'Booking Confirmation'),
+        ('workflow', 'Workflow Action'),
+    ]
+    
+    trainer = models.ForeignKey(Trainer, on_delete=models.CASCADE, related_name='digest_entries')
+    booking = models.ForeignKey(
+        'bookings.Booking',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='digest_entries'
+    )
+    event_type = models.CharField(max_length=30, choices=EVENT_CHOICES)
+    notification_type = models.CharField(max_length=20, choices=Notification.TYPE_CHOICES)
+    recipient = models.CharField(max_length=255)
+    subject = models.CharField(max_length=255, blank=True)
+    message = models.TextField()
+    payload = models.JSONField(default=dict, blank=True)
+    flush_at = models.DateTimeField()
+    flushed_at = models.DateTimeField(null=True, blank=True)
+    # No database constraint: notifications are partitioned by month on
+    # PostgreSQL (apps.core.partitioning) and old months are dropped
+    notification = models.ForeignKey(
+        Notification,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        db_constraint=False,
+        related_name='digest_entries'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        verbose_name_plural = 'Digest entries'
+        indexes = [
+            models.Index(fields=['flushed_at', 'flush_at']),
+            models.Index(fields=['recipient', 'flushed_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} {self.notification_type} to {self.recipient}"
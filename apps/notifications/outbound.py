@@ -0,0 +1,318 @@
+"""
+Rate-limited outbound message queue.
+Producers enqueue pending Notification rows and deliver_notifications
+workers send them through token buckets (per provider and per sender
+number) shared via Redis, so throughput stays at the provider ceiling
+instead of bursting into 429s.
+"""
+import math
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification
+from .email_service import email_service
+from .sms_service import sms_service
+from .retry import RETRY_FIELDS, backoff_delay, provider_configured
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis is a hard dependency in production
+    redis = None
+
+
+# Prefix of the Redis keys holding bucket state
+BUCKET_KEY_PREFIX = 'trainerhubb:outbound:bucket:'
+
+# Waits up to this many seconds are slept through inside the worker;
+# longer ones hand the rest of the batch back to the queue
+MAX_INLINE_WAIT = 1.0
+
+# How often to try Redis again after it was found unreachable
+REDIS_RETRY_INTERVAL = 30
+
+# Refill and take tokens atomically. Returns the wait in seconds before the
+# request could be granted ("0" when it was). Time comes from the Redis
+# server so every worker agrees on it.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+_redis_client = None
+_redis_checked_at = None
+_local_buckets = {}
+_local_lock = threading.Lock()
+
+
+class OutboundBackpressure(Exception):
+    """Raised to producers while a provider's outbound backlog is full."""
+    
+    def __init__(self, provider, backlog, retry_after):
+        self.provider = provider
+        self.backlog = backlog
+        self.retry_after = retry_after
+        super().__init__(
+            f'{provider} outbound backlog is full ({backlog} pending); '
+            f'retry in {retry_after}s'
+        )
+
+
+def get_redis():
+    """
+    Shared Redis client for bucket state, or None if Redis is unreachable.
+    
+    A failed connection is only retried every REDIS_RETRY_INTERVAL seconds,
+    so an outage costs one connect timeout rather than one per message.
+    """
+    global _redis_client, _redis_checked_at
+    
+    if _redis_client is not None or redis is None:
+        return _redis_client
+    
+    now = time.monotonic()
+    if _redis_checked_at is not None and now - _redis_checked_at < REDIS_RETRY_INTERVAL:
+        return None
+    
+    _redis_checked_at = now
+    try:
+        client = redis.from_url(settings.REDIS_URL, socket_connect_timeout=1, socket_timeout=1)
+        client.ping()
+        _redis_client = client
+    except redis.RedisError:
+        pass
+    return _redis_client
+
+
+def _drop_redis():
+    global _redis_client, _redis_checked_at
+    _redis_client = None
+    _redis_checked_at = time.monotonic()
+
+
+class TokenBucket:
+    """
+    Token bucket holding up to `burst` tokens, refilled at `rate` per second.
+    
+    State lives in Redis so every worker draws from the same bucket. When
+    Redis is unavailable the bucket falls back to process-local state,
+    which still smooths bursts but no longer caps the fleet as a whole.
+    """
+    
+    def __init__(self, name, rate, burst):
+        self.key = f'{BUCKET_KEY_PREFIX}{name}'
+        self.rate = float(rate)
+        self.burst = float(burst)
+    
+    def take(self, tokens=1):
+        """
+        Take tokens if available.
+        
+        Returns:
+            float: 0 if granted, else seconds until they would be
+        """
+        tokens = min(tokens, self.burst)
+        client = get_redis()
+        if client is not None:
+            try:
+                return float(client.eval(TOKEN_BUCKET_SCRIPT, 1, self.key, self.rate, self.burst, tokens))
+            except redis.RedisError as e:
+                print(f"Token bucket falling back to local state: {str(e)}")
+                _drop_redis()
+        return self._take_local(tokens)
+    
+    def _take_local(self, tokens):
+        now = time.monotonic()
+        with _local_lock:
+            available, updated = _local_buckets.get(self.key, (self.burst, now))
+            available = min(self.burst, available + (now - updated) * self.rate)
+            wait = 0.0
+            if available >= tokens:
+                available -= tokens
+            else:
+                wait = (tokens - available) / self.rate
+            _local_buckets[self.key] = (available, now)
+        return wait
+
+
+def bucket(name, key=None):
+    """TokenBucket configured from NOTIFICATION_RATE_LIMITS[name]."""
+    limits = settings.NOTIFICATION_RATE_LIMITS[name]
+    return TokenBucket(f'{name}:{key}' if key else name, limits['rate'], limits['burst'])
+
+
+def acquire(token_bucket):
+    """
+    Take one token, sleeping through short waits.
+    
+    Returns:
+        float: 0 once the token is taken, else the (long) wait to defer by
+    """
+    wait = token_bucket.take()
+    for _ in range(3):
+        if not 0 < wait <= MAX_INLINE_WAIT:
+            break
+        time.sleep(wait)
+        wait = token_bucket.take()
+    return wait
+
+
+def backlog(provider):
+    """Number of notifications waiting in the outbound queue for a provider."""
+    since = timezone.now() - timedelta(hours=settings.NOTIFICATION_RETRY_WINDOW_HOURS)
+    return Notification.objects.filter(
+        notification_type=provider,
+        status='pending',
+        created_at__gte=since
+    ).count()
+
+
+def ensure_capacity(providers):
+    """
+    Apply backpressure before producing messages.
+    
+    Raises:
+        OutboundBackpressure: if any provider's backlog has reached
+            NOTIFICATION_OUTBOUND_MAX_PENDING
+    """
+    for provider in set(providers):
+        pending = backlog(provider)
+        if pending >= settings.NOTIFICATION_OUTBOUND_MAX_PENDING:
+            raise OutboundBackpressure(
+                provider, pending, settings.NOTIFICATION_OUTBOUND_BACKOFF
+            )
+
+
+def enqueue(notifications, check_capacity=True):
+    """
+    Queue notifications for rate-limited delivery.
+    
+    Notifications for providers without credentials are dropped (the
+    direct send methods never logged those either). The rest are written
+    pending with one bulk_create, and deliver_notifications tasks are
+    dispatched once the surrounding transaction commits.
+    
+    Args:
+        notifications: Unsaved Notification instances
+        check_capacity: Raise OutboundBackpressure if a backlog is full
+    
+    Returns:
+        list: The notifications that were queued
+    """
+    from .tasks import deliver_notifications
+    
+    notifications = [
+        notification for notification in notifications
+        if provider_configured(notification.notification_type)
+    ]
+    if check_capacity:
+        ensure_capacity(notification.notification_type for notification in notifications)
+    
+    for notification in notifications:
+        notification.status = 'pending'
+    Notification.objects.bulk_create(notifications)
+    
+    dispatch(
+        [notification.id for notification in notifications],
+        deliver_notifications.delay
+    )
+    return notifications
+
+
+def dispatch(notification_ids, send):
+    """Hand notification IDs to `send` in batches once the transaction commits."""
+    batch_size = settings.NOTIFICATION_OUTBOUND_BATCH_SIZE
+    for offset in range(0, len(notification_ids), batch_size):
+        batch = notification_ids[offset:offset + batch_size]
+        transaction.on_commit(lambda batch=batch: send(batch))
+
+
+def deliver(notification_ids):
+    """
+    Send pending notifications within the rate limits.
+    
+    Email goes out one SendGrid request (up to 1000 recipients sharing a
+    template) per token; SMS needs a token from both the account bucket
+    and the sender number's bucket. Once a bucket runs dry, or a provider
+    answers 429, the remaining notifications stay pending and are returned
+    for a delayed redelivery. Failures get their next retry scheduled with
+    the retry engine's backoff.
+    
+    Args:
+        notification_ids: IDs of notifications to deliver
+    
+    Returns:
+        tuple: (delivered count, IDs still pending, seconds to wait)
+    """
+    notifications = list(
+        Notification.objects.filter(id__in=notification_ids, status='pending')
+    )
+    
+    deferred = []
+    wait = 0
+    attempted = []
+    
+    emails = [n for n in notifications if n.notification_type == 'email']
+    if emails and email_service.client:
+        batches = list(email_service.batch_requests(
+            [email_service.batch_email(notification) for notification in emails]
+        ))
+        for index, (html_template, batch) in enumerate(batches):
+            wait = acquire(bucket('email'))
+            if wait:
+                deferred.extend(
+                    email.notification for _, rest in batches[index:] for email in rest
+                )
+                break
+            email_service.send_request(html_template, batch)
+            attempted.extend(email.notification for email in batch)
+    
+    messages = [n for n in notifications if n.notification_type == 'sms']
+    if messages and sms_service.client and sms_service.from_number:
+        sender = bucket('sms_sender', sms_service.from_number)
+        account = bucket('sms')
+        for index, notification in enumerate(messages):
+            sms_wait = acquire(sender) or acquire(account)
+            if sms_wait:
+                wait = max(wait, sms_wait)
+                deferred.extend(messages[index:])
+                break
+            sms_service.deliver(notification)
+            attempted.append(notification)
+    
+    now = timezone.now()
+    delivered = 0
+    for notification in attempted:
+        if notification.status == 'sent':
+            notification.next_retry_at = None
+            delivered += 1
+        elif notification.status == 'pending':
+            # Throttled by the provider despite the buckets
+            wait = max(wait, settings.NOTIFICATION_OUTBOUND_BACKOFF)
+            deferred.append(notification)
+        elif notification.attempts < settings.NOTIFICATION_RETRY_MAX_ATTEMPTS:
+            notification.next_retry_at = now + backoff_delay(
+                notification.notification_type, notification.attempts
+            )
+    
+    Notification.objects.bulk_update(attempted, RETRY_FIELDS)
+    return delivered, [notification.id for notification in deferred], math.ceil(wait)
@@ -0,0 +1,96 @@
+"""
+Retry engine for failed notifications.
+Claims failed notifications in per-provider batches and puts them back on
+the outbound queue, which replays them from their stored payloads; capped
+exponential backoff with jitter spaces out the attempts.
+"""
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Notification
+from .email_service import email_service
+from .sms_service import sms_service
+
+
+# Providers the engine can replay, keyed by notification_type
+RETRY_PROVIDERS = ('email', 'sms')
+
+# Fields written back after a retry batch
+RETRY_FIELDS = ['status', 'sent_at', 'failed_reason', 'attempts', 'next_retry_at']
+
+# How long a claimed batch is hidden from other retry runs
+RETRY_LEASE = timedelta(minutes=10)
+
+
+def backoff_delay(provider, attempts):
+    """
+    Delay before the next attempt, after `attempts` attempts so far.
+    
+    Exponential in attempts and capped at the provider's max_delay, with
+    "equal jitter": half the delay is fixed and half is random, so retries
+    spread out without ever collapsing to zero.
+    """
+    policy = settings.NOTIFICATION_RETRY_POLICY[provider]
+    ceiling = min(policy['max_delay'], policy['base_delay'] * 2 ** (attempts - 1))
+    return timedelta(seconds=ceiling / 2 + random.uniform(0, ceiling / 2))
+
+
+def retryable(provider, now):
+    """Queryset of failed notifications due for another attempt."""
+    queryset = Notification.objects.filter(
+        Q(next_retry_at__isnull=True) | Q(next_retry_at__lte=now),
+        notification_type=provider,
+        status='failed',
+        attempts__lt=settings.NOTIFICATION_RETRY_MAX_ATTEMPTS,
+        created_at__gte=now - timedelta(hours=settings.NOTIFICATION_RETRY_WINDOW_HOURS),
+    )
+    if provider == 'email':
+        # Emails can only be replayed from a stored template payload
+        queryset = queryset.filter(payload__has_key='template')
+    return queryset
+
+
+def claim_batch(provider, limit):
+    """
+    Lock and lease a batch of retryable notifications.
+    
+    Rows locked by a concurrent run are skipped, and claimed rows get
+    next_retry_at pushed out by RETRY_LEASE, so two runs never resend
+    the same notification.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            retryable(provider, now).select_for_update(skip_locked=True)
+            .order_by('id').values_list('id', flat=True)[:limit]
+        )
+        Notification.objects.filter(id__in=ids).update(next_retry_at=now + RETRY_LEASE)
+    
+    return list(Notification.objects.filter(id__in=ids).select_related('trainer'))
+
+
+def requeue_batch(notifications):
+    """
+    Put claimed notifications back on the outbound queue as a new attempt.
+    
+    Returns:
+        list: IDs of the requeued notifications, for deliver_notifications
+    """
+    for notification in notifications:
+        notification.status = 'pending'
+        notification.attempts += 1
+        notification.next_retry_at = None
+    
+    Notification.objects.bulk_update(notifications, RETRY_FIELDS)
+    return [notification.id for notification in notifications]
+
+
+def provider_configured(provider):
+    """Retries are pointless (and would burn attempts) without credentials."""
+    if provider == 'email':
+        return email_service.client is not None
+    return sms_service.client is not None and bool(sms_service.from_number)
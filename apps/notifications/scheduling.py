@@ -0,0 +1,76 @@
+"""
+Per-booking reminder scheduling.
+Keeps ScheduledReminder entries in step with bookings so the reminder
+ticker only ever looks at reminders that are actually due.
+"""
+from datetime import timedelta
+from django.utils import timezone
+
+from .models import ReminderLedger, ScheduledReminder
+
+
+# Bookings that should still receive reminders
+REMINDABLE_STATUSES = ['pending', 'confirmed']
+
+# Hours before the session each reminder goes out
+REMINDER_HOURS = (24, 1)
+
+# Channels per reminder, in send order (SMS first when it is urgent)
+REMINDER_CHANNELS = {
+    24: ('email', 'sms'),
+    1: ('sms', 'email'),
+}
+
+
+def hours_for_kind(kind):
+    """Inverse of ReminderLedger.kind_for ('24h' -> 24)."""
+    return int(kind.rstrip('h'))
+
+
+def schedule_reminders(booking, rescheduled=False):
+    """
+    Create, move or remove a booking's reminder entries.
+    
+    Due times are absolute (start_time minus the reminder offset), so they
+    are exact whatever the trainer's timezone or DST rules. Reminders whose
+    due time has already passed are not scheduled.
+    
+    Args:
+        booking: Booking instance
+        rescheduled: True if start_time changed; clears the reminder ledger
+            so reminders already sent for the old time go out again
+    """
+    if rescheduled:
+        ReminderLedger.objects.filter(booking=booking).delete()
+    
+    if booking.status not in REMINDABLE_STATUSES:
+        unschedule_reminders(booking)
+        return
+    
+    now = timezone.now()
+    entries = []
+    for hours in REMINDER_HOURS:
+        due_at = booking.start_time - timedelta(hours=hours)
+        if due_at > now:
+            entries.append(ScheduledReminder(
+                booking=booking,
+                kind=ReminderLedger.kind_for(hours),
+                due_at=due_at
+            ))
+    
+    ScheduledReminder.objects.filter(booking=booking).exclude(
+        kind__in=[entry.kind for entry in entries]
+    ).delete()
+    
+    if entries:
+        ScheduledReminder.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['booking', 'kind'],
+            update_fields=['due_at', 'updated_at']
+        )
+
+
+def unschedule_reminders(booking):
+    """Remove all pending reminder entries for a booking."""
+    ScheduledReminder.objects.filter(booking=booking).delete()
@@ -13,10 +13,10 @@ class NotificationSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'trainer', 'trainer_name', 'notification_type', 'type_display',
             'recipient', 'subject', 'message', 'status', 'status_display',
-            'sent_at', 'failed_reason', 'created_at'
+            'sent_at', 'failed_reason', 'attempts', 'next_retry_at', 'created_at'
         ]
         read_only_fields = [
             'id', 'trainer', 'trainer_name', 'type_display', 'status_display',
-            'sent_at', 'failed_reason', 'created_at'
+            'sent_at', 'failed_reason', 'attempts', 'next_retry_at', 'created_at'
         ]
 
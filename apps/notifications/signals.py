@@ -0,0 +1,20 @@
+"""
+Django signals keeping reminder schedules in step with bookings
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from apps.bookings.models import Booking
+from apps.bookings.signals import stored_values
+from .scheduling import schedule_reminders
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, created, **kwargs):
+    """Schedule, move or drop reminders when a booking is saved."""
+    stored = stored_values(instance)
+    rescheduled = (
+        not created
+        and stored is not None
+        and stored['start_time'] != instance.start_time
+    )
+    schedule_reminders(instance, rescheduled=rescheduled)
@@ -6,6 +6,7 @@ from twilio.rest import Client
 from django.conf import settings
 from django.utils import timezone
 from .models import Notification
+from .utils import trainer_localtime
 
 
 class SMSService:
@@ -43,11 +44,7 @@ class SMSService:
         if not trainer:
             trainer = booking.trainer
         
-        message_text = (
-            f"Reminder: Your session with {booking.trainer.business_name} "
-            f"is {booking.start_time.strftime('%A at %I:%M %p')}. "
-            f"Reply CONFIRM to confirm."
-        )
+        message_text = self._booking_reminder_text(booking)
         
         try:
             message = self.client.messages.create(
@@ -77,6 +74,94 @@ class SMSService:
             )
             return False, str(e)
     
+    def build_booking_reminders(self, bookings, hours_before=24):
+        """
+        Build unsaved reminder SMS notifications for the outbound queue.
+        
+        Bookings whose client has no phone number are skipped.
+        
+        Args:
+            bookings: Iterable of Booking instances (client and trainer loaded)
+            hours_before: Hours before booking (default 24)
+        
+        Returns:
+            list: Unsaved pending Notification instances
+        """
+        return [
+            Notification(
+                trainer=booking.trainer,
+                notification_type='sms',
+                recipient=booking.client.phone,
+                message=self._booking_reminder_text(booking),
+            )
+            for booking in bookings
+            if booking.client.phone
+        ]
+    
+    def build_confirmation(self, phone_number, booking):
+        """Build an unsaved booking confirmation SMS notification."""
+        return Notification(
+            trainer=booking.trainer,
+            notification_type='sms',
+            recipient=phone_number,
+            message=self._confirmation_text(booking),
+        )
+    
+    def deliver(self, notification):
+        """
+        Send one SMS notification using its stored message text.
+        
+        The notification is marked sent or failed in memory. If Twilio
+        throttles the request (HTTP 429) it is left pending instead, for the
+        outbound queue to send again later.
+        
+        Args:
+            notification: SMS Notification instance
+        
+        Returns:
+            bool: False if the message was throttled, True otherwise
+        """
+        try:
+            self.client.messages.create(
+                body=notification.message,
+                from_=self.from_number,
+                to=notification.recipient
+            )
+            notification.status = 'sent'
+            notification.sent_at = timezone.now()
+            notification.failed_reason = ''
+        except Exception as e:
+            if getattr(e, 'status', None) == 429:
+                notification.status = 'pending'
+                notification.failed_reason = 'Rate limited by Twilio'
+                return False
+            notification.status = 'failed'
+            notification.failed_reason = str(e)
+        
+        return True
+    
+    def resend(self, notifications):
+        """
+        Resend SMS notifications using their stored message text.
+        
+        Each notification is marked sent or failed in memory; persisting
+        them is left to the caller.
+        
+        Args:
+            notifications: List of SMS Notification instances
+        
+        Returns:
+            list: The given notifications
+        """
+        if not self.client or not self.from_number:
+            return []
+        
+        for notification in notifications:
+            if not self.deliver(notification):
+                notification.status = 'failed'
+        
+        return notifications
+    
     def send_confirmation(self, phone_number, booking, trainer=None):
         """
         Send booking confirmation SMS.
@@ -98,10 +183,7 @@ class SMSService:
         if not trainer:
             trainer = booking.trainer
         
-        message_text = (
-            f"Your session with {booking.trainer.business_name} "
-            f"is confirmed for {booking.start_time.strftime('%A at %I:%M %p')}."
-        )
+        message_text = self._confirmation_text(booking)
         
         try:
             message = self.client.messages.create(
@@ -176,6 +258,25 @@ class SMSService:
                 failed_reason=str(e)
             )
             return False, str(e)
+    
+    @staticmethod
+    def _confirmation_text(booking):
+        """Build the confirmation SMS body for a booking."""
+        start_time = trainer_localtime(booking.start_time, booking.trainer)
+        return (
+            f"Your session with {booking.trainer.business_name} "
+            f"is confirmed for {start_time.strftime('%A at %I:%M %p')}."
+        )
+    
+    @staticmethod
+    def _booking_reminder_text(booking):
+        """Build the reminder SMS body for a booking."""
+        start_time = trainer_localtime(booking.start_time, booking.trainer)
+        return (
+            f"Reminder: Your session with {booking.trainer.business_name} "
+            f"is {start_time.strftime('%A at %I:%M %p')}. "
+            f"Reply CONFIRM to confirm."
+        )
 
 
 # Create singleton instance
@@ -1,24 +1,33 @@
 """
 Celery tasks for sending notifications asynchronously.
 These tasks run in the background to avoid blocking the main application.
+Producers queue notifications through outbound.enqueue; only
+deliver_notifications talks to the providers.
 """
 from celery import shared_task
 from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from django.db.models import Q
 
+from . import digest
 from .email_service import email_service
 from .sms_service import sms_service
+from .outbound import OutboundBackpressure, deliver, dispatch, enqueue, ensure_capacity
+from .scheduling import REMINDABLE_STATUSES, REMINDER_CHANNELS, hours_for_kind
 from apps.bookings.models import Booking
 
 
-@shared_task
-def send_booking_confirmation(booking_id):
+@shared_task(bind=True)
+def send_booking_confirmation(self, booking_id):
     """
     Send confirmation email and SMS for booking.
     
     This task is called when a booking is confirmed.
-    It sends both email and SMS (if phone available) notifications.
+    It queues both email and SMS (if phone available) notifications for
+    rate-limited delivery (coalesced into digests when enabled), retrying
+    later while the outbound queue is full.
     
     Args:
         booking_id: ID of the booking to send confirmation for
@@ -26,36 +35,224 @@ def send_booking_confirmation(booking_id):
     try:
         booking = Booking.objects.select_related('client', 'trainer').get(id=booking_id)
         
-        # Send email confirmation
-        # Note: email_service already creates Notification record
-        email_service.send_booking_confirmation(
-            booking.client.email,
-            booking,
-            trainer=booking.trainer
-        )
+        notifications = [
+            email_service.build_booking_confirmation(booking.client.email, booking)
+        ]
         
-        # Send SMS confirmation if phone available
+        # SMS confirmation only if phone available
         if booking.client.phone:
-            # Note: sms_service already creates Notification record
-            sms_service.send_confirmation(
-                booking.client.phone,
-                booking,
-                trainer=booking.trainer
+            notifications.append(
+                sms_service.build_confirmation(booking.client.phone, booking)
             )
-            
+        
+        # Several bookings made at once are confirmed in one digest
+        digest.submit(notifications, 'booking_confirmation', booking=booking)
+    
+    except OutboundBackpressure as e:
+        raise self.retry(exc=e, countdown=e.retry_after)
     except Booking.DoesNotExist:
         print(f"Booking {booking_id} not found")
     except Exception as e:
         print(f"Error sending booking confirmation for {booking_id}: {str(e)}")
 
 
+def _dispatch_reminder_chunks(start, end, hours_before, channels):
+    """
+    Page through bookings starting in [start, end] and fan them out.
+    
+    Only booking IDs are streamed from the database (via .iterator()), and
+    every NOTIFICATION_REMINDER_CHUNK_SIZE of them are handed to a separate
+    send_reminder_chunk task so workers can send in parallel. Bookings
+    already in the reminder ledger for this kind are skipped.
+    
+    Returns:
+        tuple: (bookings dispatched, chunks dispatched)
+    """
+    from .models import ReminderLedger
+    
+    chunk_size = settings.NOTIFICATION_REMINDER_CHUNK_SIZE
+    booking_ids = Booking.objects.filter(
+        start_time__gte=start,
+        start_time__lte=end,
+        status__in=REMINDABLE_STATUSES
+    ).exclude(
+        reminder_ledger__kind=ReminderLedger.kind_for(hours_before)
+    ).order_by('id').values_list('id', flat=True)
+    
+    total = 0
+    chunks = 0
+    chunk = []
+    for booking_id in booking_ids.iterator(chunk_size=chunk_size):
+        chunk.append(booking_id)
+        if len(chunk) >= chunk_size:
+            send_reminder_chunk.delay(chunk, hours_before, channels)
+            total += len(chunk)
+            chunks += 1
+            chunk = []
+    
+    if chunk:
+        send_reminder_chunk.delay(chunk, hours_before, channels)
+        total += len(chunk)
+        chunks += 1
+    
+    return total, chunks
+
+
+@shared_task(bind=True, max_retries=None)
+def send_reminder_chunk(self, booking_ids, hours_before, channels=('email', 'sms')):
+    """
+    Queue reminders for one chunk of bookings.
+    
+    Worker half of the reminder pipeline. Bookings are loaded in one query
+    and claimed in the reminder ledger, so a booking picked up by two
+    overlapping runs is only reminded once. Reminders for the claimed
+    bookings are built for each channel and handed to the outbound queue
+    in one batch. While the queue is full for any of the channels the
+    chunk is retried later, before anything is claimed.
+    
+    Args:
+        booking_ids: IDs of the bookings in this chunk
+        hours_before: Hours before booking the reminder refers to
+        channels: Channels to send on, in order ('email', 'sms')
+    
+    Returns:
+        dict: Counts of bookings processed and notifications queued
+    """
+    from .models import ReminderLedger
+    
+    try:
+        ensure_capacity(channels)
+    except OutboundBackpressure as e:
+        raise self.retry(exc=e, countdown=e.retry_after)
+    
+    # Re-check status and start time; a booking may have been cancelled,
+    # or the session already begun, since planning
+    bookings = list(
+        Booking.objects.filter(
+            id__in=booking_ids,
+            status__in=REMINDABLE_STATUSES,
+            start_time__gt=timezone.now()
+        ).select_related('client', 'trainer')
+    )
+    
+    claimed = ReminderLedger.claim(
+        [booking.id for booking in bookings],
+        ReminderLedger.kind_for(hours_before)
+    )
+    bookings = [booking for booking in bookings if booking.id in claimed]
+    
+    builders = {
+        'email': email_service.build_booking_reminders,
+        'sms': sms_service.build_booking_reminders,
+    }
+    
+    notifications = []
+    for channel in channels:
+        notifications.extend(builders[channel](bookings, hours_before=hours_before))
+    
+    # Capacity was checked above; reminders already claimed must go out
+    queued = enqueue(notifications, check_capacity=False)
+    
+    return {
+        'bookings': len(bookings),
+        'queued': len(queued),
+    }
+
+
+@shared_task
+def flush_due_digests():
+    """
+    Deliver digests whose coalescing window has closed.
+    
+    Scheduled for the end of each new window, and every minute via Celery
+    Beat as a safety net.
+    
+    Returns:
+        int: Number of notifications queued
+    """
+    return digest.flush_due()
+
+
+@shared_task
+def deliver_notifications(notification_ids):
+    """
+    Deliver queued notifications within the provider rate limits.
+    
+    Consumer of the outbound queue (routed to the 'outbound' Celery queue).
+    Notifications the rate limits or the provider held back are handed to
+    a new delivery task that runs once tokens are expected to be available.
+    
+    Args:
+        notification_ids: IDs of pending notifications
+    
+    Returns:
+        dict: Counts of notifications delivered and deferred
+    """
+    delivered, deferred, wait = deliver(notification_ids)
+    
+    if deferred:
+        deliver_notifications.apply_async((deferred,), countdown=wait)
+    
+    return {'delivered': delivered, 'deferred': len(deferred)}
+
+
+@shared_task
+def dispatch_due_reminders():
+    """
+    Pop due reminders from the schedule and fan them out for sending.
+    
+    This task runs every minute (scheduled via Celery Beat). Entries with
+    due_at in the past are locked (skipping rows another ticker holds),
+    handed to send_reminder_chunk tasks grouped by kind and deleted once
+    every chunk is queued; if queueing fails the entries stay scheduled
+    for the next tick (the reminder ledger drops chunks sent twice). At
+    most NOTIFICATION_REMINDER_TICK_LIMIT entries are popped per tick; any
+    remainder is picked up on the next one.
+    
+    Returns:
+        dict: Number of reminders dispatched per kind
+    """
+    from .models import ScheduledReminder
+    
+    chunk_size = settings.NOTIFICATION_REMINDER_CHUNK_SIZE
+    
+    with transaction.atomic():
+        due = list(
+            ScheduledReminder.objects.select_for_update(skip_locked=True).filter(
+                due_at__lte=timezone.now()
+            ).order_by('due_at').values_list(
+                'id', 'booking_id', 'kind'
+            )[:settings.NOTIFICATION_REMINDER_TICK_LIMIT]
+        )
+        
+        by_kind = {}
+        for _, booking_id, kind in due:
+            by_kind.setdefault(kind, []).append(booking_id)
+        
+        for kind, booking_ids in by_kind.items():
+            hours_before = hours_for_kind(kind)
+            for offset in range(0, len(booking_ids), chunk_size):
+                send_reminder_chunk.delay(
+                    booking_ids[offset:offset + chunk_size],
+                    hours_before,
+                    REMINDER_CHANNELS[hours_before]
+                )
+        
+        # Only popped once handed off, so a broker failure rolls the pop back
+        ScheduledReminder.objects.filter(id__in=[entry[0] for entry in due]).delete()
+    
+    return {kind: len(booking_ids) for kind, booking_ids in by_kind.items()}
+
+
 @shared_task
 def send_booking_reminders():
     """
     Send reminders for bookings in 24 hours.
     
-    This task runs daily (scheduled via Celery Beat) to send
-    reminders for bookings happening tomorrow.
+    Window-polling catch-up for bookings with no scheduled reminder (e.g.
+    created before reminder scheduling existed); regular reminders come
+    from dispatch_due_reminders. Plans reminders for bookings happening
+    tomorrow and fans sending out to send_reminder_chunk tasks.
     """
     try:
         # Calculate tomorrow's date range
@@ -63,41 +260,12 @@ def send_booking_reminders():
         start_of_day = tomorrow.replace(hour=0, minute=0, second=0, microsecond=0)
         end_of_day = tomorrow.replace(hour=23, minute=59, second=59, microsecond=999999)
         
-        # Get bookings happening tomorrow that are pending or confirmed
-        bookings = Booking.objects.filter(
-            start_time__gte=start_of_day,
-            start_time__lte=end_of_day,
-            status__in=['pending', 'confirmed']
-        ).select_related('client', 'trainer')
-        
-        sent_count = 0
-        for booking in bookings:
-            try:
-                # Send email reminder
-                # Note: email_service already creates Notification record
-                email_service.send_booking_reminder(
-                    booking.client.email,
-                    booking,
-                    hours_before=24,
-                    trainer=booking.trainer
-                )
-                
-                # Send SMS reminder if phone available
-                if booking.client.phone:
-                    # Note: sms_service already creates Notification record
-                    sms_service.send_booking_reminder(
-                        booking.client.phone,
-                        booking,
-                        hours_before=24,
-                        trainer=booking.trainer
-                    )
-                
-                sent_count += 1
-            except Exception as e:
-                print(f"Error sending reminder for booking {booking.id}: {str(e)}")
-        
-        print(f"Sent {sent_count} booking reminders for tomorrow")
+        total, chunks = _dispatch_reminder_chunks(
+            start_of_day, end_of_day, hours_before=24, channels=REMINDER_CHANNELS[24]
+        )
         
+        print(f"Dispatched {total} booking reminders for tomorrow in {chunks} chunks")
+    
     except Exception as e:
         print(f"Error in send_booking_reminders task: {str(e)}")
 
@@ -107,8 +275,10 @@ def send_hour_reminders():
     """
     Send reminders for bookings in 1 hour.
     
-    This task runs every 30 minutes (scheduled via Celery Beat) to send
-    last-minute reminders for bookings happening soon.
+    Window-polling catch-up counterpart of send_booking_reminders for
+    last-minute reminders; regular reminders come from
+    dispatch_due_reminders. Sending is fanned out to send_reminder_chunk
+    tasks.
     """
     try:
         # Calculate time range for bookings in the next hour
@@ -117,50 +287,23 @@ def send_hour_reminders():
         start = in_one_hour.replace(minute=0, second=0, microsecond=0)
         end = start + timedelta(hours=1)
         
-        # Get bookings happening in the next hour that are pending or confirmed
-        bookings = Booking.objects.filter(
-            start_time__gte=start,
-            start_time__lte=end,
-            status__in=['pending', 'confirmed']
-        ).select_related('client', 'trainer')
-        
-        sent_count = 0
-        for booking in bookings:
-            try:
-                # Send SMS reminder (more urgent, so SMS preferred)
-                if booking.client.phone:
-                    # Note: sms_service already creates Notification record
-                    sms_service.send_booking_reminder(
-                        booking.client.phone,
-                        booking,
-                        hours_before=1,
-                        trainer=booking.trainer
-                    )
-                    sent_count += 1
-                
-                # Also send email reminder
-                email_service.send_booking_reminder(
-                    booking.client.email,
-                    booking,
-                    hours_before=1,
-                    trainer=booking.trainer
-                )
-                
-            except Exception as e:
-                print(f"Error sending 1-hour reminder for booking {booking.id}: {str(e)}")
-        
-        print(f"Sent {sent_count} 1-hour booking reminders")
+        total, chunks = _dispatch_reminder_chunks(
+            start, end, hours_before=1, channels=REMINDER_CHANNELS[1]
+        )
         
+        print(f"Dispatched {total} 1-hour booking reminders in {chunks} chunks")
+    
     except Exception as e:
         print(f"Error in send_hour_reminders task: {str(e)}")
 
 
-@shared_task
-def send_payment_receipt(payment_id):
+@shared_task(bind=True)
+def send_payment_receipt(self, payment_id):
     """
     Send payment receipt email to trainer.
     
-    This task is called when a payment is completed.
+    This task is called when a payment is completed. The receipt is
+    queued for rate-limited delivery.
     
     Args:
         payment_id: ID of the payment to send receipt for
@@ -175,13 +318,12 @@ def send_payment_receipt(payment_id):
         trainer = payment.subscription.trainer
         trainer_email = trainer.user.email
         
-        # Note: email_service already creates Notification record
-        email_service.send_payment_receipt(
-            trainer_email,
-            payment,
-            trainer=trainer
-        )
-        
+        enqueue([
+            email_service.build_payment_receipt(trainer_email, payment, trainer)
+        ])
+    
+    except OutboundBackpressure as e:
+        raise self.retry(exc=e, countdown=e.retry_after)
     except Payment.DoesNotExist:
         print(f"Payment {payment_id} not found")
     except Exception as e:
@@ -193,42 +335,37 @@ def retry_failed_notifications():
     """
     Retry sending failed notifications.
     
-    This task runs periodically to retry notifications that failed.
-    Only retries notifications that failed in the last 24 hours.
+    This task runs every few minutes (scheduled via Celery Beat). Failed
+    notifications due for another attempt are claimed in batches per
+    provider and put back on the outbound queue, where each failure backs
+    off exponentially (with jitter) until NOTIFICATION_RETRY_MAX_ATTEMPTS
+    is reached. Only notifications created in the last
+    NOTIFICATION_RETRY_WINDOW_HOURS are retried, and a provider is skipped
+    while its outbound backlog is full.
+    
+    Returns:
+        dict: Per provider, number of notifications requeued
     """
-    try:
-        from .models import Notification
-        
-        # Get failed notifications from the last 24 hours
-        yesterday = timezone.now() - timedelta(hours=24)
-        failed_notifications = Notification.objects.filter(
-            status='failed',
-            created_at__gte=yesterday
-        ).select_related('trainer')
-        
-        retry_count = 0
-        for notification in failed_notifications:
-            try:
-                # Retry based on notification type
-                if notification.notification_type == 'email':
-                    # For email, we'd need to store the original context
-                    # For now, just mark as pending for manual review
-                    notification.status = 'pending'
-                    notification.failed_reason = ''
-                    notification.save()
-                    retry_count += 1
-                elif notification.notification_type == 'sms':
-                    # Similar for SMS
-                    notification.status = 'pending'
-                    notification.failed_reason = ''
-                    notification.save()
-                    retry_count += 1
-                    
-            except Exception as e:
-                print(f"Error retrying notification {notification.id}: {str(e)}")
+    from .retry import RETRY_PROVIDERS, claim_batch, provider_configured, requeue_batch
+    
+    results = {}
+    for provider in RETRY_PROVIDERS:
+        requeued = 0
         
-        print(f"Retried {retry_count} failed notifications")
+        if provider_configured(provider):
+            while True:
+                try:
+                    ensure_capacity([provider])
+                except OutboundBackpressure as e:
+                    print(f"Skipping {provider} retries: {str(e)}")
+                    break
+                batch = claim_batch(provider, settings.NOTIFICATION_RETRY_BATCH_SIZE)
+                if not batch:
+                    break
+                dispatch(requeue_batch(batch), deliver_notifications.delay)
+                requeued += len(batch)
         
-    except Exception as e:
-        print(f"Error in retry_failed_notifications task: {str(e)}")
-
+        results[provider] = {'requeued': requeued}
+    
+    print(f"Retried failed notifications: {results}")
+    return results
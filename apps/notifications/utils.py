@@ -0,0 +1,74 @@
+"""
+Helper functions for notifications
+"""
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.core.exports import format_datetime, iterate
+
+
+def trainer_localtime(value, trainer):
+    """
+    Convert an aware datetime to the trainer's timezone for display.
+    
+    Falls back to UTC when the trainer's timezone name is unknown.
+    """
+    try:
+        tz = ZoneInfo(trainer.timezone or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        tz = ZoneInfo('UTC')
+    return timezone.localtime(value, tz)
+
+
+NOTIFICATION_EXPORT_HEADER = [
+    'ID', 'Type', 'Recipient', 'Subject', 'Status', 'Attempts',
+    'Failed Reason', 'Created At', 'Sent At'
+]
+
+
+def get_notification_export_queryset(trainer=None, status=None, notification_type=None,
+                                     start_date=None, end_date=None):
+    """
+    Get notification log entries for export, newest first.
+    
+    Args:
+        trainer: Only this trainer's notifications (default: all trainers)
+        status: Only this status (optional)
+        notification_type: Only this type (optional)
+        start_date: Created on or after (YYYY-MM-DD, optional)
+        end_date: Created on or before (YYYY-MM-DD, optional)
+    """
+    from .models import Notification
+    
+    notifications = Notification.objects.all()
+    if trainer is not None:
+        notifications = notifications.filter(trainer=trainer)
+    if status:
+        notifications = notifications.filter(status=status)
+    if notification_type:
+        notifications = notifications.filter(notification_type=notification_type)
+    if start_date and parse_date(start_date):
+        notifications = notifications.filter(created_at__date__gte=parse_date(start_date))
+    if end_date and parse_date(end_date):
+        notifications = notifications.filter(created_at__date__lte=parse_date(end_date))
+    return notifications.order_by('-created_at', '-id')
+
+
+def notification_export_rows(notifications):
+    """Yield one NOTIFICATION_EXPORT_HEADER row per notification, streaming the queryset."""
+    for notification in iterate(notifications.only(
+        'id', 'notification_type', 'recipient', 'subject', 'status', 'attempts',
+        'failed_reason', 'created_at', 'sent_at'
+    )):
+        yield [
+            notification.id,
+            notification.notification_type,
+            notification.recipient,
+            notification.subject,
+            notification.status,
+            notification.attempts,
+            notification.failed_reason,
+            format_datetime(notification.created_at),
+            format_datetime(notification.sent_at),
+        ]
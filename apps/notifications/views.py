@@ -5,8 +5,9 @@ from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, time
 
+from . import counters
 from .models import Notification
 from .serializers import NotificationSerializer
 from apps.trainers.models import Trainer
@@ -38,28 +39,17 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         """
         Get notification statistics.
         
+        Read from the trainer's notification counters, so the cost does not
+        grow with notification history.
+        
         GET /api/notifications/stats/
         """
         try:
             trainer = request.user.trainer_profile
-            notifications = Notification.objects.filter(trainer=trainer)
-            
-            total = notifications.count()
-            sent = notifications.filter(status='sent').count()
-            failed = notifications.filter(status='failed').count()
-            pending = notifications.filter(status='pending').count()
-            
-            # By type
-            email_count = notifications.filter(notification_type='email').count()
-            sms_count = notifications.filter(notification_type='sms').count()
-            push_count = notifications.filter(notification_type='push').count()
+            totals = counters.summary(trainer)
             
-            # Recent activity (last 7 days)
-            week_ago = timezone.now() - timedelta(days=7)
-            recent_sent = notifications.filter(
-                status='sent',
-                sent_at__gte=week_ago
-            ).count()
+            total = totals['total']
+            sent = totals['sent']
             
             # Success rate
             success_rate = (sent / total * 100) if total > 0 else 0
@@ -67,14 +57,14 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({
                 'total': total,
                 'sent': sent,
-                'failed': failed,
-                'pending': pending,
+                'failed': totals['failed'],
+                'pending': totals['pending'],
                 'by_type': {
-                    'email': email_count,
-                    'sms': sms_count,
-                    'push': push_count,
+                    'email': totals['email'],
+                    'sms': totals['sms'],
+                    'push': totals['push'],
                 },
-                'recent_sent_7_days': recent_sent,
+                'recent_sent_7_days': totals['recent_sent'],
                 'success_rate': round(success_rate, 2),
             })
         except Trainer.DoesNotExist:
@@ -91,23 +81,32 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'], url_path='recent')
     def recent(self, request):
         """
-        Get recent notifications (last 7 days).
+        Get recent notifications (today and the previous 6 days), paginated.
+        
+        The page count comes from the notification counters rather than a
+        COUNT(*) over the window.
         
         GET /api/notifications/recent/
         """
         try:
             trainer = request.user.trainer_profile
-            week_ago = timezone.now() - timedelta(days=7)
+        except Trainer.DoesNotExist:
+            # Same paginated shape, with no results
+            notifications = Notification.objects.none()
+        else:
+            start_day = counters.week_start()
+            start = timezone.make_aware(datetime.combine(start_day, time.min))
             
             notifications = Notification.objects.filter(
                 trainer=trainer,
-                created_at__gte=week_ago
-            ).select_related('trainer').order_by('-created_at')
-            
-            serializer = self.get_serializer(notifications, many=True)
-            return Response(serializer.data)
-        except Trainer.DoesNotExist:
-            return Response([])
+                created_at__gte=start
+            ).select_related('trainer').order_by('-created_at').with_count(
+                counters.count(trainer=trainer, day__gte=start_day)
+            )
+        
+        page = self.paginate_queryset(notifications)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
     
     @action(detail=False, methods=['get'], url_path='failed')
     def failed(self, request):
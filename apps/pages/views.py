@@ -9,7 +9,8 @@ from .models import PageTemplate, Page, PageSection
 from .serializers import (
     PageTemplateSerializer, PageSerializer, PageCreateSerializer, PageSectionSerializer
 )
-from apps.payments.permissions import check_usage_limit
+from apps.payments.entitlements import for_request
+from apps.payments.usage import UsageLimitReached, enforce_limit
 
 
 class PageTemplateViewSet(viewsets.ReadOnlyModelViewSet):
@@ -24,13 +25,7 @@ class PageTemplateViewSet(viewsets.ReadOnlyModelViewSet):
         
         # Get trainer's subscription plan
         if hasattr(self.request.user, 'trainer_profile'):
-            trainer = self.request.user.trainer_profile
-            try:
-                from apps.payments.models import Subscription
-                subscription = Subscription.objects.get(trainer=trainer)
-                plan = subscription.plan
-            except:
-                plan = 'free'
+            plan = for_request(self.request).plan
             
             # Filter by available plans
             queryset = queryset.filter(
@@ -71,17 +66,17 @@ class PageViewSet(viewsets.ModelViewSet):
         
         trainer = self.request.user.trainer_profile
         
-        # Check page usage limit
-        can_create, current_count, limit = check_usage_limit(trainer, 'pages')
-        if not can_create:
+        # Create within the page usage limit
+        try:
+            with enforce_limit(trainer, 'pages', for_request(self.request)):
+                serializer.save(trainer=trainer)
+        except UsageLimitReached as e:
             raise serializers.ValidationError({
                 'error': 'Usage limit reached',
-                'detail': f'You have reached your limit of {limit} pages. Upgrade your plan to add more.',
-                'current_count': current_count,
-                'limit': limit
+                'detail': f'You have reached your limit of {e.limit} pages. Upgrade your plan to add more.',
+                'current_count': e.current_count,
+                'limit': e.limit
             })
-        
-        serializer.save(trainer=trainer)
     
     @action(detail=True, methods=['post'])
     def publish(self, request, pk=None):
@@ -85,15 +85,22 @@ class PaymentAdmin(admin.ModelAdmin):
 @admin.register(WebhookEvent)
 class WebhookEventAdmin(admin.ModelAdmin):
     """Admin interface for webhook events."""
-    list_display = ['event_id', 'event_type', 'processed', 'processed_at', 'created_at']
-    list_filter = ['event_type', 'processed', 'created_at']
-    search_fields = ['event_id', 'event_type']
-    readonly_fields = ['event_id', 'event_type', 'payload', 'processed', 'processed_at', 'error_message', 'created_at']
+    list_display = ['event_id', 'event_type', 'status', 'attempts', 'processed_at', 'created_at']
+    list_filter = ['event_type', 'status', 'created_at']
+    search_fields = ['event_id', 'event_type', 'ordering_key']
+    readonly_fields = [
+        'event_id', 'event_type', 'payload', 'status', 'ordering_key', 'occurred_at', 'attempts',
+        'next_attempt_at', 'processed', 'processed_at', 'error_message', 'created_at'
+    ]
     ordering = ['-created_at']
+    actions = ['replay_events']
     
     fieldsets = (
         ('Event Information', {
-            'fields': ('event_id', 'event_type', 'processed', 'processed_at')
+            'fields': ('event_id', 'event_type', 'ordering_key', 'occurred_at')
+        }),
+        ('Processing', {
+            'fields': ('status', 'attempts', 'next_attempt_at', 'processed', 'processed_at')
         }),
         ('Payload', {
             'fields': ('payload',),
@@ -111,6 +118,14 @@ class WebhookEventAdmin(admin.ModelAdmin):
     def has_add_permission(self, request):
         """Webhook events are created automatically."""
         return False
+    
+    def replay_events(self, request, queryset):
+        """Put the selected events back in the webhook inbox."""
+        from .webhook_inbox import replay
+        
+        count, keys = replay(queryset)
+        self.message_user(request, f"Replaying {count} events across {len(keys)} subscriptions/customers.")
+    replay_events.short_description = "Replay selected events"
 
 
 @admin.register(ClientPayment)
@@ -0,0 +1,151 @@
+"""
+Client payment balances.
+Client.total_paid, last_payment_date and payment_status are kept in step
+with ClientPayment by one atomic UPDATE per affected client, applied by
+signals in the payment's transaction (see signals.py). The update adds
+the amount difference with F(), moves last_payment_date forward with
+Greatest, and only looks the latest date up again (an index lookup on
+client, payment_date) when the payment carrying it was removed or moved.
+Client.save() leaves the three columns out when updating a client, so a
+concurrent client edit cannot write back the balance it read.
+find_drift() and repair() reconcile clients against their payments.
+"""
+from django.db.models import Case, DateField, F, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from apps.clients.models import Client
+from .models import ClientPayment
+
+
+def payment_status(total_paid):
+    """Payment status of a client who has paid total_paid."""
+    return 'paid' if total_paid > 0 else 'unpaid'
+
+
+def record(previous, current):
+    """
+    Apply a payment write to its client's balance.
+    
+    Args:
+        previous: (client_id, amount, payment_date) before the write
+            (None for inserts)
+        current: (client_id, amount, payment_date) after the write
+            (None for deletes)
+    """
+    changes = {}
+    if previous is not None:
+        client_id, amount, payment_date = previous
+        changes[client_id] = {'delta': -amount, 'added': None, 'removed': payment_date}
+    if current is not None:
+        client_id, amount, payment_date = current
+        change = changes.setdefault(client_id, {'delta': 0, 'added': None, 'removed': None})
+        change['delta'] += amount
+        if change['removed'] == payment_date:
+            # Same client and date: the latest payment date cannot change
+            change['removed'] = None
+        else:
+            change['added'] = payment_date
+    
+    # Sorted so concurrent writers lock client rows in the same order
+    for client_id, change in sorted(changes.items()):
+        apply(client_id, **change)
+
+
+def apply(client_id, delta, added=None, removed=None):
+    """
+    Update a client's balance in one statement.
+    
+    Args:
+        client_id: Client to update
+        delta: Amount to add to total_paid
+        added: Payment date now present (may advance last_payment_date)
+        removed: Payment date no longer present (last_payment_date is looked
+            up again if it was this date)
+    """
+    last_payment_date = F('last_payment_date')
+    if removed is not None:
+        latest = ClientPayment.objects.filter(client_id=OuterRef('pk')).order_by(
+            '-payment_date'
+        ).values('payment_date')[:1]
+        last_payment_date = Case(
+            When(last_payment_date=removed, then=Subquery(latest)),
+            default=F('last_payment_date'),
+            output_field=DateField()
+        )
+    if added is not None:
+        added = Value(added, output_field=DateField())
+        last_payment_date = Greatest(Coalesce(last_payment_date, added), added)
+    
+    Client.objects.filter(pk=client_id).update(
+        total_paid=F('total_paid') + delta,
+        last_payment_date=last_payment_date,
+        # Compared against the stored total, i.e. before the delta
+        payment_status=Case(
+            When(total_paid__gt=-delta, then=Value('paid')),
+            default=Value('unpaid')
+        ),
+        updated_at=timezone.now()
+    )
+
+
+def find_drift(trainer_ids=None):
+    """
+    Clients whose stored balance disagrees with their payments.
+    
+    Args:
+        trainer_ids: Only check clients of these trainers (default: all)
+    
+    Returns:
+        list: (client, expected) pairs, expected holding the correct
+            total_paid, last_payment_date and payment_status
+    """
+    clients = Client.objects.only('id', 'total_paid', 'last_payment_date', 'payment_status')
+    payments = ClientPayment.objects.all()
+    if trainer_ids is not None:
+        clients = clients.filter(trainer_id__in=trainer_ids)
+        payments = payments.filter(client__trainer_id__in=trainer_ids)
+    
+    totals = {
+        row['client_id']: row
+        for row in payments.values('client_id').annotate(
+            total=Sum('amount'),
+            latest=Max('payment_date')
+        ).order_by()
+    }
+    
+    drift = []
+    for client in clients.order_by('id').iterator(chunk_size=2000):
+        row = totals.get(client.id, {})
+        total_paid = row.get('total') or 0
+        expected = {
+            'total_paid': total_paid,
+            'last_payment_date': row.get('latest'),
+            'payment_status': payment_status(total_paid),
+        }
+        if any(getattr(client, field) != value for field, value in expected.items()):
+            drift.append((client, expected))
+    return drift
+
+
+def repair(drift):
+    """
+    Overwrite drifted balances with their expected values.
+    
+    Args:
+        drift: Pairs returned by find_drift()
+    
+    Returns:
+        int: Number of clients repaired
+    """
+    clients = []
+    for client, expected in drift:
+        for field, value in expected.items():
+            setattr(client, field, value)
+        clients.append(client)
+    Client.objects.bulk_update(
+        clients,
+        ['total_paid', 'last_payment_date', 'payment_status'],
+        batch_size=1000
+    )
+    return len(clients)
@@ -4,12 +4,15 @@ Subscription-based decorators for views and viewsets.
 from functools import wraps
 from rest_framework.response import Response
 from rest_framework import status
-from .permissions import check_usage_limit
+from .entitlements import for_request
+from .usage import UsageLimitReached, enforce_limit
 
 
 def check_resource_limit(resource_type):
     """
-    Decorator to check usage limits before creating resources.
+    Decorator enforcing usage limits on the resources a view creates.
+    The view runs in a transaction that is rolled back if it would go
+    over the limit (see usage.enforce_limit).
     
     Usage:
         @check_resource_limit('clients')
@@ -31,20 +34,18 @@ def check_resource_limit(resource_type):
             
             trainer = request.user.trainer_profile
             
-            # Check usage limit
-            can_create, current_count, limit = check_usage_limit(trainer, resource_type)
-            
-            if not can_create:
+            # Take the usage limit while creating
+            try:
+                with enforce_limit(trainer, resource_type, for_request(request)):
+                    return func(self, request, *args, **kwargs)
+            except UsageLimitReached as e:
                 return Response({
                     'error': 'Usage limit reached',
-                    'detail': f'You have reached your limit of {limit} {resource_type}. Upgrade your plan to add more.',
-                    'current_count': current_count,
-                    'limit': limit,
+                    'detail': f'You have reached your limit of {e.limit} {resource_type}. Upgrade your plan to add more.',
+                    'current_count': e.current_count,
+                    'limit': e.limit,
                     'resource_type': resource_type
                 }, status=status.HTTP_403_FORBIDDEN)
-            
-            # Proceed with the original function
-            return func(self, request, *args, **kwargs)
         
         return wrapper
     return decorator
@@ -72,30 +73,14 @@ def require_plan(required_plan):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            from .models import Subscription
-            trainer = request.user.trainer_profile
-            
-            # Get subscription
-            try:
-                subscription = Subscription.objects.get(trainer=trainer)
-            except Subscription.DoesNotExist:
-                subscription = Subscription(plan='free')
+            entitlements = for_request(request)
             
             # Check plan hierarchy
-            plan_hierarchy = {
-                'free': 0,
-                'pro': 1,
-                'business': 2,
-            }
-            
-            current_level = plan_hierarchy.get(subscription.plan, 0)
-            required_level = plan_hierarchy.get(required_plan, 0)
-            
-            if current_level < required_level:
+            if not entitlements.has_plan(required_plan):
                 return Response({
                     'error': 'Plan upgrade required',
                     'detail': f'This feature requires {required_plan.capitalize()} plan or higher.',
-                    'current_plan': subscription.plan,
+                    'current_plan': entitlements.plan,
                     'required_plan': required_plan
                 }, status=status.HTTP_403_FORBIDDEN)
             
@@ -116,7 +101,7 @@ def require_feature(feature_name):
             ...
     
     Args:
-        feature_name: Feature key from subscription.can_access_feature()
+        feature_name: Feature key from Subscription.FEATURE_MATRIX
     """
     def decorator(func):
         @wraps(func)
@@ -128,22 +113,15 @@ def require_feature(feature_name):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            from .models import Subscription
-            trainer = request.user.trainer_profile
-            
-            # Get subscription
-            try:
-                subscription = Subscription.objects.get(trainer=trainer)
-            except Subscription.DoesNotExist:
-                subscription = Subscription(plan='free')
+            entitlements = for_request(request)
             
             # Check feature access
-            if not subscription.can_access_feature(feature_name):
+            if not entitlements.can_access_feature(feature_name):
                 return Response({
                     'error': 'Feature not available',
                     'detail': f'Your current plan does not include access to {feature_name}.',
                     'feature': feature_name,
-                    'current_plan': subscription.plan
+                    'current_plan': entitlements.plan
                 }, status=status.HTTP_403_FORBIDDEN)
             
             # Proceed with the original function
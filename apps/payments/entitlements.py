@@ -0,0 +1,161 @@
+"""
+Subscription entitlements.
+What a trainer's subscription allows - plan, status, feature matrix and
+usage limits - is resolved once per request: for_request() memoizes the
+Entitlements on the request, and get_entitlements() keeps them in the
+cache per trainer, so the middleware, permission classes, decorators and
+views share one lookup and most requests run no subscription query at
+all. Subscription signals drop the cached copy whenever the Paddle
+webhook handler, the subscription endpoints or the admin save a
+subscription.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Subscription
+
+
+CACHE_KEY = 'payments:entitlements:{trainer_id}'
+
+# Upper bound on staleness for changes no signal sees (queryset.update())
+CACHE_TIMEOUT = 3600
+
+# Statuses blocked by SubscriptionMiddleware when cancelling at period end
+BLOCKED_STATUSES = ['past_due', 'cancelled']
+
+# Workflows are a feature flag in the matrix; the number each plan allows
+WORKFLOW_LIMITS = {
+    'pro': 3,
+    'business': -1,
+}
+
+# Usage limit resource -> feature matrix key
+LIMIT_FEATURES = {
+    'clients': 'max_clients',
+    'pages': 'max_pages',
+}
+
+
+def cache_key(trainer_id):
+    return CACHE_KEY.format(trainer_id=trainer_id)
+
+
+class Entitlements:
+    """
+    What a trainer's subscription allows.
+    Trainers without a subscription get the active free tier.
+    """
+    
+    def __init__(self, trainer_id, plan='free', status='active',
+                 cancel_at_period_end=False, has_subscription=False):
+        self.trainer_id = trainer_id
+        self.plan = plan
+        self.status = status
+        self.cancel_at_period_end = cancel_at_period_end
+        self.has_subscription = has_subscription
+        self.features = Subscription.FEATURE_MATRIX.get(plan, {})
+        self.limits = {resource: self.limit(resource) for resource in ('clients', 'pages', 'workflows')}
+    
+    def __repr__(self):
+        return f"<Entitlements trainer={self.trainer_id} {self.plan} ({self.status})>"
+    
+    def is_active(self):
+        """Same as Subscription.is_active()."""
+        return self.status in ['active', 'trialing']
+    
+    def is_blocked(self):
+        """Whether SubscriptionMiddleware refuses the trainer's API requests."""
+        return self.status in BLOCKED_STATUSES and self.cancel_at_period_end
+    
+    def has_plan(self, required_plan):
+        """Whether the plan is required_plan or higher."""
+        levels = Subscription.PLAN_LEVELS
+        return levels.get(self.plan, 0) >= levels.get(required_plan, 0)
+    
+    def can_access_feature(self, feature):
+        """Same as Subscription.can_access_feature()."""
+        return self.features.get(feature, False)
+    
+    def limit(self, resource_type):
+        """
+        Usage limit for a resource.
+        
+        Args:
+            resource_type: 'clients', 'pages' or 'workflows'
+        
+        Returns:
+            int: Most resources allowed, -1 for unlimited (None for an
+                unknown resource)
+        """
+        if resource_type == 'workflows':
+            return WORKFLOW_LIMITS.get(self.plan, 0) if self.can_access_feature('workflows') else 0
+        if resource_type in LIMIT_FEATURES:
+            return self.can_access_feature(LIMIT_FEATURES[resource_type])
+        return None
+    
+    def to_cache(self):
+        return {
+            'plan': self.plan,
+            'status': self.status,
+            'cancel_at_period_end': self.cancel_at_period_end,
+            'has_subscription': self.has_subscription,
+        }
+
+
+def compute_entitlements(trainer_id):
+    """Entitlements of a trainer, read from the database."""
+    subscription = Subscription.objects.filter(trainer_id=trainer_id).values(
+        'plan', 'status', 'cancel_at_period_end'
+    ).first()
+    if subscription is None:
+        return Entitlements(trainer_id)
+    return Entitlements(trainer_id, has_subscription=True, **subscription)
+
+
+def get_entitlements(trainer):
+    """
+    Entitlements of a trainer, from the cache when available.
+    
+    Args:
+        trainer: Trainer instance or id
+    
+    Returns:
+        Entitlements
+    """
+    trainer_id = getattr(trainer, 'pk', trainer)
+    key = cache_key(trainer_id)
+    cached = cache.get(key)
+    if cached is not None:
+        return Entitlements(trainer_id, **cached)
+    
+    entitlements = compute_entitlements(trainer_id)
+    cache.set(key, entitlements.to_cache(), CACHE_TIMEOUT)
+    return entitlements
+
+
+def for_request(request):
+    """
+    Entitlements of the trainer making a request, looked up once per request.
+    
+    Works with Django and DRF requests alike: the result is memoized on the
+    underlying HttpRequest, which SubscriptionMiddleware and the view share.
+    
+    Returns:
+        Entitlements or None: None when the user is not a trainer
+    """
+    http_request = getattr(request, '_request', request)
+    user = request.user
+    memo = getattr(http_request, '_entitlements', None)
+    if memo is not None and memo[0] == user.pk:
+        return memo[1]
+    
+    trainer = getattr(user, 'trainer_profile', None) if user.is_authenticated else None
+    entitlements = get_entitlements(trainer) if trainer is not None else None
+    http_request._entitlements = (user.pk, entitlements)
+    return entitlements
+
+
+def invalidate(trainer_id):
+    """Drop a trainer's cached entitlements once the current transaction commits."""
+    if trainer_id:
+        transaction.on_commit(lambda: cache.delete(cache_key(trainer_id)))
@@ -0,0 +1,150 @@
+"""
+Monthly revenue ledger.
+RevenueLedger holds each trainer's client-payment total and count per
+month, payment method and currency. Creating, editing or deleting a
+ClientPayment applies the difference to the affected rows in the same
+transaction (see signals.py), so revenue summaries read a handful of
+ledger rows instead of scanning payments. rebuild() recomputes rows from
+the payments table for writes that bypass signals.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import ClientPayment, RevenueLedger
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def contribution(trainer_id, payment_date, payment_method, currency, amount):
+    """
+    Ledger entry a payment adds to.
+    
+    Returns:
+        tuple: ((trainer_id, month, payment_method, currency), amount)
+    """
+    return (trainer_id, month_of(payment_date), payment_method, currency), amount
+
+
+def payment_contribution(payment):
+    """Ledger contribution of a ClientPayment instance."""
+    if 'client' in payment._state.fields_cache:
+        trainer_id = payment.client.trainer_id
+    else:
+        from apps.clients.models import Client
+        trainer_id = Client.objects.filter(pk=payment.client_id).values_list('trainer_id', flat=True).first()
+    return contribution(
+        trainer_id, payment.payment_date, payment.payment_method, payment.currency, payment.amount
+    )
+
+
+def stored_contribution(stored):
+    """Ledger contribution of a payment row read by signals.client_payment_pre_save()."""
+    return contribution(
+        stored['client__trainer_id'],
+        stored['payment_date'],
+        stored['payment_method'],
+        stored['currency'],
+        stored['amount']
+    )
+
+
+def record(previous, current):
+    """
+    Apply the change between a payment's previous and current contribution.
+    
+    Args:
+        previous: Contribution before the write (None for inserts)
+        current: Contribution after the write (None for deletes)
+    """
+    deltas = defaultdict(lambda: [Decimal('0'), 0])
+    for entry, sign in ((previous, -1), (current, 1)):
+        if entry is None or entry[0][0] is None:
+            continue
+        key, amount = entry
+        deltas[key][0] += sign * Decimal(amount)
+        deltas[key][1] += sign
+    apply(deltas)
+
+
+def apply(deltas):
+    """
+    Add (total, count) deltas to ledger rows, creating rows as needed.
+    
+    Rows are updated in sorted key order so concurrent writers lock them
+    in the same order.
+    """
+    for key, (total, count) in sorted(deltas.items()):
+        if not total and not count:
+            continue
+        
+        trainer_id, month, payment_method, currency = key
+        rows = RevenueLedger.objects.filter(
+            trainer_id=trainer_id,
+            month=month,
+            payment_method=payment_method,
+            currency=currency
+        )
+        if rows.update(total=F('total') + total, count=F('count') + count):
+            continue
+        if count < 0:
+            # Removing a payment whose row is gone (e.g. deleted along with
+            # its trainer in the same cascade); nothing to subtract from
+            continue
+        
+        try:
+            with transaction.atomic():
+                RevenueLedger.objects.create(
+                    trainer_id=trainer_id,
+                    month=month,
+                    payment_method=payment_method,
+                    currency=currency,
+                    total=total,
+                    count=count
+                )
+        except IntegrityError:
+            # Created concurrently since the update above
+            rows.update(total=F('total') + total, count=F('count') + count)
+
+
+def rebuild(trainer_ids=None):
+    """
+    Replace ledger rows with totals recomputed from ClientPayment.
+    
+    Args:
+        trainer_ids: Only rebuild these trainers (default: all)
+    
+    Returns:
+        int: Number of ledger rows written
+    """
+    payments = ClientPayment.objects.all()
+    ledger = RevenueLedger.objects.all()
+    if trainer_ids is not None:
+        payments = payments.filter(client__trainer_id__in=trainer_ids)
+        ledger = ledger.filter(trainer_id__in=trainer_ids)
+    
+    rows = payments.annotate(month=TruncMonth('payment_date')).values(
+        'client__trainer_id', 'month', 'payment_method', 'currency'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+    
+    with transaction.atomic():
+        ledger.delete()
+        created = RevenueLedger.objects.bulk_create(
+            [
+                RevenueLedger(
+                    trainer_id=row['client__trainer_id'],
+                    month=row['month'],
+                    payment_method=row['payment_method'],
+                    currency=row['currency'],
+                    total=row['total'],
+                    count=row['count']
+                )
+                for row in rows
+            ],
+            batch_size=1000
+        )
+    return len(created)
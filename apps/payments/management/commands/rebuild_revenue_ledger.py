@@ -0,0 +1,22 @@
+"""
+Management command to rebuild the monthly revenue ledger from client payments
+"""
+from django.core.management.base import BaseCommand
+from apps.payments.ledger import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute monthly revenue ledger rows from ClientPayment'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trainer',
+            type=int,
+            action='append',
+            dest='trainer_ids',
+            help='Trainer ID to rebuild (repeatable, default: all trainers)'
+        )
+    
+    def handle(self, *args, **options):
+        rows = rebuild(options['trainer_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} revenue ledger rows'))
@@ -0,0 +1,42 @@
+"""
+Management command to verify (and optionally repair) client payment balances
+"""
+from django.core.management.base import BaseCommand
+from apps.payments.balances import find_drift, repair
+
+
+class Command(BaseCommand):
+    help = "Compare clients' total_paid, last_payment_date and payment_status with their payments"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trainer',
+            type=int,
+            action='append',
+            dest='trainer_ids',
+            help='Trainer ID whose clients to check (repeatable, default: all trainers)'
+        )
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Overwrite drifted balances with the values computed from payments'
+        )
+    
+    def handle(self, *args, **options):
+        drift = find_drift(options['trainer_ids'])
+        
+        for client, expected in drift[:20]:
+            self.stdout.write(
+                f'Client {client.id}: stored total_paid={client.total_paid} '
+                f'last_payment_date={client.last_payment_date} status={client.payment_status}, '
+                f"expected {expected['total_paid']} / {expected['last_payment_date']} / {expected['payment_status']}"
+            )
+        if len(drift) > 20:
+            self.stdout.write(f'... and {len(drift) - 20} more')
+        
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('All client balances match their payments'))
+        elif options['repair']:
+            self.stdout.write(self.style.SUCCESS(f'Repaired {repair(drift)} client balances'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} client balances drifted; rerun with --repair to fix'))
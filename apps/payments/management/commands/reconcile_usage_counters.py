@@ -0,0 +1,38 @@
+"""
+Management command to verify (and optionally repair) plan usage counters
+"""
+from django.core.management.base import BaseCommand
+from apps.payments.usage import find_drift, repair
+
+
+class Command(BaseCommand):
+    help = "Compare trainers' usage counters (active clients, pages, workflows) with their rows"
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--trainer',
+            type=int,
+            action='append',
+            dest='trainer_ids',
+            help='Trainer ID to check (repeatable, default: all trainers)'
+        )
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='Recount drifted counters from the rows'
+        )
+    
+    def handle(self, *args, **options):
+        drift = find_drift(options['trainer_ids'])
+        
+        for trainer_id, stored, expected in drift[:20]:
+            self.stdout.write(f'Trainer {trainer_id}: stored {stored or "no counter"}, expected {expected}')
+        if len(drift) > 20:
+            self.stdout.write(f'... and {len(drift) - 20} more')
+        
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('All usage counters match'))
+        elif options['repair']:
+            self.stdout.write(self.style.SUCCESS(f'Repaired {repair(drift)} usage counters'))
+        else:
+            self.stdout.write(self.style.WARNING(f'{len(drift)} usage counters drifted; rerun with --repair to fix'))
@@ -0,0 +1,67 @@
+"""
+Management command to reprocess Paddle webhook events from the inbox
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from apps.payments.models import WebhookEvent
+from apps.payments.webhook_inbox import process_key, replay
+
+
+class Command(BaseCommand):
+    help = 'Put webhook events (dead-lettered ones by default) back in the inbox for reprocessing'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--status',
+            action='append',
+            dest='statuses',
+            choices=[value for value, _ in WebhookEvent.STATUS_CHOICES],
+            help='Event status to replay (repeatable, default: dead)'
+        )
+        parser.add_argument(
+            '--event-id',
+            action='append',
+            dest='event_ids',
+            help='Only this event ID (repeatable)'
+        )
+        parser.add_argument('--event-type', help='Only this event type, e.g. subscription.updated')
+        parser.add_argument('--since', help='Only events received on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Only events received on or before this date (YYYY-MM-DD)')
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Process the events in this process instead of queuing worker tasks'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many events would be replayed'
+        )
+    
+    def handle(self, *args, **options):
+        events = WebhookEvent.objects.filter(status__in=options['statuses'] or ['dead'])
+        if options['event_ids']:
+            events = events.filter(event_id__in=options['event_ids'])
+        if options['event_type']:
+            events = events.filter(event_type=options['event_type'])
+        for option, lookup in (('since', 'created_at__date__gte'), ('until', 'created_at__date__lte')):
+            if options[option]:
+                day = parse_date(options[option])
+                if day is None:
+                    raise CommandError(f'Invalid --{option} date: {options[option]}')
+                events = events.filter(**{lookup: day})
+        
+        if options['dry_run']:
+            self.stdout.write(f'{events.count()} webhook events would be replayed')
+            return
+        
+        count, keys = replay(events, queue=not options['sync'])
+        if options['sync']:
+            applied = sum(process_key(key) for key in keys)
+            self.stdout.write(self.style.SUCCESS(
+                f'Replayed {count} webhook events; {applied} events applied across {len(keys)} keys'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Replayed {count} webhook events; queued {len(keys)} keys for processing'
+            ))
@@ -3,13 +3,15 @@ Subscription Middleware
 Checks subscription status and feature access on API requests.
 """
 from django.http import JsonResponse
-from .models import Subscription
+from .entitlements import for_request
 
 
 class SubscriptionMiddleware:
     """
     Middleware that checks subscription status for trainer requests.
     Blocks access if subscription is inactive (past_due, cancelled).
+    The entitlements looked up here are reused by the view's permission
+    checks (see entitlements.for_request).
     """
     
     def __init__(self, get_response):
@@ -36,24 +38,14 @@ class SubscriptionMiddleware:
             if request.user.is_superuser:
                 return self.get_response(request)
             
-            # Check if user is a trainer
-            if hasattr(request.user, 'trainer_profile'):
-                trainer = request.user.trainer_profile
-                
-                try:
-                    subscription = Subscription.objects.get(trainer=trainer)
-                    
-                    # Check if subscription is inactive
-                    if subscription.status in ['past_due', 'cancelled'] and subscription.cancel_at_period_end:
-                        return JsonResponse({
-                            'error': 'Subscription inactive',
-                            'detail': 'Your subscription is inactive. Please update your payment method.',
-                            'status': subscription.status
-                        }, status=403)
-                    
-                except Subscription.DoesNotExist:
-                    # No subscription = free tier, allow access
-                    pass
+            # Trainers only; no subscription = free tier, allow access
+            entitlements = for_request(request)
+            if entitlements is not None and entitlements.is_blocked():
+                return JsonResponse({
+                    'error': 'Subscription inactive',
+                    'detail': 'Your subscription is inactive. Please update your payment method.',
+                    'status': entitlements.status
+                }, status=403)
         
         response = self.get_response(request)
         return response
@@ -0,0 +1,16 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:02
+
+from django.db import migrations
+
+from apps.core.partitioning import PartitionByMonth
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_clientpayment'),
+    ]
+
+    operations = [
+        PartitionByMonth('webhookevent', 'created_at'),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_ledger(apps, schema_editor):
+    """Build the ledger from existing payments (same grouping as ledger.rebuild)."""
+    ClientPayment = apps.get_model('payments', 'ClientPayment')
+    RevenueLedger = apps.get_model('payments', 'RevenueLedger')
+    
+    rows = ClientPayment.objects.annotate(month=TruncMonth('payment_date')).values(
+        'client__trainer_id', 'month', 'payment_method', 'currency'
+    ).annotate(total=Sum('amount'), count=Count('id')).order_by()
+    RevenueLedger.objects.bulk_create(
+        (
+            RevenueLedger(
+                trainer_id=row['client__trainer_id'],
+                month=row['month'],
+                payment_method=row['payment_method'],
+                currency=row['currency'],
+                total=row['total'],
+                count=row['count']
+            )
+            for row in rows
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0003_client_clients_cli_trainer_1df325_idx_and_more'),
+        ('payments', '0004_partition_by_month'),
+        ('trainers', '0003_paymentlinks'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='RevenueLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('payment_method', models.CharField(max_length=50)),
+                ('currency', models.CharField(max_length=3)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('trainer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_ledger', to='trainers.trainer')),
+            ],
+            options={
+                'ordering': ['-month', 'payment_method', 'currency'],
+                'unique_together': {('trainer', 'month', 'payment_method', 'currency')},
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
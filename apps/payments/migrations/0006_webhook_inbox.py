@@ -0,0 +1,86 @@
+# Generated by Django 5.0.1 on 2026-10-19 07:44
+
+from django.db import migrations, models
+
+from apps.payments.webhook_inbox import ordering_key
+
+
+def backfill_inbox(apps, schema_editor):
+    """
+    Give logged events their inbox fields and claim their event IDs.
+    Events that were never processed are dead-lettered rather than
+    retried on deploy; replay_webhook_events can reprocess them.
+    """
+    WebhookEvent = apps.get_model('payments', 'WebhookEvent')
+    WebhookEventKey = apps.get_model('payments', 'WebhookEventKey')
+    
+    batch = []
+    
+    def flush():
+        WebhookEvent.objects.bulk_update(batch, ['status', 'ordering_key', 'occurred_at'])
+        WebhookEventKey.objects.bulk_create(
+            [WebhookEventKey(event_id=event.event_id) for event in batch],
+            ignore_conflicts=True
+        )
+        batch.clear()
+    
+    for event in WebhookEvent.objects.order_by('id').iterator(chunk_size=1000):
+        event.status = 'processed' if event.processed else 'dead'
+        event.ordering_key = ordering_key(event.payload or {})
+        event.occurred_at = event.created_at
+        batch.append(event)
+        if len(batch) >= 1000:
+            flush()
+    if batch:
+        flush()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_revenueledger'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEventKey',
+            fields=[
+                ('event_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='occurred_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='ordering_key',
+            field=models.CharField(blank=True, help_text='Events sharing a key (a Paddle subscription or customer) are processed in order', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('failed', 'Failed (will retry)'), ('processed', 'Processed'), ('dead', 'Dead-lettered')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='webhookevent',
+            index=models.Index(fields=['ordering_key', 'status', 'occurred_at'], name='payments_we_orderin_73e5cd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='webhookevent',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='payments_we_status_a02aee_idx'),
+        ),
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.1 on 2026-10-19 08:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    """Count every trainer's active clients, pages and workflows."""
+    Trainer = apps.get_model('trainers', 'Trainer')
+    UsageCounter = apps.get_model('payments', 'UsageCounter')
+    
+    def counts(relation, **filters):
+        rows = Trainer.objects.values('id').annotate(
+            count=Count(relation, filter=Q(**filters) if filters else None)
+        ).order_by()
+        return {row['id']: row['count'] for row in rows}
+    
+    active_clients = counts('clients', clients__is_active=True)
+    pages = counts('pages')
+    workflows = counts('workflows')
+    UsageCounter.objects.bulk_create(
+        (
+            UsageCounter(
+                trainer_id=trainer_id,
+                active_clients=active_clients.get(trainer_id, 0),
+                pages=pages.get(trainer_id, 0),
+                workflows=workflows.get(trainer_id, 0)
+            )
+            for trainer_id in Trainer.objects.values_list('id', flat=True)
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0003_client_clients_cli_trainer_1df325_idx_and_more'),
+        ('pages', '0001_initial'),
+        ('payments', '0006_webhook_inbox'),
+        ('trainers', '0003_paymentlinks'),
+        ('workflows', '0002_partition_by_month'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='UsageCounter',
+            fields=[
+                ('trainer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='trainers.trainer')),
+                ('active_clients', models.PositiveIntegerField(default=0)),
+                ('pages', models.PositiveIntegerField(default=0)),
+                ('workflows', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
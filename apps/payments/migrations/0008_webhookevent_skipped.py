@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+def skip_unhandled(apps, schema_editor):
+    """Release events that were retried only because their type has no handler."""
+    WebhookEvent = apps.get_model('payments', 'WebhookEvent')
+    WebhookEvent.objects.filter(
+        status__in=['failed', 'dead'],
+        error_message__startswith='Error processing webhook: Unhandled event type'
+    ).update(status='skipped', processed=True, next_attempt_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_usagecounter'),
+    ]
+    
+    operations = [
+        migrations.AlterField(
+            model_name='webhookevent',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('failed', 'Failed (will retry)'), ('processed', 'Processed'), ('skipped', 'Skipped (unhandled type)'), ('dead', 'Dead-lettered')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(skip_unhandled, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.1 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+from apps.core.partitioning import supports_partitioning
+
+
+def drop_event_id_unique(apps, schema_editor):
+    """
+    Drop the unique index on event_id.
+    
+    On PostgreSQL the monthly partitioning rebuilt it as a unique index on
+    (event_id, created_at), which Django's AlterField cannot find, so it is
+    dropped by introspection; elsewhere the plain unique constraint is
+    altered away as usual.
+    """
+    WebhookEvent = apps.get_model('payments', 'WebhookEvent')
+    table = WebhookEvent._meta.db_table
+    connection = schema_editor.connection
+    
+    if not supports_partitioning(connection):
+        old_field = WebhookEvent._meta.get_field('event_id')
+        new_field = models.CharField(max_length=255)
+        new_field.set_attributes_from_name('event_id')
+        schema_editor.alter_field(WebhookEvent, old_field, new_field)
+        return
+    
+    quote = schema_editor.quote_name
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    for name, info in constraints.items():
+        if info['unique'] and not info['primary_key'] and info['columns'][:1] == ['event_id']:
+            if info['index']:
+                schema_editor.execute(f'DROP INDEX {quote(name)}')
+            else:
+                schema_editor.execute(f'ALTER TABLE {quote(table)} DROP CONSTRAINT {quote(name)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_webhookevent_skipped'),
+    ]
+    
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='webhookevent',
+                    name='event_id',
+                    field=models.CharField(help_text='Unique through WebhookEventKey', max_length=255),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(drop_event_id_unique, migrations.RunPython.noop),
+            ],
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from apps.trainers.models import Trainer
 from apps.clients.models import Client
 from apps.users.models import User
@@ -23,6 +23,37 @@ class Subscription(models.Model):
         ('trialing', 'Trialing'),
     ]
     
+    # Plan order for "this plan or higher" checks
+    PLAN_LEVELS = {
+        'free': 0,
+        'pro': 1,
+        'business': 2,
+    }
+    
+    FEATURE_MATRIX = {
+        'free': {
+            'max_clients': 10,
+            'max_pages': 1,
+            'custom_domain': False,
+            'white_label': False,
+            'workflows': False,
+        },
+        'pro': {
+            'max_clients': -1,  # unlimited
+            'max_pages': 5,
+            'custom_domain': False,
+            'white_label': False,
+            'workflows': True,
+        },
+        'business': {
+            'max_clients': -1,  # unlimited
+            'max_pages': -1,  # unlimited
+            'custom_domain': True,
+            'white_label': True,
+            'workflows': True,
+        },
+    }
+    
     trainer = models.OneToOneField(Trainer, on_delete=models.CASCADE, related_name='subscription')
     paddle_subscription_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
     paddle_customer_id = models.CharField(max_length=255, null=True, blank=True)
@@ -53,30 +84,7 @@ class Subscription(models.Model):
     
     def can_access_feature(self, feature):
         """Check if plan allows access to a feature."""
-        feature_matrix = {
-            'free': {
-                'max_clients': 10,
-                'max_pages': 1,
-                'custom_domain': False,
-                'white_label': False,
-                'workflows': False,
-            },
-            'pro': {
-                'max_clients': -1,  # unlimited
-                'max_pages': 5,
-                'custom_domain': False,
-                'white_label': False,
-                'workflows': True,
-            },
-            'business': {
-                'max_clients': -1,  # unlimited
-                'max_pages': -1,  # unlimited
-                'custom_domain': True,
-                'white_label': True,
-                'workflows': True,
-            },
-        }
-        return feature_matrix.get(self.plan, {}).get(feature, False)
+        return self.FEATURE_MATRIX.get(self.plan, {}).get(feature, False)
 
 
 class Payment(models.Model):
@@ -119,10 +127,30 @@ class Payment(models.Model):
 class WebhookEvent(models.Model):
     """
     Log of all Paddle webhook events for debugging and audit.
+    Doubles as the inbox workers process events from (see webhook_inbox.py).
     """
-    event_id = models.CharField(max_length=255, unique=True)
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('failed', 'Failed (will retry)'),
+        ('processed', 'Processed'),
+        ('skipped', 'Skipped (unhandled type)'),
+        ('dead', 'Dead-lettered'),
+    ]
+    
+    # Not unique here: partitioning would scope the index to (event_id,
+    # created_at), so WebhookEventKey keeps event IDs unique
+    event_id = models.CharField(max_length=255, help_text="Unique through WebhookEventKey")
     event_type = models.CharField(max_length=100)
     payload = models.JSONField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    ordering_key = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Events sharing a key (a Paddle subscription or customer) are processed in order"
+    )
+    occurred_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
     processed = models.BooleanField(default=False)
     processed_at = models.DateTimeField(null=True, blank=True)
     error_message = models.TextField(null=True, blank=True)
@@ -134,10 +162,26 @@ class WebhookEvent(models.Model):
             models.Index(fields=['event_type', 'created_at']),
             models.Index(fields=['processed']),
             models.Index(fields=['event_id']),
+            models.Index(fields=['ordering_key', 'status', 'occurred_at']),
+            models.Index(fields=['status', 'next_attempt_at']),
         ]
     
     def __str__(self):
-        return f"{self.event_type} - {self.event_id} ({'Processed' if self.processed else 'Pending'})"
+        return f"{self.event_type} - {self.event_id} ({self.get_status_display()})"
+
+
+class WebhookEventKey(models.Model):
+    """
+    Event IDs of received webhooks.
+    WebhookEvent is partitioned by month on PostgreSQL, where its unique
+    index must include created_at; this plain table keeps event_id unique
+    across the whole log, so redeliveries are detected on insert.
+    """
+    event_id = models.CharField(max_length=255, primary_key=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.event_id
 
 
 class ClientPayment(models.Model):
@@ -181,5 +225,55 @@ class ClientPayment(models.Model):
             models.Index(fields=['recorded_by', 'payment_date']),
         ]
     
+    def save(self, *args, **kwargs):
+        # The revenue ledger is updated by signals inside the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
     def __str__(self):
         return f"{self.client.get_full_name()} - {self.currency} {self.amount} ({self.payment_method})"
+
+
+class RevenueLedger(models.Model):
+    """
+    Monthly totals of a trainer's client payments per method and currency.
+    Kept in step with ClientPayment by signals (see ledger.py).
+    """
+    trainer = models.ForeignKey(Trainer, on_delete=models.CASCADE, related_name='revenue_ledger')
+    month = models.DateField()  # First day of the month
+    payment_method = models.CharField(max_length=50)
+    currency = models.CharField(max_length=3)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-month', 'payment_method', 'currency']
+        unique_together = ['trainer', 'month', 'payment_method', 'currency']
+    
+    def __str__(self):
+        return f"{self.trainer.business_name} {self.month:%Y-%m} {self.payment_method} {self.currency} {self.total}"
+
+
+class UsageCounter(models.Model):
+    """
+    A trainer's usage of the resources plans limit.
+    Kept in step by signals and enforced with conditional increments
+    (see usage.py); reconciled with the actual rows periodically.
+    """
+    trainer = models.OneToOneField(
+        Trainer,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='usage'
+    )
+    active_clients = models.PositiveIntegerField(default=0)
+    pages = models.PositiveIntegerField(default=0)
+    workflows = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return (
+            f"{self.trainer.business_name}: {self.active_clients} clients, "
+            f"{self.pages} pages, {self.workflows} workflows"
+        )
@@ -11,12 +11,16 @@ from django.conf import settings
 from django.utils import timezone
 from django.db import transaction
 
-from .models import Subscription, Payment, WebhookEvent
+from .models import Subscription, Payment
 from apps.trainers.models import Trainer
 
 logger = logging.getLogger(__name__)
 
 
+class UnhandledEventType(ValueError):
+    """A webhook event type this handler does not act on."""
+
+
 class PaddleWebhookHandler:
     """
     Handles Paddle webhook events.
@@ -50,63 +54,50 @@ class PaddleWebhookHandler:
         # For now, return True for development
         return True
     
+    def dispatch(self):
+        """
+        Apply the event to subscriptions and payments in one transaction.
+        
+        Raises:
+            UnhandledEventType: No handler for the event type
+            Exception: Whatever the event's handler raises
+        """
+        handler_map = {
+            'subscription.created': self.handle_subscription_created,
+            'subscription.updated': self.handle_subscription_updated,
+            'subscription.canceled': self.handle_subscription_canceled,
+            'subscription.past_due': self.handle_subscription_past_due,
+            'subscription.paused': self.handle_subscription_paused,
+            'subscription.resumed': self.handle_subscription_resumed,
+            'transaction.completed': self.handle_transaction_completed,
+            'transaction.payment_failed': self.handle_transaction_failed,
+        }
+        
+        handler = handler_map.get(self.event_type)
+        if not handler:
+            raise UnhandledEventType(f"Unhandled event type: {self.event_type}")
+        
+        with transaction.atomic():
+            return handler()
+    
     def process(self):
         """
-        Process the webhook event.
+        Process the webhook event synchronously.
+        The webhook endpoint only stores events; workers apply them through
+        webhook_inbox, which records the outcome on the WebhookEvent.
         Returns (success: bool, message: str)
         """
-        # Log the event
-        webhook_event = WebhookEvent.objects.create(
-            event_id=self.event_id,
-            event_type=self.event_type,
-            payload=self.payload,
-            processed=False
-        )
-        
         try:
             # Verify signature
             if not self.verify_signature():
-                error_msg = "Invalid webhook signature"
-                webhook_event.error_message = error_msg
-                webhook_event.save()
-                return False, error_msg
-            
-            # Route to appropriate handler
-            handler_map = {
-                'subscription.created': self.handle_subscription_created,
-                'subscription.updated': self.handle_subscription_updated,
-                'subscription.canceled': self.handle_subscription_canceled,
-                'subscription.past_due': self.handle_subscription_past_due,
-                'subscription.paused': self.handle_subscription_paused,
-                'subscription.resumed': self.handle_subscription_resumed,
-                'transaction.completed': self.handle_transaction_completed,
-                'transaction.payment_failed': self.handle_transaction_failed,
-            }
-            
-            handler = handler_map.get(self.event_type)
-            if not handler:
-                error_msg = f"Unhandled event type: {self.event_type}"
-                logger.warning(error_msg)
-                webhook_event.error_message = error_msg
-                webhook_event.save()
-                return False, error_msg
-            
-            # Execute handler
-            with transaction.atomic():
-                result = handler()
-            
-            # Mark as processed
-            webhook_event.processed = True
-            webhook_event.processed_at = timezone.now()
-            webhook_event.save()
+                return False, "Invalid webhook signature"
             
+            self.dispatch()
             return True, f"Successfully processed {self.event_type}"
-            
+        
         except Exception as e:
             error_msg = f"Error processing webhook: {str(e)}"
             logger.error(error_msg, exc_info=True)
-            webhook_event.error_message = error_msg
-            webhook_event.save()
             return False, error_msg
     
     def get_or_create_trainer(self, customer_id, customer_email=None):
@@ -3,7 +3,8 @@ Subscription-based Permission Classes
 Enforce feature access based on subscription tier.
 """
 from rest_framework import permissions
-from .models import Subscription
+from .entitlements import for_request, get_entitlements
+from .usage import RESOURCE_FIELDS, get_counter
 
 
 class RequiresPlan(permissions.BasePermission):
@@ -31,33 +32,17 @@ class RequiresPlan(permissions.BasePermission):
         if not hasattr(request.user, 'trainer_profile'):
             return False
         
-        trainer = request.user.trainer_profile
-        
-        # Get subscription
-        try:
-            subscription = Subscription.objects.get(trainer=trainer)
-        except Subscription.DoesNotExist:
-            # No subscription = free tier
-            subscription = Subscription(plan='free')
+        entitlements = for_request(request)
         
         # Check if subscription is active
-        if not subscription.is_active():
+        if not entitlements.is_active():
             return False
         
         # Get required plan from view if available
         required_plan = getattr(view, 'required_plan', self.required_plan)
         
         # Check plan hierarchy: business > pro > free
-        plan_hierarchy = {
-            'free': 0,
-            'pro': 1,
-            'business': 2,
-        }
-        
-        current_level = plan_hierarchy.get(subscription.plan, 0)
-        required_level = plan_hierarchy.get(required_plan, 0)
-        
-        return current_level >= required_level
+        return entitlements.has_plan(required_plan)
 
 
 class RequiresActiveSubscription(permissions.BasePermission):
@@ -75,15 +60,8 @@ class RequiresActiveSubscription(permissions.BasePermission):
         if not hasattr(request.user, 'trainer_profile'):
             return False
         
-        trainer = request.user.trainer_profile
-        
-        # Get subscription
-        try:
-            subscription = Subscription.objects.get(trainer=trainer)
-            return subscription.is_active()
-        except Subscription.DoesNotExist:
-            # Free tier is always "active"
-            return True
+        # Free tier (no subscription) is always "active"
+        return for_request(request).is_active()
 
 
 class RequiresFeature(permissions.BasePermission):
@@ -111,16 +89,10 @@ class RequiresFeature(permissions.BasePermission):
         if not hasattr(request.user, 'trainer_profile'):
             return False
         
-        trainer = request.user.trainer_profile
-        
-        # Get subscription
-        try:
-            subscription = Subscription.objects.get(trainer=trainer)
-        except Subscription.DoesNotExist:
-            subscription = Subscription(plan='free')
+        entitlements = for_request(request)
         
         # Check if subscription is active
-        if not subscription.is_active():
+        if not entitlements.is_active():
             return False
         
         # Get feature from view if available
@@ -129,45 +101,31 @@ class RequiresFeature(permissions.BasePermission):
         if not feature:
             return True
         
-        return subscription.can_access_feature(feature)
+        return entitlements.can_access_feature(feature)
 
 
-def check_usage_limit(trainer, resource_type):
+def check_usage_limit(trainer, resource_type, entitlements=None):
     """
     Check if trainer has reached usage limit for a resource.
     
+    Reads the trainer's usage counter; creates should still run inside
+    usage.enforce_limit(), which takes the limit atomically.
+    
     Args:
         trainer: Trainer instance
         resource_type: 'clients', 'pages', 'workflows'
+        entitlements: The trainer's Entitlements, if already looked up
+            (e.g. for_request(request))
     
     Returns:
         tuple: (can_create: bool, current_count: int, limit: int)
     """
-    from apps.clients.models import Client
-    
-    # Get subscription
-    try:
-        subscription = Subscription.objects.get(trainer=trainer)
-    except Subscription.DoesNotExist:
-        subscription = Subscription(plan='free')
-    
-    # Get current count
-    if resource_type == 'clients':
-        current_count = Client.objects.filter(trainer=trainer, is_active=True).count()
-        limit = subscription.can_access_feature('max_clients')
-    elif resource_type == 'pages':
-        from apps.pages.models import Page
-        current_count = Page.objects.filter(trainer=trainer).count()
-        limit = subscription.can_access_feature('max_pages')
-    elif resource_type == 'workflows':
-        from apps.workflows.models import Workflow
-        current_count = Workflow.objects.filter(trainer=trainer).count()
-        limit = subscription.can_access_feature('workflows')
-        if isinstance(limit, bool):
-            limit = 3 if subscription.plan == 'pro' else (-1 if subscription.plan == 'business' else 0)
-    else:
+    if resource_type not in RESOURCE_FIELDS:
         return False, 0, 0
     
+    limit = (entitlements or get_entitlements(trainer)).limit(resource_type)
+    current_count = getattr(get_counter(trainer.pk), RESOURCE_FIELDS[resource_type])
+    
     # -1 means unlimited
     if limit == -1:
         return True, current_count, limit
@@ -175,4 +133,3 @@ def check_usage_limit(trainer, resource_type):
     # Check if limit reached
     can_create = current_count < limit
     return can_create, current_count, limit
-
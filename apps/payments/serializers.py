@@ -53,7 +53,8 @@ class WebhookEventSerializer(serializers.ModelSerializer):
     class Meta:
         model = WebhookEvent
         fields = [
-            'id', 'event_id', 'event_type', 'payload', 'processed',
+            'id', 'event_id', 'event_type', 'payload', 'status', 'ordering_key',
+            'occurred_at', 'attempts', 'next_attempt_at', 'processed',
             'processed_at', 'error_message', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
@@ -0,0 +1,115 @@
+"""
+Django signals keeping the monthly revenue ledger and client balances in
+step with client payments, cached entitlements with subscriptions, and
+usage counters with clients, pages and workflows
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from apps.clients.models import Client
+from apps.pages.models import Page
+from apps.workflows.models import Workflow
+from . import balances, entitlements, ledger, usage
+from .models import ClientPayment, Subscription
+
+
+# Counted model -> usage resource (clients are handled separately, only
+# active ones count)
+USAGE_RESOURCES = {
+    Page: 'pages',
+    Workflow: 'workflows',
+}
+
+
+def _balance(payment):
+    return payment.client_id, payment.amount, payment.payment_date
+
+
+@receiver(pre_save, sender=ClientPayment)
+def client_payment_pre_save(sender, instance, **kwargs):
+    """Remember the stored payment's ledger and balance contributions."""
+    stored = ClientPayment.objects.filter(pk=instance.pk).values(
+        'client_id', 'client__trainer_id', 'payment_date', 'payment_method', 'currency', 'amount'
+    ).first() if instance.pk else None
+    
+    instance._stored_values = stored
+    instance._ledger_contribution = ledger.stored_contribution(stored) if stored else None
+    instance._balance_contribution = (
+        (stored['client_id'], stored['amount'], stored['payment_date']) if stored else None
+    )
+
+
+def stored_values(payment):
+    """
+    Values a client payment had in the database before the current save.
+    
+    Returns:
+        dict or None: The stored row read by client_payment_pre_save, None
+            for new payments
+    """
+    return getattr(payment, '_stored_values', None)
+
+
+@receiver(post_save, sender=ClientPayment)
+def client_payment_saved(sender, instance, **kwargs):
+    ledger.record(
+        getattr(instance, '_ledger_contribution', None),
+        ledger.payment_contribution(instance)
+    )
+    balances.record(getattr(instance, '_balance_contribution', None), _balance(instance))
+
+
+@receiver(post_delete, sender=ClientPayment)
+def client_payment_deleted(sender, instance, **kwargs):
+    ledger.record(ledger.payment_contribution(instance), None)
+    balances.record(_balance(instance), None)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def subscription_changed(sender, instance, **kwargs):
+    """Plan or status changes (webhooks, subscription endpoints, admin) reach the next request."""
+    entitlements.invalidate(instance.trainer_id)
+
+
+def _counted_client(trainer_id, is_active):
+    return trainer_id if is_active else None
+
+
+@receiver(pre_save, sender=Client)
+def client_pre_save(sender, instance, update_fields=None, **kwargs):
+    """Remember whom the stored client counted for."""
+    if not instance.pk:
+        instance._usage_counted = None
+    elif update_fields is not None and not {'trainer', 'is_active'} & set(update_fields):
+        # Neither field is written: the client counts as it did
+        instance._usage_counted = _counted_client(instance.trainer_id, instance.is_active)
+    else:
+        stored = Client.objects.filter(pk=instance.pk).values('trainer_id', 'is_active').first()
+        instance._usage_counted = _counted_client(**stored) if stored else None
+
+
+@receiver(post_save, sender=Client)
+def client_saved(sender, instance, **kwargs):
+    usage.record(
+        'clients',
+        getattr(instance, '_usage_counted', None),
+        _counted_client(instance.trainer_id, instance.is_active)
+    )
+
+
+@receiver(post_delete, sender=Client)
+def client_deleted(sender, instance, **kwargs):
+    usage.record('clients', _counted_client(instance.trainer_id, instance.is_active), None)
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_save, sender=Workflow)
+def usage_resource_saved(sender, instance, created, **kwargs):
+    if created:
+        usage.record(USAGE_RESOURCES[sender], None, instance.trainer_id)
+
+
+@receiver(post_delete, sender=Page)
+@receiver(post_delete, sender=Workflow)
+def usage_resource_deleted(sender, instance, **kwargs):
+    usage.record(USAGE_RESOURCES[sender], instance.trainer_id, None)
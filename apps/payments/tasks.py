@@ -0,0 +1,47 @@
+"""
+Celery tasks for processing Paddle webhooks from the inbox and
+reconciling usage counters
+"""
+from celery import shared_task
+from django.conf import settings
+
+from . import usage, webhook_inbox
+
+
+@shared_task
+def process_webhook_key(key):
+    """
+    Apply the inbox events of one ordering key, in order.
+    Queued when an event arrives or is replayed.
+    """
+    try:
+        return webhook_inbox.process_key(key)
+    except Exception as e:
+        print(f"Error processing webhook events for {key}: {str(e)}")
+        return 0
+
+
+@shared_task
+def process_webhook_inbox():
+    """
+    Queue the ordering keys with retries due or stalled pending events.
+    Runs every minute via Celery beat.
+    """
+    keys = webhook_inbox.due_keys(settings.PADDLE_WEBHOOK_SWEEP_KEYS)
+    for key in keys:
+        process_webhook_key.delay(key)
+    return len(keys)
+
+
+@shared_task
+def reconcile_usage_counters():
+    """
+    Recount trainers whose usage counters drifted from their rows.
+    Runs hourly via Celery beat.
+    """
+    try:
+        drift = usage.find_drift()
+        return usage.repair(drift)
+    except Exception as e:
+        print(f"Error reconciling usage counters: {str(e)}")
+        return 0
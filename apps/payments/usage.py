@@ -0,0 +1,215 @@
+"""
+Plan usage counters.
+Each trainer's active clients, pages and workflows are counted in one
+UsageCounter row, kept in step by signals (see signals.py) with one
+atomic UPDATE per write instead of COUNT(*) queries. Creates made inside
+enforce_limit() increment conditionally - the UPDATE only matches while
+the counter is under the plan limit - so the limit is checked and taken
+in the same statement and concurrent creates cannot both slip under it:
+the second one waits on the counter row and then sees the first.
+Writes that bypass signals (bulk_create, queryset.update/delete) drift
+the counters until find_drift()/repair() reconcile them (hourly task and
+the reconcile_usage_counters command).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.clients.models import Client
+from apps.core.exports import related_count
+from apps.pages.models import Page
+from apps.trainers.models import Trainer
+from apps.workflows.models import Workflow
+from .entitlements import get_entitlements
+from .models import UsageCounter
+
+
+# Usage limit resource -> UsageCounter field
+RESOURCE_FIELDS = {
+    'clients': 'active_clients',
+    'pages': 'pages',
+    'workflows': 'workflows',
+}
+
+# (trainer_id, resource_type) -> limit enforced by enforce_limit()
+_limits = ContextVar('usage_limits', default=None)
+
+
+class UsageLimitReached(Exception):
+    """A create would take a trainer over their plan's limit."""
+    
+    def __init__(self, resource_type, current_count, limit):
+        self.resource_type = resource_type
+        self.current_count = current_count
+        self.limit = limit
+        super().__init__(f"Limit of {limit} {resource_type} reached")
+
+
+def count_usage(trainer_ids=None):
+    """
+    Count trainers' resources from their rows.
+    
+    Args:
+        trainer_ids: Only count these trainers (default: all)
+    
+    Returns:
+        dict: trainer_id -> {UsageCounter field: count}
+    """
+    trainers = Trainer.objects.all()
+    if trainer_ids is not None:
+        trainers = trainers.filter(pk__in=trainer_ids)
+    
+    rows = trainers.order_by().values('id').annotate(
+        active_clients=related_count(Client.objects.filter(is_active=True), 'trainer'),
+        pages=related_count(Page.objects.all(), 'trainer'),
+        workflows=related_count(Workflow.objects.all(), 'trainer')
+    )
+    return {row.pop('id'): row for row in rows}
+
+
+def get_counter(trainer_id):
+    """A trainer's UsageCounter, counted from their rows if it is missing."""
+    counter = UsageCounter.objects.filter(pk=trainer_id).first()
+    if counter is None:
+        counter, _ = UsageCounter.objects.get_or_create(
+            trainer_id=trainer_id,
+            defaults=count_usage([trainer_id]).get(trainer_id, {})
+        )
+    return counter
+
+
+def increment(trainer_id, resource_type, limit=None):
+    """
+    Count a new resource of a trainer.
+    
+    Args:
+        trainer_id: Trainer the resource belongs to
+        resource_type: 'clients', 'pages' or 'workflows'
+        limit: Refuse the increment at this count (None or -1: unlimited)
+    
+    Raises:
+        UsageLimitReached: The counter is already at the limit
+    """
+    field = RESOURCE_FIELDS[resource_type]
+    counters = UsageCounter.objects.filter(pk=trainer_id)
+    if limit is not None and limit != -1:
+        counters = counters.filter(**{f'{field}__lt': limit})
+    if counters.update(**{field: F(field) + 1, 'updated_at': timezone.now()}):
+        return
+    
+    counter = UsageCounter.objects.filter(pk=trainer_id).first()
+    if counter is None:
+        # First write for the trainer: counted from the rows, the new one included
+        counter = get_counter(trainer_id)
+        if limit is None or limit == -1 or getattr(counter, field) <= limit:
+            return
+    raise UsageLimitReached(resource_type, getattr(counter, field), limit)
+
+
+def decrement(trainer_id, resource_type):
+    """
+    Count a removed resource of a trainer.
+    A missing counter is left alone (the trainer may be being deleted).
+    """
+    field = RESOURCE_FIELDS[resource_type]
+    UsageCounter.objects.filter(pk=trainer_id, **{f'{field}__gt': 0}).update(
+        **{field: F(field) - 1, 'updated_at': timezone.now()}
+    )
+
+
+def record(resource_type, previous, current):
+    """
+    Apply a resource write to the counters.
+    
+    Args:
+        resource_type: 'clients', 'pages' or 'workflows'
+        previous: Trainer id the resource counted for before the write
+            (None for inserts, or if it did not count)
+        current: Trainer id it counts for after the write (None for
+            deletes, or if it no longer counts)
+    """
+    if previous == current:
+        return
+    if previous is not None:
+        decrement(previous, resource_type)
+    if current is not None:
+        limits = _limits.get() or {}
+        increment(current, resource_type, limits.get((current, resource_type)))
+
+
+@contextmanager
+def enforce_limit(trainer, resource_type, entitlements=None):
+    """
+    Enforce a trainer's plan limit on the resources created in the block.
+    
+    The block runs in a transaction; a create that would exceed the limit
+    raises UsageLimitReached and rolls the block back.
+    
+    Usage:
+        with enforce_limit(trainer, 'pages', for_request(request)):
+            serializer.save(trainer=trainer)
+    
+    Args:
+        trainer: Trainer instance
+        resource_type: 'clients', 'pages' or 'workflows'
+        entitlements: The trainer's Entitlements, if already looked up
+    
+    Yields:
+        int: The limit (-1 for unlimited)
+    """
+    limit = (entitlements or get_entitlements(trainer)).limit(resource_type)
+    token = _limits.set({**(_limits.get() or {}), (trainer.pk, resource_type): limit})
+    try:
+        with transaction.atomic():
+            yield limit
+    finally:
+        _limits.reset(token)
+
+
+def find_drift(trainer_ids=None):
+    """
+    Trainers whose counters disagree with their rows.
+    
+    Args:
+        trainer_ids: Only check these trainers (default: all)
+    
+    Returns:
+        list: (trainer_id, stored, expected) tuples; stored is None when
+            the trainer has no counter yet
+    """
+    counters = UsageCounter.objects.values('trainer_id', *RESOURCE_FIELDS.values())
+    if trainer_ids is not None:
+        counters = counters.filter(trainer_id__in=trainer_ids)
+    stored = {row.pop('trainer_id'): row for row in counters}
+    
+    return [
+        (trainer_id, stored.get(trainer_id), expected)
+        for trainer_id, expected in sorted(count_usage(trainer_ids).items())
+        if stored.get(trainer_id) != expected
+    ]
+
+
+def repair(drift):
+    """
+    Recount drifted trainers and store the result.
+    
+    Each trainer is recounted while their counter row is locked, so
+    creates and deletes running concurrently are neither lost nor counted
+    twice.
+    
+    Args:
+        drift: Tuples returned by find_drift()
+    
+    Returns:
+        int: Number of counters repaired
+    """
+    for trainer_id, _, _ in drift:
+        with transaction.atomic():
+            counter, _ = UsageCounter.objects.select_for_update().get_or_create(trainer_id=trainer_id)
+            expected = count_usage([trainer_id]).get(trainer_id, {})
+            for field, value in expected.items():
+                setattr(counter, field, value)
+            counter.save()
+    return len(drift)
@@ -1,68 +1,103 @@
 """
 Utility functions for revenue calculations and reporting.
 """
-from django.db.models import Sum, Count, Q
+from calendar import monthrange
+from datetime import datetime, timedelta
+from django.db.models import Count, Sum
 from django.utils import timezone
-from datetime import timedelta
-from .models import ClientPayment
+from django.utils.dateparse import parse_date
 
+from apps.core.exports import format_datetime, iterate
+from .models import ClientPayment, RevenueLedger
 
-def get_revenue_by_period(trainer, start_date, end_date):
+
+def summarize_revenue(rows):
     """
-    Calculate total revenue for a trainer within a date range.
-    
-    Args:
-        trainer: Trainer instance
-        start_date: Start date (datetime or date)
-        end_date: End date (datetime or date)
+    Revenue figures from (payment_method, currency, total, count) rows.
     
     Returns:
         dict: {
-            'total': Decimal,
+            'total': float,
             'count': int,
             'by_method': {method: amount},
             'by_currency': {currency: amount}
         }
     """
-    from apps.clients.models import Client
-    
-    client_ids = Client.objects.filter(trainer=trainer).values_list('id', flat=True)
-    
-    payments = ClientPayment.objects.filter(
-        client_id__in=client_ids,
-        payment_date__gte=start_date,
-        payment_date__lte=end_date
-    )
-    
-    total = payments.aggregate(Sum('amount'))['amount__sum'] or 0
-    count = payments.count()
-    
-    # Revenue by payment method
+    total = 0
+    count = 0
     by_method = {}
-    for method, _ in ClientPayment.PAYMENT_METHODS:
-        method_total = payments.filter(payment_method=method).aggregate(Sum('amount'))['amount__sum'] or 0
-        if method_total > 0:
-            by_method[method] = float(method_total)
-    
-    # Revenue by currency
     by_currency = {}
-    for currency in payments.values_list('currency', flat=True).distinct():
-        currency_total = payments.filter(currency=currency).aggregate(Sum('amount'))['amount__sum'] or 0
-        if currency_total > 0:
-            by_currency[currency] = float(currency_total)
+    for payment_method, currency, amount, payments in rows:
+        total += amount
+        count += payments
+        by_method[payment_method] = by_method.get(payment_method, 0) + amount
+        by_currency[currency] = by_currency.get(currency, 0) + amount
     
     return {
         'total': float(total),
         'count': count,
-        'by_method': by_method,
-        'by_currency': by_currency,
+        'by_method': {method: float(amount) for method, amount in by_method.items() if amount > 0},
+        'by_currency': {currency: float(amount) for currency, amount in by_currency.items() if amount > 0},
     }
 
 
+def _whole_months(start_date, end_date):
+    """Whether a range starts on a month's first day and ends on a month's last day."""
+    return start_date.day == 1 and end_date.day == monthrange(end_date.year, end_date.month)[1]
+
+
+def get_revenue_by_period(trainer, start_date, end_date):
+    """
+    Calculate total revenue for a trainer within a date range.
+    
+    Ranges made of whole months are read from the revenue ledger; other
+    ranges take one query grouping the trainer's payments by method and
+    currency.
+    
+    Args:
+        trainer: Trainer instance
+        start_date: Start date (datetime or date)
+        end_date: End date (datetime or date)
+    
+    Returns:
+        dict: {
+            'total': float,
+            'count': int,
+            'by_method': {method: amount},
+            'by_currency': {currency: amount}
+        }
+    """
+    if isinstance(start_date, datetime):
+        start_date = start_date.date()
+    if isinstance(end_date, datetime):
+        end_date = end_date.date()
+    
+    if _whole_months(start_date, end_date):
+        rows = RevenueLedger.objects.filter(
+            trainer=trainer,
+            month__gte=start_date,
+            month__lte=end_date
+        ).values_list('payment_method', 'currency', 'total', 'count')
+    else:
+        rows = ClientPayment.objects.filter(
+            client__trainer=trainer,
+            payment_date__gte=start_date,
+            payment_date__lte=end_date
+        ).values('payment_method', 'currency').annotate(
+            total=Sum('amount'),
+            count=Count('id')
+        ).order_by().values_list('payment_method', 'currency', 'total', 'count')
+    
+    return summarize_revenue(rows)
+
+
 def get_revenue_summary(trainer):
     """
     Get revenue summary for a trainer (this month, last month, all time).
     
+    Revenue comes from the trainer's revenue ledger rows in one query;
+    months after the current one are left out of all time.
+    
     Returns:
         dict: {
             'this_month': {...},
@@ -70,37 +105,40 @@ def get_revenue_summary(trainer):
             'all_time': {...},
             'unpaid_clients': {
                 'count': int,
-                'total_amount': Decimal
+                'total_amount': float
             }
         }
     """
+    from apps.clients.models import Client
+    
     now = timezone.now().date()
     this_month_start = now.replace(day=1)
     last_month_start = (this_month_start - timedelta(days=1)).replace(day=1)
-    last_month_end = this_month_start - timedelta(days=1)
     
-    this_month = get_revenue_by_period(trainer, this_month_start, now)
-    last_month = get_revenue_by_period(trainer, last_month_start, last_month_end)
-    # For all time, use a very early date
-    all_time_start = timezone.now().date().replace(year=2000, month=1, day=1)
-    all_time = get_revenue_by_period(trainer, all_time_start, now)
+    months = {this_month_start: [], last_month_start: []}
+    all_time = []
+    for month, payment_method, currency, total, count in RevenueLedger.objects.filter(
+        trainer=trainer,
+        month__lte=this_month_start
+    ).values_list('month', 'payment_method', 'currency', 'total', 'count'):
+        row = (payment_method, currency, total, count)
+        all_time.append(row)
+        if month in months:
+            months[month].append(row)
     
     # Unpaid clients
-    from apps.clients.models import Client
-    unpaid_clients = Client.objects.filter(
+    unpaid = Client.objects.filter(
         trainer=trainer,
         payment_status__in=['unpaid', 'partial']
-    )
-    unpaid_count = unpaid_clients.count()
-    unpaid_total = sum(float(client.total_paid or 0) for client in unpaid_clients)
+    ).aggregate(count=Count('id'), total_amount=Sum('total_paid'))
     
     return {
-        'this_month': this_month,
-        'last_month': last_month,
-        'all_time': all_time,
+        'this_month': summarize_revenue(months[this_month_start]),
+        'last_month': summarize_revenue(months[last_month_start]),
+        'all_time': summarize_revenue(all_time),
         'unpaid_clients': {
-            'count': unpaid_count,
-            'total_amount': unpaid_total,
+            'count': unpaid['count'],
+            'total_amount': float(unpaid['total_amount'] or 0),
         }
     }
 
@@ -124,3 +162,51 @@ def get_recent_payments(trainer, limit=10):
         client_id__in=client_ids
     ).select_related('client', 'recorded_by').order_by('-payment_date', '-created_at')[:limit]
 
+
+PAYMENT_EXPORT_HEADER = [
+    'Date', 'Client', 'Email', 'Amount', 'Currency', 'Payment Method',
+    'Reference ID', 'Notes', 'Recorded By', 'Created At'
+]
+
+
+def get_payment_export_queryset(trainer, start_date=None, end_date=None):
+    """
+    Get a trainer's payments for export, newest first.
+    
+    Args:
+        trainer: Trainer instance
+        start_date: Earliest payment date (YYYY-MM-DD string or date, optional)
+        end_date: Latest payment date (YYYY-MM-DD string or date, optional)
+    
+    Returns:
+        QuerySet: ClientPayment objects with client and recorded_by joined
+    """
+    payments = ClientPayment.objects.filter(client__trainer=trainer).select_related(
+        'client', 'recorded_by'
+    )
+    if isinstance(start_date, str):
+        start_date = parse_date(start_date)
+    if isinstance(end_date, str):
+        end_date = parse_date(end_date)
+    if start_date:
+        payments = payments.filter(payment_date__gte=start_date)
+    if end_date:
+        payments = payments.filter(payment_date__lte=end_date)
+    return payments.order_by('-payment_date', '-created_at')
+
+
+def payment_export_rows(payments):
+    """Yield one PAYMENT_EXPORT_HEADER row per payment, streaming the queryset."""
+    for payment in iterate(payments):
+        yield [
+            payment.payment_date.strftime('%Y-%m-%d'),
+            payment.client.get_full_name(),
+            payment.client.email,
+            payment.amount,
+            payment.currency,
+            payment.get_payment_method_display(),
+            payment.reference_id or '',
+            payment.notes or '',
+            payment.recorded_by.email if payment.recorded_by else '',
+            format_datetime(payment.created_at),
+        ]
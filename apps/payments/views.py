@@ -4,21 +4,24 @@ Handles Paddle webhooks and subscription management endpoints.
 """
 import json
 import logging
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.http import HttpResponse
-import csv
-from io import StringIO
 
+from apps.core.exports import streaming_csv_response
 from .models import Subscription, Payment, WebhookEvent, ClientPayment
 from .serializers import SubscriptionSerializer, PaymentSerializer, ClientPaymentSerializer
-from .utils import get_revenue_summary, get_recent_payments
+from .utils import (
+    get_revenue_summary, get_recent_payments, get_payment_export_queryset,
+    payment_export_rows, PAYMENT_EXPORT_HEADER
+)
+from .entitlements import for_request
 from .paddle_webhooks import PaddleWebhookHandler
+from . import webhook_inbox
 
 logger = logging.getLogger(__name__)
 
@@ -28,30 +31,35 @@ logger = logging.getLogger(__name__)
 def paddle_webhook(request):
     """
     Paddle webhook endpoint.
-    Receives and processes Paddle webhook events.
+    Stores events in the webhook inbox and acknowledges them at once;
+    Celery workers apply them (see webhook_inbox). Redeliveries of an
+    event already received are acknowledged without being stored again.
     
     POST /api/payments/paddle-webhook/
     """
     try:
         # Parse JSON payload
         payload = json.loads(request.body)
+        if not isinstance(payload, dict):
+            raise ValueError("Payload must be a JSON object")
         
         # Get signature from headers
         signature = request.headers.get('Paddle-Signature')
         
-        # Process webhook
         handler = PaddleWebhookHandler(payload, signature)
-        success, message = handler.process()
-        
-        if success:
-            logger.info(f"Webhook processed successfully: {message}")
-            return JsonResponse({'status': 'success', 'message': message})
-        else:
-            logger.error(f"Webhook processing failed: {message}")
+        if not handler.verify_signature():
+            logger.error("Invalid webhook signature")
             return JsonResponse(
-                {'status': 'error', 'message': message},
+                {'status': 'error', 'message': 'Invalid webhook signature'},
                 status=400
             )
+        
+        event, created = webhook_inbox.receive(payload)
+        if not created:
+            logger.info(f"Duplicate webhook {payload.get('event_id')} ignored")
+            return JsonResponse({'status': 'success', 'message': 'Duplicate event ignored'})
+        
+        return JsonResponse({'status': 'success', 'message': f'Queued {event.event_type}'})
             
     except json.JSONDecodeError:
         logger.error("Invalid JSON in webhook payload")
@@ -59,6 +67,12 @@ def paddle_webhook(request):
             {'status': 'error', 'message': 'Invalid JSON'},
             status=400
         )
+    except ValueError as e:
+        logger.error(f"Invalid webhook payload: {str(e)}")
+        return JsonResponse(
+            {'status': 'error', 'message': str(e)},
+            status=400
+        )
     except Exception as e:
         logger.error(f"Webhook error: {str(e)}", exc_info=True)
         return JsonResponse(
@@ -125,24 +139,19 @@ class SubscriptionViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            subscription = Subscription.objects.get(
-                trainer=request.user.trainer_profile
-            )
-        except Subscription.DoesNotExist:
-            # Default to free tier
-            subscription = Subscription(plan='free')
+        # No subscription = free tier
+        entitlements = for_request(request)
         
         features = {
-            'plan': subscription.plan,
-            'status': subscription.status,
-            'is_active': subscription.is_active(),
+            'plan': entitlements.plan,
+            'status': entitlements.status,
+            'is_active': entitlements.is_active(),
             'limits': {
-                'max_clients': subscription.can_access_feature('max_clients'),
-                'max_pages': subscription.can_access_feature('max_pages'),
-                'custom_domain': subscription.can_access_feature('custom_domain'),
-                'white_label': subscription.can_access_feature('white_label'),
-                'workflows': subscription.can_access_feature('workflows'),
+                'max_clients': entitlements.can_access_feature('max_clients'),
+                'max_pages': entitlements.can_access_feature('max_pages'),
+                'custom_domain': entitlements.can_access_feature('custom_domain'),
+                'white_label': entitlements.can_access_feature('white_label'),
+                'workflows': entitlements.can_access_feature('workflows'),
             }
         }
         
@@ -264,48 +273,13 @@ class ClientPaymentViewSet(viewsets.ModelViewSet):
         return ClientPayment.objects.none()
     
     def perform_create(self, serializer):
-        """Set recorded_by to current user."""
-        serializer.save(recorded_by=self.request.user)
+        """
+        Set recorded_by to current user.
         
-        # Update client payment status
-        client = serializer.instance.client
-        self._update_client_payment_status(client)
-    
-    def perform_update(self, serializer):
-        """Update client payment status after payment update."""
-        old_payment = self.get_object()
-        serializer.save()
-        
-        # Recalculate client payment status
-        client = serializer.instance.client
-        self._update_client_payment_status(client)
-    
-    def perform_destroy(self, instance):
-        """Update client payment status after payment deletion."""
-        client = instance.client
-        super().perform_destroy(instance)
-        self._update_client_payment_status(client)
-    
-    def _update_client_payment_status(self, client):
-        """Update client's total_paid and payment_status."""
-        from django.db.models import Sum
-        from django.utils import timezone
-        
-        payments = ClientPayment.objects.filter(client=client)
-        total_paid = payments.aggregate(Sum('amount'))['amount__sum'] or 0
-        
-        # Get latest payment date
-        latest_payment = payments.order_by('-payment_date').first()
-        last_payment_date = latest_payment.payment_date if latest_payment else None
-        
-        # Determine payment status (simplified - can be enhanced)
-        # This is a placeholder - actual logic would compare against expected payments
-        payment_status = 'paid' if total_paid > 0 else 'unpaid'
-        
-        client.total_paid = total_paid
-        client.last_payment_date = last_payment_date
-        client.payment_status = payment_status
-        client.save()
+        The client's total_paid, last_payment_date and payment_status are
+        updated atomically with every payment write (see payments.balances).
+        """
+        serializer.save(recorded_by=self.request.user)
     
     @action(detail=False, methods=['get'], url_path='revenue-summary')
     def revenue_summary(self, request):
@@ -396,48 +370,13 @@ class ClientPaymentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        trainer = request.user.trainer_profile
-        from apps.clients.models import Client
-        from django.utils.dateparse import parse_date
-        
-        client_ids = Client.objects.filter(trainer=trainer).values_list('id', flat=True)
-        payments = ClientPayment.objects.filter(client_id__in=client_ids).select_related('client')
-        
-        # Filter by date range if provided
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        if start_date:
-            payments = payments.filter(payment_date__gte=parse_date(start_date))
-        if end_date:
-            payments = payments.filter(payment_date__lte=parse_date(end_date))
-        
-        payments = payments.order_by('-payment_date', '-created_at')
-        
-        # Create CSV
-        output = StringIO()
-        writer = csv.writer(output)
-        
-        # Header
-        writer.writerow([
-            'Date', 'Client', 'Email', 'Amount', 'Currency', 'Payment Method',
-            'Reference ID', 'Notes', 'Recorded By', 'Created At'
-        ])
-        
-        # Data rows
-        for payment in payments:
-            writer.writerow([
-                payment.payment_date.strftime('%Y-%m-%d'),
-                payment.client.get_full_name(),
-                payment.client.email,
-                payment.amount,
-                payment.currency,
-                payment.get_payment_method_display(),
-                payment.reference_id or '',
-                payment.notes or '',
-                payment.recorded_by.email if payment.recorded_by else '',
-                payment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            ])
-        
-        response = HttpResponse(output.getvalue(), content_type='text/csv')
-        response['Content-Disposition'] = 'attachment; filename="payments_export.csv"'
-        return response
+        payments = get_payment_export_queryset(
+            request.user.trainer_profile,
+            start_date=request.query_params.get('start_date'),
+            end_date=request.query_params.get('end_date')
+        )
+        return streaming_csv_response(
+            'payments_export.csv',
+            PAYMENT_EXPORT_HEADER,
+            payment_export_rows(payments)
+        )
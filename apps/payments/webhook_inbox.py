@@ -0,0 +1,216 @@
+"""
+Durable inbox for Paddle webhooks.
+The webhook endpoint only stores deliveries: it claims the event_id in
+WebhookEventKey and appends the raw payload to WebhookEvent as pending, so
+a redelivered event is acknowledged as a no-op and a billing-run burst
+costs each web worker one insert per event. Celery workers then apply the
+inbox per ordering key (the Paddle subscription, else the customer),
+oldest event first. A failing event holds back the later events of its
+key and is retried with capped exponential backoff; after
+PADDLE_WEBHOOK_MAX_ATTEMPTS it is dead-lettered and its key moves on.
+Event types without a handler (transaction.created, subscription.activated,
+...) are marked skipped at once and never hold their key back.
+replay() puts events back in the inbox for reprocessing.
+"""
+import random
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import WebhookEvent, WebhookEventKey
+from .paddle_webhooks import PaddleWebhookHandler, UnhandledEventType
+
+
+# Statuses still waiting to be applied
+OPEN_STATUSES = ['pending', 'failed']
+
+# Fields written back after an attempt
+ATTEMPT_FIELDS = [
+    'status', 'attempts', 'next_attempt_at', 'processed', 'processed_at', 'error_message'
+]
+
+
+def ordering_key(payload):
+    """
+    Key of the events that must be applied in order with this one.
+    
+    Subscription events and transactions of a subscription share the
+    subscription's key; other transactions are ordered per customer.
+    """
+    data = payload.get('data') or {}
+    event_type = payload.get('event_type') or ''
+    if event_type.startswith('subscription.') and data.get('id'):
+        return f"subscription:{data['id']}"
+    if data.get('subscription_id'):
+        return f"subscription:{data['subscription_id']}"
+    if data.get('customer_id'):
+        return f"customer:{data['customer_id']}"
+    return f"event:{payload.get('event_id')}"
+
+
+def receive(payload):
+    """
+    Store a webhook delivery in the inbox.
+    
+    Args:
+        payload: Parsed webhook body
+    
+    Returns:
+        tuple: (WebhookEvent, True) for a new event, (None, False) for a
+            redelivery of a known event_id
+    
+    Raises:
+        ValueError: The payload has no event_id
+    """
+    event_id = payload.get('event_id')
+    if not event_id:
+        raise ValueError("Missing event_id")
+    
+    occurred_at = PaddleWebhookHandler.parse_datetime(payload.get('occurred_at'))
+    try:
+        with transaction.atomic():
+            WebhookEventKey.objects.create(event_id=event_id)
+            event = WebhookEvent.objects.create(
+                event_id=event_id,
+                event_type=payload.get('event_type') or '',
+                payload=payload,
+                ordering_key=ordering_key(payload),
+                occurred_at=occurred_at or timezone.now()
+            )
+    except IntegrityError:
+        return None, False
+    
+    # A broker outage must not fail the delivery; the sweep picks it up
+    from .tasks import process_webhook_key
+    transaction.on_commit(lambda: process_webhook_key.delay(event.ordering_key), robust=True)
+    return event, True
+
+
+def retry_delay(attempts):
+    """
+    Delay before the next attempt, after `attempts` attempts so far.
+    
+    Exponential and capped like the notification retries, with equal
+    jitter so a failing burst does not retry in lockstep.
+    """
+    policy = settings.PADDLE_WEBHOOK_RETRY_POLICY
+    ceiling = min(policy['max_delay'], policy['base_delay'] * 2 ** (attempts - 1))
+    return timedelta(seconds=ceiling / 2 + random.uniform(0, ceiling / 2))
+
+
+def apply_event(event):
+    """
+    Attempt one event and record the outcome on it.
+    
+    Returns:
+        bool: True if the event was applied or skipped
+    """
+    now = timezone.now()
+    event.attempts += 1
+    try:
+        PaddleWebhookHandler(event.payload).dispatch()
+    except UnhandledEventType as e:
+        # Nothing to apply; retrying would only hold back the key
+        event.status = 'skipped'
+        event.processed = True
+        event.processed_at = now
+        event.next_attempt_at = None
+        event.error_message = str(e)
+        event.save(update_fields=ATTEMPT_FIELDS)
+        return True
+    except Exception as e:
+        event.error_message = f"Error processing webhook: {str(e)}"
+        if event.attempts >= settings.PADDLE_WEBHOOK_MAX_ATTEMPTS:
+            event.status = 'dead'
+            event.next_attempt_at = None
+        else:
+            event.status = 'failed'
+            event.next_attempt_at = now + retry_delay(event.attempts)
+        event.save(update_fields=ATTEMPT_FIELDS)
+        return False
+    
+    event.status = 'processed'
+    event.processed = True
+    event.processed_at = now
+    event.next_attempt_at = None
+    event.error_message = None
+    event.save(update_fields=ATTEMPT_FIELDS)
+    return True
+
+
+def process_key(key, limit=None):
+    """
+    Apply a key's open events in order until one fails or has to wait.
+    
+    The head event is locked while it is applied, so concurrent workers
+    on the same key queue behind each other instead of reordering events.
+    
+    Args:
+        key: Ordering key
+        limit: Most events to apply (default: all due)
+    
+    Returns:
+        int: Events applied (or skipped)
+    """
+    applied = 0
+    while limit is None or applied < limit:
+        with transaction.atomic():
+            head = WebhookEvent.objects.select_for_update().filter(
+                ordering_key=key,
+                status__in=OPEN_STATUSES
+            ).order_by('occurred_at', 'id').first()
+            if head is None:
+                break
+            if head.next_attempt_at and head.next_attempt_at > timezone.now():
+                # Later events of the key wait for this one's retry
+                break
+            if apply_event(head):
+                applied += 1
+            elif head.status == 'failed':
+                break
+    return applied
+
+
+def due_keys(limit, now=None):
+    """
+    Ordering keys with an event ready to be attempted: retries that are
+    due, and pending events whose own task has not run within a minute
+    (lost to a broker outage or still queued behind a burst).
+    """
+    now = now or timezone.now()
+    return list(
+        WebhookEvent.objects.filter(
+            Q(status='pending', created_at__lte=now - timedelta(minutes=1)) |
+            Q(status='failed', next_attempt_at__lte=now)
+        ).order_by().values_list('ordering_key', flat=True).distinct()[:limit]
+    )
+
+
+def replay(events, queue=True):
+    """
+    Put events back in the inbox.
+    
+    Args:
+        events: WebhookEvent queryset to reprocess (e.g. dead-lettered ones)
+        queue: Queue a worker task per affected ordering key
+    
+    Returns:
+        tuple: (number of events reset, affected ordering keys)
+    """
+    from .tasks import process_webhook_key
+    
+    keys = sorted(set(events.values_list('ordering_key', flat=True)))
+    count = events.update(
+        status='pending',
+        attempts=0,
+        next_attempt_at=None,
+        processed=False,
+        processed_at=None,
+        error_message=None
+    )
+    if queue:
+        for key in keys:
+            transaction.on_commit(lambda key=key: process_webhook_key.delay(key), robust=True)
+    return count, keys
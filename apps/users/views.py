@@ -6,6 +6,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authtoken.models import Token
+from django.contrib.auth.signals import user_logged_in
 
 from .models import User
 from .serializers import (
@@ -85,6 +86,8 @@ class UserViewSet(viewsets.ModelViewSet):
         if serializer.is_valid():
             user = serializer.validated_data['user']
             token, created = Token.objects.get_or_create(user=user)
+            # Token logins skip django.contrib.auth.login(); announce them too
+            user_logged_in.send(sender=user.__class__, request=request, user=user)
             
             # Get trainer profile if exists
             trainer_data = None
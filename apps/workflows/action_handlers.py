@@ -2,8 +2,12 @@
 Action handlers for workflow automation
 """
 import logging
-from django.core.mail import send_mail
 from django.conf import settings
+from django.core.mail import send_mail
+from django.utils.html import linebreaks
+from apps.notifications.models import Notification
+from apps.notifications.digest import submit
+from apps.notifications.retry import provider_configured
 from .models import WorkflowAction, EmailTemplate, SMSTemplate
 from .utils import replace_variables
 
@@ -29,18 +33,22 @@ def execute_action(action: WorkflowAction, event_data: dict):
     }
     
     handler = handlers.get(action_type)
-    if handler:
+    if handler in (handle_send_email, handle_send_sms):
+        # Messages are logged against (and rate limited for) the workflow's trainer
+        handler(action_data, event_data, trainer_id=action.workflow.trainer_id)
+    elif handler:
         handler(action_data, event_data)
     else:
         logger.warning(f"Unknown action type: {action_type}")
 
 
-def handle_send_email(action_data: dict, event_data: dict):
-    """Send an email action."""
+def handle_send_email(action_data: dict, event_data: dict, trainer_id=None):
+    """Send an email action (queued for rate-limited delivery)."""
     template_id = action_data.get('template_id')
     recipient = action_data.get('recipient') or event_data.get('client_email')
     custom_subject = action_data.get('subject')
     custom_body = action_data.get('body')
+    trainer_id = trainer_id or event_data.get('trainer_id')
     
     if not recipient:
         logger.error("No recipient specified for email action")
@@ -59,26 +67,63 @@ def handle_send_email(action_data: dict, event_data: dict):
         subject = replace_variables(custom_subject or "Notification", event_data)
         body = replace_variables(custom_body or "", event_data)
     
-    # Send email
+    notification = Notification(
+        trainer_id=trainer_id,
+        notification_type='email',
+        recipient=recipient,
+        subject=subject,
+        message=body,
+        payload={
+            'template': 'custom',
+            'variables': {'html_content': linebreaks(body, autoescape=True)},
+        },
+    )
+    
+    if not provider_configured('email'):
+        # No SendGrid credentials: the outbound queue would drop the email
+        send_with_email_backend(notification)
+        return
+    
+    # Queue email; workflow sends are few and interactive, so they are not
+    # held back by outbound backpressure
+    try:
+        submit([notification], 'workflow', check_capacity=False)
+        logger.info(f"Email queued for {recipient}")
+    except Exception as e:
+        logger.error(f"Failed to queue email: {e}")
+        raise
+
+
+def send_with_email_backend(notification):
+    """
+    Send a workflow email through Django's EMAIL_BACKEND and log the outcome.
+    Used when SendGrid is not configured.
+    """
     try:
         send_mail(
-            subject=subject,
-            message=body,
+            subject=notification.subject,
+            message=notification.message,
             from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[recipient],
+            recipient_list=[notification.recipient],
             fail_silently=False,
         )
-        logger.info(f"Email sent to {recipient}")
     except Exception as e:
         logger.error(f"Failed to send email: {e}")
+        if notification.trainer_id:
+            notification.mark_failed(f"EMAIL_BACKEND send failed: {e}")
         raise
+    
+    logger.info(f"Email sent to {notification.recipient}")
+    if notification.trainer_id:
+        notification.mark_sent()
 
 
-def handle_send_sms(action_data: dict, event_data: dict):
-    """Send an SMS action."""
+def handle_send_sms(action_data: dict, event_data: dict, trainer_id=None):
+    """Send an SMS action (queued for rate-limited delivery)."""
     template_id = action_data.get('template_id')
     recipient = action_data.get('recipient') or event_data.get('client_phone')
     custom_message = action_data.get('message')
+    trainer_id = trainer_id or event_data.get('trainer_id')
     
     if not recipient:
         logger.error("No recipient specified for SMS action")
@@ -95,25 +140,19 @@ def handle_send_sms(action_data: dict, event_data: dict):
     else:
         message = replace_variables(custom_message or "", event_data)
     
-    # Send SMS using Twilio
+    # Queue SMS for the Twilio sender
     try:
-        from twilio.rest import Client as TwilioClient
-        
-        account_sid = settings.TWILIO_ACCOUNT_SID
-        auth_token = settings.TWILIO_AUTH_TOKEN
-        from_number = settings.TWILIO_PHONE_NUMBER
-        
-        client = TwilioClient(account_sid, auth_token)
-        
-        message_obj = client.messages.create(
-            body=message,
-            from_=from_number,
-            to=recipient
-        )
-        
-        logger.info(f"SMS sent to {recipient}: {message_obj.sid}")
+        submit([
+            Notification(
+                trainer_id=trainer_id,
+                notification_type='sms',
+                recipient=recipient,
+                message=message,
+            )
+        ], 'workflow', check_capacity=False)
+        logger.info(f"SMS queued for {recipient}")
     except Exception as e:
-        logger.error(f"Failed to send SMS: {e}")
+        logger.error(f"Failed to queue SMS: {e}")
         raise
 
 
@@ -9,7 +9,8 @@ from .serializers import (
     EmailTemplateSerializer, SMSTemplateSerializer,
     WorkflowExecutionLogSerializer, WorkflowTemplateSerializer
 )
-from apps.payments.permissions import check_usage_limit
+from apps.payments.entitlements import for_request
+from apps.payments.usage import UsageLimitReached, enforce_limit
 
 
 class WorkflowViewSet(viewsets.ModelViewSet):
@@ -38,18 +39,18 @@ class WorkflowViewSet(viewsets.ModelViewSet):
         
         trainer = self.request.user.trainer_profile
         
-        # Check workflow usage limit
-        can_create, current_count, limit = check_usage_limit(trainer, 'workflows')
-        if not can_create:
+        # Create within the workflow usage limit
+        try:
+            with enforce_limit(trainer, 'workflows', for_request(self.request)):
+                serializer.save(trainer=trainer)
+        except UsageLimitReached as e:
             from rest_framework.exceptions import ValidationError
             raise ValidationError({
                 'error': 'Usage limit reached',
-                'detail': f'You have reached your limit of {limit} workflows. Upgrade your plan to add more.',
-                'current_count': current_count,
-                'limit': limit
+                'detail': f'You have reached your limit of {e.limit} workflows. Upgrade your plan to add more.',
+                'current_count': e.current_count,
+                'limit': e.limit
             })
-        
-        serializer.save(trainer=trainer)
     
     @action(detail=True, methods=['post'])
     def activate(self, request, pk=None):
@@ -147,42 +148,42 @@ class WorkflowTemplateViewSet(viewsets.ReadOnlyModelViewSet):
         trainer = request.user.trainer_profile
         template = self.get_object()
         
-        # Check usage limits
-        can_create, current_count, limit = check_usage_limit(trainer, 'workflows')
-        if not can_create:
+        # Create the workflow within the usage limit
+        try:
+            with enforce_limit(trainer, 'workflows', for_request(request)):
+                # Create workflow from template
+                workflow = Workflow.objects.create(
+                    trainer=trainer,
+                    name=template.name,
+                    description=template.description,
+                    is_active=False  # Start inactive so trainer can customize
+                )
+                
+                # Create trigger
+                WorkflowTrigger.objects.create(
+                    workflow=workflow,
+                    trigger_type=template.trigger_type,
+                    conditions=template.trigger_conditions,
+                    delay_minutes=template.trigger_delay_minutes
+                )
+                
+                # Create actions
+                for action_config in template.actions_config:
+                    WorkflowAction.objects.create(
+                        workflow=workflow,
+                        action_type=action_config['action_type'],
+                        action_data=action_config['action_data'],
+                        order=action_config['order']
+                    )
+        except UsageLimitReached as e:
             from rest_framework.exceptions import ValidationError
             raise ValidationError({
                 'error': 'Usage limit reached',
-                'detail': f'You have reached your limit of {limit} workflows. Upgrade your plan to add more.',
-                'current_count': current_count,
-                'limit': limit
+                'detail': f'You have reached your limit of {e.limit} workflows. Upgrade your plan to add more.',
+                'current_count': e.current_count,
+                'limit': e.limit
             })
         
-        # Create workflow from template
-        workflow = Workflow.objects.create(
-            trainer=trainer,
-            name=template.name,
-            description=template.description,
-            is_active=False  # Start inactive so trainer can customize
-        )
-        
-        # Create trigger
-        WorkflowTrigger.objects.create(
-            workflow=workflow,
-            trigger_type=template.trigger_type,
-            conditions=template.trigger_conditions,
-            delay_minutes=template.trigger_delay_minutes
-        )
-        
-        # Create actions
-        for action_config in template.actions_config:
-            WorkflowAction.objects.create(
-                workflow=workflow,
-                action_type=action_config['action_type'],
-                action_data=action_config['action_data'],
-                order=action_config['order']
-            )
-        
         # Increment usage counter
         template.times_used += 1
         template.save(update_fields=['times_used'])
@@ -19,17 +19,49 @@ app.autodiscover_tasks()
 
 # Celery Beat schedule for periodic tasks
 app.conf.beat_schedule = {
-    'send-24h-booking-reminders': {
-        'task': 'apps.notifications.tasks.send_booking_reminders',
-        'schedule': crontab(hour=10, minute=0),  # Daily at 10 AM
+    'dispatch-due-reminders': {
+        'task': 'apps.notifications.tasks.dispatch_due_reminders',
+        'schedule': crontab(minute='*'),  # Every minute
     },
-    'send-1h-booking-reminders': {
-        'task': 'apps.notifications.tasks.send_hour_reminders',
-        'schedule': crontab(minute='*/30'),  # Every 30 minutes
+    'flush-due-digests': {
+        'task': 'apps.notifications.tasks.flush_due_digests',
+        'schedule': crontab(minute='*'),  # Every minute
+    },
+    'process-webhook-inbox': {
+        'task': 'apps.payments.tasks.process_webhook_inbox',
+        'schedule': crontab(minute='*'),  # Every minute
     },
     'retry-failed-notifications': {
         'task': 'apps.notifications.tasks.retry_failed_notifications',
-        'schedule': crontab(hour='*/6', minute=0),  # Every 6 hours
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes
+    },
+    'take-platform-snapshot': {
+        'task': 'apps.admin_panel.tasks.take_platform_snapshot',
+        'schedule': crontab(minute='*/15'),  # Every 15 minutes
+    },
+    'rollup-dashboard-metrics': {
+        'task': 'apps.analytics.tasks.rollup_dashboard_metrics',
+        'schedule': crontab(hour=1, minute=15),  # Daily at 01:15
+    },
+    'reconcile-leaderboard': {
+        'task': 'apps.analytics.tasks.reconcile_leaderboard',
+        'schedule': crontab(minute=40),  # Hourly
+    },
+    'reconcile-usage-counters': {
+        'task': 'apps.payments.tasks.reconcile_usage_counters',
+        'schedule': crontab(minute=50),  # Hourly
+    },
+    'send-weekly-reports': {
+        'task': 'apps.analytics.tasks.send_weekly_reports',
+        'schedule': crontab(hour=7, minute=0, day_of_week='mon'),  # Mondays at 07:00
+    },
+    'manage-log-partitions': {
+        'task': 'apps.core.tasks.manage_log_partitions',
+        'schedule': crontab(hour=2, minute=30),  # Daily at 02:30
+    },
+    'purge-expired-exports': {
+        'task': 'apps.core.tasks.purge_expired_exports',
+        'schedule': crontab(minute=15),  # Hourly
     },
 }
 
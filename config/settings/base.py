@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'django_filters',
     
     # Local apps
+    'apps.core',
     'apps.users',
     'apps.trainers',
     'apps.clients',
@@ -296,6 +297,10 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# Provider sends run on their own queue so a backlog never delays other tasks
+CELERY_TASK_ROUTES = {
+    'apps.notifications.tasks.deliver_notifications': {'queue': 'outbound'},
+}
 
 # Fail fast if Redis is unavailable (prevent slow retries)
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = False
@@ -310,18 +315,84 @@ CELERY_BROKER_TRANSPORT_OPTIONS = {
 
 # Email Configuration (SendGrid)
 SENDGRID_API_KEY = config('SENDGRID_API_KEY', default='')
+SENDGRID_API_HOST = config('SENDGRID_API_HOST', default='https://api.sendgrid.com')
 
 # SMS Configuration (Twilio)
 TWILIO_ACCOUNT_SID = config('TWILIO_ACCOUNT_SID', default='')
 TWILIO_AUTH_TOKEN = config('TWILIO_AUTH_TOKEN', default='')
 TWILIO_PHONE_NUMBER = config('TWILIO_PHONE_NUMBER', default='')
 
+# Notification Configuration
+# Number of bookings handed to each send_reminder_chunk worker task
+NOTIFICATION_REMINDER_CHUNK_SIZE = config('NOTIFICATION_REMINDER_CHUNK_SIZE', default=200, cast=int)
+# Maximum number of due reminders popped by each dispatch_due_reminders tick
+NOTIFICATION_REMINDER_TICK_LIMIT = config('NOTIFICATION_REMINDER_TICK_LIMIT', default=5000, cast=int)
+# Failed notification retries: attempts cap, age window, batch size and
+# per-provider exponential backoff (seconds)
+NOTIFICATION_RETRY_MAX_ATTEMPTS = config('NOTIFICATION_RETRY_MAX_ATTEMPTS', default=5, cast=int)
+NOTIFICATION_RETRY_WINDOW_HOURS = config('NOTIFICATION_RETRY_WINDOW_HOURS', default=24, cast=int)
+NOTIFICATION_RETRY_BATCH_SIZE = config('NOTIFICATION_RETRY_BATCH_SIZE', default=500, cast=int)
+NOTIFICATION_RETRY_POLICY = {
+    'email': {'base_delay': 60, 'max_delay': 3600},
+    'sms': {'base_delay': 120, 'max_delay': 3600},
+}
+# Outbound queue token buckets (tokens per second, bucket size). An email
+# token is one SendGrid request of up to 1000 recipients; SMS needs a token
+# from the account bucket and from the sending number's bucket.
+NOTIFICATION_RATE_LIMITS = {
+    'email': {'rate': 5, 'burst': 10},
+    'sms': {'rate': 30, 'burst': 30},
+    'sms_sender': {'rate': 1, 'burst': 5},
+}
+# Producers are pushed back (and retry after NOTIFICATION_OUTBOUND_BACKOFF
+# seconds) while a provider has this many notifications pending delivery
+NOTIFICATION_OUTBOUND_MAX_PENDING = config('NOTIFICATION_OUTBOUND_MAX_PENDING', default=20000, cast=int)
+NOTIFICATION_OUTBOUND_BACKOFF = config('NOTIFICATION_OUTBOUND_BACKOFF', default=30, cast=int)
+# Seconds messages to the same recipient are held to be merged into one
+# digest (booking confirmations and workflow messages); 0 disables digests
+NOTIFICATION_DIGEST_WINDOW = config('NOTIFICATION_DIGEST_WINDOW', default=0, cast=int)
+# Notifications handed to each deliver_notifications task
+NOTIFICATION_OUTBOUND_BATCH_SIZE = config('NOTIFICATION_OUTBOUND_BATCH_SIZE', default=1000, cast=int)
+
+# Log Table Partitioning (see apps.core.partitioning)
+# Monthly partitions created ahead of time on PostgreSQL
+LOG_PARTITION_MONTHS_AHEAD = config('LOG_PARTITION_MONTHS_AHEAD', default=3, cast=int)
+# Months of history kept per log table; older months are dropped, or moved
+# to the log_archive schema with 'archive'
+LOG_RETENTION = {
+    'notifications.Notification': {'months': 13, 'action': 'archive'},
+    'workflows.WorkflowExecutionLog': {'months': 6, 'action': 'drop'},
+    'payments.WebhookEvent': {'months': 12, 'action': 'archive'},
+    'admin_panel.AdminActionLog': {'months': 24, 'action': 'archive'},
+    'admin_panel.DomainVerificationLog': {'months': 6, 'action': 'drop'},
+}
+
+# Background Exports (see apps.core.export_jobs)
+# Storage alias artifacts are saved to; point it at an extra STORAGES
+# entry (e.g. S3) to keep artifacts off the web servers' disks
+EXPORT_STORAGE_ALIAS = config('EXPORT_STORAGE_ALIAS', default='default')
+# Seconds an artifact is kept before it is deleted
+EXPORT_ARTIFACT_TTL = config('EXPORT_ARTIFACT_TTL', default=24 * 3600, cast=int)
+# Seconds a signed download link stays valid
+EXPORT_LINK_MAX_AGE = config('EXPORT_LINK_MAX_AGE', default=3600, cast=int)
+# Seconds within which an identical export request reuses the existing job
+EXPORT_REUSE_WINDOW = config('EXPORT_REUSE_WINDOW', default=15 * 60, cast=int)
+
+# Platform KPI Snapshots (see apps.admin_panel.snapshots)
+# Days of snapshots kept for the admin stats history (96 are taken a day)
+PLATFORM_SNAPSHOT_RETENTION_DAYS = config('PLATFORM_SNAPSHOT_RETENTION_DAYS', default=90, cast=int)
+
 # Payment Configuration (Paddle)
 PADDLE_VENDOR_ID = config('PADDLE_VENDOR_ID', default='')
 PADDLE_API_KEY = config('PADDLE_API_KEY', default='')
 PADDLE_WEBHOOK_SECRET = config('PADDLE_WEBHOOK_SECRET', default='')
 PADDLE_PRODUCT_ID = config('PADDLE_PRODUCT_ID', default='')
 PADDLE_NOTIFICATION_SET_ID = config('PADDLE_NOTIFICATION_SET_ID', default='')
+# Webhook inbox (see apps.payments.webhook_inbox): attempts before an event
+# is dead-lettered, retry backoff (seconds) and keys queued per sweep
+PADDLE_WEBHOOK_MAX_ATTEMPTS = config('PADDLE_WEBHOOK_MAX_ATTEMPTS', default=8, cast=int)
+PADDLE_WEBHOOK_RETRY_POLICY = {'base_delay': 30, 'max_delay': 3600}
+PADDLE_WEBHOOK_SWEEP_KEYS = config('PADDLE_WEBHOOK_SWEEP_KEYS', default=1000, cast=int)
 
 # Logging Configuration
 LOGGING = {
@@ -23,6 +23,7 @@ urlpatterns = [
     path('api/', include('apps.notifications.urls')),
     path('api/', include('apps.analytics.urls')),
     path('api/admin/', include('apps.admin_panel.urls')),  # Super admin endpoints
+    path('api/', include('apps.core.urls')),  # Background exports
 
     # Public pages API (no authentication)
     path('api/public/<str:trainer_slug>/', include('apps.pages.public_urls')),
@@ -1,3 +1,365 @@
-from django.test import TestCase
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.admin_panel.domain_models import CustomDomain
+from apps.admin_panel.export_utils import export_trainers_csv
+
+from apps.admin_panel.analytics_utils import aggregate_time_series
+from apps.bookings.models import Booking
+from apps.clients.models import Client
+from apps.core import export_jobs
+from apps.core.models import ExportJob
+from apps.payments.models import Subscription
+from apps.trainers.models import Trainer
+
+User = get_user_model()
+
+
+class TimeSeriesAggregationTest(TestCase):
+    """Tests for the database-side time series engine"""
+    
+    def setUp(self):
+        self.trainers = []
+        for index in range(2):
+            user = User.objects.create_user(
+                email=f'trainer{index}@example.com',
+                username=f'trainer{index}',
+                password='pass123'
+            )
+            self.trainers.append(Trainer.objects.create(user=user, business_name=f'Gym {index}'))
+        
+        client = Client.objects.create(
+            trainer=self.trainers[0],
+            first_name='Jane',
+            last_name='Doe',
+            email='jane@example.com'
+        )
+        
+        def booking(trainer, day, hour):
+            start = datetime(2026, 3, day, hour, tzinfo=dt_timezone.utc)
+            return Booking(
+                trainer=trainer,
+                client=client,
+                start_time=start,
+                end_time=start + timedelta(hours=1)
+            )
+        
+        # Created with bulk_create: the workflow trigger signal is not under test
+        Booking.objects.bulk_create([
+            booking(self.trainers[0], 2, 9),
+            booking(self.trainers[0], 2, 11),
+            booking(self.trainers[1], 2, 15),
+            booking(self.trainers[0], 4, 9),
+            booking(self.trainers[1], 17, 9),
+        ])
+    
+    def test_daily_series_is_filled_with_zeros(self):
+        series = aggregate_time_series(
+            Booking.objects.all(),
+            'start_time',
+            datetime(2026, 3, 1, tzinfo=dt_timezone.utc),
+            datetime(2026, 3, 5, tzinfo=dt_timezone.utc),
+            'day',
+            bookings=('count', 'id'),
+            active_users=('distinct', 'trainer')
+        )
+        
+        self.assertEqual(series, [
+            {'date': '2026-03-01', 'bookings': 0, 'active_users': 0},
+            {'date': '2026-03-02', 'bookings': 3, 'active_users': 2},
+            {'date': '2026-03-03', 'bookings': 0, 'active_users': 0},
+            {'date': '2026-03-04', 'bookings': 1, 'active_users': 1},
+            {'date': '2026-03-05', 'bookings': 0, 'active_users': 0},
+        ])
+    
+    def test_weekly_and_monthly_grouping(self):
+        start = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+        end = datetime(2026, 3, 20, tzinfo=dt_timezone.utc)
+        
+        bookings = Booking.objects.all()
+        weekly = aggregate_time_series(bookings, 'start_time', start, end, 'week', bookings=('count', 'id'))
+        monthly = aggregate_time_series(bookings, 'start_time', start, end, 'month', bookings=('count', 'id'))
+        
+        self.assertEqual(weekly, [
+            {'date': '2026-02-23', 'bookings': 0},
+            {'date': '2026-03-02', 'bookings': 4},
+            {'date': '2026-03-09', 'bookings': 0},
+            {'date': '2026-03-16', 'bookings': 1},
+        ])
+        self.assertEqual(monthly, [{'date': '2026-03', 'bookings': 5}])
+
+
+class PlatformSnapshotTest(TestCase):
+    """Tests for platform KPI snapshots"""
+    
+    def setUp(self):
+        from apps.payments.models import Subscription
+        
+        plans = ['pro', 'pro', 'business', 'free']
+        for index, plan in enumerate(plans):
+            user = User.objects.create_user(
+                email=f'trainer{index}@example.com',
+                username=f'trainer{index}',
+                password='pass123'
+            )
+            trainer = Trainer.objects.create(user=user, business_name=f'Gym {index}')
+            Subscription.objects.create(trainer=trainer, plan=plan, status='active')
+        Subscription.objects.filter(plan='free').update(status='cancelled')
+        
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            password='pass123'
+        )
+    
+    def test_kpis_compute_mrr_in_database(self):
+        from decimal import Decimal
+        from apps.admin_panel.snapshots import compute_kpis
+        
+        kpis = compute_kpis()
+        
+        self.assertEqual(kpis['total_trainers'], 4)
+        self.assertEqual(kpis['mrr'], Decimal('137'))
+        self.assertEqual(kpis['subscription_breakdown'], {'pro': 2, 'business': 1})
+    
+    def test_stats_serves_latest_snapshot_until_refreshed(self):
+        from rest_framework.test import APIClient
+        from apps.admin_panel.models import PlatformSnapshot
+        
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        
+        response = client.get('/api/admin/dashboard/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_trainers'], 4)
+        self.assertEqual(PlatformSnapshot.objects.count(), 1)
+        
+        user = User.objects.create_user(email='new@example.com', username='new', password='pass123')
+        Trainer.objects.create(user=user, business_name='New Gym')
+        
+        self.assertEqual(client.get('/api/admin/dashboard/stats/').data['total_trainers'], 4)
+        
+        response = client.get('/api/admin/dashboard/stats/?refresh=true')
+        self.assertEqual(response.data['total_trainers'], 5)
+        self.assertEqual(PlatformSnapshot.objects.count(), 2)
+        
+        history = client.get('/api/admin/dashboard/stats-history/')
+        self.assertEqual([point['total_trainers'] for point in history.data], [4, 5])
+    
+    def test_stale_snapshot_is_served_while_refreshed_in_background(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from apps.admin_panel.models import PlatformSnapshot
+        from apps.admin_panel.snapshots import latest_snapshot, take_snapshot
+        
+        cache.clear()
+        snapshot = take_snapshot()
+        PlatformSnapshot.objects.filter(pk=snapshot.pk).update(
+            captured_at=timezone.now() - timedelta(hours=2)
+        )
+        
+        with mock.patch('apps.admin_panel.tasks.take_platform_snapshot.delay') as delay:
+            self.assertEqual(latest_snapshot().pk, snapshot.pk)
+            self.assertEqual(latest_snapshot().pk, snapshot.pk)
+        
+        delay.assert_called_once_with()
+        self.assertEqual(PlatformSnapshot.objects.count(), 1)
+        cache.clear()
+    
+    @override_settings(PLATFORM_SNAPSHOT_RETENTION_DAYS=30)
+    def test_snapshot_task_prunes_old_snapshots(self):
+        from apps.admin_panel.models import PlatformSnapshot
+        from apps.admin_panel.snapshots import take_snapshot
+        from apps.admin_panel.tasks import take_platform_snapshot
+        
+        old = take_snapshot()
+        PlatformSnapshot.objects.filter(pk=old.pk).update(
+            captured_at=timezone.now() - timedelta(days=31)
+        )
+        
+        result = take_platform_snapshot()
+        
+        self.assertEqual(result['pruned'], 1)
+        self.assertEqual(
+            list(PlatformSnapshot.objects.values_list('pk', flat=True)),
+            [result['snapshot_id']]
+        )
+
+
+class ActiveUsersRangeTest(TestCase):
+    """Tests for the active-users date range"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            password='pass123'
+        ))
+    
+    def test_reversed_and_oversized_ranges_are_rejected(self):
+        from unittest import mock
+        
+        url = '/api/admin/dashboard/active-users/'
+        with mock.patch('apps.analytics.activity._redis', return_value=None):
+            response = self.client.get(url, {'start': '2026-03-10', 'end': '2026-03-01'})
+            self.assertEqual(response.status_code, 400)
+            
+            response = self.client.get(url, {'start': '2020-01-01', 'end': '2026-03-01'})
+            self.assertEqual(response.status_code, 400)
+            
+            response = self.client.get(url, {'start': '2025-03-02', 'end': '2026-03-01'})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['range']['clients'], 0)
+
+class TrainerExportTest(TestCase):
+    """Tests for the streaming trainer CSV export"""
+    
+    def setUp(self):
+        self.trainers = []
+        for index in range(3):
+            user = User.objects.create_user(
+                email=f'trainer{index}@example.com',
+                username=f'trainer{index}',
+                password='pass123'
+            )
+            trainer = Trainer.objects.create(user=user, business_name=f'Gym {index}')
+            self.trainers.append(trainer)
+            for number in range(index + 1):
+                Client.objects.create(
+                    trainer=trainer,
+                    first_name='Client',
+                    last_name=str(number),
+                    email=f'client{index}-{number}@example.com',
+                    is_active=number > 0
+                )
+        
+        Subscription.objects.create(trainer=self.trainers[1], plan='pro', status='active')
+        CustomDomain.objects.create(
+            trainer=self.trainers[1],
+            domain='gym1.example.com',
+            status='active',
+            verification_token='token-1'
+        )
+        CustomDomain.objects.create(
+            trainer=self.trainers[2],
+            domain='gym2.example.com',
+            verification_token='token-2'
+        )
+    
+    def test_streams_rows_in_one_query(self):
+        response = export_trainers_csv(Trainer.objects.order_by('id'))
+        self.assertTrue(response.streaming)
+        
+        with self.assertNumQueries(1):
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        
+        rows = {line.split(',')[1]: line.split(',') for line in lines[1:]}
+        self.assertEqual(lines[0].split(',')[:2], ['ID', 'Business Name'])
+        self.assertEqual(len(rows), 3)
+        # Total Clients, Total Bookings, Subscription Plan, Subscription Status, Custom Domain
+        self.assertEqual(rows['Gym 0'][9:14], ['0', '0', 'free', 'free', ''])
+        self.assertEqual(rows['Gym 1'][9:14], ['1', '0', 'pro', 'active', 'gym1.example.com'])
+        self.assertEqual(rows['Gym 2'][9:14], ['2', '0', 'free', 'free', ''])
+
+
+class ExportJobTest(TestCase):
+    """Tests for background export jobs"""
+    
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            password='pass123'
+        )
+        for index in range(3):
+            user = User.objects.create_user(
+                email=f'trainer{index}@example.com',
+                username=f'trainer{index}',
+                password='pass123'
+            )
+            Trainer.objects.create(user=user, business_name=f'Gym {index}')
+        Subscription.objects.create(trainer=Trainer.objects.get(business_name='Gym 1'), plan='pro')
+        
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+    
+    def test_job_writes_compressed_artifact(self):
+        job, created = export_jobs.request_export(
+            self.admin, 'trainers', format='jsonl', params={'plan': 'pro', 'unknown': 'x'}
+        )
+        self.assertTrue(created)
+        self.assertEqual(job.params, {'plan': 'pro'})
+        
+        job = export_jobs.run_export(job)
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.rows_total, job.rows_written, job.progress), (1, 1, 100))
+        
+        with job.file.open('rb') as artifact:
+            rows = [json.loads(line) for line in gzip.decompress(artifact.read()).decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['Business Name'], 'Gym 1')
+        self.assertEqual(rows[0]['Subscription Plan'], 'pro')
+    
+    def test_identical_request_reuses_job(self):
+        first = self.api.post('/api/exports/', {'kind': 'trainers'}, format='json')
+        self.assertEqual(first.status_code, 202)
+        export_jobs.run_export(ExportJob.objects.get(pk=first.data['id']))
+        
+        again = self.api.post('/api/exports/', {'kind': 'trainers'}, format='json')
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data['id'], first.data['id'])
+        
+        other_format = self.api.post('/api/exports/', {'kind': 'trainers', 'format': 'jsonl'}, format='json')
+        self.assertEqual(other_format.status_code, 202)
+        self.assertEqual(ExportJob.objects.count(), 2)
+    
+    def test_jobs_are_not_reused_across_users(self):
+        trainer = Trainer.objects.get(business_name='Gym 0')
+        by_admin = self.api.post(
+            '/api/exports/', {'kind': 'payments', 'trainer_id': trainer.id}, format='json'
+        )
+        self.assertEqual(by_admin.status_code, 202)
+        
+        self.api.force_authenticate(trainer.user)
+        by_trainer = self.api.post('/api/exports/', {'kind': 'payments'}, format='json')
+        self.assertEqual(by_trainer.status_code, 202)
+        self.assertNotEqual(by_trainer.data['id'], by_admin.data['id'])
+        self.assertEqual(self.api.get(f"/api/exports/{by_trainer.data['id']}/").status_code, 200)
+    
+    def test_download_link_and_expiry(self):
+        job, _ = export_jobs.request_export(self.admin, 'trainers')
+        export_jobs.run_export(job)
+        
+        detail = self.api.get(f'/api/exports/{job.id}/')
+        self.assertEqual(detail.data['progress'], 100)
+        response = APIClient().get(detail.data['download_url'])
+        self.assertEqual(response.status_code, 200)
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        
+        # Tampered signature
+        self.assertEqual(APIClient().get(detail.data['download_url'][:-2] + '/').status_code, 404)
+        
+        self.assertEqual(export_jobs.purge_expired(now=timezone.now() + timedelta(days=2)), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.file.name), ('expired', ''))
+        self.assertEqual(APIClient().get(detail.data['download_url']).status_code, 404)
+    
+    def test_trainers_export_requires_admin(self):
+        self.api.force_authenticate(User.objects.get(username='trainer0'))
+        response = self.api.post('/api/exports/', {'kind': 'trainers'}, format='json')
+        self.assertEqual(response.status_code, 403)
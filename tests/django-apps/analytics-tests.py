@@ -1,3 +1,483 @@
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
+from unittest import mock
 
-# Create your tests here.
+from apps.analytics import rollup
+from apps.analytics.models import DashboardMetrics, MetricsDirtyDay
+from apps.bookings.models import Booking
+from apps.clients.models import Client
+from apps.payments.models import ClientPayment
+from apps.trainers.models import Trainer
+
+User = get_user_model()
+
+
+class DashboardMetricsRollupTest(TestCase):
+    """Tests for the daily DashboardMetrics rollup"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        self.trainer = Trainer.objects.create(user=self.user, business_name='Fit Pro')
+        self.client_a = Client.objects.create(
+            trainer=self.trainer, first_name='Ann', last_name='Lee', email='ann@example.com'
+        )
+        self.client_b = Client.objects.create(
+            trainer=self.trainer, first_name='Bob', last_name='Ray', email='bob@example.com'
+        )
+        self.day = date(2026, 3, 2)
+    
+    def booking(self, client, hour, status, day=None):
+        start = datetime.combine(day or self.day, time(hour), tzinfo=dt_timezone.utc)
+        return Booking(
+            trainer=self.trainer,
+            client=client,
+            start_time=start,
+            end_time=start + timedelta(hours=1),
+            status=status
+        )
+    
+    def test_run_rolls_up_changed_days(self):
+        # Created with bulk_create: the workflow trigger signal is not under test
+        Booking.objects.bulk_create([
+            self.booking(self.client_a, 9, 'completed'),
+            self.booking(self.client_a, 11, 'confirmed'),
+            self.booking(self.client_b, 15, 'cancelled'),
+        ])
+        ClientPayment.objects.create(
+            client=self.client_a,
+            amount=Decimal('80.00'),
+            payment_method='cash',
+            payment_date=self.day,
+            recorded_by=self.user
+        )
+        
+        rollup.run()
+        
+        metrics = DashboardMetrics.objects.get(trainer=self.trainer, date=self.day)
+        self.assertEqual(metrics.bookings_count, 3)
+        self.assertEqual(metrics.completed_bookings, 1)
+        self.assertEqual(metrics.cancelled_bookings, 1)
+        self.assertEqual(metrics.active_clients, 1)
+        self.assertEqual(metrics.revenue, Decimal('80.00'))
+        # Both clients were created today
+        created = DashboardMetrics.objects.get(trainer=self.trainer, date=self.client_a.created_at.date())
+        self.assertEqual(created.new_clients, 2)
+        
+        # Nothing changed since the high-water mark
+        with mock.patch.object(rollup, 'HIGH_WATER_OVERLAP', timedelta(0)):
+            self.assertEqual(rollup.run()['days'], 0)
+            
+            Booking.objects.filter(status='confirmed').update(
+                status='completed',
+                updated_at=timezone.now()
+            )
+            self.assertEqual(rollup.run()['days'], 1)
+        metrics.refresh_from_db()
+        self.assertEqual(metrics.completed_bookings, 2)
+    
+    def test_run_recomputes_days_rows_moved_off(self):
+        from django.db.models.signals import post_save
+        from apps.workflows.signals import booking_saved
+        
+        # Workflow triggers are not under test here
+        post_save.disconnect(booking_saved, sender=Booking)
+        self.addCleanup(post_save.connect, booking_saved, sender=Booking)
+        
+        # Bookings cannot be saved in the past
+        day = timezone.localdate() + timedelta(days=10)
+        moved, deleted = Booking.objects.bulk_create([
+            self.booking(self.client_a, 9, 'confirmed', day),
+            self.booking(self.client_b, 11, 'confirmed', day),
+        ])
+        payment = ClientPayment.objects.create(
+            client=self.client_a,
+            amount=Decimal('80.00'),
+            payment_method='cash',
+            payment_date=day,
+            recorded_by=self.user
+        )
+        rollup.run()
+        
+        moved.start_time += timedelta(days=1)
+        moved.end_time += timedelta(days=1)
+        moved.save()
+        deleted.delete()
+        payment.payment_date = day + timedelta(days=1)
+        payment.save()
+        
+        rollup.run()
+        
+        metrics = DashboardMetrics.objects.get(trainer=self.trainer, date=day)
+        self.assertEqual((metrics.bookings_count, metrics.revenue), (0, Decimal('0')))
+        metrics = DashboardMetrics.objects.get(trainer=self.trainer, date=day + timedelta(days=1))
+        self.assertEqual((metrics.bookings_count, metrics.revenue), (1, Decimal('80.00')))
+        self.assertFalse(MetricsDirtyDay.objects.exists())
+    
+    def test_backfill_replaces_range(self):
+        DashboardMetrics.objects.create(trainer=self.trainer, date=self.day, bookings_count=99)
+        Booking.objects.bulk_create([self.booking(self.client_a, 9, 'completed')])
+        
+        rollup.backfill(self.day, self.day)
+        
+        metrics = DashboardMetrics.objects.get(trainer=self.trainer, date=self.day)
+        self.assertEqual(metrics.bookings_count, 1)
+        self.assertEqual(metrics.completed_bookings, 1)
+
+
+class DashboardSummaryTest(TestCase):
+    """Tests for the cached trainer dashboard summary"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        
+        user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        self.trainer = Trainer.objects.create(user=user, business_name='Fit Pro')
+        self.client_a = Client.objects.create(
+            trainer=self.trainer, first_name='Ann', last_name='Lee', email='ann@example.com'
+        )
+        upcoming = timezone.now() + timedelta(days=1)
+        past = timezone.now() - timedelta(days=2)
+        Booking.objects.bulk_create([
+            Booking(
+                trainer=self.trainer,
+                client=self.client_a,
+                start_time=upcoming,
+                end_time=upcoming + timedelta(hours=1),
+                status='confirmed'
+            ),
+            Booking(
+                trainer=self.trainer,
+                client=self.client_a,
+                start_time=past,
+                end_time=past + timedelta(hours=1),
+                status='completed'
+            ),
+        ])
+    
+    def test_summary_is_cached_until_trainer_data_changes(self):
+        from apps.analytics.summary import get_summary
+        
+        with self.assertNumQueries(4):
+            summary = get_summary(self.trainer)
+        self.assertEqual(summary['total_bookings'], 2)
+        self.assertEqual(summary['completed_bookings'], 1)
+        self.assertEqual(summary['upcoming_bookings'], 1)
+        self.assertEqual(summary['total_clients'], 1)
+        self.assertEqual(summary['new_clients'], 1)
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(get_summary(self.trainer), summary)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Client.objects.create(
+                trainer=self.trainer, first_name='Bob', last_name='Ray', email='bob@example.com'
+            )
+        
+        self.assertEqual(get_summary(self.trainer)['total_clients'], 2)
+
+
+class LeaderboardTest(TestCase):
+    """Tests for the incrementally kept trainer leaderboard"""
+    
+    def setUp(self):
+        from apps.payments.models import Subscription
+        
+        self.trainers = []
+        self.subscriptions = []
+        for index in range(3):
+            user = User.objects.create_user(
+                email=f'trainer{index}@example.com',
+                username=f'trainer{index}',
+                password='pass123'
+            )
+            trainer = Trainer.objects.create(user=user, business_name=f'Gym {index}')
+            self.trainers.append(trainer)
+            self.subscriptions.append(Subscription.objects.create(trainer=trainer, plan='pro'))
+    
+    def pay(self, index, amount, status='completed'):
+        from apps.payments.models import Payment
+        
+        return Payment.objects.create(
+            subscription=self.subscriptions[index],
+            amount=Decimal(amount),
+            paddle_transaction_id=f'txn_{Payment.objects.count()}',
+            status=status
+        )
+    
+    def test_payment_writes_update_scores(self):
+        from apps.analytics import leaderboard
+        
+        self.pay(0, '29.00')
+        self.pay(1, '79.00')
+        pending = self.pay(2, '500.00', status='pending')
+        
+        ranked = [score.trainer_id for score in leaderboard.top('revenue')]
+        self.assertEqual(ranked[:2], [self.trainers[1].id, self.trainers[0].id])
+        
+        pending.status = 'completed'
+        pending.save()
+        self.assertEqual(leaderboard.top('revenue', limit=1)[0].trainer_id, self.trainers[2].id)
+        
+        pending.delete()
+        self.assertEqual(leaderboard.top('revenue', limit=1)[0].trainer_id, self.trainers[1].id)
+        self.assertEqual(
+            {trainer_id: values['revenue'] for trainer_id, values in leaderboard.compute_scores().items()},
+            {score.trainer_id: score.revenue for score in leaderboard.top('revenue')}
+        )
+    
+    def test_reconcile_repairs_bulk_writes(self):
+        from apps.analytics import leaderboard
+        
+        client = Client.objects.create(
+            trainer=self.trainers[2], first_name='Ann', last_name='Lee', email='ann@example.com'
+        )
+        start = timezone.now()
+        # bulk_create bypasses the signals, like the bulk paths in production
+        Booking.objects.bulk_create([
+            Booking(
+                trainer=self.trainers[2],
+                client=client,
+                start_time=start + timedelta(hours=hour),
+                end_time=start + timedelta(hours=hour + 1),
+                status='completed'
+            )
+            for hour in range(3)
+        ])
+        leaderboard.reconcile()
+        
+        best = leaderboard.top('completed_sessions', limit=1)[0]
+        self.assertEqual(best.trainer_id, self.trainers[2].id)
+        self.assertEqual(best.bookings, 3)
+
+
+class ActivitySketchTest(TestCase):
+    """Tests for the HyperLogLog active-user sketches"""
+    
+    def test_estimate_is_close_and_sketches_merge(self):
+        from apps.analytics.activity import HyperLogLog
+        
+        first, second = HyperLogLog(), HyperLogLog()
+        for member in range(6000):
+            first.add(member)
+        for member in range(4000, 10000):
+            second.add(member)
+        first.merge(second)
+        
+        self.assertAlmostEqual(second.count(), 6000, delta=300)
+        self.assertAlmostEqual(first.count(), 10000, delta=500)
+    
+    @mock.patch('apps.analytics.activity._redis', return_value=None)
+    def test_database_sketches_count_distinct_members(self, redis):
+        from apps.analytics import activity
+        
+        today = date(2026, 3, 10)
+        activity.record_many('clients', range(50), today - timedelta(days=3))
+        activity.record_many('clients', range(25, 100), today)
+        activity.record('clients', 7, today)
+        
+        # Sketches estimate; small counts land within a few members
+        counts = activity.active_counts('clients', today)
+        self.assertAlmostEqual(counts['dau'], 75, delta=4)
+        self.assertAlmostEqual(counts['wau'], 100, delta=4)
+        self.assertEqual(counts['wau'], counts['mau'])
+        self.assertEqual(activity.count('trainers', today, today), 0)
+
+
+class UtilizationHeatmapTest(TestCase):
+    """Tests for the weekday x time-of-day utilization heatmap"""
+    
+    def setUp(self):
+        from apps.availability.models import AvailabilitySlot
+        
+        user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        self.trainer = Trainer.objects.create(user=user, business_name='Fit Pro')
+        client = Client.objects.create(
+            trainer=self.trainer, first_name='Ann', last_name='Lee', email='ann@example.com'
+        )
+        AvailabilitySlot.objects.create(
+            trainer=self.trainer, day_of_week=0, start_time=time(9), end_time=time(11)
+        )
+        
+        def booking(day, hour, minutes, status):
+            start = datetime(2026, 3, day, hour, tzinfo=dt_timezone.utc)
+            return Booking(
+                trainer=self.trainer,
+                client=client,
+                start_time=start,
+                end_time=start + timedelta(minutes=minutes),
+                status=status
+            )
+        
+        # Mondays; bulk_create skips the booking signals
+        Booking.objects.bulk_create([
+            booking(2, 9, 60, 'completed'),
+            booking(2, 10, 60, 'cancelled'),
+            booking(2, 10, 30, 'no-show'),
+            booking(9, 9, 60, 'completed'),
+        ])
+        self.today = date(2026, 3, 10)
+    
+    def test_hourly_cells(self):
+        from apps.analytics.heatmap import compute_heatmap
+        
+        heatmap = compute_heatmap(self.trainer, today=self.today)
+        
+        # The window holds 53 Mondays of two available hours each
+        self.assertEqual(heatmap['available_minutes'][0][9], 53 * 60)
+        self.assertEqual(heatmap['booked_minutes'][0][9], 120)
+        self.assertEqual(heatmap['utilization'][0][9], round(120 / (53 * 60) * 100, 2))
+        self.assertIsNone(heatmap['utilization'][0][8])
+        
+        self.assertEqual(heatmap['bookings'][0][10], 2)
+        self.assertEqual(heatmap['booked_minutes'][0][10], 30)
+        self.assertEqual(heatmap['cancellation_rate'][0][10], 50)
+        self.assertEqual(heatmap['no_show_rate'][0][10], 50)
+        self.assertEqual(heatmap['no_show_rate'][0][9], 0)
+    
+    def test_quarter_hour_cells_match_across_backends(self):
+        from apps.analytics import heatmap
+        
+        quarters = heatmap.compute_heatmap(self.trainer, cell_minutes=15, today=self.today)
+        self.assertEqual(len(quarters['booked_minutes'][0]), 96)
+        self.assertEqual(quarters['booked_minutes'][0][40:43], [15, 15, 0])
+        
+        if heatmap.np is not None:
+            with mock.patch.object(heatmap, 'np', None):
+                fallback = heatmap.compute_heatmap(self.trainer, cell_minutes=15, today=self.today)
+            self.assertEqual(fallback, quarters)
+
+
+class ConditionalAggregateTest(TestCase):
+    """Tests for the single-query stats endpoints"""
+    
+    def setUp(self):
+        from rest_framework.test import APIClient
+        
+        self.user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        self.trainer = Trainer.objects.create(user=self.user, business_name='Fit Pro')
+        client = Client.objects.create(
+            trainer=self.trainer, first_name='Ann', last_name='Lee', email='ann@example.com',
+            fitness_level='advanced'
+        )
+        start = timezone.now()
+        Booking.objects.bulk_create([
+            Booking(
+                trainer=self.trainer,
+                client=client,
+                start_time=start + timedelta(hours=index),
+                end_time=start + timedelta(hours=index + 1),
+                status=status
+            )
+            for index, status in enumerate(['completed', 'completed', 'cancelled', 'no-show'])
+        ])
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+    
+    def test_helper_nests_and_fills_empty_measures(self):
+        from django.db.models import Q
+        from apps.analytics.aggregates import choice_measures, conditional_aggregate
+        
+        with self.assertNumQueries(1):
+            totals = conditional_aggregate(Booking.objects.filter(trainer=self.trainer), {
+                'total': ('count', 'id'),
+                'later': ('count', 'id', Q(start_time__gte=timezone.now() + timedelta(days=1))),
+                'by_status': choice_measures('status', Booking.STATUS_CHOICES),
+            })
+        
+        self.assertEqual(totals['total'], 4)
+        self.assertEqual(totals['later'], 0)
+        self.assertEqual(totals['by_status'], {
+            'pending': 0, 'confirmed': 0, 'completed': 2, 'cancelled': 1, 'no-show': 1,
+        })
+    
+    def test_stats_endpoints_use_one_aggregate_query(self):
+        # One query loads the trainer profile, one computes the stats
+        with self.assertNumQueries(2):
+            bookings = self.api.get('/api/analytics/bookings-stats/').data
+        self.assertEqual(bookings['completion_rate'], 50)
+        self.assertEqual(bookings['by_status']['no-show'], 1)
+        
+        with self.assertNumQueries(2):
+            clients = self.api.get('/api/analytics/client-stats/').data
+        self.assertEqual(clients['active_clients'], 1)
+        self.assertEqual(clients['by_fitness_level']['advanced'], 1)
+
+
+class WeeklyReportTest(TestCase):
+    """Tests for the batched weekly trainer reports"""
+    
+    def setUp(self):
+        from apps.analytics.reports import week_bounds
+        
+        self.start, self.end = week_bounds(date(2026, 3, 11))
+        self.trainers = []
+        for index in range(3):
+            user = User.objects.create_user(
+                email=f'trainer{index}@example.com',
+                username=f'trainer{index}',
+                password='pass123'
+            )
+            self.trainers.append(Trainer.objects.create(user=user, business_name=f'Gym {index}'))
+        client = Client.objects.create(
+            trainer=self.trainers[0], first_name='Ann', last_name='Lee', email='ann@example.com'
+        )
+        Booking.objects.bulk_create([
+            Booking(
+                trainer=self.trainers[0],
+                client=client,
+                start_time=start,
+                end_time=start + timedelta(hours=1),
+                status=status
+            )
+            for start, status in [
+                (self.start + timedelta(days=1, hours=9), 'completed'),
+                (self.start + timedelta(days=2, hours=9), 'no-show'),
+                (self.end + timedelta(days=1, hours=9), 'confirmed'),
+            ]
+        ])
+        ClientPayment.objects.create(
+            client=client, amount=Decimal('40.00'), payment_method='cash',
+            payment_date=self.start.date() + timedelta(days=1)
+        )
+    
+    def test_reports_cost_fixed_queries_and_share_a_template(self):
+        from apps.analytics.reports import build_reports
+        from apps.notifications.email_service import email_service
+        
+        self.assertEqual(self.start.date(), date(2026, 3, 2))
+        
+        # Trainers plus one grouped query per table, whatever the trainer count
+        with self.assertNumQueries(5):
+            reports = build_reports(self.start, self.end)
+        
+        self.assertEqual([report.trainer_id for report in reports], [t.id for t in self.trainers])
+        figures = reports[0].payload['variables']
+        self.assertEqual(
+            (figures['bookings'], figures['completed'], figures['no_shows'], figures['upcoming']),
+            (2, 1, 1, 1)
+        )
+        self.assertEqual(figures['revenue'], '40.00')
+        self.assertEqual(reports[1].payload['variables']['bookings'], 0)
+        
+        emails = [email_service.batch_email(report) for report in reports]
+        self.assertEqual(len({email.html_template for email in emails}), 1)
@@ -73,6 +73,64 @@ class BookingModelTest(TestCase):
         self.assertIn('John Doe', str(booking))
 
 
+class BookingStoredValuesTest(TestCase):
+    """Tests for the stored booking row shared by signal handlers"""
+    
+    def setUp(self):
+        from django.db.models.signals import post_save
+        from apps.workflows.signals import booking_saved
+        
+        # Workflow triggers are not under test here
+        post_save.disconnect(booking_saved, sender=Booking)
+        self.addCleanup(post_save.connect, booking_saved, sender=Booking)
+        
+        user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        self.trainer = Trainer.objects.create(user=user, business_name='Fit Pro')
+        client = Client.objects.create(
+            trainer=self.trainer,
+            first_name='John',
+            last_name='Doe',
+            email='john@example.com'
+        )
+        start_time = timezone.now() + timedelta(days=1)
+        self.booking = Booking.objects.create(
+            trainer=self.trainer,
+            client=client,
+            start_time=start_time,
+            end_time=start_time + timedelta(hours=1),
+            status='confirmed'
+        )
+    
+    def test_update_reads_stored_row_once(self):
+        """Test that one stored-row read serves reminders and scores"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from apps.analytics.models import TrainerScore
+        from apps.notifications.models import ScheduledReminder
+        
+        self.booking.start_time += timedelta(days=1)
+        self.booking.end_time += timedelta(days=1)
+        
+        with CaptureQueriesContext(connection) as queries:
+            self.booking.save()
+        
+        stored_reads = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "bookings_booking"' in query['sql']
+            and '"bookings_booking"."id" = ' in query['sql']
+        ]
+        self.assertEqual(len(stored_reads), 1)
+        self.assertEqual(
+            ScheduledReminder.objects.get(kind='24h').due_at,
+            self.booking.start_time - timedelta(hours=24)
+        )
+        self.assertEqual(TrainerScore.objects.get(trainer=self.trainer).bookings, 1)
+
+
 class AvailabilitySlotModelTest(TestCase):
     """Tests for AvailabilitySlot model"""
     
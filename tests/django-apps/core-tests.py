@@ -0,0 +1,67 @@
+"""
+Unit tests for core app
+"""
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from apps.trainers.models import Trainer
+from apps.workflows.models import Workflow, WorkflowExecutionLog
+
+User = get_user_model()
+
+
+class LogPartitioningTest(TestCase):
+    """Tests for log table partition helpers and retention"""
+    
+    def setUp(self):
+        user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        trainer = Trainer.objects.create(user=user, business_name='Fit Pro')
+        self.workflow = Workflow.objects.create(trainer=trainer, name='Welcome')
+    
+    def test_month_helpers(self):
+        """Test month arithmetic and partition naming"""
+        from datetime import date
+        from apps.core.partitioning import add_months, month_bound, partition_name
+        
+        self.assertEqual(add_months(date(2026, 11, 1), 3), date(2027, 2, 1))
+        self.assertEqual(add_months(date(2026, 1, 1), -1), date(2025, 12, 1))
+        self.assertEqual(month_bound(date(2026, 3, 1)), '2026-03-01T00:00:00+00:00')
+        self.assertEqual(
+            partition_name('workflows_workflowexecutionlog', date(2026, 3, 1)),
+            'workflows_workflowexecutionlog_p202603'
+        )
+    
+    def test_retention_without_partitions_deletes_expired_rows(self):
+        """Test retention falls back to deleting rows on non-partitioned tables"""
+        from datetime import datetime, timezone as dt_timezone
+        from django.test import override_settings
+        from apps.core.partitioning import PartitionedTable
+        
+        old = WorkflowExecutionLog.objects.create(workflow=self.workflow, trigger_type='booking_created')
+        recent = WorkflowExecutionLog.objects.create(workflow=self.workflow, trigger_type='booking_created')
+        WorkflowExecutionLog.objects.filter(pk=old.pk).update(
+            executed_at=datetime(2026, 3, 31, 23, 0, tzinfo=dt_timezone.utc)
+        )
+        WorkflowExecutionLog.objects.filter(pk=recent.pk).update(
+            executed_at=datetime(2026, 4, 1, 1, 0, tzinfo=dt_timezone.utc)
+        )
+        
+        table = PartitionedTable('workflows.WorkflowExecutionLog', 'executed_at')
+        now = datetime(2026, 10, 19, tzinfo=dt_timezone.utc)
+        
+        self.assertFalse(table.is_partitioned())
+        with override_settings(LOG_RETENTION={table.label: {'months': 6, 'action': 'drop'}}):
+            removed = table.apply_retention(now)
+        
+        self.assertEqual(len(removed), 1)
+        self.assertEqual(
+            list(WorkflowExecutionLog.objects.values_list('pk', flat=True)),
+            [recent.pk]
+        )
+        
+        with override_settings(LOG_RETENTION={table.label: {'months': 1, 'action': 'archive'}}):
+            self.assertEqual(table.apply_retention(now), [])
+        self.assertTrue(WorkflowExecutionLog.objects.filter(pk=recent.pk).exists())
@@ -1,3 +1,792 @@
-from django.test import TestCase
+"""
+Unit tests for notifications app
+"""
+from contextlib import contextmanager
+from unittest import mock
+from datetime import timedelta
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.trainers.models import Trainer
+from apps.clients.models import Client
+from apps.bookings.models import Booking
+from apps.notifications.models import DigestEntry, Notification, NotificationCounter, ReminderLedger, ScheduledReminder
+from apps.notifications.scheduling import schedule_reminders
+from apps.notifications import counters, digest, outbound, tasks
+from apps.notifications.email_service import EmailService, email_service
+from apps.notifications.sms_service import sms_service
+from tests.fake_sendgrid import FakeSendGridServer
 
-# Create your tests here.
+User = get_user_model()
+
+# Rate limits high enough that tests never wait on a bucket
+FAST_RATE_LIMITS = {
+    'email': {'rate': 1000, 'burst': 1000},
+    'sms': {'rate': 1000, 'burst': 1000},
+    'sms_sender': {'rate': 1000, 'burst': 1000},
+}
+
+
+@contextmanager
+def delivering(testcase):
+    """Run queued deliver_notifications tasks inline once the block commits."""
+    with mock.patch.object(
+        tasks.deliver_notifications, 'delay',
+        side_effect=lambda ids: tasks.deliver_notifications(ids)
+    ), testcase.captureOnCommitCallbacks(execute=True):
+        yield
+
+
+@override_settings(NOTIFICATION_RATE_LIMITS=FAST_RATE_LIMITS)
+class ReminderPipelineTest(TestCase):
+    """Tests for the chunked booking reminder pipeline"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        self.trainer = Trainer.objects.create(
+            user=self.user,
+            business_name='Fit Pro'
+        )
+        self.client_obj = Client.objects.create(
+            trainer=self.trainer,
+            first_name='John',
+            last_name='Doe',
+            email='john@example.com',
+            phone='+15550001111'
+        )
+        self.start = timezone.now() + timedelta(days=1)
+        # bulk_create skips Booking.save() validation and post_save signals
+        self.bookings = Booking.objects.bulk_create([
+            Booking(
+                trainer=self.trainer,
+                client=self.client_obj,
+                start_time=self.start + timedelta(minutes=i),
+                end_time=self.start + timedelta(minutes=i + 60),
+                status='confirmed'
+            )
+            for i in range(5)
+        ])
+    
+    @override_settings(NOTIFICATION_REMINDER_CHUNK_SIZE=2)
+    def test_planner_dispatches_chunks(self):
+        """Test that due bookings are split into fixed-size chunks"""
+        with mock.patch.object(tasks.send_reminder_chunk, 'delay') as delay:
+            total, chunks = tasks._dispatch_reminder_chunks(
+                self.start - timedelta(minutes=1),
+                self.start + timedelta(hours=1),
+                hours_before=24,
+                channels=('email', 'sms')
+            )
+        
+        self.assertEqual(total, 5)
+        self.assertEqual(chunks, 3)
+        sizes = [len(call.args[0]) for call in delay.call_args_list]
+        self.assertEqual(sizes, [2, 2, 1])
+    
+    def test_chunk_writes_notifications_in_bulk(self):
+        """Test that a chunk queues every channel and the queue delivers it"""
+        booking_ids = [booking.id for booking in self.bookings]
+        email_client = mock.Mock()
+        sms_client = mock.Mock()
+        sms_client.messages.create.side_effect = [Exception('Twilio down')] + [mock.Mock()] * 4
+        
+        with mock.patch.object(email_service, 'client', email_client), \
+                mock.patch.object(sms_service, 'client', sms_client), \
+                mock.patch.object(sms_service, 'from_number', '+15559990000'), \
+                delivering(self):
+            result = tasks.send_reminder_chunk(booking_ids, 24, ['email', 'sms'])
+        
+        self.assertEqual(result, {'bookings': 5, 'queued': 10})
+        # All five reminders share one template, so one SendGrid request
+        self.assertEqual(email_client.send.call_count, 1)
+        self.assertEqual(Notification.objects.filter(notification_type='email').count(), 5)
+        self.assertEqual(Notification.objects.filter(status='sent').count(), 9)
+        self.assertEqual(Notification.objects.filter(status='failed').count(), 1)
+    
+    def test_chunk_skips_cancelled_bookings(self):
+        """Test that bookings cancelled after planning are not reminded"""
+        Booking.objects.filter(id=self.bookings[0].id).update(status='cancelled')
+        
+        with mock.patch.object(email_service, 'client', mock.Mock()):
+            result = tasks.send_reminder_chunk([self.bookings[0].id], 24, ['email'])
+        
+        self.assertEqual(result['bookings'], 0)
+        self.assertFalse(Notification.objects.exists())
+    
+    def test_overlapping_runs_send_once(self):
+        """Test that a booking picked up by two runs is reminded once"""
+        booking_ids = [booking.id for booking in self.bookings]
+        
+        with mock.patch.object(sms_service, 'client', mock.Mock()), \
+                mock.patch.object(sms_service, 'from_number', '+15559990000'):
+            first = tasks.send_reminder_chunk(booking_ids, 1, ['sms'])
+            second = tasks.send_reminder_chunk(booking_ids, 1, ['sms'])
+        
+        self.assertEqual(first['bookings'], 5)
+        self.assertEqual(second['bookings'], 0)
+        self.assertEqual(Notification.objects.count(), 5)
+    
+    def test_planner_skips_ledgered_bookings(self):
+        """Test that already-claimed bookings are not dispatched again"""
+        ReminderLedger.claim([self.bookings[0].id], '24h')
+        
+        with mock.patch.object(tasks.send_reminder_chunk, 'delay'):
+            total, _ = tasks._dispatch_reminder_chunks(
+                self.start - timedelta(minutes=1),
+                self.start + timedelta(hours=1),
+                hours_before=24,
+                channels=('email',)
+            )
+        
+        self.assertEqual(total, 4)
+
+
+class ReminderLedgerTest(TestCase):
+    """Tests for ReminderLedger claims"""
+    
+    def setUp(self):
+        user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        trainer = Trainer.objects.create(user=user, business_name='Fit Pro')
+        client = Client.objects.create(
+            trainer=trainer,
+            first_name='John',
+            last_name='Doe',
+            email='john@example.com'
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.bookings = Booking.objects.bulk_create([
+            Booking(
+                trainer=trainer,
+                client=client,
+                start_time=start + timedelta(hours=i),
+                end_time=start + timedelta(hours=i + 1)
+            )
+            for i in range(3)
+        ])
+    
+    def test_claims_are_disjoint(self):
+        """Test that overlapping claims never hand out a booking twice"""
+        ids = [booking.id for booking in self.bookings]
+        
+        first = ReminderLedger.claim(ids[:2], '1h')
+        second = ReminderLedger.claim(ids, '1h')
+        
+        self.assertEqual(first, set(ids[:2]))
+        self.assertEqual(second, {ids[2]})
+    
+    def test_kinds_are_independent(self):
+        """Test that a 24h claim does not block the 1h reminder"""
+        ids = [booking.id for booking in self.bookings]
+        
+        ReminderLedger.claim(ids, '24h')
+        
+        self.assertEqual(ReminderLedger.claim(ids, '1h'), set(ids))
+
+@override_settings(NOTIFICATION_RATE_LIMITS=FAST_RATE_LIMITS)
+class BatchEmailSendTest(TestCase):
+    """Tests for batched outbound SendGrid sends against the local stand-in"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        self.trainer = Trainer.objects.create(
+            user=self.user,
+            business_name='Fit Pro',
+            location='Main Gym'
+        )
+        start = timezone.now() + timedelta(days=1)
+        clients = Client.objects.bulk_create([
+            Client(
+                trainer=self.trainer,
+                first_name=f'Client{i}',
+                last_name='Test',
+                email=f'client{i}@example.com'
+            )
+            for i in range(3)
+        ])
+        self.bookings = Booking.objects.bulk_create([
+            Booking(
+                trainer=self.trainer,
+                client=client,
+                start_time=start,
+                end_time=start + timedelta(hours=1),
+                status='confirmed'
+            )
+            for client in clients
+        ])
+    
+    def _send(self, server):
+        """Queue reminders for the bookings and run the outbound delivery."""
+        notifications = email_service.build_booking_reminders(self.bookings, hours_before=24)
+        for notification in notifications:
+            notification.status = 'pending'
+        Notification.objects.bulk_create(notifications)
+        
+        with override_settings(SENDGRID_API_KEY='test-key', SENDGRID_API_HOST=server.url):
+            client = EmailService().client
+        with mock.patch.object(email_service, 'client', client):
+            outbound.deliver([notification.id for notification in notifications])
+        return list(Notification.objects.order_by('id'))
+    
+    def test_reminders_share_one_request(self):
+        """Test that reminders go out as personalizations of one request"""
+        with FakeSendGridServer() as server:
+            notifications = self._send(server)
+        
+        self.assertEqual(len(server.requests), 1)
+        personalizations = server.requests[0]['personalizations']
+        self.assertEqual(len(personalizations), 3)
+        self.assertEqual(
+            sorted(p['substitutions']['-client_name-'] for p in personalizations),
+            ['Client0 Test', 'Client1 Test', 'Client2 Test']
+        )
+        self.assertIn('-location-', server.requests[0]['content'][0]['value'])
+        self.assertTrue(all(n.status == 'sent' for n in notifications))
+    
+    def test_rejected_recipient_fails_alone(self):
+        """Test that a rejected recipient is failed and the rest resent"""
+        with FakeSendGridServer(reject={'client1@example.com'}) as server:
+            notifications = self._send(server)
+        
+        self.assertEqual([n.status for n in notifications], ['sent', 'failed', 'sent'])
+        self.assertIn('valid address', notifications[1].failed_reason)
+        self.assertEqual(len(server.requests[0]['personalizations']), 2)
+    
+    def test_request_failure_fails_whole_batch(self):
+        """Test that a failed request marks every recipient failed"""
+        with FakeSendGridServer(fail_status=503) as server:
+            notifications = self._send(server)
+        
+        self.assertTrue(all(n.status == 'failed' for n in notifications))
+        self.assertEqual(server.requests, [])
+
+
+class ReminderSchedulingTest(TestCase):
+    """Tests for per-booking reminder scheduling and the ticker"""
+    
+    def setUp(self):
+        user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        self.trainer = Trainer.objects.create(
+            user=user,
+            business_name='Fit Pro',
+            timezone='America/New_York'
+        )
+        self.client_obj = Client.objects.create(
+            trainer=self.trainer,
+            first_name='John',
+            last_name='Doe',
+            email='john@example.com',
+            phone='+15550001111'
+        )
+        start = timezone.now() + timedelta(days=2)
+        self.booking = Booking.objects.bulk_create([
+            Booking(
+                trainer=self.trainer,
+                client=self.client_obj,
+                start_time=start,
+                end_time=start + timedelta(hours=1),
+                status='confirmed'
+            )
+        ])[0]
+    
+    def test_schedules_both_reminders(self):
+        """Test that a future booking gets a 24h and a 1h entry"""
+        schedule_reminders(self.booking)
+        
+        due = dict(ScheduledReminder.objects.values_list('kind', 'due_at'))
+        self.assertEqual(due['24h'], self.booking.start_time - timedelta(hours=24))
+        self.assertEqual(due['1h'], self.booking.start_time - timedelta(hours=1))
+    
+    def test_reschedule_moves_entries_and_clears_ledger(self):
+        """Test that moving a booking moves its entries and re-arms reminders"""
+        schedule_reminders(self.booking)
+        ReminderLedger.claim([self.booking.id], '24h')
+        
+        self.booking.start_time += timedelta(days=1)
+        schedule_reminders(self.booking, rescheduled=True)
+        
+        self.assertEqual(ScheduledReminder.objects.count(), 2)
+        self.assertEqual(
+            ScheduledReminder.objects.get(kind='24h').due_at,
+            self.booking.start_time - timedelta(hours=24)
+        )
+        self.assertFalse(ReminderLedger.objects.exists())
+    
+    def test_cancel_removes_entries(self):
+        """Test that cancelling a booking drops its reminders"""
+        schedule_reminders(self.booking)
+        
+        self.booking.status = 'cancelled'
+        schedule_reminders(self.booking)
+        
+        self.assertFalse(ScheduledReminder.objects.exists())
+    
+    def test_ticker_pops_only_due_entries(self):
+        """Test that the ticker dispatches due entries and leaves the rest"""
+        schedule_reminders(self.booking)
+        ScheduledReminder.objects.filter(kind='24h').update(
+            due_at=timezone.now() - timedelta(minutes=1)
+        )
+        
+        with mock.patch.object(tasks.send_reminder_chunk, 'delay') as delay:
+            result = tasks.dispatch_due_reminders()
+        
+        self.assertEqual(result, {'24h': 1})
+        delay.assert_called_once_with([self.booking.id], 24, ('email', 'sms'))
+        self.assertEqual(list(ScheduledReminder.objects.values_list('kind', flat=True)), ['1h'])
+    
+    def test_ticker_keeps_entries_when_hand_off_fails(self):
+        """Test that due entries stay scheduled if their chunks cannot be queued"""
+        schedule_reminders(self.booking)
+        ScheduledReminder.objects.filter(kind='24h').update(
+            due_at=timezone.now() - timedelta(minutes=1)
+        )
+        
+        with mock.patch.object(tasks.send_reminder_chunk, 'delay', side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                tasks.dispatch_due_reminders()
+        
+        self.assertEqual(ScheduledReminder.objects.count(), 2)
+    
+    def test_reminder_uses_trainer_timezone(self):
+        """Test that reminder text shows the session in the trainer's timezone"""
+        from apps.notifications.utils import trainer_localtime
+        
+        local = trainer_localtime(self.booking.start_time, self.trainer)
+        
+        notifications = sms_service.build_booking_reminders([self.booking], hours_before=24)
+        
+        self.assertEqual(str(local.tzinfo), 'America/New_York')
+        self.assertIn(local.strftime('%A at %I:%M %p'), notifications[0].message)
+
+
+@override_settings(NOTIFICATION_RATE_LIMITS=FAST_RATE_LIMITS)
+class RetryEngineTest(TestCase):
+    """Tests for replaying failed notifications"""
+    
+    def setUp(self):
+        user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        self.trainer = Trainer.objects.create(user=user, business_name='Fit Pro')
+        self.variables = {
+            'client_name': 'John Doe',
+            'trainer_name': 'Fit Pro',
+            'date': '2030-01-01',
+            'time': '10:00 AM',
+            'hours_before': 24,
+            'location': '',
+        }
+    
+    def _failed(self, notification_type, recipient, **kwargs):
+        return Notification.objects.create(
+            trainer=self.trainer,
+            notification_type=notification_type,
+            recipient=recipient,
+            subject='Reminder: Your session in 24 hours',
+            message='Reminder: Booking in 24 hours',
+            status='failed',
+            failed_reason='timeout',
+            **kwargs
+        )
+    
+    def test_emails_replayed_from_payload(self):
+        """Test that failed emails are re-rendered and resent in one request"""
+        payload = {'template': 'booking_reminder', 'variables': self.variables}
+        first = self._failed('email', 'a@example.com', payload=payload)
+        second = self._failed('email', 'b@example.com', payload=payload)
+        legacy = self._failed('email', 'c@example.com')
+        
+        with FakeSendGridServer() as server:
+            with override_settings(SENDGRID_API_KEY='test-key', SENDGRID_API_HOST=server.url):
+                client = EmailService().client
+            with mock.patch.object(email_service, 'client', client), \
+                    mock.patch.object(sms_service, 'client', None), \
+                    delivering(self):
+                result = tasks.retry_failed_notifications()
+        
+        self.assertEqual(result['email'], {'requeued': 2})
+        self.assertEqual(len(server.requests), 1)
+        self.assertIn('John Doe', str(server.requests[0]['personalizations'][0]['substitutions']))
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts, first.failed_reason), ('sent', 2, ''))
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.status, 'failed')
+        self.assertEqual(legacy.attempts, 1)
+    
+    def test_failures_back_off_until_attempts_run_out(self):
+        """Test that repeated failures back off and stop at the attempt cap"""
+        notification = self._failed('sms', '+15550001111')
+        sms_client = mock.Mock()
+        sms_client.messages.create.side_effect = Exception('Twilio 429')
+        
+        with mock.patch.object(sms_service, 'client', sms_client), \
+                mock.patch.object(sms_service, 'from_number', '+15559990000'), \
+                mock.patch.object(email_service, 'client', None), \
+                override_settings(NOTIFICATION_RETRY_MAX_ATTEMPTS=3):
+            with delivering(self):
+                tasks.retry_failed_notifications()
+            notification.refresh_from_db()
+            self.assertEqual((notification.status, notification.attempts), ('failed', 2))
+            self.assertGreater(notification.next_retry_at, timezone.now())
+            
+            # Not due yet, so the next run leaves it alone
+            self.assertEqual(tasks.retry_failed_notifications()['sms']['requeued'], 0)
+            
+            Notification.objects.filter(id=notification.id).update(next_retry_at=timezone.now())
+            with delivering(self):
+                tasks.retry_failed_notifications()
+        
+        notification.refresh_from_db()
+        self.assertEqual(notification.attempts, 3)
+        self.assertIsNone(notification.next_retry_at)
+        self.assertEqual(sms_client.messages.create.call_count, 2)
+    
+    def test_backoff_grows_and_is_capped(self):
+        """Test exponential growth and the per-provider ceiling"""
+        from apps.notifications.retry import backoff_delay
+        
+        with override_settings(NOTIFICATION_RETRY_POLICY={'sms': {'base_delay': 10, 'max_delay': 100}}):
+            first = backoff_delay('sms', 1).total_seconds()
+            third = backoff_delay('sms', 3).total_seconds()
+            capped = backoff_delay('sms', 10).total_seconds()
+        
+        self.assertTrue(5 <= first <= 10)
+        self.assertTrue(20 <= third <= 40)
+        self.assertTrue(50 <= capped <= 100)
+
+
+class OutboundQueueTest(TestCase):
+    """Tests for the rate-limited outbound queue"""
+    
+    def setUp(self):
+        user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        self.trainer = Trainer.objects.create(user=user, business_name='Fit Pro')
+        outbound._local_buckets.clear()
+        patcher = mock.patch.object(outbound, 'get_redis', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _sms(self, count):
+        return [
+            Notification(
+                trainer=self.trainer,
+                notification_type='sms',
+                recipient=f'+1555000{i:04d}',
+                message='Hello'
+            )
+            for i in range(count)
+        ]
+    
+    def test_bucket_grants_burst_then_waits(self):
+        """Test that a bucket allows a burst and then reports the wait"""
+        bucket = outbound.TokenBucket('test', rate=2, burst=2)
+        
+        self.assertEqual(bucket.take(), 0)
+        self.assertEqual(bucket.take(), 0)
+        self.assertTrue(0 < bucket.take() <= 0.5)
+    
+    @override_settings(NOTIFICATION_OUTBOUND_MAX_PENDING=2)
+    def test_full_backlog_pushes_back(self):
+        """Test that producers are refused while the backlog is full"""
+        with mock.patch.object(sms_service, 'client', mock.Mock()), \
+                mock.patch.object(sms_service, 'from_number', '+15559990000'):
+            outbound.enqueue(self._sms(2))
+            
+            with self.assertRaises(outbound.OutboundBackpressure) as raised:
+                outbound.enqueue(self._sms(1))
+            
+            # Interactive sends may bypass the check
+            outbound.enqueue(self._sms(1), check_capacity=False)
+        
+        self.assertEqual(raised.exception.provider, 'sms')
+        self.assertEqual(Notification.objects.filter(status='pending').count(), 3)
+    
+    @override_settings(NOTIFICATION_RATE_LIMITS={
+        **FAST_RATE_LIMITS, 'sms_sender': {'rate': 0.1, 'burst': 2},
+    })
+    def test_sender_bucket_defers_remainder(self):
+        """Test that messages beyond the sender's budget are requeued"""
+        sms_client = mock.Mock()
+        
+        with mock.patch.object(sms_service, 'client', sms_client), \
+                mock.patch.object(sms_service, 'from_number', '+15559990000'), \
+                mock.patch.object(tasks.deliver_notifications, 'apply_async') as apply_async, \
+                delivering(self):
+            outbound.enqueue(self._sms(3))
+        
+        self.assertEqual(sms_client.messages.create.call_count, 2)
+        pending = Notification.objects.get(status='pending')
+        self.assertEqual(apply_async.call_args.args[0], ([pending.id],))
+        self.assertGreater(apply_async.call_args.kwargs['countdown'], 1)
+    
+    @override_settings(NOTIFICATION_RATE_LIMITS=FAST_RATE_LIMITS)
+    def test_provider_throttling_keeps_message_pending(self):
+        """Test that a 429 is retried through the queue instead of failing"""
+        throttled = Exception('Too Many Requests')
+        throttled.status = 429
+        sms_client = mock.Mock()
+        sms_client.messages.create.side_effect = throttled
+        
+        with mock.patch.object(sms_service, 'client', sms_client), \
+                mock.patch.object(sms_service, 'from_number', '+15559990000'), \
+                mock.patch.object(tasks.deliver_notifications, 'apply_async') as apply_async, \
+                delivering(self):
+            outbound.enqueue(self._sms(1))
+        
+        notification = Notification.objects.get()
+        self.assertEqual((notification.status, notification.attempts), ('pending', 1))
+        self.assertEqual(apply_async.call_count, 1)
+    
+    def test_workflow_email_is_queued(self):
+        """Test that workflow email actions go through the queue"""
+        from apps.workflows.action_handlers import handle_send_email
+        
+        with mock.patch.object(email_service, 'client', mock.Mock()):
+            handle_send_email(
+                {'subject': 'Hi', 'body': 'See you <soon>'},
+                {'client_email': 'john@example.com'},
+                trainer_id=self.trainer.id
+            )
+        
+        notification = Notification.objects.get()
+        self.assertEqual(notification.status, 'pending')
+        self.assertEqual(
+            notification.payload['variables']['html_content'],
+            '<p>See you &lt;soon&gt;</p>'
+        )
+    
+    def test_workflow_email_without_sendgrid_uses_email_backend(self):
+        """Test that workflow emails fall back to EMAIL_BACKEND and are logged"""
+        from apps.workflows.action_handlers import handle_send_email
+        
+        with mock.patch.object(email_service, 'client', None):
+            handle_send_email(
+                {'subject': 'Hi', 'body': 'See you soon'},
+                {'client_email': 'john@example.com'},
+                trainer_id=self.trainer.id
+            )
+        
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['john@example.com'])
+        self.assertEqual(Notification.objects.get().status, 'sent')
+
+
+@override_settings(NOTIFICATION_DIGEST_WINDOW=120, NOTIFICATION_RATE_LIMITS=FAST_RATE_LIMITS)
+class DigestTest(TestCase):
+    """Tests for coalescing messages into digests"""
+    
+    def setUp(self):
+        user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        self.trainer = Trainer.objects.create(user=user, business_name='Fit Pro')
+        client = Client.objects.create(
+            trainer=self.trainer,
+            first_name='John',
+            last_name='Doe',
+            email='john@example.com',
+            phone='+15550001111'
+        )
+        start = timezone.now() + timedelta(days=1)
+        self.bookings = Booking.objects.bulk_create([
+            Booking(
+                trainer=self.trainer,
+                client=client,
+                start_time=start + timedelta(days=i),
+                end_time=start + timedelta(days=i, hours=1),
+                status='confirmed'
+            )
+            for i in range(3)
+        ])
+        patcher = mock.patch.object(outbound, 'get_redis', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _confirm_all(self):
+        for booking in self.bookings:
+            tasks.send_booking_confirmation(booking.id)
+    
+    def test_confirmations_coalesce_into_one_digest(self):
+        """Test that several confirmations become one email and one SMS"""
+        email_client = mock.Mock()
+        sms_client = mock.Mock()
+        
+        with mock.patch.object(email_service, 'client', email_client), \
+                mock.patch.object(sms_service, 'client', sms_client), \
+                mock.patch.object(sms_service, 'from_number', '+15559990000'):
+            self._confirm_all()
+            self.assertEqual(DigestEntry.objects.count(), 6)
+            self.assertFalse(Notification.objects.exists())
+            
+            # Nothing is due before the window closes
+            self.assertEqual(digest.flush_due(), 0)
+            
+            DigestEntry.objects.update(flush_at=timezone.now())
+            with delivering(self):
+                self.assertEqual(tasks.flush_due_digests(), 2)
+        
+        email = Notification.objects.get(notification_type='email')
+        self.assertEqual((email.status, email.subject), ('sent', '3 updates from Fit Pro'))
+        self.assertEqual(email.digest_entries.count(), 3)
+        self.assertEqual(
+            set(email.digest_entries.values_list('booking_id', flat=True)),
+            {booking.id for booking in self.bookings}
+        )
+        html = email_client.send.call_args.args[0].get()['content'][0]['value']
+        self.assertEqual(html.count('<li'), 3)
+        self.assertEqual(sms_client.messages.create.call_count, 1)
+        self.assertIn('3 updates from Fit Pro', sms_client.messages.create.call_args.kwargs['body'])
+    
+    def test_single_message_is_sent_unchanged(self):
+        """Test that a window holding one message delivers it as is"""
+        with mock.patch.object(email_service, 'client', mock.Mock()), \
+                mock.patch.object(sms_service, 'client', None):
+            tasks.send_booking_confirmation(self.bookings[0].id)
+            DigestEntry.objects.update(flush_at=timezone.now())
+            with delivering(self):
+                digest.flush_due()
+        
+        notification = Notification.objects.get()
+        self.assertEqual(notification.payload['template'], 'booking_confirmation')
+        self.assertEqual(notification.digest_entries.get().event_type, 'booking_confirmation')
+    
+    @override_settings(NOTIFICATION_DIGEST_WINDOW=0)
+    def test_disabled_digest_queues_directly(self):
+        """Test that without a window messages skip the digest stage"""
+        with mock.patch.object(email_service, 'client', mock.Mock()), \
+                mock.patch.object(sms_service, 'client', None):
+            self._confirm_all()
+        
+        self.assertFalse(DigestEntry.objects.exists())
+        self.assertEqual(Notification.objects.filter(status='pending').count(), 3)
+
+
+class NotificationCounterTest(TestCase):
+    """Tests for incrementally maintained notification counters"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='trainer@example.com',
+            username='trainer1',
+            password='pass123'
+        )
+        self.trainer = Trainer.objects.create(user=self.user, business_name='Fit Pro')
+    
+    def _notification(self, notification_type='email', status='pending'):
+        return Notification(
+            trainer=self.trainer,
+            notification_type=notification_type,
+            recipient='john@example.com',
+            message='Hello',
+            status=status
+        )
+    
+    def _counts(self):
+        return {
+            (row.notification_type, row.status): row.count
+            for row in NotificationCounter.objects.filter(trainer=self.trainer)
+            if row.count
+        }
+    
+    def test_counters_follow_inserts_and_status_changes(self):
+        """Test that every write path keeps the counters exact"""
+        created = Notification.objects.bulk_create(
+            [self._notification() for _ in range(3)] + [self._notification('sms')]
+        )
+        Notification.objects.create(
+            trainer=self.trainer, notification_type='sms', recipient='+1555', message='Hi', status='sent'
+        )
+        
+        loaded = list(Notification.objects.filter(id__in=[n.id for n in created[:2]]))
+        for notification in loaded:
+            notification.status = 'sent'
+        Notification.objects.bulk_update(loaded, ['status'])
+        Notification.objects.filter(id=created[2].id).update(status='failed')
+        
+        notification = Notification.objects.get(id=created[3].id)
+        notification.mark_failed('Twilio down')
+        notification.save()
+        
+        expected = {('email', 'sent'): 2, ('email', 'failed'): 1, ('sms', 'failed'): 1, ('sms', 'sent'): 1}
+        self.assertEqual(self._counts(), expected)
+        
+        counters.rebuild([self.trainer.id])
+        self.assertEqual(self._counts(), expected)
+    
+    def test_stats_read_counters(self):
+        """Test that the stats endpoint answers from the counters"""
+        Notification.objects.bulk_create(
+            [self._notification(status='sent') for _ in range(3)] + [self._notification('sms', 'failed')]
+        )
+        api = APIClient()
+        api.force_authenticate(self.user)
+        
+        with mock.patch.object(counters, 'rebuild') as rebuild:
+            response = api.get('/api/notifications/stats/')
+        
+        rebuild.assert_not_called()
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(response.data['recent_sent_7_days'], 3)
+        self.assertEqual(response.data['by_type'], {'email': 3, 'sms': 1, 'push': 0})
+        self.assertEqual(response.data['success_rate'], 75.0)
+    
+    def test_missing_counters_are_rebuilt(self):
+        """Test the one-shot fallback for trainers without counters"""
+        Notification.objects.bulk_create([self._notification() for _ in range(2)])
+        NotificationCounter.objects.all().delete()
+        
+        self.assertEqual(counters.summary(self.trainer)['pending'], 2)
+        self.assertEqual(self._counts(), {('email', 'pending'): 2})
+    
+    def test_recent_is_paginated_with_counter_count(self):
+        """Test that recent takes its page count from the counters"""
+        Notification.objects.bulk_create([self._notification() for _ in range(3)])
+        NotificationCounter.objects.update(count=60)
+        api = APIClient()
+        api.force_authenticate(self.user)
+        
+        response = api.get('/api/notifications/recent/')
+        
+        self.assertEqual(response.data['count'], 60)
+        self.assertEqual(len(response.data['results']), 3)
+    
+    def test_recent_without_trainer_profile_is_an_empty_page(self):
+        """Test that non-trainers get the same paginated shape"""
+        api = APIClient()
+        api.force_authenticate(User.objects.create_user(
+            email='member@example.com',
+            username='member',
+            password='pass123'
+        ))
+        
+        response = api.get('/api/notifications/recent/')
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 0)
+        self.assertEqual(response.data['results'], [])
@@ -0,0 +1,99 @@
+"""
+Local HTTP stand-in for the SendGrid v3 mail/send endpoint.
+Used by the notification tests to exercise batched sends without talking
+to SendGrid. Point SENDGRID_API_HOST at FakeSendGridServer.url.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeSendGridServer:
+    """
+    Minimal SendGrid look-alike running on a background thread.
+    
+    Every accepted POST to /v3/mail/send is recorded in `requests`.
+    Recipients listed in `reject` cause a 400 response whose errors point
+    at their personalization index, the way SendGrid reports bad addresses.
+    Setting `fail_status` makes every request fail with that HTTP status.
+    
+    Usage:
+        with FakeSendGridServer(reject={'bad@example.com'}) as server:
+            with override_settings(SENDGRID_API_KEY='test', SENDGRID_API_HOST=server.url):
+                ...
+    """
+    
+    def __init__(self, reject=None, fail_status=None):
+        self.reject = set(reject or [])
+        self.fail_status = fail_status
+        self.requests = []
+        self._server = None
+        self._thread = None
+    
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+    
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, *exc_info):
+        self.stop()
+    
+    def _handle_send(self, body):
+        """Return (status, response body) for one mail/send request."""
+        if self.fail_status:
+            return self.fail_status, {'errors': [{'message': 'Service unavailable', 'field': None}]}
+        
+        errors = []
+        for index, personalization in enumerate(body.get('personalizations', [])):
+            for to_index, recipient in enumerate(personalization.get('to', [])):
+                if recipient.get('email') in self.reject:
+                    errors.append({
+                        'message': 'Does not contain a valid address.',
+                        'field': f'personalizations.{index}.to.{to_index}.email',
+                    })
+        
+        if errors:
+            return 400, {'errors': errors}
+        
+        self.requests.append(body)
+        return 202, None
+    
+    def _make_handler(self):
+        fake = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                
+                if self.path.rstrip('/') == '/v3/mail/send':
+                    status, payload = fake._handle_send(body)
+                else:
+                    status, payload = 404, {'errors': [{'message': 'Not found'}]}
+                
+                data = json.dumps(payload).encode() if payload is not None else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler